@@ -0,0 +1,218 @@
+# analysis_cache.py
+"""
+Caché de resultados de análisis (payload de /api/analisis) con dos niveles.
+
+Sustituye a los ficheros static/cached_previews/{match_id}.json, que no caducaban,
+podían quedar truncados si el proceso moría a mitad de escritura y crecían sin límite:
+
+  - nivel en memoria: LRU pequeño para los partidos que se están consultando ahora;
+  - nivel en disco: SQLite (cada escritura es una transacción, nunca se sirve un JSON a
+    medias) con el payload comprimido, caducidad según el estado del partido y
+    expulsión LRU al superar el tamaño máximo.
+
+El estado es el de _matchInfo que devuelve el scraper (match_state): un partido terminado
+no cambia y se guarda sin caducidad; uno próximo caduca a los pocos minutos porque sus
+cuotas y sus últimos partidos se mueven.
+
+Configuración por variables de entorno:
+    ANALYSIS_CACHE_PATH            fichero SQLite (<proyecto>/cache_html/analisis.sqlite3)
+    ANALYSIS_CACHE_MAX_MB          tamaño máximo en disco (256)
+    ANALYSIS_CACHE_MEMORY_ITEMS    entradas del nivel en memoria (128)
+    ANALYSIS_CACHE_TTL_UPCOMING    segundos para partidos sin empezar o de estado desconocido (1800)
+    ANALYSIS_CACHE_TTL_LIVE        segundos para partidos en juego (120)
+    ANALYSIS_CACHE_TTL_FINISHED    segundos para partidos terminados; 0 = sin caducidad (0)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from modules.page_cache import match_state_class
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class AnalysisCache:
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, memory_items=128, ttl_by_state=None):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        # Segundos de vida por clase de estado; None = sin caducidad
+        self.ttl_by_state = ttl_by_state or {"upcoming": 1800, "live": 120, "finished": None}
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # key -> (expires_at, payload)
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0,
+                          "expired": 0, "evicted": 0, "invalidated": 0}
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                " key TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL, state TEXT,"
+                " stored_at REAL NOT NULL, expires_at REAL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS analysis_cache_last_access ON analysis_cache(last_access)")
+
+    # --- nivel en memoria ---
+    def _remember_locked(self, key, expires_at, payload):
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # --- API pública ---
+    def get(self, key):
+        """Payload guardado (el mismo dict para los aciertos en memoria: no modificarlo) o None."""
+        key = str(key)
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                expires_at, payload = hit
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return payload
+                del self._memory[key]
+
+            row = self._conn.execute("SELECT payload, expires_at FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            blob, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                with self._conn:
+                    self._conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE analysis_cache SET last_access = ? WHERE key = ?", (now, key))
+        try:
+            payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+        except (zlib.error, ValueError):
+            self.invalidate(key)
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+        with self._lock:
+            self._counters["disk_hits"] += 1
+            self._remember_locked(key, expires_at, payload)
+        return payload
+
+    def contains(self, key):
+        """True si hay una entrada vigente (no cuenta como acierto ni carga el payload)."""
+        key = str(key)
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None and (hit[0] is None or hit[0] > now):
+                return True
+            row = self._conn.execute("SELECT expires_at FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] > now)
+
+    def put(self, key, payload, state=None):
+        """Guarda el payload; `state` es el match_state de _matchInfo (decide la caducidad)."""
+        key = str(key)
+        state_class = match_state_class(state)
+        ttl = self.ttl_by_state.get(state_class)
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+        blob = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"), 6)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (key, payload, size, state, stored_at, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, blob, len(blob), state_class, now, expires_at, now),
+                )
+            self._counters["stores"] += 1
+            self._remember_locked(key, expires_at, payload)
+            self._evict_locked()
+
+    def invalidate(self, key):
+        """Borra una entrada de ambos niveles. Devuelve True si existía en disco."""
+        key = str(key)
+        with self._lock:
+            self._memory.pop(key, None)
+            with self._conn:
+                deleted = self._conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,)).rowcount
+            if deleted:
+                self._counters["invalidated"] += 1
+        return bool(deleted)
+
+    def entries(self, limit=None):
+        """Entradas vigentes en disco (sin payload), las usadas más recientemente primero."""
+        query = ("SELECT key, state, size, stored_at, expires_at, last_access FROM analysis_cache"
+                 " WHERE expires_at IS NULL OR expires_at > ? ORDER BY last_access DESC")
+        params = [time.time()]
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(zip(("key", "state", "size", "stored_at", "expires_at", "last_access"), row)) for row in rows]
+
+    def _evict_locked(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with self._conn:
+            self._counters["expired"] += self._conn.execute(
+                "DELETE FROM analysis_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).rowcount
+        # Se libera hasta el 90% para no expulsar en cada escritura
+        target = self.max_bytes * 0.9
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()[0]
+        for key, size in self._conn.execute("SELECT key, size FROM analysis_cache ORDER BY last_access").fetchall():
+            if total <= target:
+                break
+            with self._conn:
+                self._conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            self._counters["evicted"] += 1
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()
+            return dict(self._counters, entries=entries, bytes=total, max_bytes=self.max_bytes,
+                        memory_entries=len(self._memory), memory_items=self.memory_items)
+
+
+def _ttl_env(name, default):
+    value = _env_int(name, default)
+    return None if value <= 0 else value
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    """Caché compartida por proceso; el SQLite se abre en la primera llamada, no al importar."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalysisCache(
+                    os.environ.get("ANALYSIS_CACHE_PATH") or Path(__file__).resolve().parent / "cache_html" / "analisis.sqlite3",
+                    max_bytes=max(1, _env_int("ANALYSIS_CACHE_MAX_MB", 256)) * 1024 * 1024,
+                    memory_items=max(1, _env_int("ANALYSIS_CACHE_MEMORY_ITEMS", 128)),
+                    ttl_by_state={
+                        "upcoming": _ttl_env("ANALYSIS_CACHE_TTL_UPCOMING", 1800),
+                        "live": _ttl_env("ANALYSIS_CACHE_TTL_LIVE", 120),
+                        "finished": _ttl_env("ANALYSIS_CACHE_TTL_FINISHED", 0),
+                    },
+                )
+    return _cache
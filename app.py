@@ -1,13 +1,15 @@
 # app.py - Servidor web principal (Flask)
-from flask import Flask, render_template, abort, request
+from flask import Flask, render_template, abort, request, g, Response
 import asyncio
 from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 import datetime
+import os
 import re
 import math
 import threading
 import json
+import pandas as pd
 import time
 import logging
 from pathlib import Path
@@ -23,12 +25,50 @@ from modules.estudio_scraper import (
     obtener_datos_preview_ligero, 
     generar_analisis_mercado_simplificado,
     check_handicap_cover,
-    parse_ah_to_number_of
+    parse_ah_to_number_of,
+    obtener_tiempos_etapas_recientes,
+    GRAFO_ANALISIS_OF
 )
 from flask import jsonify # Asegúrate de que jsonify está importado
+from fetch_limits import nowgoal_limiter
+from modules.page_cache import get_page_cache
+from modules.stats_store import get_stats_store
+from modules.analysis_layers import get_layer_cache
+from modules.metrics import METRICS_ENABLED, counter, histogram, register_stats_collector, render_metrics
+from modules.tracing import trace, span, current_trace_id, recent_spans, recent_traces
+from modules.results_warehouse import get_results_warehouse, backtest_handicap, backtest_goal_line
+from analysis_cache import get_analysis_cache
+from match_store import MatchStore
+from match_segments import SegmentStore
+from match_catalog import get_match_catalog
+from match_snapshot import ChangeLogReader, change_log_path_for, changed_ids
+from scheduler import read_status_file
+from prewarm_queue import PrewarmQueue
+from single_flight import SingleFlight
 
 app = Flask(__name__)
 
+# --- Métricas por ruta (plantilla de la regla, no la URL: /api/analisis/<string:match_id>) ---
+APP_REQUESTS = counter("app_requests_total", "Peticiones atendidas por ruta, método y estado", ("route", "method", "status"))
+APP_REQUEST_SECONDS = histogram("app_request_seconds", "Duración de las peticiones por ruta", ("route",))
+ANALISIS_REQUESTS = counter("api_analisis_requests_total", "Peticiones a /api/analisis según si salen de la caché", ("cache",))
+
+
+@app.before_request
+def _metrics_start():
+    g.metrics_start = time.perf_counter()
+
+
+@app.after_request
+def _metrics_record(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        APP_REQUESTS.inc(route=route, method=request.method, status=str(response.status_code))
+        APP_REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+    return response
+
+
 # --- Mantén tu lógica para la página principal ---
 URL_NOWGOAL = "https://live20.nowgoal25.com/"
 
@@ -43,7 +83,6 @@ _REQUEST_HEADERS = {
 
 _requests_session = None
 _requests_session_lock = threading.Lock()
-_requests_fetch_lock = threading.Lock()
 
 _EMPTY_DATA_TEMPLATE = {"upcoming_matches": [], "finished_matches": []}
 _DATA_FILE_CANDIDATES = [
@@ -60,6 +99,94 @@ else:
 _data_file_lock = threading.Lock()
 
 
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+# Registro de cambios que deja run_scraper.py (completo o --incremental) junto a data.json
+_data_change_log = ChangeLogReader(change_log_path_for(DATA_FILE))
+
+
+# Horas de próximos partidos que se precalculan solas al recargar data.json (0 = desactivado)
+PREWARM_AUTO_HOURS = _env_float('PREWARM_AUTO_HOURS', 0)
+
+
+def _aplicar_registro_cambios():
+    """
+    Invalida en la caché de análisis (y sus etapas reutilizables) los partidos que el
+    scraper anotó como cambiados desde la última lectura. Leer el registro sin novedades
+    es un stat() del fichero, así que se llama también antes de servir un análisis o una
+    vista previa: no hace falta que una petición de listado recargue data.json antes.
+    """
+    entries = _data_change_log.read_new()
+    if not entries:
+        return
+    layer_cache = get_layer_cache()
+    for changes in entries:
+        for match_id in changed_ids(changes):
+            get_analysis_cache().invalidate(match_id)
+            if layer_cache is not None:
+                layer_cache.invalidate(match_id)
+
+
+def _on_data_reload():
+    """
+    Al recargar data.json: aplica el registro de cambios y, si PREWARM_AUTO_HOURS > 0, encola
+    los partidos que empiezan pronto. Los finalizados nuevos del catálogo pasan al almacén de resultados.
+    """
+    _aplicar_registro_cambios()
+    warehouse = get_results_warehouse()
+    if warehouse is not None:
+        warehouse.ingest_catalog(match_catalog.path)
+    if PREWARM_AUTO_HOURS > 0:
+        encolar_proximos_partidos(PREWARM_AUTO_HOURS)
+
+
+# Índice en memoria de data.json (se recarga solo cuando cambia el fichero)
+match_store = MatchStore(DATA_FILE)
+# Segmentos NDJSON junto a data.json: las páginas del scroll se leen sin cargar el fichero entero
+segment_store = SegmentStore(DATA_FILE)
+# Catálogo SQLite que rellena el scraper (índices por hora, hándicap, línea y equipo; histórico)
+match_catalog = get_match_catalog(DATA_FILE)
+_data_seen_signature = [None]
+_data_signature_lock = threading.Lock()
+
+
+def _comprobar_recarga_datos():
+    """
+    Única comprobación de la firma de data.json (mtime y tamaño, y si el catálogo ya tiene
+    su volcado): _on_data_reload se llama una vez por snapshot del scraper, lo sirva el
+    catálogo, los segmentos o el índice en memoria.
+    """
+    try:
+        stat = DATA_FILE.stat()
+    except OSError:
+        return
+    signature = (stat.st_mtime_ns, stat.st_size, match_catalog.is_current_for(DATA_FILE))
+    with _data_signature_lock:
+        if signature == _data_seen_signature[0]:
+            return
+        _data_seen_signature[0] = signature
+    try:
+        _on_data_reload()
+    except Exception as exc:
+        print(f"Error tras recargar {DATA_FILE}: {exc}")
+
+
+def _catalog_for_listings():
+    """El catálogo si corresponde al data.json actual."""
+    return match_catalog if match_catalog.is_current_for(DATA_FILE) else None
+
+
 def load_data_from_file():
     """Carga los datos desde el archivo JSON, similar a la app ligera."""
     with _data_file_lock:
@@ -84,102 +211,43 @@ def load_data_from_file():
         return normalized
 
 
-def _parse_time_obj(value):
-    if isinstance(value, datetime.datetime):
-        return value
-    if isinstance(value, str):
-        try:
-            return datetime.datetime.fromisoformat(value)
-        except ValueError:
-            try:
-                return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                return None
-    return None
-
-
-def _ensure_time_string(entry, parsed_time):
-    if entry.get('time') or not parsed_time:
-        return
-    entry['time'] = parsed_time.strftime('%d/%m %H:%M')
-
-
 def _filter_and_slice_matches(section, limit=None, offset=0, handicap_filter=None, sort_desc=False):
-    data = load_data_from_file()
-    matches = data.get(section, [])
-    prepared = []
-    for original in matches:
-        entry = dict(original)
-        parsed_time = _parse_time_obj(entry.get('time_obj'))
-        entry['_sort_time'] = parsed_time or datetime.datetime.min
-        _ensure_time_string(entry, parsed_time)
-        prepared.append(entry)
+    # Orden de preferencia: catálogo SQLite (consulta indexada, finalizados con histórico),
+    # segmentos NDJSON (solo la página pedida) e índice en memoria de data.json. Los dos
+    # primeros solo si los escribió el scraper a partir del data.json actual
+    _comprobar_recarga_datos()
+    if (catalog := _catalog_for_listings()) is not None:
+        return catalog.query(section, limit=limit, offset=offset, handicap_filter=handicap_filter, sort_desc=sort_desc)
+    if segment_store.available():
+        return segment_store.query(section, limit=limit, offset=offset, handicap_filter=handicap_filter, sort_desc=sort_desc)
+    return match_store.query(section, limit=limit, offset=offset, handicap_filter=handicap_filter, sort_desc=sort_desc)
 
-    if handicap_filter:
-        try:
-            target = normalize_handicap_to_half_bucket_str(handicap_filter)
-        except Exception:
-            target = None
-        if target is not None:
-            filtered = []
-            for entry in prepared:
-                hv = normalize_handicap_to_half_bucket_str(entry.get('handicap', ''))
-                if hv == target:
-                    filtered.append(entry)
-            prepared = filtered
-
-    prepared.sort(key=lambda item: (item['_sort_time'], item.get('id', '')), reverse=sort_desc)
-
-    offset = max(int(offset or 0), 0)
-    if offset:
-        if offset >= len(prepared):
-            prepared = []
-        else:
-            prepared = prepared[offset:]
-
-    if limit is not None:
-        try:
-            limit_val = int(limit)
-        except (TypeError, ValueError):
-            limit_val = None
-        if limit_val is not None and limit_val >= 0:
-            prepared = prepared[:limit_val]
 
-    for entry in prepared:
-        entry.pop('_sort_time', None)
-    return prepared
+# --- Single-flight: un solo cálculo en curso por partido ---
+completos_flight = SingleFlight('obtener_datos_completos_partido')
+analisis_flight = SingleFlight('api_analisis')
+preview_flight = SingleFlight('api_preview')
 
 
-def _get_preview_cache_dir():
-    static_root_value = app.static_folder
-    if not static_root_value:
-        static_root_value = Path(__file__).resolve().parent / 'static'
-    static_root = Path(static_root_value).resolve()
-    return static_root / 'cached_previews'
+def obtener_datos_completos_compartido(match_id: str, engine: str | None = None):
+    """
+    obtener_datos_completos_partido con las peticiones simultáneas del mismo partido
+    agrupadas (/estudio, /analizar_partido, /api/analisis y la cola de precálculo).
+    Se agrupa solo por match_id: todos los motores devuelven los mismos datos.
+    El dict devuelto se comparte entre peticiones: tratarlo como solo lectura.
+    """
+    return completos_flight.do(str(match_id), obtener_datos_completos_partido, match_id, engine=engine)
 
 
 def load_preview_from_cache(match_id: str):
-    cache_dir = _get_preview_cache_dir()
-    cache_path = cache_dir / f'{match_id}.json'
-    if cache_path.exists():
-        try:
-            with cache_path.open('r', encoding='utf-8') as fh:
-                cached_data = json.load(fh)
-                if isinstance(cached_data, dict):
-                    return cached_data
-        except (json.JSONDecodeError, OSError) as exc:
-            print(f"Error al leer cache de analisis {cache_path}: {exc}")
-    return None
+    _aplicar_registro_cambios()
+    return get_analysis_cache().get(match_id)
 
 
 def save_preview_to_cache(match_id: str, payload: dict):
-    cache_dir = _get_preview_cache_dir()
     try:
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        cache_path = cache_dir / f'{match_id}.json'
-        with cache_path.open('w', encoding='utf-8') as fh:
-            json.dump(payload, fh, ensure_ascii=False)
-    except OSError as exc:
+        get_analysis_cache().put(match_id, payload, state=payload.get('match_state'))
+    except Exception as exc:
         print(f"Error al escribir cache de analisis para {match_id}: {exc}")
 
 
@@ -206,11 +274,16 @@ def _get_shared_requests_session():
 
 
 def _fetch_nowgoal_html_sync(url: str) -> str | None:
+    page_cache = get_page_cache()
+    if page_cache is not None and (cached := page_cache.get(url)) is not None:
+        return cached
     session = _get_shared_requests_session()
     try:
-        with _requests_fetch_lock:
+        with nowgoal_limiter.limit(url):
             response = session.get(url, timeout=REQUEST_TIMEOUT_SECONDS)
         response.raise_for_status()
+        if page_cache is not None:
+            page_cache.put(url, response.text)
         return response.text
     except Exception as exc:
         print(f"Error al obtener {url} con requests: {exc}")
@@ -574,17 +647,19 @@ def mostrar_estudio(match_id):
     """
     print(f"Recibida petición para el estudio del partido ID: {match_id}")
     
-    # Llama a la función principal de tu módulo de scraping
-    datos_partido = obtener_datos_completos_partido(match_id)
-    
-    if not datos_partido or "error" in datos_partido:
-        # Si hay un error, puedes mostrar una página de error
-        print(f"Error al obtener datos para {match_id}: {datos_partido.get('error')}")
-        abort(500, description=datos_partido.get('error', 'Error desconocido'))
+    with trace("estudio", match_id=match_id):
+        # Llama a la función principal de tu módulo de scraping (?engine=http|selenium|auto)
+        datos_partido = obtener_datos_completos_compartido(match_id, engine=request.args.get('engine'))
 
-    # Si todo va bien, renderiza la plantilla HTML pasándole los datos
-    print(f"Datos obtenidos para {datos_partido['home_name']} vs {datos_partido['away_name']}. Renderizando plantilla...")
-    return render_template('estudio.html', data=datos_partido, format_ah=format_ah_as_decimal_string_of)
+        if not datos_partido or "error" in datos_partido:
+            # Si hay un error, puedes mostrar una página de error
+            print(f"Error al obtener datos para {match_id}: {datos_partido.get('error')}")
+            abort(500, description=datos_partido.get('error', 'Error desconocido'))
+
+        # Si todo va bien, renderiza la plantilla HTML pasándole los datos
+        print(f"Datos obtenidos para {datos_partido['home_name']} vs {datos_partido['away_name']}. Renderizando plantilla...")
+        with span("render", template="estudio.html"):
+            return render_template('estudio.html', data=datos_partido, format_ah=format_ah_as_decimal_string_of)
 
 # --- NUEVA RUTA PARA ANALIZAR PARTIDOS FINALIZADOS ---
 @app.route('/analizar_partido', methods=['GET', 'POST'])
@@ -595,39 +670,47 @@ def analizar_partido():
     if request.method == 'POST':
         match_id = request.form.get('match_id')
         if match_id:
-            print(f"Recibida petición para analizar partido finalizado ID: {match_id}")
-            
-            # Llama a la función principal de tu módulo de scraping
-            datos_partido = obtener_datos_completos_partido(match_id)
-            
-            if not datos_partido or "error" in datos_partido:
-                # Si hay un error, mostrarlo en la página
-                print(f"Error al obtener datos para {match_id}: {datos_partido.get('error')}")
-                return render_template('analizar_partido.html', error=datos_partido.get('error', 'Error desconocido'))
-            
-            # --- ANÁLISIS SIMPLIFICADO ---
-            # Extraer los datos necesarios para el análisis simplificado
-            main_odds = datos_partido.get("main_match_odds_data")
-            h2h_data = datos_partido.get("h2h_data")
-            home_name = datos_partido.get("home_name")
-            away_name = datos_partido.get("away_name")
-
-            analisis_simplificado_html = ""
-            if all([main_odds, h2h_data, home_name, away_name]):
-                analisis_simplificado_html = generar_analisis_mercado_simplificado(main_odds, h2h_data, home_name, away_name)
-
-            # Si todo va bien, renderiza la plantilla HTML pasándole los datos
-            print(f"Datos obtenidos para {datos_partido['home_name']} vs {datos_partido['away_name']}. Renderizando plantilla...")
-            return render_template('estudio.html', 
-                                   data=datos_partido, 
-                                   format_ah=format_ah_as_decimal_string_of,
-                                   analisis_simplificado_html=analisis_simplificado_html)
+            with trace("analizar_partido", match_id=match_id):
+                return _analizar_partido_finalizado(match_id)
         else:
             return render_template('analizar_partido.html', error="Por favor, introduce un ID de partido válido.")
     
     # Si es GET, mostrar el formulario
     return render_template('analizar_partido.html')
 
+
+def _analizar_partido_finalizado(match_id):
+    """Análisis completo + análisis de mercado simplificado de un partido finalizado, renderizado con estudio.html."""
+    print(f"Recibida petición para analizar partido finalizado ID: {match_id}")
+    
+    # Llama a la función principal de tu módulo de scraping
+    datos_partido = obtener_datos_completos_compartido(match_id)
+    
+    if not datos_partido or "error" in datos_partido:
+        # Si hay un error, mostrarlo en la página
+        print(f"Error al obtener datos para {match_id}: {datos_partido.get('error')}")
+        return render_template('analizar_partido.html', error=datos_partido.get('error', 'Error desconocido'))
+    
+    # --- ANÁLISIS SIMPLIFICADO ---
+    # Extraer los datos necesarios para el análisis simplificado
+    main_odds = datos_partido.get("main_match_odds_data")
+    h2h_data = datos_partido.get("h2h_data")
+    home_name = datos_partido.get("home_name")
+    away_name = datos_partido.get("away_name")
+
+    analisis_simplificado_html = ""
+    if all([main_odds, h2h_data, home_name, away_name]):
+        analisis_simplificado_html = generar_analisis_mercado_simplificado(main_odds, h2h_data, home_name, away_name)
+
+    # Si todo va bien, renderiza la plantilla HTML pasándole los datos
+    print(f"Datos obtenidos para {datos_partido['home_name']} vs {datos_partido['away_name']}. Renderizando plantilla...")
+    with span("render", template="estudio.html"):
+        return render_template('estudio.html', 
+                               data=datos_partido, 
+                               format_ah=format_ah_as_decimal_string_of,
+                               analisis_simplificado_html=analisis_simplificado_html)
+
+
 # --- NUEVA RUTA API PARA LA VISTA PREVIA RÁPIDA ---
 @app.route('/api/preview/<string:match_id>')
 def api_preview(match_id):
@@ -638,10 +721,12 @@ def api_preview(match_id):
     try:
         # Por defecto usa la vista previa LIGERA (requests). Si ?mode=selenium, usa la completa.
         mode = request.args.get('mode', 'light').lower()
-        if mode in ['full', 'selenium']:
-            preview_data = obtener_datos_preview_rapido(match_id)
-        else:
-            preview_data = obtener_datos_preview_ligero(match_id)
+        _aplicar_registro_cambios()
+        with trace("preview", match_id=match_id, mode=mode):
+            if mode in ['full', 'selenium']:
+                preview_data = preview_flight.do(('full', match_id), obtener_datos_preview_rapido, match_id)
+            else:
+                preview_data = preview_flight.do(('light', match_id), obtener_datos_preview_ligero, match_id)
         if "error" in preview_data:
             return jsonify(preview_data), 500
         return jsonify(preview_data)
@@ -650,6 +735,266 @@ def api_preview(match_id):
         return jsonify({'error': 'Ocurrió un error interno en el servidor.'}), 500
 
 
+def construir_payload_analisis(match_id: str, engine: str | None = None):
+    """
+    Ejecuta el análisis completo y construye el payload de /api/analisis
+    (datos complejos + HTML simplificado). Devuelve (payload, None) o (None, error).
+    """
+    datos = obtener_datos_completos_compartido(match_id, engine=engine)
+    if not datos or (isinstance(datos, dict) and datos.get('error')):
+        return None, (datos or {}).get('error', 'No se pudieron obtener datos.')
+
+    # --- Lógica para el payload complejo (la original) ---
+    def df_to_rows(df):
+        rows = []
+        try:
+            if df is not None and hasattr(df, 'iterrows'):
+                for idx, row in df.iterrows():
+                    label = str(idx)
+                    label = label.replace('Shots on Goal', 'Tiros a Puerta')                                     .replace('Shots', 'Tiros')                                     .replace('Dangerous Attacks', 'Ataques Peligrosos')                                     .replace('Attacks', 'Ataques')
+                    try:
+                        home_val = row['Casa']
+                    except Exception:
+                        home_val = ''
+                    try:
+                        away_val = row['Fuera']
+                    except Exception:
+                        away_val = ''
+                    rows.append({'label': label, 'home': home_val or '', 'away': away_val or ''})
+        except Exception:
+            pass
+        return rows
+
+    payload = {
+        'match_id': match_id,
+        'home_team': datos.get('home_name', ''),
+        'away_team': datos.get('away_name', ''),
+        'final_score': datos.get('score'),
+        'match_date': datos.get('match_date'),
+        'match_time': datos.get('match_time'),
+        'match_datetime': datos.get('match_datetime'),
+        'match_state': datos.get('match_state'),
+        'recent_indirect_full': {
+            'last_home': None,
+            'last_away': None,
+            'h2h_col3': None
+        },
+        'comparativas_indirectas': {
+            'left': None,
+            'right': None
+        }
+    }
+    
+    # --- START COVERAGE CALCULATION ---
+    main_odds = datos.get("main_match_odds_data")
+    home_name = datos.get("home_name")
+    away_name = datos.get("away_name")
+    ah_actual_num = parse_ah_to_number_of(main_odds.get('ah_linea_raw', ''))
+    
+    favorito_actual_name = "Ninguno (línea en 0)"
+    if ah_actual_num is not None:
+        if ah_actual_num > 0: favorito_actual_name = home_name
+        elif ah_actual_num < 0: favorito_actual_name = away_name
+
+    def get_cover_status_vs_current(details):
+        if not details or ah_actual_num is None:
+            return 'NEUTRO'
+        try:
+            score_str = details.get('score', '').replace(' ', '').replace(':', '-')
+            if not score_str or '?' in score_str:
+                return 'NEUTRO'
+
+            h_home = details.get('home_team')
+            h_away = details.get('away_team')
+            
+            status, _ = check_handicap_cover(score_str, ah_actual_num, favorito_actual_name, h_home, h_away, home_name)
+            return status
+        except Exception:
+            return 'NEUTRO'
+            
+    # --- Análisis mejorado de H2H Rivales ---
+    def analyze_h2h_rivals(home_result, away_result):
+        if not home_result or not away_result:
+            return None
+            
+        try:
+            # Obtener resultados de los partidos
+            home_goals = list(map(int, home_result.get('score', '0-0').split('-')))
+            away_goals = list(map(int, away_result.get('score', '0-0').split('-')))
+            
+            # Calcular diferencia de goles
+            home_goal_diff = home_goals[0] - home_goals[1]
+            away_goal_diff = away_goals[0] - away_goals[1]
+            
+            # Comparar resultados
+            if home_goal_diff > away_goal_diff:
+                return "Contra rivales comunes, el Equipo Local ha obtenido mejores resultados"
+            elif away_goal_diff > home_goal_diff:
+                return "Contra rivales comunes, el Equipo Visitante ha obtenido mejores resultados"
+            else:
+                return "Los rivales han tenido resultados similares"
+        except Exception:
+            return None
+            
+    # --- Análisis de Comparativas Indirectas ---
+    def analyze_indirect_comparison(result, team_name):
+        if not result:
+            return None
+            
+        try:
+            # Determinar si el equipo cubrió el handicap
+            status = get_cover_status_vs_current(result)
+            
+            if status == 'CUBIERTO':
+                return f"Contra este rival, {team_name} habría cubierto el handicap"
+            elif status == 'NO CUBIERTO':
+                return f"Contra este rival, {team_name} no habría cubierto el handicap"
+            else:
+                return f"Contra este rival, el resultado para {team_name} sería indeterminado"
+        except Exception:
+            return None
+    # --- END COVERAGE CALCULATION ---
+
+    last_home = (datos.get('last_home_match') or {})
+    last_home_details = last_home.get('details') or {}
+    if last_home_details:
+        payload['recent_indirect_full']['last_home'] = {
+            'home': last_home_details.get('home_team'),
+            'away': last_home_details.get('away_team'),
+            'score': (last_home_details.get('score') or '').replace(':', ' : '),
+            'ah': format_ah_as_decimal_string_of(last_home_details.get('handicap_line_raw') or '-'),
+            'ou': last_home_details.get('ouLine') or '-',
+            'stats_rows': df_to_rows(last_home.get('stats')),
+            'date': last_home_details.get('date'),
+            'cover_status': get_cover_status_vs_current(last_home_details)
+        }
+
+    last_away = (datos.get('last_away_match') or {})
+    last_away_details = last_away.get('details') or {}
+    if last_away_details:
+        payload['recent_indirect_full']['last_away'] = {
+            'home': last_away_details.get('home_team'),
+            'away': last_away_details.get('away_team'),
+            'score': (last_away_details.get('score') or '').replace(':', ' : '),
+            'ah': format_ah_as_decimal_string_of(last_away_details.get('handicap_line_raw') or '-'),
+            'ou': last_away_details.get('ouLine') or '-',
+            'stats_rows': df_to_rows(last_away.get('stats')),
+            'date': last_away_details.get('date'),
+            'cover_status': get_cover_status_vs_current(last_away_details)
+        }
+
+    h2h_col3 = (datos.get('h2h_col3') or {})
+    h2h_col3_details = h2h_col3.get('details') or {}
+    if h2h_col3_details and h2h_col3_details.get('status') == 'found':
+        h2h_col3_details_adapted = {
+            'score': f"{h2h_col3_details.get('goles_home')}:{h2h_col3_details.get('goles_away')}",
+            'home_team': h2h_col3_details.get('h2h_home_team_name'),
+            'away_team': h2h_col3_details.get('h2h_away_team_name')
+        }
+        payload['recent_indirect_full']['h2h_col3'] = {
+            'home': h2h_col3_details.get('h2h_home_team_name'),
+            'away': h2h_col3_details.get('h2h_away_team_name'),
+            'score': f"{h2h_col3_details.get('goles_home')} : {h2h_col3_details.get('goles_away')}",
+            'ah': format_ah_as_decimal_string_of(h2h_col3_details.get('handicap_line_raw') or '-'),
+            'ou': h2h_col3_details.get('ou_result') or '-',
+            'stats_rows': df_to_rows(h2h_col3.get('stats')),
+            'date': h2h_col3_details.get('date'),
+            'cover_status': get_cover_status_vs_current(h2h_col3_details_adapted),
+            'analysis': analyze_h2h_rivals(last_home_details, last_away_details)
+        }
+
+    h2h_general = (datos.get('h2h_general') or {})
+    h2h_general_details = h2h_general.get('details') or {}
+    if h2h_general_details:
+        score_text = h2h_general_details.get('res6') or ''
+        cover_input = {
+            'score': score_text,
+            'home_team': h2h_general_details.get('h2h_gen_home'),
+            'away_team': h2h_general_details.get('h2h_gen_away')
+        }
+        payload['recent_indirect_full']['h2h_general'] = {
+            'home': h2h_general_details.get('h2h_gen_home'),
+            'away': h2h_general_details.get('h2h_gen_away'),
+            'score': score_text.replace(':', ' : '),
+            'ah': h2h_general_details.get('ah6') or '-',
+            'ou': h2h_general_details.get('ou_result6') or '-',
+            'stats_rows': df_to_rows(h2h_general.get('stats')),
+            'date': h2h_general_details.get('date'),
+            'cover_status': get_cover_status_vs_current(cover_input) if score_text else 'NEUTRO'
+        }
+
+    comp_left = (datos.get('comp_L_vs_UV_A') or {})
+    comp_left_details = comp_left.get('details') or {}
+    if comp_left_details:
+        payload['comparativas_indirectas']['left'] = {
+            'title_home_name': datos.get('home_name'),
+            'title_away_name': datos.get('away_name'),
+            'home_team': comp_left_details.get('home_team'),
+            'away_team': comp_left_details.get('away_team'),
+            'score': (comp_left_details.get('score') or '').replace(':', ' : '),
+            'ah': format_ah_as_decimal_string_of(comp_left_details.get('ah_line') or '-'),
+            'ou': comp_left_details.get('ou_line') or '-',
+            'localia': comp_left_details.get('localia') or '',
+            'stats_rows': df_to_rows(comp_left.get('stats')),
+            'cover_status': get_cover_status_vs_current(comp_left_details),
+            'analysis': analyze_indirect_comparison(comp_left_details, datos.get('home_name'))
+        }
+
+    comp_right = (datos.get('comp_V_vs_UL_H') or {})
+    comp_right_details = comp_right.get('details') or {}
+    if comp_right_details:
+        payload['comparativas_indirectas']['right'] = {
+            'title_home_name': datos.get('home_name'),
+            'title_away_name': datos.get('away_name'),
+            'home_team': comp_right_details.get('home_team'),
+            'away_team': comp_right_details.get('away_team'),
+            'score': (comp_right_details.get('score') or '').replace(':', ' : '),
+            'ah': format_ah_as_decimal_string_of(comp_right_details.get('ah_line') or '-'),
+            'ou': comp_right_details.get('ou_line') or '-',
+            'localia': comp_right_details.get('localia') or '',
+            'stats_rows': df_to_rows(comp_right.get('stats')),
+            'cover_status': get_cover_status_vs_current(comp_right_details),
+            'analysis': analyze_indirect_comparison(comp_right_details, datos.get('away_name'))
+        }
+
+    # --- Lógica para el HTML simplificado ---
+    h2h_data = datos.get("h2h_data")
+    simplified_html = ""
+    if all([main_odds, h2h_data, home_name, away_name]):
+        simplified_html = generar_analisis_mercado_simplificado(main_odds, h2h_data, home_name, away_name)
+    
+    payload['simplified_html'] = simplified_html
+
+    return payload, None
+
+
+def analizar_y_cachear(match_id: str, engine: str | None = None):
+    """
+    Análisis completo + guardado en la caché de análisis. Devuelve (payload, error).
+    Las llamadas simultáneas para el mismo partido (/api/analisis y la cola de precálculo)
+    comparten un único cálculo.
+    """
+    return analisis_flight.do(str(match_id), _analizar_y_cachear, match_id, engine)
+
+
+def _analizar_y_cachear(match_id, engine):
+    # Quien gana el single-flight puede llegar justo después de que otro líder guardara
+    # el mismo partido (su consulta a la caché fue anterior): se vuelve a mirar antes de calcular
+    cached_payload = load_preview_from_cache(match_id)
+    if isinstance(cached_payload, dict) and cached_payload.get('home_team'):
+        return cached_payload, None
+    start_time = time.time()
+    with trace("analizar_y_cachear", match_id=match_id):
+        payload, error = construir_payload_analisis(match_id, engine=engine)
+        if payload is None:
+            return None, error
+        with span("cache_write"):
+            save_preview_to_cache(match_id, payload)
+        elapsed = time.time() - start_time
+        logging.warning(f"[PERFORMANCE] El análisis completo para el partido {match_id} tardó {elapsed:.2f} segundos (traza {current_trace_id()}).")
+    return payload, None
+
+
 @app.route('/api/analisis/<string:match_id>')
 def api_analisis(match_id):
     """
@@ -657,249 +1002,190 @@ def api_analisis(match_id):
     Devuelve tanto el payload complejo como el HTML simplificado.
     """
     try:
-        cached_payload = load_preview_from_cache(match_id)
-        if isinstance(cached_payload, dict) and cached_payload.get('home_team'):
-            print(f"Devolviendo analisis cacheado para {match_id}")
-            return jsonify(cached_payload)
+        with trace("api_analisis", match_id=match_id) as root:
+            cached_payload = load_preview_from_cache(match_id)
+            if isinstance(cached_payload, dict) and cached_payload.get('home_team'):
+                root.set(cache="hit")
+                ANALISIS_REQUESTS.inc(cache="hit")
+                print(f"Devolviendo analisis cacheado para {match_id}")
+                return jsonify(cached_payload)
+
+            root.set(cache="miss")
+            ANALISIS_REQUESTS.inc(cache="miss")
+            logging.warning(f"CACHE MISS para {match_id}. Iniciando análisis profundo...")
+            payload, error = analizar_y_cachear(match_id, engine=request.args.get('engine'))
+            if payload is None:
+                return jsonify({'error': error}), 500
+            return jsonify(payload)
 
-        start_time = time.time()
-        logging.warning(f"CACHE MISS para {match_id}. Iniciando análisis profundo...")
+    except Exception as e:
+        print(f"Error en la ruta /api/analisis/{match_id}: {e}")
+        return jsonify({'error': 'Ocurrió un error interno en el servidor.'}), 500
 
-        datos = obtener_datos_completos_partido(match_id)
-        if not datos or (isinstance(datos, dict) and datos.get('error')):
-            return jsonify({'error': (datos or {}).get('error', 'No se pudieron obtener datos.')}), 500
+@app.route('/api/cache/analisis')
+def api_analysis_cache():
+    """Contadores de la caché de análisis, de los cálculos agrupados y las entradas vigentes (?limit=N, por defecto 100)."""
+    limit = request.args.get('limit', default=100, type=int)
+    return jsonify({
+        'stats': get_analysis_cache().stats(),
+        'single_flight': [flight.stats() for flight in (analisis_flight, completos_flight, preview_flight)],
+        'entries': get_analysis_cache().entries(limit=limit),
+    })
+
+
+@app.route('/api/analisis/etapas')
+def api_analysis_stages():
+    """Grafo de etapas del análisis completo y tiempos por etapa de las últimas ejecuciones (?limit=20)."""
+    limit = min(max(request.args.get('limit', default=20, type=int), 1), 200)
+    return jsonify({
+        'stages': [{'name': stage.name, 'inputs': list(stage.inputs)} for stage in GRAFO_ANALISIS_OF.stages()],
+        'runs': obtener_tiempos_etapas_recientes(limit),
+    })
+
+
+@app.route('/api/trazas')
+def api_traces():
+    """
+    Trazas recientes en memoria. Sin parámetros: resumen de las últimas (?limit=20).
+    ?trace_id= o ?match_id=: sus spans (fetch, parse, extractores, analizar_*, render...).
+    """
+    trace_id, match_id = request.args.get('trace_id'), request.args.get('match_id')
+    if trace_id or match_id:
+        return jsonify({'spans': recent_spans(trace_id=trace_id, match_id=match_id)})
+    limit = min(max(request.args.get('limit', default=20, type=int), 1), 500)
+    return jsonify({'traces': recent_traces(limit)})
 
-        # --- Lógica para el payload complejo (la original) ---
-        def df_to_rows(df):
-            rows = []
-            try:
-                if df is not None and hasattr(df, 'iterrows'):
-                    for idx, row in df.iterrows():
-                        label = str(idx)
-                        label = label.replace('Shots on Goal', 'Tiros a Puerta')                                     .replace('Shots', 'Tiros')                                     .replace('Dangerous Attacks', 'Ataques Peligrosos')                                     .replace('Attacks', 'Ataques')
-                        try:
-                            home_val = row['Casa']
-                        except Exception:
-                            home_val = ''
-                        try:
-                            away_val = row['Fuera']
-                        except Exception:
-                            away_val = ''
-                        rows.append({'label': label, 'home': home_val or '', 'away': away_val or ''})
-            except Exception:
-                pass
-            return rows
-
-        payload = {
-            'match_id': match_id,
-            'home_team': datos.get('home_name', ''),
-            'away_team': datos.get('away_name', ''),
-            'final_score': datos.get('score'),
-            'match_date': datos.get('match_date'),
-            'match_time': datos.get('match_time'),
-            'match_datetime': datos.get('match_datetime'),
-            'recent_indirect_full': {
-                'last_home': None,
-                'last_away': None,
-                'h2h_col3': None
-            },
-            'comparativas_indirectas': {
-                'left': None,
-                'right': None
-            }
-        }
-        
-        # --- START COVERAGE CALCULATION ---
-        main_odds = datos.get("main_match_odds_data")
-        home_name = datos.get("home_name")
-        away_name = datos.get("away_name")
-        ah_actual_num = parse_ah_to_number_of(main_odds.get('ah_linea_raw', ''))
-        
-        favorito_actual_name = "Ninguno (línea en 0)"
-        if ah_actual_num is not None:
-            if ah_actual_num > 0: favorito_actual_name = home_name
-            elif ah_actual_num < 0: favorito_actual_name = away_name
 
-        def get_cover_status_vs_current(details):
-            if not details or ah_actual_num is None:
-                return 'NEUTRO'
-            try:
-                score_str = details.get('score', '').replace(' ', '').replace(':', '-')
-                if not score_str or '?' in score_str:
-                    return 'NEUTRO'
-
-                h_home = details.get('home_team')
-                h_away = details.get('away_team')
-                
-                status, _ = check_handicap_cover(score_str, ah_actual_num, favorito_actual_name, h_home, h_away, home_name)
-                return status
-            except Exception:
-                return 'NEUTRO'
-                
-        # --- Análisis mejorado de H2H Rivales ---
-        def analyze_h2h_rivals(home_result, away_result):
-            if not home_result or not away_result:
-                return None
-                
-            try:
-                # Obtener resultados de los partidos
-                home_goals = list(map(int, home_result.get('score', '0-0').split('-')))
-                away_goals = list(map(int, away_result.get('score', '0-0').split('-')))
-                
-                # Calcular diferencia de goles
-                home_goal_diff = home_goals[0] - home_goals[1]
-                away_goal_diff = away_goals[0] - away_goals[1]
-                
-                # Comparar resultados
-                if home_goal_diff > away_goal_diff:
-                    return "Contra rivales comunes, el Equipo Local ha obtenido mejores resultados"
-                elif away_goal_diff > home_goal_diff:
-                    return "Contra rivales comunes, el Equipo Visitante ha obtenido mejores resultados"
-                else:
-                    return "Los rivales han tenido resultados similares"
-            except Exception:
-                return None
-                
-        # --- Análisis de Comparativas Indirectas ---
-        def analyze_indirect_comparison(result, team_name):
-            if not result:
-                return None
-                
-            try:
-                # Determinar si el equipo cubrió el handicap
-                status = get_cover_status_vs_current(result)
-                
-                if status == 'CUBIERTO':
-                    return f"Contra este rival, {team_name} habría cubierto el handicap"
-                elif status == 'NO CUBIERTO':
-                    return f"Contra este rival, {team_name} no habría cubierto el handicap"
-                else:
-                    return f"Contra este rival, el resultado para {team_name} sería indeterminado"
-            except Exception:
-                return None
-        # --- END COVERAGE CALCULATION ---
-
-        last_home = (datos.get('last_home_match') or {})
-        last_home_details = last_home.get('details') or {}
-        if last_home_details:
-            payload['recent_indirect_full']['last_home'] = {
-                'home': last_home_details.get('home_team'),
-                'away': last_home_details.get('away_team'),
-                'score': (last_home_details.get('score') or '').replace(':', ' : '),
-                'ah': format_ah_as_decimal_string_of(last_home_details.get('handicap_line_raw') or '-'),
-                'ou': last_home_details.get('ouLine') or '-',
-                'stats_rows': df_to_rows(last_home.get('stats')),
-                'date': last_home_details.get('date'),
-                'cover_status': get_cover_status_vs_current(last_home_details)
-            }
-
-        last_away = (datos.get('last_away_match') or {})
-        last_away_details = last_away.get('details') or {}
-        if last_away_details:
-            payload['recent_indirect_full']['last_away'] = {
-                'home': last_away_details.get('home_team'),
-                'away': last_away_details.get('away_team'),
-                'score': (last_away_details.get('score') or '').replace(':', ' : '),
-                'ah': format_ah_as_decimal_string_of(last_away_details.get('handicap_line_raw') or '-'),
-                'ou': last_away_details.get('ouLine') or '-',
-                'stats_rows': df_to_rows(last_away.get('stats')),
-                'date': last_away_details.get('date'),
-                'cover_status': get_cover_status_vs_current(last_away_details)
-            }
-
-        h2h_col3 = (datos.get('h2h_col3') or {})
-        h2h_col3_details = h2h_col3.get('details') or {}
-        if h2h_col3_details and h2h_col3_details.get('status') == 'found':
-            h2h_col3_details_adapted = {
-                'score': f"{h2h_col3_details.get('goles_home')}:{h2h_col3_details.get('goles_away')}",
-                'home_team': h2h_col3_details.get('h2h_home_team_name'),
-                'away_team': h2h_col3_details.get('h2h_away_team_name')
-            }
-            payload['recent_indirect_full']['h2h_col3'] = {
-                'home': h2h_col3_details.get('h2h_home_team_name'),
-                'away': h2h_col3_details.get('h2h_away_team_name'),
-                'score': f"{h2h_col3_details.get('goles_home')} : {h2h_col3_details.get('goles_away')}",
-                'ah': format_ah_as_decimal_string_of(h2h_col3_details.get('handicap_line_raw') or '-'),
-                'ou': h2h_col3_details.get('ou_result') or '-',
-                'stats_rows': df_to_rows(h2h_col3.get('stats')),
-                'date': h2h_col3_details.get('date'),
-                'cover_status': get_cover_status_vs_current(h2h_col3_details_adapted),
-                'analysis': analyze_h2h_rivals(last_home_details, last_away_details)
-            }
-
-        h2h_general = (datos.get('h2h_general') or {})
-        h2h_general_details = h2h_general.get('details') or {}
-        if h2h_general_details:
-            score_text = h2h_general_details.get('res6') or ''
-            cover_input = {
-                'score': score_text,
-                'home_team': h2h_general_details.get('h2h_gen_home'),
-                'away_team': h2h_general_details.get('h2h_gen_away')
-            }
-            payload['recent_indirect_full']['h2h_general'] = {
-                'home': h2h_general_details.get('h2h_gen_home'),
-                'away': h2h_general_details.get('h2h_gen_away'),
-                'score': score_text.replace(':', ' : '),
-                'ah': h2h_general_details.get('ah6') or '-',
-                'ou': h2h_general_details.get('ou_result6') or '-',
-                'stats_rows': df_to_rows(h2h_general.get('stats')),
-                'date': h2h_general_details.get('date'),
-                'cover_status': get_cover_status_vs_current(cover_input) if score_text else 'NEUTRO'
-            }
-
-        comp_left = (datos.get('comp_L_vs_UV_A') or {})
-        comp_left_details = comp_left.get('details') or {}
-        if comp_left_details:
-            payload['comparativas_indirectas']['left'] = {
-                'title_home_name': datos.get('home_name'),
-                'title_away_name': datos.get('away_name'),
-                'home_team': comp_left_details.get('home_team'),
-                'away_team': comp_left_details.get('away_team'),
-                'score': (comp_left_details.get('score') or '').replace(':', ' : '),
-                'ah': format_ah_as_decimal_string_of(comp_left_details.get('ah_line') or '-'),
-                'ou': comp_left_details.get('ou_line') or '-',
-                'localia': comp_left_details.get('localia') or '',
-                'stats_rows': df_to_rows(comp_left.get('stats')),
-                'cover_status': get_cover_status_vs_current(comp_left_details),
-                'analysis': analyze_indirect_comparison(comp_left_details, datos.get('home_name'))
-            }
-
-        comp_right = (datos.get('comp_V_vs_UL_H') or {})
-        comp_right_details = comp_right.get('details') or {}
-        if comp_right_details:
-            payload['comparativas_indirectas']['right'] = {
-                'title_home_name': datos.get('home_name'),
-                'title_away_name': datos.get('away_name'),
-                'home_team': comp_right_details.get('home_team'),
-                'away_team': comp_right_details.get('away_team'),
-                'score': (comp_right_details.get('score') or '').replace(':', ' : '),
-                'ah': format_ah_as_decimal_string_of(comp_right_details.get('ah_line') or '-'),
-                'ou': comp_right_details.get('ou_line') or '-',
-                'localia': comp_right_details.get('localia') or '',
-                'stats_rows': df_to_rows(comp_right.get('stats')),
-                'cover_status': get_cover_status_vs_current(comp_right_details),
-                'analysis': analyze_indirect_comparison(comp_right_details, datos.get('away_name'))
-            }
-
-        # --- Lógica para el HTML simplificado ---
-        h2h_data = datos.get("h2h_data")
-        simplified_html = ""
-        if all([main_odds, h2h_data, home_name, away_name]):
-            simplified_html = generar_analisis_mercado_simplificado(main_odds, h2h_data, home_name, away_name)
-        
-        payload['simplified_html'] = simplified_html
+@app.route('/metrics')
+def metrics():
+    """Métricas del proceso en formato de texto de Prometheus (404 con METRICS_ENABLED=0)."""
+    if not METRICS_ENABLED:
+        abort(404)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
-        save_preview_to_cache(match_id, payload)
 
-        end_time = time.time()
-        elapsed = end_time - start_time
-        logging.warning(f"[PERFORMANCE] El análisis completo para el partido {match_id} tardó {elapsed:.2f} segundos.")
+@app.route('/api/cache/analisis/<string:match_id>', methods=['DELETE'])
+def api_analysis_cache_invalidate(match_id):
+    removed = get_analysis_cache().invalidate(match_id)
+    if (layer_cache := get_layer_cache()) is not None:
+        layer_cache.invalidate(match_id)
+    return jsonify({'match_id': match_id, 'removed': removed})
 
-        return jsonify(payload)
 
-    except Exception as e:
-        print(f"Error en la ruta /api/analisis/{match_id}: {e}")
-        return jsonify({'error': 'Ocurrió un error interno en el servidor.'}), 500
+@app.route('/api/catalog/search')
+def api_catalog_search():
+    """
+    Búsqueda en el catálogo de partidos: ?team= (local o visitante, '%' como comodín),
+    ?goal_line=, ?handicap=, ?section=upcoming|finished, ?start=/?end= (ISO),
+    ?include_inactive=1 y ?limit= (100, máximo 1000).
+    """
+    args = request.args
+    limit = min(max(args.get('limit', default=100, type=int), 1), 1000)
+    section = args.get('section')
+    matches = match_catalog.search(
+        team=args.get('team'), goal_line=args.get('goal_line'), handicap=args.get('handicap'),
+        section=f"{section}_matches" if section in ('upcoming', 'finished') else None,
+        start=args.get('start'), end=args.get('end'),
+        include_inactive=args.get('include_inactive') == '1', limit=limit,
+    )
+    return jsonify({'matches': matches, 'count': len(matches)})
+
+
+@app.route('/api/catalog/<string:match_id>/history')
+def api_catalog_history(match_id):
+    """Cambios de hándicap, línea, hora o marcador registrados entre descargas."""
+    return jsonify({'match_id': match_id, 'changes': match_catalog.history(match_id)})
+
+
+@app.route('/api/catalog/stats')
+def api_catalog_stats():
+    return jsonify(match_catalog.stats())
+
+
+@app.route('/api/backtest')
+def api_backtest():
+    """
+    Backtest sobre el almacén de resultados: ?market=ah|ou, ?by=ah_line|goal_line|league|team,
+    ?side=home|away|favorite (ah) o over|under (ou), filtros ?league=, ?team=, ?since=/?until=
+    (ISO) y ?min_matches= (1).
+    """
+    warehouse = get_results_warehouse()
+    if warehouse is None:
+        return jsonify({'error': 'El almacén de resultados está desactivado (RESULTS_WAREHOUSE_ENABLED=0).'}), 404
+    args = request.args
+    market = args.get('market', 'ah')
+    if market not in ('ah', 'ou'):
+        return jsonify({'error': f'Mercado desconocido: {market}'}), 400
+    by = args.get('by') or ('ah_line' if market == 'ah' else 'goal_line')
+    if by not in ('ah_line', 'goal_line', 'league', 'team'):
+        return jsonify({'error': f'Agrupación desconocida: {by}'}), 400
+    results = warehouse.load_results(league=args.get('league'), team=args.get('team'),
+                                     since=args.get('since'), until=args.get('until'))
+    min_matches = max(args.get('min_matches', default=1, type=int), 1)
+    try:
+        if market == 'ah':
+            summary = backtest_handicap(results, by=by, side=args.get('side', 'home'), min_matches=min_matches)
+        else:
+            summary = backtest_goal_line(results, by=by, side=args.get('side', 'over'), min_matches=min_matches)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    groups = [{by: None if pd.isna(key) else key, **row} for key, row in zip(summary.index.tolist(), summary.to_dict('records'))]
+    return jsonify({'market': market, 'by': by, 'matches': len(results), 'groups': groups})
+
+
+@app.route('/api/backtest/stats')
+def api_backtest_stats():
+    warehouse = get_results_warehouse()
+    if warehouse is None:
+        return jsonify({'error': 'El almacén de resultados está desactivado (RESULTS_WAREHOUSE_ENABLED=0).'}), 404
+    return jsonify(warehouse.stats())
+
+
+@app.route('/api/scheduler/status')
+def api_scheduler_status():
+    """Estado que publica scheduler.py (python scheduler.py o el panel de Streamlit) junto a data.json."""
+    status = read_status_file(DATA_FILE)
+    if status is None:
+        return jsonify({'error': 'El planificador no ha publicado ningún estado todavía.'}), 404
+    return jsonify(status)
+
+
+def _prewarm_compute(match_id):
+    payload, error = analizar_y_cachear(match_id)
+    if payload is None:
+        raise RuntimeError(error)
+
+
+# Cola acotada de precálculo: los workers dejan el payload de /api/analisis en la caché
+prewarm_queue = PrewarmQueue(
+    compute=_prewarm_compute,
+    workers=_env_int('PREWARM_WORKERS', 2),
+    max_size=_env_int('PREWARM_QUEUE_SIZE', 200),
+    is_fresh=lambda match_id: _aplicar_registro_cambios() or get_analysis_cache().contains(match_id),
+)
+
+# Contadores que ya llevan las cachés y las colas, publicados en /metrics al leerlo
+register_stats_collector('analysis_cache', lambda: get_analysis_cache().stats(),
+                         counters=('memory_hits', 'disk_hits', 'misses', 'stores', 'expired', 'evicted', 'invalidated'),
+                         gauges=('entries', 'bytes', 'memory_entries'))
+register_stats_collector('page_cache', lambda: get_page_cache() and get_page_cache().stats(),
+                         counters=('hits', 'misses', 'stores', 'expired', 'evicted'), gauges=('entries', 'bytes'))
+register_stats_collector('stats_store', lambda: get_stats_store() and get_stats_store().stats(),
+                         counters=('hits', 'misses', 'stores'), gauges=('entries',))
+register_stats_collector('single_flight', lambda: [f.stats() for f in (analisis_flight, completos_flight, preview_flight)],
+                         counters=('leaders', 'shared', 'errors'), gauges=('in_flight',), labels=('name',))
+register_stats_collector('prewarm_queue', prewarm_queue.stats,
+                         counters=('submitted', 'duplicates', 'fresh', 'rejected', 'displaced', 'done', 'failed'),
+                         gauges=('queued', 'running'))
+
+
+def encolar_proximos_partidos(hours: float, limit: int | None = None):
+    """Encola los próximos partidos que empiezan en las siguientes `hours` horas."""
+    results = {}
+    for match_id, kickoff in match_store.upcoming_within(hours)[:limit]:
+        results[match_id] = prewarm_queue.submit(match_id, kickoff)
+    return results
+
 
 @app.route('/start_analysis_background', methods=['POST'])
 def start_analysis_background():
@@ -907,19 +1193,29 @@ def start_analysis_background():
     if not match_id:
         return jsonify({'status': 'error', 'message': 'No se proporcionó match_id'}), 400
 
-    def analysis_worker(app, match_id):
-        with app.app_context():
-            print(f"Iniciando análisis en segundo plano para el ID: {match_id}")
-            try:
-                obtener_datos_completos_partido(match_id)
-                print(f"Análisis en segundo plano finalizado para el ID: {match_id}")
-            except Exception as e:
-                print(f"Error en el hilo de análisis para el ID {match_id}: {e}")
+    result = prewarm_queue.submit(match_id, match_store.kickoff_of(match_id))
+    if result == 'full':
+        return jsonify({'status': 'error', 'message': 'La cola de análisis está llena'}), 503
+    return jsonify({'status': 'success', 'queue': result, 'message': f'Análisis iniciado para el partido {match_id}'})
 
-    thread = threading.Thread(target=analysis_worker, args=(app, match_id))
-    thread.start()
 
-    return jsonify({'status': 'success', 'message': f'Análisis iniciado para el partido {match_id}'})
+@app.route('/api/prewarm', methods=['GET', 'POST'])
+def api_prewarm():
+    """
+    GET: estado de la cola de precálculo. POST {"hours": 3, "limit": 50}: encola los
+    próximos partidos que empiezan en esas horas (los más cercanos primero).
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            hours = float(body.get('hours', 3))
+            limit = int(body['limit']) if body.get('limit') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'hours/limit no válidos'}), 400
+        results = encolar_proximos_partidos(hours, limit)
+        return jsonify({'status': 'success', 'submitted': results, 'stats': prewarm_queue.stats()})
+    pending = [{'match_id': mid, 'kickoff': k.isoformat() if k else None} for mid, k in prewarm_queue.pending()]
+    return jsonify({'stats': prewarm_queue.stats(), 'pending': pending})
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True) # debug=True es útil para desarrollar
@@ -0,0 +1,227 @@
+# benchmark_parsers.py
+"""
+Benchmark offline de los parsers sobre las capturas de muestra_sin_fallos/html_extraer.
+
+Reproduce, sin red ni Selenium, el trabajo de CPU de:
+  - parse_main_page_matches / parse_main_page_finished_matches (index_web.txt, resultados.txt),
+    con los dos motores de listados (lxml y el original bs4) y comprobando que coinciden
+  - el paso de parseo de get_match_progression_stats_data (live.txt)
+  - cada extractor/analizador que llama obtener_datos_completos_partido (analisis.txt)
+
+Para cada función informa tiempo de pared (mediana y mínimo), pico de memoria
+(tracemalloc, en una pasada aparte para no contaminar los tiempos) y filas devueltas.
+
+Uso:
+    python benchmark_parsers.py                 # tabla por consola
+    python benchmark_parsers.py --repeat 5 --json resultados_bench.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+for _path in (BASE_DIR, os.path.join(BASE_DIR, "muestra_sin_fallos")):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+import pandas as pd
+from bs4 import BeautifulSoup
+from modules.h2h_page import H2HPage
+
+import scraping_logic
+from modules import estudio_scraper as es
+
+DEFAULT_FIXTURES_DIR = os.path.join(BASE_DIR, "muestra_sin_fallos", "html_extraer")
+# Las capturas son antiguas: congelamos el reloj antes de sus partidos para que
+# parse_main_page_matches los considere "próximos" y el benchmark tenga filas.
+DEFAULT_NOW = "2000-01-01 00:00:00"
+
+
+def _load_fixture(fixtures_dir, name):
+    with open(os.path.join(fixtures_dir, name), "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def _count_rows(result):
+    """Número de 'filas' de un resultado, con independencia de su tipo."""
+    if result is None:
+        return 0
+    if isinstance(result, pd.DataFrame):
+        return int(result.shape[0])
+    if isinstance(result, (list, dict, tuple, str)):
+        return len(result)
+    return 1
+
+
+@contextlib.contextmanager
+def _frozen_clock(now_str):
+    """Sustituye el reloj de scraping_logic por uno fijo durante el benchmark."""
+    frozen = datetime.datetime.strptime(now_str, "%Y-%m-%d %H:%M:%S")
+
+    class _FrozenDatetime(datetime.datetime):
+        @classmethod
+        def utcnow(cls):
+            return frozen
+
+        @classmethod
+        def now(cls, tz=None):
+            return frozen if tz is None else frozen.replace(tzinfo=tz)
+
+    original = scraping_logic.datetime
+    scraping_logic.datetime = types.SimpleNamespace(datetime=_FrozenDatetime, timedelta=datetime.timedelta)
+    try:
+        yield
+    finally:
+        scraping_logic.datetime = original
+
+
+def _run_case(name, func, repeat):
+    """Ejecuta func() `repeat` veces midiendo tiempo y una vez más midiendo memoria."""
+    timings = []
+    result = None
+    sink = io.StringIO()
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(sink):
+            t0 = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - t0)
+        sink.seek(0)
+        sink.truncate()
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(sink):
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": name,
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "peak_kib": peak / 1024,
+        "rows": _count_rows(result),
+    }
+
+
+def build_cases(fixtures_dir):
+    """Devuelve la lista de (nombre, callable) a medir sobre las capturas."""
+    index_html = _load_fixture(fixtures_dir, "index_web.txt")
+    resultados_html = _load_fixture(fixtures_dir, "resultados.txt")
+    live_html = _load_fixture(fixtures_dir, "live.txt")
+    analisis_html = _load_fixture(fixtures_dir, "analisis.txt")
+
+    # Datos previos que obtener_datos_completos_partido calcula antes de lanzar los extractores
+    soup = BeautifulSoup(analisis_html, "lxml")
+    pagina = H2HPage(soup)
+    home_id, away_id, league_id, home_name, away_name, league_name = es.get_team_league_info_from_script_of(soup)
+    main_odds = es.extract_bet365_initial_odds_of(soup)
+    h2h_data = es.extract_h2h_data_of(pagina, home_name, away_name, None)
+    last_home = es.extract_last_match_in_league_of(pagina, "table_v1", home_name, league_id, True) or {}
+    last_away = es.extract_last_match_in_league_of(pagina, "table_v2", away_name, league_id, False) or {}
+    _, rival_a_id, rival_a_name = es.get_rival_a_for_original_h2h_of(pagina, league_id)
+    _, rival_b_id, rival_b_name = es.get_rival_b_for_original_h2h_of(pagina, league_id)
+    current_ah = es.parse_ah_to_number_of(main_odds.get("ah_linea_raw", "0"))
+    indirect = es.extract_indirect_comparison_data(soup)
+    rival_local_rival = last_away.get("home_team", "N/A")
+    rival_visitante_rival = last_home.get("away_team", "N/A")
+
+    return [
+        # --- Listados de la portada (un caso por motor) ---
+        *[(f"parse_main_page_matches[{engine}]",
+           lambda engine=engine: scraping_logic.parse_main_page_matches(index_html, limit=100000, engine=engine))
+          for engine in scraping_logic.LIST_PARSER_ENGINES],
+        *[(f"parse_main_page_finished_matches[{engine}]",
+           lambda engine=engine: scraping_logic.parse_main_page_finished_matches(resultados_html, limit=100000, engine=engine))
+          for engine in scraping_logic.LIST_PARSER_ENGINES],
+        # --- Estadísticas de progresión (live-{id}) ---
+        ("parse_match_progression_stats_html", lambda: es.parse_match_progression_stats_html(live_html)),
+        # --- Página h2h-{id} ---
+        ("BeautifulSoup(analisis, lxml)", lambda: BeautifulSoup(analisis_html, "lxml")),
+        ("H2HPage(soup)", lambda: H2HPage(soup)),
+        ("extract_final_score_of", lambda: es.extract_final_score_of(soup)),
+        ("get_team_league_info_from_script_of", lambda: es.get_team_league_info_from_script_of(soup)),
+        ("get_match_datetime_from_script_of", lambda: es.get_match_datetime_from_script_of(soup)),
+        ("extract_standings_data_from_h2h_page_of[home]", lambda: es.extract_standings_data_from_h2h_page_of(soup, home_name)),
+        ("extract_standings_data_from_h2h_page_of[away]", lambda: es.extract_standings_data_from_h2h_page_of(soup, away_name)),
+        ("extract_over_under_stats_from_div_of[home]", lambda: es.extract_over_under_stats_from_div_of(soup, "home")),
+        ("extract_over_under_stats_from_div_of[away]", lambda: es.extract_over_under_stats_from_div_of(soup, "away")),
+        ("extract_bet365_initial_odds_of", lambda: es.extract_bet365_initial_odds_of(soup)),
+        ("extract_h2h_data_of", lambda: es.extract_h2h_data_of(pagina, home_name, away_name, None)),
+        ("extract_last_match_in_league_of[home]", lambda: es.extract_last_match_in_league_of(pagina, "table_v1", home_name, league_id, True)),
+        ("extract_last_match_in_league_of[away]", lambda: es.extract_last_match_in_league_of(pagina, "table_v2", away_name, league_id, False)),
+        ("get_rival_a_for_original_h2h_of", lambda: es.get_rival_a_for_original_h2h_of(pagina, league_id)),
+        ("get_rival_b_for_original_h2h_of", lambda: es.get_rival_b_for_original_h2h_of(pagina, league_id)),
+        ("extract_h2h_col3_details_of", lambda: es.extract_h2h_col3_details_of(pagina, rival_a_id, rival_b_id, rival_a_name, rival_b_name)),
+        ("extract_comparative_match_of[L_vs_UV_A]", lambda: es.extract_comparative_match_of(pagina, "table_v1", home_name, last_away.get("home_team"), league_id, True)),
+        ("extract_comparative_match_of[V_vs_UL_H]", lambda: es.extract_comparative_match_of(pagina, "table_v2", away_name, last_home.get("away_team"), league_id, False)),
+        ("generar_analisis_completo_mercado", lambda: es.generar_analisis_completo_mercado(main_odds, h2h_data, home_name, away_name)),
+        ("extract_indirect_comparison_data", lambda: es.extract_indirect_comparison_data(soup)),
+        ("generar_analisis_comparativas_indirectas", lambda: es.generar_analisis_comparativas_indirectas(indirect)),
+        ("analizar_rendimiento_reciente_con_handicap[home]", lambda: es.analizar_rendimiento_reciente_con_handicap(pagina, home_name, True)),
+        ("analizar_rendimiento_reciente_con_handicap[away]", lambda: es.analizar_rendimiento_reciente_con_handicap(pagina, away_name, False)),
+        ("comparar_lineas_handicap_recientes[home]", lambda: es.comparar_lineas_handicap_recientes(pagina, home_name, current_ah, True)),
+        ("comparar_lineas_handicap_recientes[away]", lambda: es.comparar_lineas_handicap_recientes(pagina, away_name, current_ah, False)),
+        ("analizar_rivales_comunes", lambda: es.analizar_rivales_comunes(pagina, home_name, away_name)),
+        ("analizar_contra_rival_del_rival", lambda: es.analizar_contra_rival_del_rival(pagina, home_name, away_name, rival_local_rival, rival_visitante_rival)),
+        ("generar_resumen_rendimiento_reciente", lambda: es.generar_resumen_rendimiento_reciente(pagina, home_name, away_name, current_ah)),
+    ]
+
+
+def compare_list_engines(fixtures_dir=DEFAULT_FIXTURES_DIR, now=DEFAULT_NOW):
+    """{función: True/False}: los motores lxml y bs4 devuelven exactamente los mismos dicts."""
+    index_html = _load_fixture(fixtures_dir, "index_web.txt")
+    resultados_html = _load_fixture(fixtures_dir, "resultados.txt")
+    checks = {}
+    with _frozen_clock(now):
+        for func, html in ((scraping_logic.parse_main_page_matches, index_html),
+                           (scraping_logic.parse_main_page_finished_matches, resultados_html)):
+            results = [func(html, limit=100000, engine=engine) for engine in scraping_logic.LIST_PARSER_ENGINES]
+            checks[func.__name__] = all(result == results[0] for result in results[1:])
+    return checks
+
+
+def run_benchmark(fixtures_dir=DEFAULT_FIXTURES_DIR, repeat=3, now=DEFAULT_NOW):
+    with _frozen_clock(now):
+        return [_run_case(name, func, repeat) for name, func in build_cases(fixtures_dir)]
+
+
+def _print_table(results):
+    name_width = max(len(r["name"]) for r in results)
+    print(f"{'funcion':<{name_width}}  {'mediana ms':>11}  {'min ms':>9}  {'pico KiB':>10}  {'filas':>6}")
+    print("-" * (name_width + 44))
+    for r in results:
+        print(f"{r['name']:<{name_width}}  {r['median_ms']:>11.2f}  {r['min_ms']:>9.2f}  {r['peak_kib']:>10.1f}  {r['rows']:>6}")
+    print("-" * (name_width + 44))
+    print(f"{'TOTAL (mediana)':<{name_width}}  {sum(r['median_ms'] for r in results):>11.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline de los parsers sobre html_extraer.")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Carpeta con index_web.txt, resultados.txt, live.txt y analisis.txt")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por función (se informa la mediana)")
+    parser.add_argument("--now", default=DEFAULT_NOW, help="Reloj congelado para parse_main_page_matches (YYYY-MM-DD HH:MM:SS)")
+    parser.add_argument("--json", dest="json_path", help="Guardar también los resultados en este fichero JSON")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.fixtures, max(1, args.repeat), args.now)
+    _print_table(results)
+    for name, identical in compare_list_engines(args.fixtures, args.now).items():
+        print(f"{name}: lxml y bs4 {'devuelven los mismos partidos' if identical else 'DIFIEREN'}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
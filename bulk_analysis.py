@@ -0,0 +1,331 @@
+# bulk_analysis.py
+"""
+Análisis masivo desde la línea de comandos: una jornada entera en paralelo.
+
+Hasta ahora los análisis solo se lanzaban de uno en uno (rutas de Flask, botones de
+Streamlit o la cola de precálculo). Este script recibe una lista de partidos, los analiza
+con una concurrencia acotada y deja cada resultado en la caché de análisis (el mismo
+payload que /api/analisis, así que la web lo sirve al instante) o en un fichero NDJSON.
+
+Partidos: IDs sueltos (--ids), un fichero con un ID por línea (--ids-file) o los próximos
+de data.json, opcionalmente filtrados por hándicap y por las siguientes N horas
+(--proximos --handicap 0.5 --horas 12).
+
+Modos:
+    completo   obtener_datos_completos_partido + payload de /api/analisis (--engine http|async|selenium|auto)
+    ligero     obtener_datos_preview_ligero (requests, sin navegador)
+    rapido     obtener_datos_preview_rapido
+La caché de análisis solo guarda payloads completos: con ligero/rapido la salida es NDJSON.
+
+Cada partido terminado se añade como una línea JSON al fichero de checkpoint. Por
+defecto el checkpoint es propio de la invocación (un hash de los IDs, el modo, el motor y
+la salida): si la ejecución se interrumpe (Ctrl+C, un reinicio), el mismo comando continúa
+con los que faltan y reintenta los fallidos, y otra lista de partidos empieza su propio
+checkpoint. Cuando la ejecución termina sin fallos el checkpoint se borra, así que volver
+a lanzar el comando más tarde analiza de nuevo. --checkpoint fija el fichero y
+--reiniciar empieza de cero. Con la salida en caché, los partidos que ya tienen un
+resultado vigente se saltan; --forzar recalcula todos sin mirar la caché ni el checkpoint.
+
+El parseo es Python puro: con --concurrencia alta conviene PARSE_POOL_WORKERS=auto para
+que varios análisis parseen a la vez en procesos aparte (modules.parse_pool).
+
+Uso:
+    python bulk_analysis.py --ids 2789999 2790001 --salida analisis.ndjson
+    python bulk_analysis.py --proximos --handicap -0.5 --horas 24 --concurrencia 6
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'muestra_sin_fallos'))
+
+from match_store import MatchStore, parse_time_obj, _safe_bucket
+
+MODOS = ("completo", "ligero", "rapido")
+SALIDA_CACHE = "cache"
+DEFAULT_DATA_FILE = Path(__file__).resolve().parent / "data.json"
+DEFAULT_CHECKPOINT_DIR = Path(__file__).resolve().parent / "cache_html" / "bulk_analysis"
+
+
+# --- Selección de partidos ---
+
+def _sin_duplicados(match_ids):
+    vistos, resultado = set(), []
+    for match_id in match_ids:
+        match_id = str(match_id).strip()
+        if match_id and match_id not in vistos:
+            vistos.add(match_id)
+            resultado.append(match_id)
+    return resultado
+
+
+def leer_ids_fichero(path):
+    """Un ID por línea; se ignoran las líneas vacías y las que empiezan por #."""
+    with open(path, "r", encoding="utf-8") as fh:
+        return [line.strip() for line in fh if line.strip() and not line.lstrip().startswith("#")]
+
+
+def proximos_de_data_json(data_file, handicap=None, hours=None, now=None):
+    """
+    IDs de los próximos partidos de data.json por hora de inicio, opcionalmente solo los
+    del bucket de hándicap `handicap` y los que empiezan en las siguientes `hours` horas.
+    """
+    if handicap is not None and _safe_bucket(handicap) is None:
+        raise ValueError(f"Hándicap no válido: {handicap}")
+    store = MatchStore(Path(data_file))
+    entries = store.query("upcoming_matches", handicap_filter=handicap)
+    if hours is not None:
+        now = now or datetime.datetime.utcnow()
+        end = now + datetime.timedelta(hours=hours)
+        entries = [e for e in entries if (kickoff := parse_time_obj(e.get("time_obj"))) and now <= kickoff <= end]
+    return _sin_duplicados(e.get("id") for e in entries if e.get("id"))
+
+
+# --- Checkpoint ---
+
+def checkpoint_por_defecto(match_ids, modo, engine, salida):
+    """Checkpoint de esta invocación: solo el mismo lote (IDs, modo, motor y salida) lo continúa."""
+    clave = json.dumps([sorted(match_ids), modo, engine or "", str(salida)])
+    digest = hashlib.sha1(clave.encode("utf-8")).hexdigest()[:12]
+    if salida == SALIDA_CACHE:
+        return DEFAULT_CHECKPOINT_DIR / f"{modo}-{digest}.checkpoint"
+    return Path(f"{salida}.{digest}.checkpoint")
+
+
+def leer_checkpoint(path):
+    """{match_id: última línea} del checkpoint; las líneas cortadas por una interrupción se ignoran."""
+    estado = {}
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and record.get("match_id"):
+                    estado[str(record["match_id"])] = record
+    except FileNotFoundError:
+        pass
+    return estado
+
+
+def _termina_en_salto(path):
+    with open(path, "rb") as fh:
+        fh.seek(-1, os.SEEK_END)
+        return fh.read(1) == b"\n"
+
+
+class _Apendice:
+    """Fichero de líneas JSON en modo append, compartido por los hilos (una línea = un write + flush)."""
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        # Una interrupción puede dejar la última línea a medias: la siguiente empieza en una línea nueva
+        if self._fh.tell() and not _termina_en_salto(path):
+            self._fh.write("\n")
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._fh.write(line + "\n")
+            self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+
+# --- Ejecución ---
+
+def analizar_lote(match_ids, compute, checkpoint_path, concurrency=4, write=None, skip=None, on_progress=None,
+                  reanudar=True):
+    """
+    Ejecuta compute(match_id) -> (payload, error) para cada partido con como mucho
+    `concurrency` a la vez. Los partidos con "ok" en el checkpoint (si `reanudar`) y aquellos
+    para los que skip(match_id) es True no se calculan. write(match_id, payload) guarda cada resultado
+    antes de marcarlo en el checkpoint. Con Ctrl+C no se lanzan más partidos, se esperan
+    los que están en curso y se devuelve el resumen con interrupted=True.
+    """
+    hechos = {mid for mid, record in leer_checkpoint(checkpoint_path).items() if record.get("status") == "ok"} if reanudar else set()
+    pendientes = [mid for mid in _sin_duplicados(match_ids) if mid not in hechos]
+    resumen = {"total": len(_sin_duplicados(match_ids)), "resumed": len(hechos & set(match_ids)),
+               "skipped": 0, "ok": 0, "failed": 0, "interrupted": False}
+    checkpoint = _Apendice(checkpoint_path)
+    start = time.perf_counter()
+
+    def tarea(match_id):
+        t0 = time.perf_counter()
+        try:
+            payload, error = compute(match_id)
+            if payload is not None and write is not None:
+                write(match_id, payload)
+        except Exception as exc:
+            payload, error = None, f"{type(exc).__name__}: {exc}"
+        return payload is not None, error, time.perf_counter() - t0
+
+    cola = iter(pendientes)
+    en_curso = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="bulk") as executor:
+            try:
+                while True:
+                    while len(en_curso) < max(1, concurrency):
+                        match_id = next(cola, None)
+                        if match_id is None:
+                            break
+                        if skip is not None and skip(match_id):
+                            resumen["skipped"] += 1
+                            continue
+                        en_curso[executor.submit(tarea, match_id)] = match_id
+                    if not en_curso:
+                        break
+                    terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                    for future in terminados:
+                        _registrar(resumen, checkpoint, en_curso.pop(future), *future.result(), start, on_progress)
+            except KeyboardInterrupt:
+                resumen["interrupted"] = True
+                print(f"\nInterrumpido: esperando {len(en_curso)} análisis en curso (el checkpoint queda al día)...")
+                for future in list(en_curso):
+                    _registrar(resumen, checkpoint, en_curso.pop(future), *future.result(), start, on_progress)
+    finally:
+        checkpoint.close()
+    elapsed = time.perf_counter() - start
+    calculados = resumen["ok"] + resumen["failed"]
+    resumen.update(pending=len(pendientes) - calculados - resumen["skipped"], seconds=round(elapsed, 1),
+                   matches_per_minute=round(calculados / elapsed * 60, 2) if elapsed > 0 else 0.0)
+    return resumen
+
+
+def _registrar(resumen, checkpoint, match_id, ok, error, seconds, start, on_progress):
+    resumen["ok" if ok else "failed"] += 1
+    record = {"match_id": match_id, "status": "ok" if ok else "error", "seconds": round(seconds, 2),
+              "at": datetime.datetime.utcnow().isoformat(timespec="seconds")}
+    if not ok:
+        record["error"] = error
+    checkpoint.write(record)
+    if on_progress is not None:
+        on_progress(record, resumen, time.perf_counter() - start)
+
+
+def _imprimir_progreso(record, resumen, elapsed):
+    calculados = resumen["ok"] + resumen["failed"]
+    restantes = resumen["total"] - resumen["resumed"] - resumen["skipped"] - calculados
+    ritmo = calculados / elapsed * 60 if elapsed > 0 else 0.0
+    eta = f"{restantes / ritmo:.1f} min" if ritmo > 0 else "-"
+    estado = "ok" if record["status"] == "ok" else f"ERROR {record.get('error')}"
+    print(f"[{calculados}/{calculados + restantes}] {record['match_id']} {estado} ({record['seconds']:.1f}s)"
+          f" | {ritmo:.1f} partidos/min | quedan {restantes}, ETA {eta}")
+
+
+# --- Modos de análisis ---
+
+def _compute_para(modo, engine, salida):
+    """compute(match_id) -> (payload, error) del modo pedido."""
+    if modo == "completo":
+        # El payload de /api/analisis se construye en app.py (con la caché y el single-flight de la web)
+        import app
+        if salida == SALIDA_CACHE:
+            return lambda match_id: app.analizar_y_cachear(match_id, engine=engine)
+        return lambda match_id: app.construir_payload_analisis(match_id, engine=engine)
+
+    from modules.estudio_scraper import obtener_datos_preview_ligero, obtener_datos_preview_rapido
+    fn = obtener_datos_preview_ligero if modo == "ligero" else obtener_datos_preview_rapido
+
+    def compute(match_id):
+        datos = fn(match_id)
+        if not isinstance(datos, dict) or datos.get("error"):
+            return None, (datos or {}).get("error", "No se pudieron obtener datos.")
+        return datos, None
+    return compute
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis masivo de partidos con concurrencia acotada y checkpoint reanudable.")
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument("--ids", nargs="+", help="IDs de partido")
+    origen.add_argument("--ids-file", help="Fichero con un ID por línea")
+    origen.add_argument("--proximos", action="store_true", help="Los próximos partidos de data.json")
+    parser.add_argument("--handicap", help="Con --proximos: solo los de este hándicap (se normaliza al bucket de 0.5)")
+    parser.add_argument("--horas", type=float, help="Con --proximos: solo los que empiezan en las siguientes N horas")
+    parser.add_argument("--limite", type=int, help="Analizar como mucho N partidos")
+    parser.add_argument("--data-file", default=str(DEFAULT_DATA_FILE))
+    parser.add_argument("--modo", choices=MODOS, default="completo")
+    parser.add_argument("--engine", help="Motor del análisis completo (por defecto ESTUDIO_H2H_ENGINE)")
+    parser.add_argument("--salida", default=SALIDA_CACHE, help="'cache' (caché de análisis) o un fichero .ndjson")
+    parser.add_argument("--checkpoint", help="Fichero de progreso (por defecto uno propio de esta lista de partidos, modo y motor)")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Partidos analizándose a la vez (4)")
+    parser.add_argument("--forzar", action="store_true", help="Recalcular todos aunque estén en el checkpoint o tengan un resultado vigente en caché")
+    parser.add_argument("--reiniciar", action="store_true", help="Ignorar el checkpoint (y vaciar la salida NDJSON)")
+    args = parser.parse_args(argv)
+
+    a_cache = args.salida == SALIDA_CACHE
+    if a_cache and args.modo != "completo":
+        parser.error("La caché de análisis solo guarda el análisis completo: usa --salida fichero.ndjson con --modo ligero/rapido")
+    if (args.handicap or args.horas is not None) and not args.proximos:
+        parser.error("--handicap y --horas solo se aplican con --proximos")
+
+    if args.ids:
+        match_ids = _sin_duplicados(args.ids)
+    elif args.ids_file:
+        match_ids = _sin_duplicados(leer_ids_fichero(args.ids_file))
+    else:
+        try:
+            match_ids = proximos_de_data_json(args.data_file, args.handicap, args.horas)
+        except ValueError as exc:
+            parser.error(str(exc))
+    invalidos = [mid for mid in match_ids if not mid.isdigit()]
+    if invalidos:
+        parser.error(f"IDs de partido no válidos: {', '.join(invalidos[:10])}")
+    if args.limite is not None:
+        match_ids = match_ids[:max(0, args.limite)]
+
+    checkpoint_path = Path(args.checkpoint or checkpoint_por_defecto(match_ids, args.modo, args.engine, args.salida))
+    if args.reiniciar:
+        for path in [checkpoint_path] + ([] if a_cache else [Path(args.salida)]):
+            path.unlink(missing_ok=True)
+
+    compute = _compute_para(args.modo, args.engine, args.salida)
+    write = skip = salida = None
+    if a_cache:
+        from analysis_cache import get_analysis_cache
+        if args.forzar:
+            calcular = compute
+
+            def compute(match_id):
+                # analizar_y_cachear devuelve lo que haya en caché: se invalida antes de calcular
+                get_analysis_cache().invalidate(match_id)
+                return calcular(match_id)
+        else:
+            skip = get_analysis_cache().contains
+    else:
+        salida = _Apendice(args.salida)
+        write = lambda match_id, payload: salida.write({"match_id": match_id, "modo": args.modo, "data": payload})
+
+    print(f"{len(match_ids)} partidos, modo {args.modo}, concurrencia {args.concurrencia}, "
+          f"salida {args.salida}, checkpoint {checkpoint_path}")
+    try:
+        resumen = analizar_lote(match_ids, compute, checkpoint_path, concurrency=args.concurrencia,
+                                write=write, skip=skip, on_progress=_imprimir_progreso, reanudar=not args.forzar)
+    finally:
+        if salida is not None:
+            salida.close()
+    print(json.dumps(resumen, indent=2, ensure_ascii=False))
+    if resumen["interrupted"]:
+        print("Vuelve a lanzar el mismo comando para continuar donde se quedó.")
+    elif not resumen["failed"]:
+        # Lote terminado: la próxima vez se analiza de nuevo en lugar de darlo por hecho
+        checkpoint_path.unlink(missing_ok=True)
+    return 1 if resumen["failed"] or resumen["interrupted"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# fetch_limits.py
+"""
+Limitador de descargas por host para las páginas de Nowgoal.
+
+Sustituye al antiguo _requests_fetch_lock global (que descargaba una página cada vez):
+cada host tiene un semáforo de concurrencia y un espaciado mínimo entre peticiones, de
+modo que próximos y resultados se descargan en paralelo sin saturar la web de origen.
+
+Configuración por variables de entorno:
+    NOWGOAL_MAX_CONCURRENT_PER_HOST   descargas simultáneas por host (4)
+    NOWGOAL_MAX_REQUESTS_PER_SECOND   peticiones por segundo y host; 0 = sin límite (4)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+def _env_number(name, default, cast):
+    try:
+        return cast(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class HostLimiter:
+    def __init__(self, max_concurrent_per_host=4, max_requests_per_second=4.0):
+        self.max_concurrent_per_host = max(1, int(max_concurrent_per_host))
+        self.min_interval = 1.0 / max_requests_per_second if max_requests_per_second and max_requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+
+    def _semaphore_for(self, host):
+        with self._lock:
+            sem = self._semaphores.get(host)
+            if sem is None:
+                sem = self._semaphores[host] = threading.BoundedSemaphore(self.max_concurrent_per_host)
+            return sem
+
+    def _wait_for_slot(self, host):
+        if not self.min_interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    @contextmanager
+    def limit(self, url):
+        """with limiter.limit(url): session.get(url) -- respeta concurrencia y ritmo del host."""
+        host = urlsplit(url).netloc.lower()
+        sem = self._semaphore_for(host)
+        with sem:
+            self._wait_for_slot(host)
+            yield
+
+
+nowgoal_limiter = HostLimiter(
+    max_concurrent_per_host=_env_number("NOWGOAL_MAX_CONCURRENT_PER_HOST", 4, int),
+    max_requests_per_second=_env_number("NOWGOAL_MAX_REQUESTS_PER_SECOND", 4.0, float),
+)
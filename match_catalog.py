@@ -0,0 +1,281 @@
+# match_catalog.py
+"""
+Catálogo SQLite de partidos (próximos y finalizados) con histórico.
+
+data.json solo guarda la última descarga: filtrar por hándicap es recorrer todas las
+filas normalizando cada una, no se puede buscar por equipo y lo que sale de la portada
+se pierde. El scraper (run_scraper.py y scheduler.py) vuelca además cada snapshot aquí:
+
+  - tabla matches: una fila por partido con la hora de inicio, el bucket de hándicap ya
+    normalizado, la línea de goles, los equipos y el dict original. Índices por sección +
+    hora, por bucket + hora, por línea de goles y por equipo (sin distinguir mayúsculas);
+  - los partidos no se borran nunca: el que desaparece de la última descarga (un próximo
+    que sale de la portada, un finalizado que supera el tope de data.json) queda con
+    active = 0. Los listados (query) sirven solo lo activo, igual que MatchStore; el
+    histórico se consulta con search(include_inactive=True) o /api/catalog/search;
+  - tabla match_changes: cada cambio de campo entre descargas (movimientos de línea,
+    cambios de hora, marcador) con su fecha, a partir del diff de match_snapshot.
+
+La tabla meta guarda la firma del data.json del último volcado: Flask solo sirve los
+listados desde aquí mientras el catálogo corresponde al data.json actual.
+
+Configuración por variables de entorno:
+    MATCH_CATALOG_PATH   fichero SQLite (por defecto match_catalog.sqlite3 junto a data.json)
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from match_store import parse_time_obj, _safe_bucket
+
+# Sección de data.json -> valor de la columna section
+_SECTION_NAMES = {"upcoming_matches": "upcoming", "finished_matches": "finished"}
+_COLUMNS = ("id", "section", "active", "sort_time", "time_obj", "handicap", "handicap_bucket",
+            "goal_line", "home_team", "away_team", "score", "payload", "first_seen", "last_seen")
+
+
+def _sort_time(match):
+    """Clave de orden textual equivalente a la de match_store (sin hora = la más antigua)."""
+    parsed = parse_time_obj(match.get("time_obj"))
+    return parsed.strftime("%Y-%m-%dT%H:%M:%S.%f") if parsed else ""
+
+
+def _file_signature(path):
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class MatchCatalog:
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS matches ("
+                " id TEXT PRIMARY KEY, section TEXT NOT NULL, active INTEGER NOT NULL, sort_time TEXT NOT NULL,"
+                " time_obj TEXT, handicap TEXT, handicap_bucket TEXT, goal_line TEXT,"
+                " home_team TEXT, away_team TEXT, score TEXT, payload TEXT NOT NULL,"
+                " first_seen TEXT NOT NULL, last_seen TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS match_changes ("
+                " match_id TEXT NOT NULL, changed_at TEXT NOT NULL, field TEXT NOT NULL,"
+                " old_value TEXT, new_value TEXT)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            for statement in (
+                "CREATE INDEX IF NOT EXISTS matches_section_time ON matches(section, active, sort_time, id)",
+                "CREATE INDEX IF NOT EXISTS matches_bucket_time ON matches(section, active, handicap_bucket, sort_time, id)",
+                "CREATE INDEX IF NOT EXISTS matches_goal_line ON matches(goal_line)",
+                "CREATE INDEX IF NOT EXISTS matches_home_team ON matches(home_team COLLATE NOCASE)",
+                "CREATE INDEX IF NOT EXISTS matches_away_team ON matches(away_team COLLATE NOCASE)",
+                "CREATE INDEX IF NOT EXISTS match_changes_match ON match_changes(match_id, changed_at)",
+            ):
+                self._conn.execute(statement)
+
+    # --- escritura ---
+    def record_snapshot(self, data, changes=None, source_files=()):
+        """
+        Vuelca un snapshot de data.json: inserta o actualiza todos sus partidos, marca como
+        inactivos los que ya no están (próximos y finalizados) y guarda los cambios de campo de `changes`
+        (el diff de match_snapshot.merge_snapshot). `source_files` son los data.json que
+        contienen este snapshot. Devuelve el número de partidos volcados.
+        """
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        rows = []
+        for data_section, section in _SECTION_NAMES.items():
+            for match in (data or {}).get(data_section, []):
+                if not isinstance(match, dict) or not match.get("id"):
+                    continue
+                rows.append((
+                    str(match["id"]), section, 1, _sort_time(match), match.get("time_obj"),
+                    match.get("handicap"), _safe_bucket(match.get("handicap", "")), match.get("goal_line"),
+                    match.get("home_team"), match.get("away_team"), match.get("score"),
+                    json.dumps(match, ensure_ascii=False), now, now,
+                ))
+        change_rows = [
+            (str(match_id), now, field, json.dumps(values[0], ensure_ascii=False), json.dumps(values[1], ensure_ascii=False))
+            for match_id, fields in ((changes or {}).get("updated") or {}).items()
+            for field, values in fields.items()
+        ]
+        with self._lock, self._conn:
+            # Solo la última descarga decide qué partidos están activos
+            self._conn.execute("UPDATE matches SET active = 0 WHERE active = 1")
+            self._conn.executemany(
+                f"INSERT INTO matches ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+                " ON CONFLICT(id) DO UPDATE SET section = excluded.section, active = 1,"
+                " sort_time = excluded.sort_time, time_obj = excluded.time_obj, handicap = excluded.handicap,"
+                " handicap_bucket = excluded.handicap_bucket, goal_line = excluded.goal_line,"
+                " home_team = excluded.home_team, away_team = excluded.away_team, score = excluded.score,"
+                " payload = excluded.payload, last_seen = excluded.last_seen",
+                rows,
+            )
+            self._conn.executemany("INSERT INTO match_changes VALUES (?, ?, ?, ?, ?)", change_rows)
+            meta = {"updated_at": now}
+            for source_file in source_files:
+                meta[self._signature_key(source_file)] = json.dumps(_file_signature(source_file))
+            self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta.items())
+        return len(rows)
+
+    # --- lectura ---
+    def _meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _signature_key(data_file):
+        return f"source_signature:{Path(data_file).resolve()}"
+
+    def updated_at(self):
+        return self._meta("updated_at")
+
+    def source_signature(self, data_file):
+        """Firma (mtime, tamaño) que tenía data_file en su último volcado, o None."""
+        signature = self._meta(self._signature_key(data_file))
+        return json.loads(signature) if signature else None
+
+    def is_current_for(self, data_file):
+        """True si el último volcado salió del data.json que hay ahora en disco."""
+        signature = self.source_signature(data_file)
+        return signature is not None and signature == _file_signature(data_file)
+
+    @staticmethod
+    def _entries(rows):
+        entries = []
+        for (payload,) in rows:
+            entry = json.loads(payload)
+            parsed_time = parse_time_obj(entry.get("time_obj"))
+            if not entry.get("time") and parsed_time:
+                entry["time"] = parsed_time.strftime("%d/%m %H:%M")
+            entries.append(entry)
+        return entries
+
+    def query(self, section, limit=None, offset=0, handicap_filter=None, sort_desc=False):
+        """Misma consulta que MatchStore.query(), sobre el último snapshot (solo partidos activos)."""
+        where = ["section = ?", "active = 1"]
+        params = [_SECTION_NAMES.get(section, section)]
+        if handicap_filter:
+            target = _safe_bucket(handicap_filter)
+            if target is not None:
+                where.append("handicap_bucket = ?")
+                params.append(target)
+        order = "DESC" if sort_desc else "ASC"
+        sql = f"SELECT payload FROM matches WHERE {' AND '.join(where)} ORDER BY sort_time {order}, id {order}"
+        offset = max(int(offset or 0), 0)
+        try:
+            limit_val = int(limit) if limit is not None else -1
+        except (TypeError, ValueError):
+            limit_val = -1
+        sql += " LIMIT ? OFFSET ?"
+        params.extend([limit_val if limit_val >= 0 else -1, offset])
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return self._entries(rows)
+
+    def search(self, team=None, goal_line=None, handicap=None, section=None, start=None, end=None,
+               include_inactive=False, limit=100):
+        """
+        Búsqueda por equipo (local o visitante, sin distinguir mayúsculas; '%' como comodín),
+        línea de goles, bucket de hándicap, sección y rango de horas (datetime o ISO).
+        Más recientes primero.
+        """
+        where, params = [], []
+        if team:
+            operator = "LIKE" if "%" in team else "="
+            where.append(f"(home_team {operator} ? COLLATE NOCASE OR away_team {operator} ? COLLATE NOCASE)")
+            params.extend([team, team])
+        if goal_line:
+            where.append("goal_line = ?")
+            params.append(goal_line)
+        if handicap and (target := _safe_bucket(handicap)) is not None:
+            where.append("handicap_bucket = ?")
+            params.append(target)
+        if section:
+            where.append("section = ?")
+            params.append(_SECTION_NAMES.get(section, section))
+        for bound, operator in ((start, ">="), (end, "<=")):
+            if bound:
+                where.append(f"sort_time {operator} ?")
+                params.append(_sort_time({"time_obj": bound}))
+        if not include_inactive:
+            where.append("active = 1")
+        sql = "SELECT payload FROM matches"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        sql += " ORDER BY sort_time DESC, id DESC LIMIT ?"
+        params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return self._entries(rows)
+
+    def history(self, match_id):
+        """Cambios registrados de un partido, del más antiguo al más reciente."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT changed_at, field, old_value, new_value FROM match_changes"
+                " WHERE match_id = ? ORDER BY changed_at, rowid", (str(match_id),)
+            ).fetchall()
+        return [{"changed_at": changed_at, "field": field, "old": json.loads(old), "new": json.loads(new)}
+                for changed_at, field, old, new in rows]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(((section, active), count) for section, active, count in self._conn.execute(
+                "SELECT section, active, COUNT(*) FROM matches GROUP BY section, active"))
+            changes = self._conn.execute("SELECT COUNT(*) FROM match_changes").fetchone()[0]
+        return {
+            "upcoming_active": counts.get(("upcoming", 1), 0),
+            "upcoming_inactive": counts.get(("upcoming", 0), 0),
+            "finished": counts.get(("finished", 1), 0) + counts.get(("finished", 0), 0),
+            "finished_active": counts.get(("finished", 1), 0),
+            "changes": changes,
+            "updated_at": self.updated_at(),
+            "path": self.path,
+        }
+
+
+def catalog_path_for(data_file):
+    return os.environ.get("MATCH_CATALOG_PATH") or Path(data_file).with_name("match_catalog.sqlite3")
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_match_catalog(data_file):
+    """Catálogo asociado a un data.json (una conexión por fichero y proceso)."""
+    path = str(Path(catalog_path_for(data_file)).resolve())
+    with _catalogs_lock:
+        if path not in _catalogs:
+            _catalogs[path] = MatchCatalog(path)
+        return _catalogs[path]
+
+
+def record_snapshot(data_files, data, changes=None):
+    """
+    Vuelca en el catálogo el snapshot recién escrito en data_files (una ruta o varias, p.ej.
+    data.json y sus copias). Si comparten catálogo se vuelca una sola vez. Nunca hace
+    fallar al scraper: devuelve el número de partidos volcados.
+    """
+    if isinstance(data_files, (str, os.PathLike)):
+        data_files = [data_files]
+    by_catalog = {}
+    for data_file in data_files:
+        by_catalog.setdefault(str(Path(catalog_path_for(data_file)).resolve()), []).append(data_file)
+    recorded = 0
+    for sources in by_catalog.values():
+        try:
+            recorded = get_match_catalog(sources[0]).record_snapshot(data, changes, source_files=sources)
+        except sqlite3.Error as exc:
+            print(f"[catalogo] No se pudo actualizar el catálogo de {sources[0]}: {exc}")
+    return recorded
@@ -0,0 +1,248 @@
+# match_segments.py
+"""
+Copia de data.json en segmentos NDJSON con índice, para leer páginas sin cargar todo.
+
+data.json es un único documento: cualquier lector (Flask, Streamlit, Descarga_Todo)
+tiene que parsear los ~2700 partidos aunque solo quiera los 20 de una página. Junto a
+data.json se escribe además la carpeta data_segments/:
+
+    data_segments/
+        index.json                                   manifiesto
+        upcoming_matches/2025-10-21-<hash>.ndjson    un partido por línea, un fichero por día
+        finished_matches/2025-10-20-<hash>.ndjson
+
+Cada segmento está ordenado por (time_obj, id), igual que el índice de match_store, y su
+nombre lleva el hash del contenido: en un refresco incremental solo se reescriben los días
+que han cambiado. El manifiesto guarda por segmento el número de partidos, el intervalo de
+horas y las posiciones de cada bucket de hándicap, así que SegmentStore.query() salta
+segmentos enteros sin abrirlos y solo decodifica las líneas de la página pedida.
+
+El manifiesto incluye la firma (mtime, tamaño) del data.json del que sale: si alguien
+escribe data.json por otro camino, los segmentos dejan de considerarse vigentes y los
+lectores vuelven a data.json.
+
+Uso para regenerar los segmentos de un data.json existente:
+    python match_segments.py [data.json]
+"""
+import datetime
+import hashlib
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+from match_store import SECTIONS, parse_time_obj, _safe_bucket
+
+MANIFEST_NAME = "index.json"
+UNDATED = "undated"
+
+
+def segments_dir_for(data_file):
+    data_file = Path(data_file)
+    return data_file.with_name(f"{data_file.stem}_segments")
+
+
+def _file_signature(path):
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _write_atomic(path, payload):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(payload)
+    os.replace(tmp, path)
+
+
+def _read_manifest(directory):
+    try:
+        with open(Path(directory) / MANIFEST_NAME, "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        return manifest if isinstance(manifest, dict) else None
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _build_section_segments(section_dir, matches):
+    """Escribe los segmentos de una sección y devuelve sus entradas del manifiesto."""
+    prepared = []
+    for match in matches:
+        if not isinstance(match, dict):
+            continue
+        parsed_time = parse_time_obj(match.get("time_obj"))
+        prepared.append(((parsed_time or datetime.datetime.min, match.get("id", "")), parsed_time, match))
+    prepared.sort(key=lambda item: item[0])
+
+    by_day = {}
+    for _, parsed_time, match in prepared:
+        day = parsed_time.date().isoformat() if parsed_time else UNDATED
+        by_day.setdefault(day, []).append((parsed_time, match))
+
+    segments = []
+    # "undated" va primero: en el índice en memoria esos partidos ordenan como datetime.min
+    for day in sorted(by_day, key=lambda d: "" if d == UNDATED else d):
+        rows = by_day[day]
+        lines = [json.dumps(match, ensure_ascii=False) for _, match in rows]
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+        name = f"{day}-{hashlib.sha1(payload).hexdigest()[:12]}.ndjson"
+        path = section_dir / name
+        if not path.exists():
+            _write_atomic(path, payload)
+        buckets = {}
+        for position, (_, match) in enumerate(rows):
+            bucket = _safe_bucket(match.get("handicap", ""))
+            if bucket is not None:
+                buckets.setdefault(bucket, []).append(position)
+        times = [t for t, _ in rows if t is not None]
+        segments.append({
+            "file": name, "date": day, "count": len(rows),
+            "first": times[0].isoformat() if times else None,
+            "last": times[-1].isoformat() if times else None,
+            "buckets": buckets,
+        })
+    return segments
+
+
+def write_segments(data_file, data):
+    """
+    Escribe (o actualiza) data_segments/ para el contenido `data` que se acaba de guardar
+    en data_file. Llamar después de escribir data.json: el manifiesto guarda su firma.
+    """
+    directory = segments_dir_for(data_file)
+    previous = _read_manifest(directory) or {}
+    manifest = {
+        "version": 1,
+        "written_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "source_signature": _file_signature(data_file),
+        "sections": {},
+    }
+    for section in SECTIONS:
+        section_dir = directory / section
+        section_dir.mkdir(parents=True, exist_ok=True)
+        segments = _build_section_segments(section_dir, (data or {}).get(section, []))
+        manifest["sections"][section] = {"count": sum(s["count"] for s in segments), "segments": segments}
+    _write_atomic(directory / MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+    _remove_unreferenced(directory, manifest, previous)
+    return manifest
+
+
+def _remove_unreferenced(directory, manifest, previous):
+    """Borra segmentos que no usa ni el manifiesto nuevo ni el anterior (un lector puede seguir con él)."""
+    for section in SECTIONS:
+        keep = {s["file"] for m in (manifest, previous)
+                for s in m.get("sections", {}).get(section, {}).get("segments", [])}
+        section_dir = Path(directory) / section
+        for path in section_dir.glob("*.ndjson"):
+            if path.name not in keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+def _read_lines(path, positions):
+    """Decodifica solo las líneas `positions` (ordenadas) de un segmento."""
+    wanted = iter(positions)
+    target = next(wanted, None)
+    found = {}
+    with open(path, "rb") as fh:
+        for position, line in enumerate(fh):
+            if target is None:
+                break
+            if position == target:
+                found[position] = json.loads(line)
+                target = next(wanted, None)
+    return [found[p] for p in positions if p in found]
+
+
+class SegmentStore:
+    """Lector de data_segments/ con la misma consulta que MatchStore.query()."""
+
+    def __init__(self, data_file):
+        self.data_file = Path(data_file)
+        self.directory = segments_dir_for(data_file)
+        self._lock = threading.Lock()
+        self._manifest_signature = None
+        self._manifest = None
+        self.reloads = 0
+
+    def _refresh(self):
+        signature = _file_signature(self.directory / MANIFEST_NAME)
+        if signature == self._manifest_signature:
+            return
+        with self._lock:
+            if signature == self._manifest_signature:
+                return
+            self._manifest_signature = signature
+            self._manifest = _read_manifest(self.directory) if signature is not None else None
+            self.reloads += 1
+
+    def available(self):
+        """True si hay segmentos y corresponden al data.json actual."""
+        self._refresh()
+        manifest = self._manifest
+        return manifest is not None and manifest.get("source_signature") == _file_signature(self.data_file)
+
+    def count(self, section, handicap_filter=None):
+        self._refresh()
+        segments = (self._manifest or {}).get("sections", {}).get(section, {}).get("segments", [])
+        target = _safe_bucket(handicap_filter) if handicap_filter else None
+        if target is None:
+            return sum(s["count"] for s in segments)
+        return sum(len(s["buckets"].get(target, ())) for s in segments)
+
+    def query(self, section, limit=None, offset=0, handicap_filter=None, sort_desc=False):
+        self._refresh()
+        segments = list((self._manifest or {}).get("sections", {}).get(section, {}).get("segments", []))
+        target = _safe_bucket(handicap_filter) if handicap_filter else None
+        desc = bool(sort_desc)
+        if desc:
+            segments.reverse()
+
+        offset = max(int(offset or 0), 0)
+        remaining = None
+        if limit is not None:
+            try:
+                limit_val = int(limit)
+            except (TypeError, ValueError):
+                limit_val = None
+            if limit_val is not None and limit_val >= 0:
+                remaining = limit_val
+
+        results = []
+        for segment in segments:
+            if remaining is not None and remaining <= 0:
+                break
+            positions = list(range(segment["count"])) if target is None else list(segment["buckets"].get(target, ()))
+            if desc:
+                positions.reverse()
+            if offset >= len(positions):
+                offset -= len(positions)
+                continue
+            positions = positions[offset:]
+            offset = 0
+            if remaining is not None:
+                positions = positions[:remaining]
+                remaining -= len(positions)
+            rows = _read_lines(self.directory / section / segment["file"], sorted(positions))
+            if desc:
+                rows.reverse()
+            for entry in rows:
+                parsed_time = parse_time_obj(entry.get("time_obj"))
+                if not entry.get("time") and parsed_time:
+                    entry["time"] = parsed_time.strftime("%d/%m %H:%M")
+                results.append(entry)
+        return results
+
+
+if __name__ == "__main__":
+    source = Path(sys.argv[1] if len(sys.argv) > 1 else "data.json")
+    with open(source, "r", encoding="utf-8") as fh:
+        written = write_segments(source, json.load(fh))
+    for name, info in written["sections"].items():
+        print(f"{name}: {info['count']} partidos en {len(info['segments'])} segmentos")
+    print(f"Segmentos escritos en {segments_dir_for(source)}")
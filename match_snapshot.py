@@ -0,0 +1,158 @@
+# match_snapshot.py
+"""
+Refresco incremental de data.json y registro de cambios.
+
+merge_snapshot() compara lo que acaba de descargar el scraper con el data.json anterior:
+añade los partidos nuevos, actualiza los campos que han cambiado (hándicap, línea de
+goles, marcador, hora...), pasa a finalizados los que ya tienen resultado y conserva el
+histórico de finalizados. Cada ejecución deja una línea JSON en el registro de cambios
+(data_changes.jsonl junto a data.json) para que las cachés invaliden solo esos IDs:
+
+    {"timestamp": "...", "added": [...], "updated": {"id": {"campo": [antes, después]}},
+     "finished": [...], "removed": [...]}
+"""
+import datetime
+import json
+import os
+import threading
+from pathlib import Path
+
+# Campos derivados de otros (se recalculan al descargar): no cuentan como cambio
+_IGNORED_FIELDS = {"time"}
+
+
+def _diff_fields(old, new):
+    changed = {}
+    for field in (set(old) | set(new)) - _IGNORED_FIELDS:
+        if old.get(field) != new.get(field):
+            changed[field] = [old.get(field), new.get(field)]
+    return changed
+
+
+def merge_snapshot(previous, upcoming, finished, max_finished=1500):
+    """
+    Devuelve (datos, cambios). `previous` es el contenido anterior de data.json; `upcoming`
+    y `finished` las listas recién descargadas. Los próximos son exactamente los descargados
+    (la portada siempre se lee entera); los finalizados se acumulan hasta `max_finished`.
+    """
+    previous = previous or {}
+    prev_upcoming = {m["id"]: m for m in previous.get("upcoming_matches", []) if isinstance(m, dict) and m.get("id")}
+    prev_finished = {m["id"]: m for m in previous.get("finished_matches", []) if isinstance(m, dict) and m.get("id")}
+    changes = {"added": [], "updated": {}, "finished": [], "removed": []}
+
+    finished_ids = {m["id"] for m in finished if m.get("id")}
+    merged_finished = dict(prev_finished)
+    for match in finished:
+        match_id = match.get("id")
+        if not match_id:
+            continue
+        old = prev_finished.get(match_id)
+        if old is not None:
+            if (changed := _diff_fields(old, match)):
+                changes["updated"][match_id] = changed
+        elif match_id in prev_upcoming:
+            changes["finished"].append(match_id)
+        else:
+            changes["added"].append(match_id)
+        merged_finished[match_id] = match
+
+    merged_upcoming = []
+    upcoming_ids = set()
+    for match in upcoming:
+        match_id = match.get("id")
+        if not match_id or match_id in finished_ids or match_id in upcoming_ids:
+            continue
+        upcoming_ids.add(match_id)
+        old = prev_upcoming.get(match_id)
+        if old is None:
+            changes["added"].append(match_id)
+        elif (changed := _diff_fields(old, match)):
+            changes["updated"][match_id] = changed
+        merged_upcoming.append(match)
+
+    changes["removed"] = [match_id for match_id in prev_upcoming
+                          if match_id not in upcoming_ids and match_id not in finished_ids]
+
+    finished_list = sorted(merged_finished.values(), key=lambda m: m.get("time_obj") or "", reverse=True)
+    if max_finished is not None:
+        finished_list = finished_list[:max_finished]
+
+    data = {"upcoming_matches": merged_upcoming, "finished_matches": finished_list}
+    return data, changes
+
+
+def has_changes(changes):
+    return any(changes.get(key) for key in ("added", "updated", "finished", "removed"))
+
+
+def changed_ids(changes):
+    """Todos los IDs afectados por una entrada del registro de cambios."""
+    ids = set(changes.get("added", [])) | set(changes.get("finished", [])) | set(changes.get("removed", []))
+    ids.update(changes.get("updated", {}).keys())
+    return ids
+
+
+def change_log_path_for(data_file):
+    return Path(data_file).with_name("data_changes.jsonl")
+
+
+def load_snapshot(data_file):
+    try:
+        with open(data_file, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        return data if isinstance(data, dict) else {}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def write_snapshot_atomic(data_file, data, indent=None):
+    """Escribe data.json en un temporal y lo renombra: nadie lee nunca un fichero a medias."""
+    data_file = Path(data_file)
+    tmp = data_file.with_name(f".{data_file.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=indent, ensure_ascii=False)
+    os.replace(tmp, data_file)
+
+
+def append_change_log(log_file, changes):
+    entry = dict(changes, timestamp=datetime.datetime.now().isoformat(timespec="seconds"))
+    with open(log_file, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return entry
+
+
+class ChangeLogReader:
+    """Lee las entradas nuevas del registro de cambios desde la última llamada."""
+
+    def __init__(self, log_file, from_start=False):
+        self.log_file = Path(log_file)
+        self._lock = threading.Lock()
+        self._offset = 0 if from_start else self._size()
+
+    def _size(self):
+        try:
+            return self.log_file.stat().st_size
+        except OSError:
+            return 0
+
+    def read_new(self):
+        with self._lock:
+            size = self._size()
+            if size < self._offset:
+                # El registro se ha truncado o rotado
+                self._offset = 0
+            if size == self._offset:
+                return []
+            with open(self.log_file, "rb") as fh:
+                fh.seek(self._offset)
+                chunk = fh.read(size - self._offset)
+            # Solo líneas completas: una escritura a medias se lee en la siguiente llamada
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            self._offset += len(complete)
+        entries = []
+        for line in complete.decode("utf-8").splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
@@ -0,0 +1,170 @@
+# match_store.py
+"""
+Índice en memoria de data.json para /api/matches y /api/finished_matches.
+
+Antes cada petición del scroll infinito releía y parseaba data.json entero, copiaba
+todos los partidos, reparseaba time_obj, normalizaba todos los hándicaps y ordenaba
+todo para devolver una página. Aquí el fichero se carga una vez (y se recarga solo si
+cambia su mtime o su tamaño): cada sección queda ya ordenada y repartida por hándicap
+normalizado, así que una consulta offset/limit/handicap solo copia la página pedida.
+"""
+import datetime
+import json
+import threading
+
+from app_utils import normalize_handicap_to_half_bucket_str
+
+SECTIONS = ("upcoming_matches", "finished_matches")
+
+
+def parse_time_obj(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            try:
+                return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                return None
+    return None
+
+
+def _safe_bucket(handicap):
+    try:
+        return normalize_handicap_to_half_bucket_str(handicap)
+    except Exception:
+        return None
+
+
+class _SectionIndex:
+    """Partidos de una sección, ordenados en ambos sentidos y por bucket de hándicap."""
+
+    def __init__(self, matches):
+        prepared = []
+        self._kickoffs = {}
+        for original in matches:
+            entry = dict(original)
+            parsed_time = parse_time_obj(entry.get('time_obj'))
+            if not entry.get('time') and parsed_time:
+                entry['time'] = parsed_time.strftime('%d/%m %H:%M')
+            if entry.get('id'):
+                self._kickoffs.setdefault(str(entry['id']), parsed_time)
+            sort_key = (parsed_time or datetime.datetime.min, entry.get('id', ''))
+            prepared.append((sort_key, _safe_bucket(entry.get('handicap', '')), entry))
+        # sort(reverse=True) conserva el orden original de los empates, igual que antes:
+        # por eso se ordena dos veces en lugar de invertir la lista ascendente
+        self._ordered = {}
+        self._buckets = {}
+        for desc in (False, True):
+            ordered = sorted(prepared, key=lambda item: item[0], reverse=desc)
+            self._ordered[desc] = [entry for _, _, entry in ordered]
+            buckets = {}
+            for _, bucket, entry in ordered:
+                if bucket is not None:
+                    buckets.setdefault(bucket, []).append(entry)
+            self._buckets[desc] = buckets
+
+    def query(self, limit=None, offset=0, handicap_filter=None, sort_desc=False):
+        desc = bool(sort_desc)
+        entries = self._ordered[desc]
+        if handicap_filter:
+            target = _safe_bucket(handicap_filter)
+            if target is not None:
+                entries = self._buckets[desc].get(target, [])
+
+        offset = max(int(offset or 0), 0)
+        end = None
+        if limit is not None:
+            try:
+                limit_val = int(limit)
+            except (TypeError, ValueError):
+                limit_val = None
+            if limit_val is not None and limit_val >= 0:
+                end = offset + limit_val
+        return [dict(entry) for entry in entries[offset:end]]
+
+    def kickoff_of(self, match_id):
+        return self._kickoffs.get(str(match_id))
+
+    def starting_between(self, start, end):
+        """[(match_id, kickoff)] con inicio en [start, end], por hora de inicio."""
+        return sorted(((match_id, kickoff) for match_id, kickoff in self._kickoffs.items()
+                       if kickoff is not None and start <= kickoff <= end), key=lambda item: item[1])
+
+    def handicap_buckets(self):
+        return sorted(self._buckets[False], key=float)
+
+    def __len__(self):
+        return len(self._ordered[False])
+
+
+class MatchStore:
+    def __init__(self, data_file):
+        self.data_file = data_file
+        self._lock = threading.Lock()
+        self._signature = None
+        self._sections = {section: _SectionIndex([]) for section in SECTIONS}
+        self.reloads = 0
+
+    def _current_signature(self):
+        try:
+            stat = self.data_file.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_sections(self):
+        try:
+            with self.data_file.open('r', encoding='utf-8') as fh:
+                data = json.load(fh)
+        except (json.JSONDecodeError, OSError) as exc:
+            print(f"Error al leer {self.data_file}: {exc}")
+            return None
+        if not isinstance(data, dict):
+            data = {}
+        sections = {}
+        for section in SECTIONS:
+            value = data.get(section, [])
+            matches = [item for item in value if isinstance(item, dict)] if isinstance(value, list) else []
+            sections[section] = _SectionIndex(matches)
+        return sections
+
+    def _refresh(self):
+        signature = self._current_signature()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature:
+                return
+            if signature is None:
+                sections = {section: _SectionIndex([]) for section in SECTIONS}
+            else:
+                sections = self._load_sections()
+            # Fichero a medio escribir por el scraper: se sigue sirviendo el índice anterior
+            # hasta que vuelva a cambiar
+            self._signature = signature
+            if sections is not None:
+                self._sections = sections
+                self.reloads += 1
+
+    def section(self, section):
+        self._refresh()
+        return self._sections[section]
+
+    def kickoff_of(self, match_id):
+        """Hora de inicio (UTC, como time_obj) de un partido próximo o finalizado, o None."""
+        for section in SECTIONS:
+            kickoff = self.section(section).kickoff_of(match_id)
+            if kickoff is not None:
+                return kickoff
+        return None
+
+    def upcoming_within(self, hours, now=None):
+        """Próximos partidos que empiezan en las siguientes `hours` horas: [(match_id, kickoff)]."""
+        now = now or datetime.datetime.utcnow()
+        return self.section("upcoming_matches").starting_between(now, now + datetime.timedelta(hours=hours))
+
+    def query(self, section, limit=None, offset=0, handicap_filter=None, sort_desc=False):
+        return self.section(section).query(limit, offset, handicap_filter, sort_desc)
@@ -1,5 +1,6 @@
 # modules/analisis_avanzado.py
 import re
+from modules.tracing import traced
 
 
 def _colorear_stats(val1_str, val2_str):
@@ -17,6 +18,7 @@ def _colorear_stats(val1_str, val2_str):
         return val1_str, val2_str
 
 
+@traced()
 def generar_analisis_comparativas_indirectas(data):
     """
     Genera una nota de análisis experta basada en los datos de las comparativas indirectas.
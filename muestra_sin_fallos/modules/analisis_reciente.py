@@ -3,13 +3,16 @@ import re
 import math
 from bs4 import BeautifulSoup
 from modules.utils import parse_ah_to_number_of, format_ah_as_decimal_string_of, check_handicap_cover
+from modules.h2h_page import ensure_h2h_page
+from modules.tracing import traced
 
+@traced()
 def analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team=True):
     """
     Analiza el rendimiento reciente de un equipo con respecto al handicap.
     
     Args:
-        soup: BeautifulSoup object con el contenido de la página
+        soup: BeautifulSoup object (o H2HPage) con el contenido de la página
         team_name: Nombre del equipo a analizar
         is_home_team: Booleano que indica si el equipo es local (True) o visitante (False)
     
@@ -18,48 +21,37 @@ def analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team=Tru
     """
     # Determinar qué tabla usar según si es equipo local o visitante
     table_id = "table_v1" if is_home_team else "table_v2"
-    table = soup.find("table", id=table_id)
+    page = ensure_h2h_page(soup)
     
-    if not table:
+    if not page.has_table(table_id):
         return {"error": "No se encontró la tabla de partidos recientes"}
     
     # Extraer los últimos 5 partidos del equipo
     matches = []
-    score_selector = 'fscore_1' if is_home_team else 'fscore_2'
     
-    for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
+    for row in page.rows(table_id):
         if len(matches) >= 5:  # Limitar a los últimos 5 partidos
             break
             
         # Extraer información del partido
-        cells = row.find_all('td')
-        if len(cells) < 12:
+        if row.n_cells < 12:
             continue
             
         # Obtener nombres de equipos
-        home_team_cell = cells[2]
-        away_team_cell = cells[4]
-        
-        home_team = home_team_cell.get_text(strip=True)
-        away_team = away_team_cell.get_text(strip=True)
+        home_team = row.home_cell
+        away_team = row.away_cell
         
         # Verificar si el equipo está en este partido
         if team_name.lower() not in [home_team.lower(), away_team.lower()]:
             continue
             
         # Obtener resultado
-        score_cell = cells[3]
-        score_span = score_cell.find('span', class_=score_selector)
-        if not score_span:
-            continue
-            
-        score_raw = score_span.get_text(strip=True)
-        if '-' not in score_raw:
+        score_raw = row.score_text
+        if score_raw is None or '-' not in score_raw:
             continue
             
         # Obtener handicap
-        ah_cell = cells[11]
-        ah_line_raw = (ah_cell.get('data-o') or ah_cell.text).strip()
+        ah_line_raw = row.ah_raw
         
         matches.append({
             'home_team': home_team,
@@ -119,12 +111,13 @@ def analizar_rendimiento_reciente_con_handicap(soup, team_name, is_home_team=Tru
     
     return analysis
 
+@traced()
 def comparar_lineas_handicap_recientes(soup, team_name, current_ah_line, is_home_team=True):
     """
     Compara las líneas de handicap recientes con la línea actual.
     
     Args:
-        soup: BeautifulSoup object con el contenido de la página
+        soup: BeautifulSoup object (o H2HPage) con el contenido de la página
         team_name: Nombre del equipo a analizar
         current_ah_line: Línea de handicap actual (número)
         is_home_team: Booleano que indica si el equipo es local (True) o visitante (False)
@@ -1,14 +1,16 @@
 # modules/analisis_rivales.py
 import re
 from bs4 import BeautifulSoup
-from modules.utils import get_match_details_from_row_of
+from modules.h2h_page import ensure_h2h_page
+from modules.tracing import traced
 
+@traced()
 def analizar_rivales_comunes(soup, team_a, team_b):
     """
     Analiza los rivales comunes entre dos equipos.
     
     Args:
-        soup: BeautifulSoup object con el contenido de la página
+        soup: BeautifulSoup object (o H2HPage) con el contenido de la página
         team_a: Nombre del primer equipo
         team_b: Nombre del segundo equipo
     
@@ -16,24 +18,23 @@ def analizar_rivales_comunes(soup, team_a, team_b):
         dict: Diccionario con el análisis de rivales comunes
     """
     # Buscar tablas de partidos para ambos equipos
-    table_v1 = soup.find("table", id="table_v1")  # Partidos de team_a como local
-    table_v2 = soup.find("table", id="table_v2")  # Partidos de team_b como visitante
+    page = ensure_h2h_page(soup)
+    rows_v1 = page.details("table_v1")  # Partidos de team_a como local
+    rows_v2 = page.details("table_v2")  # Partidos de team_b como visitante
     
-    if not table_v1 or not table_v2:
+    if not page.has_table("table_v1") or not page.has_table("table_v2"):
         return {"error": "No se encontraron las tablas de partidos"}
     
     # Extraer rivales de team_a (como local)
     rivals_a = set()
-    for row in table_v1.find_all("tr", id=re.compile(r"tr1_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_1', source_table_type='hist')
-        if details and team_a.lower() in details['home'].lower():
+    for details in rows_v1:
+        if team_a.lower() in details['home'].lower():
             rivals_a.add(details['away'].lower())
     
     # Extraer rivales de team_b (como visitante)
     rivals_b = set()
-    for row in table_v2.find_all("tr", id=re.compile(r"tr2_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_2', source_table_type='hist')
-        if details and team_b.lower() in details['away'].lower():
+    for details in rows_v2:
+        if team_b.lower() in details['away'].lower():
             rivals_b.add(details['home'].lower())
     
     # Encontrar rivales comunes
@@ -43,9 +44,8 @@ def analizar_rivales_comunes(soup, team_a, team_b):
     common_matches = []
     
     # Partidos de team_a contra rivales comunes
-    for row in table_v1.find_all("tr", id=re.compile(r"tr1_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_1', source_table_type='hist')
-        if details and details['away'].lower() in common_rivals:
+    for details in rows_v1:
+        if details['away'].lower() in common_rivals:
             common_matches.append({
                 'team': team_a,
                 'opponent': details['away'],
@@ -59,9 +59,8 @@ def analizar_rivales_comunes(soup, team_a, team_b):
             })
     
     # Partidos de team_b contra rivales comunes
-    for row in table_v2.find_all("tr", id=re.compile(r"tr2_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_2', source_table_type='hist')
-        if details and details['home'].lower() in common_rivals:
+    for details in rows_v2:
+        if details['home'].lower() in common_rivals:
             common_matches.append({
                 'team': team_b,
                 'opponent': details['home'],
@@ -85,12 +84,13 @@ def analizar_rivales_comunes(soup, team_a, team_b):
         'matches': common_matches[:10]  # Limitar a 10 partidos más recientes
     }
 
+@traced()
 def analizar_contra_rival_del_rival(soup, team_a, team_b, rival_a_rival, rival_b_rival):
     """
     Analiza el rendimiento de cada equipo contra el rival del otro equipo.
     
     Args:
-        soup: BeautifulSoup object con el contenido de la página
+        soup: BeautifulSoup object (o H2HPage) con el contenido de la página
         team_a: Nombre del primer equipo
         team_b: Nombre del segundo equipo
         rival_a_rival: Rival del equipo A
@@ -100,17 +100,17 @@ def analizar_contra_rival_del_rival(soup, team_a, team_b, rival_a_rival, rival_b
         dict: Diccionario con el análisis contra el rival del rival
     """
     # Buscar tablas de partidos
-    table_v1 = soup.find("table", id="table_v1")  # Partidos de team_a como local
-    table_v2 = soup.find("table", id="table_v2")  # Partidos de team_b como visitante
+    page = ensure_h2h_page(soup)
+    rows_v1 = page.details("table_v1")  # Partidos de team_a como local
+    rows_v2 = page.details("table_v2")  # Partidos de team_b como visitante
     
-    if not table_v1 or not table_v2:
+    if not page.has_table("table_v1") or not page.has_table("table_v2"):
         return {"error": "No se encontraron las tablas de partidos"}
     
     # Buscar partidos de team_a contra rival_b_rival
     matches_a_vs_rival_b_rival = []
-    for row in table_v1.find_all("tr", id=re.compile(r"tr1_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_1', source_table_type='hist')
-        if details and (
+    for details in rows_v1:
+        if (
             (team_a.lower() in details['home'].lower() and rival_b_rival.lower() in details['away'].lower()) or
             (team_a.lower() in details['away'].lower() and rival_b_rival.lower() in details['home'].lower())
         ):
@@ -127,9 +127,8 @@ def analizar_contra_rival_del_rival(soup, team_a, team_b, rival_a_rival, rival_b
     
     # Buscar partidos de team_b contra rival_a_rival
     matches_b_vs_rival_a_rival = []
-    for row in table_v2.find_all("tr", id=re.compile(r"tr2_\d+")):
-        details = get_match_details_from_row_of(row, score_class_selector='fscore_2', source_table_type='hist')
-        if details and (
+    for details in rows_v2:
+        if (
             (team_b.lower() in details['home'].lower() and rival_a_rival.lower() in details['away'].lower()) or
             (team_b.lower() in details['away'].lower() and rival_a_rival.lower() in details['home'].lower())
         ):
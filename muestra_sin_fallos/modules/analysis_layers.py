@@ -0,0 +1,119 @@
+# modules/analysis_layers.py
+"""
+Capas ya calculadas de un partido, para no repetir trabajo entre la vista previa y el análisis completo.
+
+La vista previa ligera es un subconjunto del grafo del análisis completo (mismas etapas:
+página h2h, extracción, historial, H2H Col3 y las estadísticas de los últimos partidos). Lo que calcula
+una de las dos pasadas se guarda aquí por partido ({etapa: resultado}) y la otra lo pasa
+como resultado previo a StageGraph.run(): abrir la vista previa y después el análisis
+completo solo descarga lo que falta (las otras estadísticas, el historial), y la vista
+previa de un partido ya analizado no descarga nada.
+
+No se guarda el HTML de la página (la extracción ya lo contiene todo) y cada etapa caduca
+pronto, contando desde que se calculó (reutilizarla o añadir otras no la renueva): las
+cuotas de un partido por jugar se mueven.
+
+Configuración por variables de entorno:
+    ANALYSIS_LAYERS_TTL     segundos que se reutiliza una capa; 0 = desactivado (120)
+    ANALYSIS_LAYERS_ITEMS   partidos en memoria (64)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from modules.metrics import register_stats_collector
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class LayerCache:
+    def __init__(self, ttl_seconds=120, max_items=64):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max(1, max_items)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()        # match_id -> {etapa: (guardada, resultado)}
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evicted": 0, "invalidated": 0}
+
+    def _vigentes_locked(self, match_id, now):
+        """Etapas vigentes del partido; las caducadas se descartan (y el partido si no queda ninguna)."""
+        layers = self._entries.get(match_id)
+        if layers is None:
+            return None
+        expired = [name for name, (stored, _) in layers.items() if now - stored > self.ttl_seconds]
+        for name in expired:
+            del layers[name]
+        if expired and not layers:
+            del self._entries[match_id]
+            self._counters["expired"] += 1
+            return None
+        return layers
+
+    def get(self, match_id):
+        """{etapa: resultado} de las etapas vigentes del partido (un dict nuevo), o None."""
+        match_id = str(match_id)
+        with self._lock:
+            layers = self._vigentes_locked(match_id, time.monotonic())
+            if layers is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(match_id)
+            self._counters["hits"] += 1
+            return {name: value for name, (_, value) in layers.items()}
+
+    def put(self, match_id, layers):
+        """
+        Añade (o sustituye) etapas del partido. Cada etapa caduca según cuándo se calculó:
+        las que ya había y no vienen en `layers` se conservan con su hora original.
+        """
+        if not layers:
+            return
+        match_id = str(match_id)
+        now = time.monotonic()
+        with self._lock:
+            current = self._vigentes_locked(match_id, now) or {}
+            current.update((name, (now, value)) for name, value in layers.items())
+            self._entries[match_id] = current
+            self._entries.move_to_end(match_id)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def invalidate(self, match_id):
+        with self._lock:
+            removed = self._entries.pop(str(match_id), None) is not None
+            if removed:
+                self._counters["invalidated"] += 1
+            return removed
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), max_items=self.max_items, ttl_seconds=self.ttl_seconds)
+
+
+_layers = None
+_layers_lock = threading.Lock()
+
+
+def get_layer_cache():
+    """Capas compartidas por proceso, o None si ANALYSIS_LAYERS_TTL=0."""
+    global _layers
+    ttl = _env_int("ANALYSIS_LAYERS_TTL", 120)
+    if ttl <= 0:
+        return None
+    if _layers is None:
+        with _layers_lock:
+            if _layers is None:
+                _layers = LayerCache(ttl, _env_int("ANALYSIS_LAYERS_ITEMS", 64))
+    return _layers
+
+
+register_stats_collector("analysis_layers", lambda: _layers.stats() if _layers is not None else None,
+                         counters=("hits", "misses", "stores", "expired", "evicted", "invalidated"),
+                         gauges=("entries",))
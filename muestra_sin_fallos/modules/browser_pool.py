@@ -0,0 +1,216 @@
+# modules/browser_pool.py
+"""
+Pool acotado de navegadores Chrome headless reutilizables.
+
+Arrancar un webdriver.Chrome por petición cuesta segundos y cientos de MB; aquí se
+mantienen hasta BROWSER_POOL_SIZE drivers calientes que se prestan (checkout) y se
+devuelven (checkin). Cada driver se comprueba antes de prestarlo, se recicla tras
+BROWSER_POOL_MAX_PAGES páginas y tiene un timeout de carga por petición.
+
+Configuración por variables de entorno:
+    BROWSER_POOL_SIZE              drivers simultáneos como máximo (2)
+    BROWSER_POOL_MAX_PAGES         páginas servidas antes de reciclar un driver (40)
+    BROWSER_POOL_PAGE_TIMEOUT      segundos máximos de carga de una página (20)
+    BROWSER_POOL_CHECKOUT_TIMEOUT  segundos máximos esperando un driver libre (30)
+
+Métricas (modules.metrics): browser_startup_seconds (arranque de Chrome) y
+browser_checkout_seconds (desde que se pide un driver hasta tenerlo, arranque incluido).
+"""
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.common.exceptions import WebDriverException
+
+from modules.metrics import histogram, register_stats_collector
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"
+
+
+BROWSER_STARTUP_SECONDS = histogram("browser_startup_seconds", "Arranque de un Chrome nuevo del pool")
+BROWSER_CHECKOUT_SECONDS = histogram("browser_checkout_seconds", "Espera hasta obtener un navegador del pool")
+
+
+class BrowserPoolTimeout(Exception):
+    """No quedó ningún driver libre dentro del tiempo de espera."""
+
+
+def build_chrome_options():
+    options = ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    return options
+
+
+def _env_int(name, default):
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+class BrowserPool:
+    def __init__(self, size=2, max_pages=40, page_timeout=20, checkout_timeout=30, driver_factory=None):
+        self.size = size
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self.checkout_timeout = checkout_timeout
+        self._driver_factory = driver_factory or (lambda: webdriver.Chrome(options=build_chrome_options()))
+        self._cond = threading.Condition()
+        self._idle = []          # drivers libres (LIFO: el más caliente primero)
+        self._pages = {}         # id(driver) -> páginas servidas
+        self._created = 0        # drivers vivos (libres + prestados)
+        self._closed = False
+        self._counters = {"created": 0, "recycled": 0, "discarded": 0, "checkouts": 0, "timeouts": 0}
+
+    # --- ciclo de vida de un driver ---
+    def _new_driver(self):
+        start = time.perf_counter()
+        driver = self._driver_factory()
+        BROWSER_STARTUP_SECONDS.observe(time.perf_counter() - start)
+        driver.set_page_load_timeout(self.page_timeout)
+        driver.set_script_timeout(self.page_timeout)
+        with self._cond:
+            self._pages[id(driver)] = 0
+            self._counters["created"] += 1
+        return driver
+
+    def _destroy(self, driver, counter):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._cond:
+            self._pages.pop(id(driver), None)
+            self._created -= 1
+            self._counters[counter] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _is_healthy(driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    # --- API pública ---
+    def checkout(self, timeout=None):
+        """Presta un driver sano. Lanza BrowserPoolTimeout si no hay uno libre a tiempo."""
+        wait = self.checkout_timeout if timeout is None else timeout
+        requested = time.monotonic()
+        deadline = requested + wait
+        while True:
+            with self._cond:
+                while not self._idle and self._created >= self.size:
+                    if self._closed:
+                        raise BrowserPoolTimeout("El pool de navegadores está cerrado.")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise BrowserPoolTimeout(f"Sin navegador libre tras {wait}s (pool de {self.size}).")
+                    self._cond.wait(remaining)
+                if self._closed:
+                    raise BrowserPoolTimeout("El pool de navegadores está cerrado.")
+                driver = self._idle.pop() if self._idle else None
+                if driver is None:
+                    self._created += 1
+                self._counters["checkouts"] += 1
+            if driver is None:
+                try:
+                    driver = self._new_driver()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+                BROWSER_CHECKOUT_SECONDS.observe(time.monotonic() - requested)
+                return driver
+            if self._is_healthy(driver):
+                BROWSER_CHECKOUT_SECONDS.observe(time.monotonic() - requested)
+                return driver
+            self._destroy(driver, "discarded")
+
+    def checkin(self, driver, pages=1, discard=False):
+        """Devuelve un driver. discard=True lo cierra (p.ej. tras un error de WebDriver)."""
+        if driver is None:
+            return
+        with self._cond:
+            served = self._pages.get(id(driver), 0) + pages
+            self._pages[id(driver)] = served
+            closed = self._closed
+        if discard or closed:
+            self._destroy(driver, "discarded")
+            return
+        if served >= self.max_pages:
+            self._destroy(driver, "recycled")
+            return
+        try:
+            # Suelta la página anterior para no retener su memoria mientras está libre
+            driver.get("about:blank")
+        except Exception:
+            self._destroy(driver, "discarded")
+            return
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    @contextmanager
+    def driver(self, pages=1, timeout=None):
+        """with pool.driver() as driver: ... (descarta el driver si falla WebDriver)."""
+        drv = self.checkout(timeout)
+        discard = False
+        try:
+            yield drv
+        except WebDriverException:
+            discard = True
+            raise
+        finally:
+            self.checkin(drv, pages=pages, discard=discard)
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters, size=self.size, alive=self._created,
+                        idle=len(self._idle), in_use=self._created - len(self._idle))
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for driver in idle:
+            self._destroy(driver, "discarded")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Pool compartido por proceso: lo usa todo lo que importa modules.estudio_scraper (app.py, streamlit_app*.py, bulk_analysis.py)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool(
+                    size=_env_int("BROWSER_POOL_SIZE", 2),
+                    max_pages=_env_int("BROWSER_POOL_MAX_PAGES", 40),
+                    page_timeout=_env_int("BROWSER_POOL_PAGE_TIMEOUT", 20),
+                    checkout_timeout=_env_int("BROWSER_POOL_CHECKOUT_TIMEOUT", 30),
+                )
+                atexit.register(_pool.shutdown)
+    return _pool
+
+
+# /metrics lee el pool solo si ya existe: pedir las métricas no arranca ningún Chrome
+register_stats_collector("browser_pool", lambda: _pool.stats() if _pool is not None else None,
+                         counters=("created", "recycled", "discarded", "checkouts", "timeouts"),
+                         gauges=("size", "alive", "idle", "in_use"))
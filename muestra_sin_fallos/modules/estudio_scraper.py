@@ -4,28 +4,44 @@ from modules.analisis_reciente import analizar_rendimiento_reciente_con_handicap
 from modules.analisis_rivales import analizar_rivales_comunes, analizar_contra_rival_del_rival
 from modules.funciones_resumen import generar_resumen_rendimiento_reciente
 from modules.funciones_auxiliares import _calcular_estadisticas_contra_rival, _analizar_over_under, _analizar_ah_cubierto, _analizar_desempeno_casa_fuera
+import logging
 import time
 import re
 import math
+import sqlite3
 from bs4 import BeautifulSoup
 import pandas as pd
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from modules.utils import parse_ah_to_number_of, format_ah_as_decimal_string_of, check_handicap_cover, check_goal_line_cover, get_match_details_from_row_of, extract_final_score_of
 import asyncio
 import aiohttp
 import os
+from modules.h2h_page import ensure_h2h_page
+from modules.browser_pool import BrowserPoolTimeout, get_browser_pool
+from modules.http_client import http_get_text, aio_get_text, build_aiohttp_session, HTTP_POOL_MAXSIZE
+from modules.page_cache import is_finished_match_page, match_state_of
+from modules.stats_store import get_stats_store
+from modules.results_warehouse import get_results_warehouse
+from modules.parse_pool import run_parse, run_parse_async
+from modules.stage_graph import StageGraph
+from modules.tracing import span, trace, traced
+from modules.metrics import counter, histogram
+from modules.analysis_layers import get_layer_cache
+
+logger = logging.getLogger(__name__)
 
 BASE_URL_OF = "https://live18.nowgoal25.com"
 SELENIUM_TIMEOUT_SECONDS_OF = 10
+HTTP_TIMEOUT_SECONDS_OF = 15
+# Motor para descargar la página h2h: "http" (solo requests), "selenium", "auto" (http con respaldo Selenium) o "async" (aiohttp)
+H2H_ENGINE_OF = os.environ.get("ESTUDIO_H2H_ENGINE", "auto").strip().lower()
+H2H_ENGINES_OF = ("auto", "http", "selenium", "async")
 PLACEHOLDER_NODATA = "*(No disponible)*"
 
 def parse_ah_to_number_of(ah_line_str: str):
@@ -214,6 +230,7 @@ def _analizar_precedente_goles(precedente_data, goles_actual_num):
     except (ValueError, TypeError):
         return "<li><span class='score-value'>Goles:</span> No se pudo procesar el resultado del precedente.</li>"
 
+@traced()
 def generar_analisis_completo_mercado(main_odds, h2h_data, home_name, away_name):
     ah_actual_str = format_ah_as_decimal_string_of(main_odds.get('ah_linea_raw', '-'))
     ah_actual_num = parse_ah_to_number_of(ah_actual_str)
@@ -433,89 +450,145 @@ def _colorear_stats(val1_str, val2_str):
 
 def get_match_progression_stats_data(match_id: str) -> pd.DataFrame | None:
     if not match_id or not match_id.isdigit(): return None
+    stats_store = get_stats_store()
+    if stats_store is not None and (stored := stats_store.get(match_id)) is not None:
+        return stored
+    return _descargar_estadisticas_progresion_of(match_id)
+
+def _descargar_estadisticas_progresion_of(match_id):
+    """Descarga y parsea live-{id}; si el partido ha terminado, lo deja en el almacén de estadísticas."""
+    if not match_id or not str(match_id).isdigit(): return None
     url = f"{BASE_URL_OF}/match/live-{match_id}"
     try:
-        session = requests.Session()
-        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retries)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        session.headers.update({"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"})
-        response = session.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'lxml')
-        
-        # Definir el orden específico de las estadísticas (sin Yellow Cards)
-        stat_order = ["Corners", "Shots", "Shots on Goal", "Attacks", "Dangerous Attacks", "Red Cards"]
-        stat_titles = {stat: "-" for stat in stat_order}
-        
-        team_tech_div = soup.find('div', id='teamTechDiv_detail')
-        if team_tech_div and (stat_list := team_tech_div.find('ul', class_='stat')):
-            for li in stat_list.find_all('li'):
-                if (title_span := li.find('span', class_='stat-title')) and (stat_title := title_span.get_text(strip=True)) in stat_titles:
-                    values = [v.get_text(strip=True) for v in li.find_all('span', class_='stat-c')]
-                    if len(values) == 2:
-                        home_val, away_val = _colorear_stats(values[0], values[1])
-                        stat_titles[stat_title] = {"Home": home_val, "Away": away_val}
-        
-        # Si no encontramos las tarjetas rojas en la sección principal, las buscamos en la sección de eventos
-        if stat_titles["Red Cards"] == "-":
-            red_cards = {"Home": 0, "Away": 0}
-            events_table = soup.find('table', id='eventsTable')
-            if events_table:
-                # Buscar imágenes de tarjetas rojas
-                red_card_images = events_table.find_all('img', alt='Red Card')
-                for img in red_card_images:
-                    # Determinar si es para el equipo local o visitante basado en la estructura de la tabla
-                    parent_td = img.find_parent('td')
-                    if parent_td:
-                        # Si el td tiene style="text-align: right;", es para el equipo local
-                        if "text-align: right;" in parent_td.get('style', ''):
-                            red_cards["Home"] += 1
-                        # Si el td tiene style="text-align: left;", es para el equipo visitante
-                        elif "text-align: left;" in parent_td.get('style', ''):
-                            red_cards["Away"] += 1
-            stat_titles["Red Cards"] = red_cards
-            
-        # Eliminamos la extracción de tarjetas amarillas según solicitud
-        # Pasamos directamente a procesar Red Cards
-            
-        # Crear las filas respetando el orden definido
-        table_rows = []
-        for stat_name in stat_order:
-            vals = stat_titles[stat_name]
-            if isinstance(vals, dict):
-                table_rows.append({
-                    "Estadistica_EN": stat_name,
-                    "Casa": vals.get('Home', '-'),
-                    "Fuera": vals.get('Away', '-')
-                })
-        
-        df = pd.DataFrame(table_rows)
-        return df.set_index("Estadistica_EN") if not df.empty else df
+        html = http_get_text(url, timeout=10)
     except requests.RequestException:
         return None
-
+    df = run_parse(parse_match_progression_stats_html, html)
+    _guardar_estadisticas_progresion_of(match_id, html, df)
+    return df
+
+def _guardar_estadisticas_progresion_of(match_id, html, df):
+    if not is_finished_match_page(html):
+        return
+    stats_store = get_stats_store()
+    if stats_store is not None:
+        stats_store.put(match_id, df)
+    warehouse = get_results_warehouse()
+    if warehouse is not None:
+        try:
+            warehouse.ingest_stats(match_id, df)
+        except sqlite3.Error as exc:
+            logger.warning("[warehouse] No se pudieron guardar las estadísticas de %s: %s", match_id, exc)
+
+def _historial_pagina_of(pagina):
+    """Partidos terminados de table_v1/v2/v3 como dicts planos, para el almacén de resultados."""
+    return [{**row.details, "league": row.league}
+            for table in (1, 2, 3) for row in pagina.rows(table) if row.details and row.match_id]
+
+def _archivar_historial_of(historial):
+    """Guarda en el almacén de resultados los partidos históricos de la página h2h."""
+    warehouse = get_results_warehouse()
+    if warehouse is None or not historial:
+        return
+    try:
+        warehouse.ingest_h2h_rows(historial)
+    except sqlite3.Error as exc:
+        logger.warning("[warehouse] No se pudo archivar el historial: %s", exc)
+
+def _estadisticas_guardadas_of(ids_por_clave):
+    """{clave: DataFrame} de las estadísticas ya guardadas, con una sola consulta al almacén."""
+    stats_store = get_stats_store()
+    if stats_store is None:
+        return {}
+    stored = stats_store.get_many(match_id for match_id in ids_por_clave.values() if match_id)
+    return {key: stored[str(match_id)] for key, match_id in ids_por_clave.items() if match_id and str(match_id) in stored}
+
+def get_match_progression_stats_bulk_of(match_ids) -> dict:
+    """
+    Estadísticas de progresión de varios partidos: {match_id: DataFrame o None}.
+    Consulta el almacén de una vez y solo descarga (en paralelo) los IDs que faltan.
+    """
+    ids = [str(m) for m in dict.fromkeys(match_ids) if m and str(m).isdigit()]
+    found = _estadisticas_guardadas_of({m: m for m in ids})
+    missing = [m for m in ids if m not in found]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(len(missing), HTTP_POOL_MAXSIZE)) as executor:
+            found.update(zip(missing, executor.map(_descargar_estadisticas_progresion_of, missing)))
+    return found
+
+def parse_match_progression_stats_html(html_text: str) -> pd.DataFrame:
+    """Paso de parseo de get_match_progression_stats_data (página live-{id} ya descargada)."""
+    soup = BeautifulSoup(html_text, 'lxml')
+
+    # Definir el orden específico de las estadísticas (sin Yellow Cards)
+    stat_order = ["Corners", "Shots", "Shots on Goal", "Attacks", "Dangerous Attacks", "Red Cards"]
+    stat_titles = {stat: "-" for stat in stat_order}
+
+    team_tech_div = soup.find('div', id='teamTechDiv_detail')
+    if team_tech_div and (stat_list := team_tech_div.find('ul', class_='stat')):
+        for li in stat_list.find_all('li'):
+            if (title_span := li.find('span', class_='stat-title')) and (stat_title := title_span.get_text(strip=True)) in stat_titles:
+                values = [v.get_text(strip=True) for v in li.find_all('span', class_='stat-c')]
+                if len(values) == 2:
+                    home_val, away_val = _colorear_stats(values[0], values[1])
+                    stat_titles[stat_title] = {"Home": home_val, "Away": away_val}
+
+    # Si no encontramos las tarjetas rojas en la sección principal, las buscamos en la sección de eventos
+    if stat_titles["Red Cards"] == "-":
+        red_cards = {"Home": 0, "Away": 0}
+        events_table = soup.find('table', id='eventsTable')
+        if events_table:
+            # Buscar imágenes de tarjetas rojas
+            red_card_images = events_table.find_all('img', alt='Red Card')
+            for img in red_card_images:
+                # Determinar si es para el equipo local o visitante basado en la estructura de la tabla
+                parent_td = img.find_parent('td')
+                if parent_td:
+                    # Si el td tiene style="text-align: right;", es para el equipo local
+                    if "text-align: right;" in parent_td.get('style', ''):
+                        red_cards["Home"] += 1
+                    # Si el td tiene style="text-align: left;", es para el equipo visitante
+                    elif "text-align: left;" in parent_td.get('style', ''):
+                        red_cards["Away"] += 1
+        stat_titles["Red Cards"] = red_cards
+
+    # Eliminamos la extracción de tarjetas amarillas según solicitud
+    # Pasamos directamente a procesar Red Cards
+
+    # Crear las filas respetando el orden definido
+    table_rows = []
+    for stat_name in stat_order:
+        vals = stat_titles[stat_name]
+        if isinstance(vals, dict):
+            table_rows.append({
+                "Estadistica_EN": stat_name,
+                "Casa": vals.get('Home', '-'),
+                "Fuera": vals.get('Away', '-')
+            })
+
+    df = pd.DataFrame(table_rows)
+    return df.set_index("Estadistica_EN") if not df.empty else df
+
+@traced()
 def get_rival_a_for_original_h2h_of(soup, league_id=None):
-    if not soup or not (table := soup.find("table", id="table_v1")): return None, None, None
-    for row in table.find_all("tr", id=re.compile(r"tr1_\d+")):
-        if league_id and row.get("name") != str(league_id):
+    if not soup or not (page := ensure_h2h_page(soup)).has_table(1): return None, None, None
+    for row in page.rows(1):
+        if league_id and row.league_id != str(league_id):
             continue
-        if row.get("vs") == "1" and (key_id := row.get("index")):
-            onclicks = row.find_all("a", onclick=True)
-            if len(onclicks) > 1 and (rival_tag := onclicks[1]) and (rival_id_match := re.search(r"team\((\d+)\)", rival_tag.get("onclick", ""))):
-                return key_id, rival_id_match.group(1), rival_tag.text.strip()
+        if row.vs == "1" and (key_id := row.match_id):
+            if len(row.links) > 1 and (rival_id := row.links[1][0]):
+                return key_id, rival_id, row.links[1][1]
     return None, None, None
 
+@traced()
 def get_rival_b_for_original_h2h_of(soup, league_id=None):
-    if not soup or not (table := soup.find("table", id="table_v2")): return None, None, None
-    for row in table.find_all("tr", id=re.compile(r"tr2_\d+")):
-        if league_id and row.get("name") != str(league_id):
+    if not soup or not (page := ensure_h2h_page(soup)).has_table(2): return None, None, None
+    for row in page.rows(2):
+        if league_id and row.league_id != str(league_id):
             continue
-        if row.get("vs") == "1" and (key_id := row.get("index")):
-            onclicks = row.find_all("a", onclick=True)
-            if len(onclicks) > 0 and (rival_tag := onclicks[0]) and (rival_id_match := re.search(r"team\((\d+)\)", rival_tag.get("onclick", ""))):
-                return key_id, rival_id_match.group(1), rival_tag.text.strip()
+        if row.vs == "1" and (key_id := row.match_id):
+            if len(row.links) > 0 and (rival_id := row.links[0][0]):
+                return key_id, rival_id, row.links[0][1]
     return None, None, None
 
 def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B"):
@@ -533,39 +606,83 @@ def get_h2h_details_for_original_logic_of(driver, key_match_id, rival_a_id, riva
         soup = BeautifulSoup(driver.page_source, "lxml")
     except Exception as e:
         return {"status": "error", "resultado": f"N/A (Error Selenium en H2H Col3: {type(e).__name__})"}
-    if not (table := soup.find("table", id="table_v2")):
+    return extract_h2h_col3_details_of(soup, rival_a_id, rival_b_id, rival_a_name, rival_b_name)
+
+@traced()
+def extract_h2h_col3_details_of(soup, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B"):
+    """Busca el enfrentamiento directo entre los dos rivales en la tabla_v2 de la página h2h del partido clave."""
+    if not (page := ensure_h2h_page(soup)).has_table(2):
         return {"status": "error", "resultado": "N/A (Tabla H2H Col3 no encontrada)"}
-    for row in table.find_all("tr", id=re.compile(r"tr2_\d+")):
-        links = row.find_all("a", onclick=True)
+    for row in page.rows(2):
+        links = row.links
         if len(links) < 2: continue
-        h_id_m = re.search(r"team\((\d+)\)", links[0].get("onclick", "")); a_id_m = re.search(r"team\((\d+)\)", links[1].get("onclick", ""))
-        if not (h_id_m and a_id_m): continue
-        h_id, a_id = h_id_m.group(1), a_id_m.group(1)
+        h_id, a_id = links[0][0], links[1][0]
+        if not (h_id and a_id): continue
         if {h_id, a_id} == {str(rival_a_id), str(rival_b_id)}:
-            if not (score_span := row.find("span", class_="fscore_2")) or "-" not in score_span.text: continue
-            score = score_span.text.strip().split("(")[0].strip()
+            if row.score_text is None or "-" not in row.score_text: continue
+            score = row.score_text.split("(")[0].strip()
             g_h, g_a = score.split("-", 1)
-            tds = row.find_all("td")
-            handicap_raw = "N/A"
-            if len(tds) > 11:
-                cell = tds[11]
-                handicap_raw = (cell.get("data-o") or cell.text).strip() or "N/A"
-            # Intentar extraer la fecha de la segunda columna (si existe)
-            date_txt = None
-            try:
-                if len(tds) > 1:
-                    date_span = tds[1].find('span', attrs={'name': 'timeData'})
-                    date_txt = date_span.get_text(strip=True) if date_span else None
-            except Exception:
-                date_txt = None
+            handicap_raw = row.ah_raw or "N/A"
             return {
                 "status": "found", "goles_home": g_h.strip(), "goles_away": g_a.strip(),
-                "handicap_line_raw": handicap_raw, "match_id": row.get('index'),
-                "h2h_home_team_name": links[0].text.strip(), "h2h_away_team_name": links[1].text.strip(),
-                "date": date_txt
+                "handicap_line_raw": handicap_raw, "match_id": row.match_id,
+                "h2h_home_team_name": links[0][1], "h2h_away_team_name": links[1][1],
+                "date": row.date
             }
     return {"status": "not_found", "resultado": f"H2H directo no encontrado para {rival_a_name} vs {rival_b_name}."}
 
+def _h2h_selects_are_bet365_of(soup):
+    """
+    En el HTML estático de h2h-{id} las filas de table_v1/v2/v3 ya vienen con las cuotas de
+    la primera opción de hSelect_1/2/3. El flujo Selenium solo fuerza el valor "8" (Bet365),
+    así que la página sirve tal cual si esa primera opción (o la marcada) es "8".
+    """
+    for select_id in ("hSelect_1", "hSelect_2", "hSelect_3"):
+        if not (select := soup.find("select", id=select_id)):
+            continue
+        option = select.find("option", selected=True) or select.find("option")
+        if option is None or option.get("value") != "8":
+            return False
+    return True
+
+def _h2h_page_usable_without_browser_of(soup):
+    """La página estática trae table_v1 y las cuotas por defecto son las de Bet365."""
+    return bool(soup.find("table", id="table_v1")) and _h2h_selects_are_bet365_of(soup)
+
+def fetch_h2h_html_http_of(match_id):
+    """HTML crudo de h2h-{match_id} descargado con requests, o None si falla la descarga."""
+    try:
+        return http_get_text(f"{BASE_URL_OF}/match/h2h-{match_id}", timeout=HTTP_TIMEOUT_SECONDS_OF)
+    except requests.RequestException:
+        return None
+
+def fetch_h2h_soup_http_of(match_id):
+    """
+    Descarga h2h-{match_id} solo con requests. Devuelve el BeautifulSoup equivalente al
+    driver.page_source del flujo Selenium, o None si la página no trae table_v1 o las
+    cuotas por defecto no son las de Bet365 (en ese caso hace falta el navegador).
+    """
+    if (html := fetch_h2h_html_http_of(match_id)) is None:
+        return None
+    soup = BeautifulSoup(html, "lxml")
+    return soup if _h2h_page_usable_without_browser_of(soup) else None
+
+def analizar_html_h2h_col3_of(html, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B"):
+    """Paso de parseo de H2H Col3 (HTML de h2h-{partido clave} ya descargado). Apto para el pool de procesos."""
+    soup = BeautifulSoup(html, "lxml")
+    if not _h2h_page_usable_without_browser_of(soup) or not soup.find("table", id="table_v2"):
+        return {"status": "error", "resultado": "N/A (Error HTTP en H2H Col3)"}
+    return extract_h2h_col3_details_of(soup, rival_a_id, rival_b_id, rival_a_name, rival_b_name)
+
+def get_h2h_details_http_of(key_match_id, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B"):
+    """Versión sin navegador de get_h2h_details_for_original_logic_of."""
+    if not all([key_match_id, rival_a_id, rival_b_id]):
+        return {"status": "error", "resultado": "N/A (Datos incompletos para H2H)"}
+    if (html := fetch_h2h_html_http_of(key_match_id)) is None:
+        return {"status": "error", "resultado": "N/A (Error HTTP en H2H Col3)"}
+    return run_parse(analizar_html_h2h_col3_of, html, rival_a_id, rival_b_id, rival_a_name, rival_b_name)
+
+@traced()
 def get_team_league_info_from_script_of(soup):
     script_tag = soup.find("script", string=re.compile(r"var _matchInfo = "))
     if not (script_tag and script_tag.string): return (None,) * 3 + ("N/A",) * 3
@@ -581,6 +698,12 @@ def get_team_league_info_from_script_of(soup):
     league_name = find_val(r"lName:\s*'([^']*)'") or "N/A"
     return home_id, away_id, league_id, home_name, away_name, league_name
 
+def get_match_state_from_script_of(soup):
+    """Estado del partido según _matchInfo (-1 terminado, 0 sin empezar, 1-5 en juego) o None."""
+    script_tag = soup.find("script", string=re.compile(r"var _matchInfo = "))
+    if not (script_tag and script_tag.string): return None
+    return match_state_of(script_tag.string)
+
 def get_match_datetime_from_script_of(soup):
     """
     Extrae fecha/hora del partido desde el script _matchInfo si está disponible.
@@ -644,13 +767,11 @@ def _parse_date_ddmmyyyy(d: str) -> tuple:
     m = re.search(r'(\d{2})-(\d{2})-(\d{4})', d or '')
     return (int(m.group(3)), int(m.group(2)), int(m.group(1))) if m else (1900, 1, 1)
 
+@traced()
 def extract_last_match_in_league_of(soup, table_id, team_name, league_id, is_home_game):
-    if not soup or not (table := soup.find("table", id=table_id)): return None
+    if not soup or not (page := ensure_h2h_page(soup)).has_table(table_id): return None
     candidate_matches = []
-    score_selector = 'fscore_1' if is_home_game else 'fscore_2'
-    for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
-        if not (details := get_match_details_from_row_of(row, score_class_selector=score_selector, source_table_type='hist')):
-            continue
+    for details in page.details(table_id):
         if league_id and details.get("league_id_hist") != str(league_id):
             continue
         is_team_home = team_name.lower() in details.get('home', '').lower()
@@ -666,6 +787,7 @@ def extract_last_match_in_league_of(soup, table_id, team_name, league_id, is_hom
         "handicap_line_raw": last_match.get('ahLine_raw', 'N/A'), "match_id": last_match.get('matchIndex')
     }
 
+@traced()
 def extract_bet365_initial_odds_of(soup):
     odds_info = {
         "ah_home_cuota": "N/A", "ah_linea_raw": "N/A", "ah_away_cuota": "N/A",
@@ -684,6 +806,7 @@ def extract_bet365_initial_odds_of(soup):
         odds_info["goals_under_cuota"] = tds[10].get("data-o", tds[10].text).strip()
     return odds_info
 
+@traced()
 def extract_standings_data_from_h2h_page_of(soup, team_name):
     data = {"name": team_name, "ranking": "N/A", "total_pj": "N/A", "total_v": "N/A",
             "total_e": "N/A", "total_d": "N/A", "total_gf": "N/A", "total_gc": "N/A",
@@ -741,6 +864,7 @@ def extract_standings_data_from_h2h_page_of(soup, team_name):
                             "specific_d": d, "specific_gf": gf, "specific_gc": gc})
     return data
 
+@traced()
 def extract_over_under_stats_from_div_of(soup, team_type: str):
     default_stats = {"over_pct": 0, "under_pct": 0, "push_pct": 0, "total": 0}
     if not soup:
@@ -773,14 +897,14 @@ def extract_over_under_stats_from_div_of(soup, team_type: str):
         return default_stats
     return default_stats
 
+@traced()
 def extract_h2h_data_of(soup, home_name, away_name, league_id=None):
     results = {'ah1': '-', 'res1': '?:?', 'res1_raw': '?-?', 'match1_id': None, 'ah6': '-', 'res6': '?:?', 'res6_raw': '?-?', 'match6_id': None, 'h2h_gen_home': "Local (H2H Gen)", 'h2h_gen_away': "Visitante (H2H Gen)"}
-    if not soup or not home_name or not away_name or not (h2h_table := soup.find("table", id="table_v3")): return results
+    if not soup or not home_name or not away_name or not (page := ensure_h2h_page(soup)).has_table(3): return results
     all_matches = []
-    for r in h2h_table.find_all("tr", id=re.compile(r"tr3_\d+")):
-        if (d := get_match_details_from_row_of(r, score_class_selector='fscore_3', source_table_type='h2h')):
-            if not league_id or (d.get('league_id_hist') and d.get('league_id_hist') == str(league_id)):
-                all_matches.append(d)
+    for d in page.details(3):
+        if not league_id or (d.get('league_id_hist') and d.get('league_id_hist') == str(league_id)):
+            all_matches.append(d)
     if not all_matches: return results
     all_matches.sort(key=lambda x: _parse_date_ddmmyyyy(x.get('date', '')), reverse=True)
     most_recent = all_matches[0]
@@ -791,11 +915,10 @@ def extract_h2h_data_of(soup, home_name, away_name, league_id=None):
             break
     return results
 
+@traced()
 def extract_comparative_match_of(soup, table_id, main_team, opponent, league_id, is_home_table):
-    if not opponent or opponent == "N/A" or not main_team or not (table := soup.find("table", id=table_id)): return None
-    score_selector = 'fscore_1' if is_home_table else 'fscore_2'
-    for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
-        if not (details := get_match_details_from_row_of(row, score_class_selector=score_selector, source_table_type='hist')): continue
+    if not opponent or opponent == "N/A" or not main_team or not (page := ensure_h2h_page(soup)).has_table(table_id): return None
+    for details in page.details(table_id):
         if league_id and details.get('league_id_hist') and details.get('league_id_hist') != str(league_id): continue
         h, a = details.get('home','').lower(), details.get('away','').lower()
         main, opp = main_team.lower(), opponent.lower()
@@ -803,6 +926,7 @@ def extract_comparative_match_of(soup, table_id, main_team, opponent, league_id,
             return {"score": details.get('score', '?:?'), "ah_line": details.get('ahLine', '-'), "localia": 'H' if main == h else 'A', "home_team": details.get('home'), "away_team": details.get('away'), "match_id": details.get('matchIndex')}
     return None
 
+@traced()
 def extract_indirect_comparison_data(soup):
     """
     Extrae los datos de los dos paneles de Comparativas Indirectas.
@@ -865,745 +989,782 @@ def extract_indirect_comparison_data(soup):
 
 # --- FUNCIÓN PRINCIPAL DE EXTRACCIÓN ---
 
-async def obtener_datos_completos_partido_async(match_id: str, soup_completo: BeautifulSoup):
+def _extraer_datos_pagina_principal_of(match_id, soup_completo):
     """
-    Función ASÍNCRONA que recibe el soup principal y orquesta las peticiones secundarias.
+    Parte de CPU previa a la red: todo lo que sale de la página h2h del partido.
+    Devuelve (datos, ctx); ctx guarda lo que necesitan las fases siguientes
+    (H2H Col3, IDs de estadísticas y análisis finales).
     """
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"}
-    async with aiohttp.ClientSession(headers=headers) as session:
-
-        datos = {"match_id": match_id}
-        datos['final_score'] = extract_final_score_of(soup_completo)
-
-        home_id, away_id, league_id, home_name, away_name, league_name = get_team_league_info_from_script_of(soup_completo)
-        dt_info = get_match_datetime_from_script_of(soup_completo)
-        datos.update({
-            "home_name": home_name, "away_name": away_name, "league_name": league_name,
-            "match_date": dt_info.get("match_date"), "match_time": dt_info.get("match_time"),
-            "match_datetime": dt_info.get("match_datetime"),
-        })
-
-        # --- Recopilación de datos SINCRÓNICOS (del soup principal) ---
-        # Estos no hacen I/O y pueden ejecutarse directamente
-        home_standings = extract_standings_data_from_h2h_page_of(soup_completo, home_name)
-        away_standings = extract_standings_data_from_h2h_page_of(soup_completo, away_name)
-        home_ou_stats = extract_over_under_stats_from_div_of(soup_completo, 'home')
-        away_ou_stats = extract_over_under_stats_from_div_of(soup_completo, 'away')
-        main_match_odds_data = extract_bet365_initial_odds_of(soup_completo)
-        h2h_data = extract_h2h_data_of(soup_completo, home_name, away_name, None)
-        last_home_match = extract_last_match_in_league_of(soup_completo, "table_v1", home_name, league_id, True)
-        last_away_match = extract_last_match_in_league_of(soup_completo, "table_v2", away_name, league_id, False)
-        
-        datos.update({
-            "home_standings": home_standings, "away_standings": away_standings,
-            "home_ou_stats": home_ou_stats, "away_ou_stats": away_ou_stats,
-            "main_match_odds_data": main_match_odds_data, "h2h_data": h2h_data,
-        })
-
-        # --- Tareas CONCURRENTES (peticiones de red) ---
-        tasks = {}
-        
-        # Tarea para H2H Col3 (rivales comunes)
-        key_id_a, rival_a_id, rival_a_name = get_rival_a_for_original_h2h_of(soup_completo, league_id)
-        _, rival_b_id, rival_b_name = get_rival_b_for_original_h2h_of(soup_completo, league_id)
-        if key_id_a and rival_a_id and rival_b_id:
-            tasks['h2h_col3'] = asyncio.create_task(get_h2h_details_async(session, key_id_a, rival_a_id, rival_b_id, rival_a_name, rival_b_name))
-
-        # Tareas para estadísticas de progresión
-        match_ids_to_fetch = {
-            'last_home': (last_home_match or {}).get('match_id'),
-            'last_away': (last_away_match or {}).get('match_id'),
-            'h2h_stadium': h2h_data.get('match1_id'),
-            'h2h_general': h2h_data.get('match6_id'),
-        }
-        for key, m_id in match_ids_to_fetch.items():
-            if m_id:
-                tasks[f'stats_{key}'] = asyncio.create_task(get_match_progression_stats_data_async(session, m_id))
-
-        # Ejecutar todas las tareas de red en paralelo
-        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
-        results_map = dict(zip(tasks.keys(), results))
-
-        # --- Procesamiento de resultados ASÍNCRONOS ---
-        details_h2h_col3 = results_map.get('h2h_col3') if not isinstance(results_map.get('h2h_col3'), Exception) else {}
-        
-        # Añadir stats de H2H Col3 a las tareas de stats si existe
-        if details_h2h_col3 and details_h2h_col3.get('status') == 'found' and details_h2h_col3.get('match_id'):
-            stats_h2h_col3_df = await get_match_progression_stats_data_async(session, details_h2h_col3['match_id'])
-        else:
-            stats_h2h_col3_df = None
-
-        # --- Comparativas (dependen de los resultados anteriores) ---
-        comp_L_vs_UV_A = extract_comparative_match_of(soup_completo, "table_v1", home_name, (last_away_match or {}).get('home_team'), league_id, True)
-        comp_V_vs_UL_H = extract_comparative_match_of(soup_completo, "table_v2", away_name, (last_home_match or {}).get('away_team'), league_id, False)
+    # Índice de filas de table_v1/v2/v3: se recorre una sola vez y lo comparten todos los extractores
+    pagina_h2h = ensure_h2h_page(soup_completo)
+    datos = {"match_id": match_id}
+    datos['final_score'] = extract_final_score_of(soup_completo)
+
+    # --- Extracción de Datos Primarios ---
+    home_id, away_id, league_id, home_name, away_name, league_name = get_team_league_info_from_script_of(soup_completo)
+    # Fecha/hora del partido (si está en el script)
+    dt_info = get_match_datetime_from_script_of(soup_completo)
+    datos.update({
+        "home_name": home_name,
+        "away_name": away_name,
+        "league_name": league_name,
+        "match_date": dt_info.get("match_date"),
+        "match_time": dt_info.get("match_time"),
+        "match_datetime": dt_info.get("match_datetime"),
+        "match_state": get_match_state_from_script_of(soup_completo),
+    })
+
+    datos["home_standings"] = extract_standings_data_from_h2h_page_of(soup_completo, home_name)
+    datos["away_standings"] = extract_standings_data_from_h2h_page_of(soup_completo, away_name)
+    datos["home_ou_stats"] = extract_over_under_stats_from_div_of(soup_completo, 'home')
+    datos["away_ou_stats"] = extract_over_under_stats_from_div_of(soup_completo, 'away')
+    main_match_odds_data = extract_bet365_initial_odds_of(soup_completo)
+    h2h_data = extract_h2h_data_of(pagina_h2h, home_name, away_name, None)
+    datos["main_match_odds_data"] = main_match_odds_data
+    datos["h2h_data"] = h2h_data
+    last_home_match = extract_last_match_in_league_of(pagina_h2h, "table_v1", home_name, league_id, True)
+    last_away_match = extract_last_match_in_league_of(pagina_h2h, "table_v2", away_name, league_id, False)
+
+    # Parámetros de H2H Col3 (requiere descargar otra página h2h)
+    key_id_a, rival_a_id, rival_a_name = get_rival_a_for_original_h2h_of(pagina_h2h, league_id)
+    _, rival_b_id, rival_b_name = get_rival_b_for_original_h2h_of(pagina_h2h, league_id)
+
+    # --- Comparativas (dependen de los resultados anteriores) ---
+    comp_L_vs_UV_A = extract_comparative_match_of(pagina_h2h, "table_v1", home_name, (last_away_match or {}).get('home_team'), league_id, True)
+    comp_V_vs_UL_H = extract_comparative_match_of(pagina_h2h, "table_v2", away_name, (last_home_match or {}).get('away_team'), league_id, False)
+
+    # --- Generar Análisis de Mercado ---
+    datos["market_analysis_html"] = generar_analisis_completo_mercado(main_match_odds_data, h2h_data, home_name, away_name)
+
+    # --- Estructurar datos para la plantilla ---
+    datos["main_match_odds"] = {
+        "ah_linea": format_ah_as_decimal_string_of(main_match_odds_data.get('ah_linea_raw', '?')),
+        "goals_linea": format_ah_as_decimal_string_of(main_match_odds_data.get('goals_linea_raw', '?'))
+    }
 
-        # --- Generar Análisis de Mercado ---
-        datos["market_analysis_html"] = generar_analisis_completo_mercado(main_match_odds_data, h2h_data, home_name, away_name)
+    ctx = {
+        "soup": soup_completo, "pagina": pagina_h2h, "league_id": league_id,
+        "home_name": home_name, "away_name": away_name,
+        "main_match_odds_data": main_match_odds_data, "h2h_data": h2h_data,
+        "last_home_match": last_home_match, "last_away_match": last_away_match,
+        "comp_L_vs_UV_A": comp_L_vs_UV_A, "comp_V_vs_UL_H": comp_V_vs_UL_H,
+        "col3_args": (key_id_a, rival_a_id, rival_b_id, rival_a_name, rival_b_name),
+    }
+    return datos, ctx
 
-        datos["main_match_odds"] = {
-            "ah_linea": format_ah_as_decimal_string_of(main_match_odds_data.get('ah_linea_raw', '?')),
-            "goals_linea": format_ah_as_decimal_string_of(main_match_odds_data.get('goals_linea_raw', '?'))
-        }
+def _ids_estadisticas_of(ctx):
+    """IDs de partidos históricos cuyas estadísticas de progresión hay que descargar (sin H2H Col3)."""
+    h2h_data = ctx["h2h_data"]
+    return {
+        'last_home': (ctx["last_home_match"] or {}).get('match_id'),
+        'last_away': (ctx["last_away_match"] or {}).get('match_id'),
+        'comp_L_vs_UV_A': (ctx["comp_L_vs_UV_A"] or {}).get('match_id'),
+        'comp_V_vs_UL_H': (ctx["comp_V_vs_UL_H"] or {}).get('match_id'),
+        'h2h_stadium': h2h_data.get('match1_id'),
+        'h2h_general': h2h_data.get('match6_id')
+    }
 
-        # Empaquetar todo en el diccionario de datos final
-        datos['last_home_match'] = {'details': last_home_match, 'stats': results_map.get('stats_last_home')}
-        datos['last_away_match'] = {'details': last_away_match, 'stats': results_map.get('stats_last_away')}
-        datos['h2h_col3'] = {'details': details_h2h_col3, 'stats': stats_h2h_col3_df}
-        datos['comp_L_vs_UV_A'] = {'details': comp_L_vs_UV_A, 'stats': await get_match_progression_stats_data_async(session, (comp_L_vs_UV_A or {}).get('match_id'))}
-        datos['comp_V_vs_UL_H'] = {'details': comp_V_vs_UL_H, 'stats': await get_match_progression_stats_data_async(session, (comp_V_vs_UL_H or {}).get('match_id'))}
-        datos['h2h_stadium'] = {'details': h2h_data, 'stats': results_map.get('stats_h2h_stadium')}
-        datos['h2h_general'] = {'details': h2h_data, 'stats': results_map.get('stats_h2h_general')}
-
-        # El resto de análisis que dependen de soup_completo
-        indirect_comparison_data = extract_indirect_comparison_data(soup_completo)
-        datos["advanced_analysis_html"] = generar_analisis_comparativas_indirectas(indirect_comparison_data)
-        current_ah_line = parse_ah_to_number_of(main_match_odds_data.get('ah_linea_raw', '0'))
-        datos["rendimiento_local_handicap"] = analizar_rendimiento_reciente_con_handicap(soup_completo, home_name, True)
-        datos["rendimiento_visitante_handicap"] = analizar_rendimiento_reciente_con_handicap(soup_completo, away_name, False)
-        if current_ah_line is not None:
-            datos["comparacion_lineas_local"] = comparar_lineas_handicap_recientes(soup_completo, home_name, current_ah_line, True)
-            datos["comparacion_lineas_visitante"] = comparar_lineas_handicap_recientes(soup_completo, away_name, current_ah_line, False)
-        datos["rivales_comunes"] = analizar_rivales_comunes(soup_completo, home_name, away_name)
-        rival_local_rival = (last_away_match or {}).get('home_team', 'N/A')
-        rival_visitante_rival = (last_home_match or {}).get('away_team', 'N/A')
-        if rival_local_rival != 'N/A' and rival_visitante_rival != 'N/A':
-            datos["analisis_contra_rival_del_rival"] = analizar_contra_rival_del_rival(soup_completo, home_name, away_name, rival_local_rival, rival_visitante_rival)
-        datos["resumen_rendimiento_reciente"] = generar_resumen_rendimiento_reciente(soup_completo, home_name, away_name, current_ah_line)
-
-        # Adjuntar funciones auxiliares para la plantilla
-        from modules.funciones_auxiliares import _calcular_estadisticas_contra_rival, _analizar_over_under, _analizar_ah_cubierto, _analizar_desempeno_casa_fuera, _contar_victorias_h2h, _analizar_over_under_h2h, _contar_over_h2h, _contar_victorias_h2h_general
-        datos.update({
-            "_calcular_estadisticas_contra_rival": _calcular_estadisticas_contra_rival, "_analizar_over_under": _analizar_over_under,
-            "_analizar_ah_cubierto": _analizar_ah_cubierto, "_analizar_desempeno_casa_fuera": _analizar_desempeno_casa_fuera,
-            "_contar_victorias_h2h": _contar_victorias_h2h, "_analizar_over_under_h2h": _analizar_over_under_h2h,
-            "_contar_over_h2h": _contar_over_h2h, "_contar_victorias_h2h_general": _contar_victorias_h2h_general
-        })
-        
-        return datos
+def _analizar_pagina_principal_of(datos, ctx):
+    """Analizadores que solo dependen de la página h2h principal (no esperan a la red)."""
+    pagina_h2h = ctx["pagina"]
+    home_name, away_name = ctx["home_name"], ctx["away_name"]
+    last_home_match, last_away_match = ctx["last_home_match"], ctx["last_away_match"]
 
-async def get_h2h_details_async(session: aiohttp.ClientSession, key_match_id, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B"):
-    if not all([key_match_id, rival_a_id, rival_b_id]):
-        return {"status": "error", "resultado": "N/A (Datos incompletos para H2H)"}
+    # --- ANÁLISIS AVANZADO DE COMPARATIVAS INDIRECTAS ---
+    # Extraer los datos de las comparativas indirectas
+    indirect_comparison_data = ctx["indirect_comparison_data"] = extract_indirect_comparison_data(ctx["soup"])
     
-    url = f"{BASE_URL_OF}/match/h2h-{key_match_id}"
-    try:
-        async with session.get(url, timeout=10) as response:
-            response.raise_for_status()
-            html = await response.text()
-        soup = BeautifulSoup(html, "lxml")
-    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-        return {"status": "error", "resultado": f"N/A (Error de red en H2H Col3: {type(e).__name__})"}
-
-    if not (table := soup.find("table", id="table_v2")):
-        return {"status": "error", "resultado": "N/A (Tabla H2H Col3 no encontrada)"}
-
-    for row in table.find_all("tr", id=re.compile(r"tr2_\d+")):
-        links = row.find_all("a", onclick=True)
-        if len(links) < 2: continue
-        h_id_m = re.search(r"team\((\d+)\)", links[0].get("onclick", "")); a_id_m = re.search(r"team\((\d+)\)", links[1].get("onclick", ""))
-        if not (h_id_m and a_id_m): continue
-        h_id, a_id = h_id_m.group(1), a_id_m.group(1)
-        if {h_id, a_id} == {str(rival_a_id), str(rival_b_id)}:
-            if not (score_span := row.find("span", class_="fscore_2")) or "-" not in score_span.text: continue
-            score = score_span.text.strip().split("(")[0].strip()
-            g_h, g_a = score.split("-", 1)
-            tds = row.find_all("td")
-            handicap_raw = "N/A"
-            if len(tds) > 11:
-                cell = tds[11]
-                handicap_raw = (cell.get("data-o") or cell.text).strip() or "N/A"
-            date_txt = None
-            try:
-                if len(tds) > 1:
-                    date_span = tds[1].find('span', attrs={'name': 'timeData'})
-                    date_txt = date_span.get_text(strip=True) if date_span else None
-            except Exception:
-                date_txt = None
-            return {
-                "status": "found", "goles_home": g_h.strip(), "goles_away": g_a.strip(),
-                "handicap_line_raw": handicap_raw, "match_id": row.get('index'),
-                "h2h_home_team_name": links[0].text.strip(), "h2h_away_team_name": links[1].text.strip(),
-                "date": date_txt
-            }
-    return {"status": "not_found", "resultado": f"H2H directo no encontrado para {rival_a_name} vs {rival_b_name}."}
+    # Generar la nota de análisis
+    datos["advanced_analysis_html"] = generar_analisis_comparativas_indirectas(indirect_comparison_data)
+    
+    # --- ANÁLISIS RECIENTE CON HANDICAP ---
+    # Obtener la línea de handicap actual
+    current_ah_line = parse_ah_to_number_of(ctx["main_match_odds_data"].get('ah_linea_raw', '0'))
+    
+    # Analizar rendimiento reciente con handicap para equipo local
+    datos["rendimiento_local_handicap"] = analizar_rendimiento_reciente_con_handicap(pagina_h2h, home_name, True)
+    
+    # Analizar rendimiento reciente con handicap para equipo visitante
+    datos["rendimiento_visitante_handicap"] = analizar_rendimiento_reciente_con_handicap(pagina_h2h, away_name, False)
+    
+    # Comparar líneas de handicap recientes con la línea actual
+    if current_ah_line is not None:
+        datos["comparacion_lineas_local"] = comparar_lineas_handicap_recientes(pagina_h2h, home_name, current_ah_line, True)
+        datos["comparacion_lineas_visitante"] = comparar_lineas_handicap_recientes(pagina_h2h, away_name, current_ah_line, False)
+    
+    # --- ANÁLISIS DE RIVALES COMUNES ---
+    datos["rivales_comunes"] = analizar_rivales_comunes(pagina_h2h, home_name, away_name)
+    
+    # --- ANÁLISIS CONTRA RIVAL DEL RIVAL ---
+    # Obtener información de los rivales de los rivales
+    rival_local_rival = (last_away_match or {}).get('home_team', 'N/A')
+    rival_visitante_rival = (last_home_match or {}).get('away_team', 'N/A')
+    
+    if rival_local_rival != 'N/A' and rival_visitante_rival != 'N/A':
+        datos["analisis_contra_rival_del_rival"] = analizar_contra_rival_del_rival(
+            pagina_h2h, home_name, away_name, rival_local_rival, rival_visitante_rival
+        )
+    
+    # --- ANÁLISIS DE RENDIMIENTO RECIENTE Y COMPARATIVAS INDIRECTAS ---
+    # Generar resumen gráfico de rendimiento reciente y comparativas indirectas
+    datos["resumen_rendimiento_reciente"] = generar_resumen_rendimiento_reciente(pagina_h2h, home_name, away_name, current_ah_line)
+    return datos
 
-def obtener_datos_completos_partido(match_id: str):
+def analizar_html_h2h_of(match_id, html, requiere_pagina_estatica=True):
     """
-    Función principal que orquesta todo el scraping y análisis para un ID de partido.
-    Usa Selenium para la carga inicial y luego delega a una función async para las peticiones en paralelo.
+    Etapa de parseo del análisis completo: HTML crudo de h2h-{match_id} -> dict plano.
+    Incluye todo el trabajo de BeautifulSoup (extractores y analizadores de la página
+    principal), así que puede ejecutarse en el pool de procesos (modules.parse_pool).
+    Devuelve {"datos", "ctx", "historial", "preview", "pagina_estatica"} sin objetos de bs4,
+    o None si requiere_pagina_estatica y la página no sirve sin navegador. "preview" es la
+    parte de la vista previa ligera que sale de esta misma página.
     """
-    if not match_id or not match_id.isdigit():
-        return {"error": "ID de partido inválido."}
-
-    # --- PASO 1: Carga inicial con Selenium (lento pero necesario) ---
-    options = ChromeOptions()
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36")
-    options.add_argument('--blink-settings=imagesEnabled=false')
-    driver = None
-    try:
-        driver = webdriver.Chrome(options=options)
-        # Usamos la URL original, Selenium se encargará de la selección
-        main_page_url = f"{BASE_URL_OF}/match/h2h-{match_id}"
-        driver.get(main_page_url)
+    soup = BeautifulSoup(html, "lxml")
+    pagina_estatica = _h2h_page_usable_without_browser_of(soup)
+    if requiere_pagina_estatica and not pagina_estatica:
+        return None
+    datos, ctx = _extraer_datos_pagina_principal_of(match_id, soup)
+    _analizar_pagina_principal_of(datos, ctx)
+    return {"datos": datos, "ctx": {key: value for key, value in ctx.items() if key not in ("soup", "pagina")},
+            "historial": _historial_pagina_of(ensure_h2h_page(soup)),
+            "preview": _preview_pagina_of(soup, ctx), "pagina_estatica": pagina_estatica}
+
+def _completar_datos_partido_of(datos, ctx, details_h2h_col3, stats_results):
+    """Parte posterior a la red: empaqueta H2H Col3 y las estadísticas con los datos parseados."""
+    h2h_data = ctx["h2h_data"]
+
+    # Empaquetar todo en el diccionario de datos final
+    datos['last_home_match'] = {'details': ctx["last_home_match"], 'stats': stats_results.get('last_home')}
+    datos['last_away_match'] = {'details': ctx["last_away_match"], 'stats': stats_results.get('last_away')}
+    datos['h2h_col3'] = {'details': details_h2h_col3, 'stats': stats_results.get('h2h_col3')}
+    datos['comp_L_vs_UV_A'] = {'details': ctx["comp_L_vs_UV_A"], 'stats': stats_results.get('comp_L_vs_UV_A')}
+    datos['comp_V_vs_UL_H'] = {'details': ctx["comp_V_vs_UL_H"], 'stats': stats_results.get('comp_V_vs_UL_H')}
+    datos['h2h_stadium'] = {'details': h2h_data, 'stats': stats_results.get('h2h_stadium')}
+    datos['h2h_general'] = {'details': h2h_data, 'stats': stats_results.get('h2h_general')}
+
+    # --- FUNCIONES AUXILIARES PARA LA PLANTILLA ---
+    # Añadir funciones auxiliares para el análisis gráfico
+    from modules.funciones_auxiliares import (
+        _calcular_estadisticas_contra_rival, 
+        _analizar_over_under, 
+        _analizar_ah_cubierto, 
+        _analizar_desempeno_casa_fuera,
+        _contar_victorias_h2h,
+        _analizar_over_under_h2h,
+        _contar_over_h2h,
+        _contar_victorias_h2h_general
+    )
+    
+    datos["_calcular_estadisticas_contra_rival"] = _calcular_estadisticas_contra_rival
+    datos["_analizar_over_under"] = _analizar_over_under
+    datos["_analizar_ah_cubierto"] = _analizar_ah_cubierto
+    datos["_analizar_desempeno_casa_fuera"] = _analizar_desempeno_casa_fuera
+    datos["_contar_victorias_h2h"] = _contar_victorias_h2h
+    datos["_analizar_over_under_h2h"] = _analizar_over_under_h2h
+    datos["_contar_over_h2h"] = _contar_over_h2h
+    datos["_contar_victorias_h2h_general"] = _contar_victorias_h2h_general
+    return datos
+
+class AnalisisError(Exception):
+    """Fallo del análisis completo con un mensaje para el usuario (se devuelve como {"error": ...})."""
+
+# --- ETAPAS DEL ANÁLISIS COMPLETO ---
+# obtener_datos_completos_partido es un grafo de etapas (modules.stage_graph): cada descarga
+# arranca en cuanto existe su entrada (las estadísticas de progresión, por ejemplo, en cuanto
+# la extracción conoce los IDs) y de cada ejecución quedan los tiempos por etapa.
+
+_STATS_KEYS_OF = ('last_home', 'last_away', 'comp_L_vs_UV_A', 'comp_V_vs_UL_H', 'h2h_stadium', 'h2h_general')
+_tiempos_etapas_of = deque(maxlen=max(1, int(os.environ.get("ESTUDIO_STAGE_HISTORY", "50") or 50)))
+
+def _cargar_pagina_h2h_selenium_of(match_id):
+    """Carga h2h-{id} con un navegador del pool (hSelect_1/2/3 en Bet365) y la parsea."""
+    with span("selenium", page="h2h"), get_browser_pool().driver() as driver:
+        driver.get(f"{BASE_URL_OF}/match/h2h-{match_id}")
         WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.ID, "table_v1")))
-        
-        # Acción clave: seleccionar el proveedor de cuotas correcto en los desplegables
         for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
             try:
                 Select(WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.ID, select_id)))).select_by_value("8")
+                # Usamos una espera explícita más eficiente en lugar de time.sleep
                 WebDriverWait(driver, 1).until(EC.text_to_be_present_in_element((By.ID, select_id), "8"))
             except TimeoutException:
                 continue
-        
-        soup_completo = BeautifulSoup(driver.page_source, "lxml")
-    except Exception as e:
-        print(f"ERROR CRÍTICO durante la carga con Selenium: {e}")
-        return {"error": f"Error durante la carga inicial con Selenium: {e}"}
-    finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
+        page_source = driver.page_source
+    parsed = run_parse(analizar_html_h2h_of, match_id, page_source, False)
+    parsed["navegador"] = True
+    return parsed
+
+def _necesita_h2h_col3_con_navegador_of(parsed, details_h2h_col3):
+    """Si la página principal necesitó Selenium y la de H2H Col3 tampoco sirve por HTTP."""
+    col3_args = parsed["ctx"]["col3_args"]
+    return bool(parsed.get("navegador")) and details_h2h_col3.get("status") == "error" and all(col3_args[:3])
+
+def _h2h_col3_con_navegador_of(col3_args):
+    """H2H Col3 con su propio navegador del pool (nunca el de otra etapa)."""
+    with span("selenium", page="h2h_col3"), get_browser_pool().driver() as driver:
+        return get_h2h_details_for_original_logic_of(driver, *col3_args)
+
+def _etapa_pagina_h2h_of(match_id, engine):
+    """HTML estático de h2h-{id}; None con el motor Selenium o si falla la descarga."""
+    return fetch_h2h_html_http_of(match_id) if engine in ("http", "auto", "ligero") else None
+
+def _etapa_extraccion_of(match_id, engine, html):
+    """
+    Parseo y análisis de la página principal (en el pool de procesos si PARSE_POOL_WORKERS > 0).
+    Con engine "ligero" (vista previa) se usa la página tal cual y nunca se abre el navegador.
+    """
+    if engine == "ligero":
+        if html is None:
+            raise AnalisisError("La fuente de datos (Nowgoal) no devolvió la página H2H.")
+        return run_parse(analizar_html_h2h_of, match_id, html, False)
+    parsed = run_parse(analizar_html_h2h_of, match_id, html) if html is not None else None
+    if parsed is None:
+        if engine == "http":
+            raise AnalisisError("No se pudo obtener la página H2H sin navegador.")
+        parsed = _cargar_pagina_h2h_selenium_of(match_id)
+    return parsed
+
+def _etapa_historial_of(parsed):
+    _archivar_historial_of(parsed.get("historial"))
+
+def _etapa_h2h_col3_of(parsed):
+    details_h2h_col3 = get_h2h_details_http_of(*parsed["ctx"]["col3_args"])
+    if _necesita_h2h_col3_con_navegador_of(parsed, details_h2h_col3):
+        details_h2h_col3 = _h2h_col3_con_navegador_of(parsed["ctx"]["col3_args"])
+    return details_h2h_col3
+
+def _etapa_estadisticas_guardadas_of(parsed):
+    return _estadisticas_guardadas_of(_ids_estadisticas_of(parsed["ctx"]))
+
+def _etapa_estadisticas_of(key):
+    """Etapa de las estadísticas de progresión de `key`: del almacén o descargadas."""
+    def etapa(parsed, guardadas):
+        if key in guardadas:
+            return guardadas[key]
+        return _descargar_estadisticas_progresion_of(_ids_estadisticas_of(parsed["ctx"])[key])
+    return etapa
+
+def _etapa_estadisticas_h2h_col3_of(details_h2h_col3):
+    if not (col3_match_id := (details_h2h_col3 or {}).get('match_id')):
+        return None
+    guardadas = _estadisticas_guardadas_of({'h2h_col3': col3_match_id})
+    return guardadas['h2h_col3'] if 'h2h_col3' in guardadas else _descargar_estadisticas_progresion_of(col3_match_id)
+
+def _etapa_resultado_of(parsed, details_h2h_col3, *stats):
+    stats_results = dict(zip(_STATS_KEYS_OF + ('h2h_col3',), stats))
+    # Copia: la extracción puede estar guardada como capa y servir a otras pasadas
+    return _completar_datos_partido_of(dict(parsed["datos"]), parsed["ctx"], details_h2h_col3, stats_results)
+
+_ETAPAS_ESTADISTICAS_OF = tuple(f"stats_{key}" for key in _STATS_KEYS_OF + ('h2h_col3',))
+
+def _construir_grafo_analisis_of():
+    grafo = StageGraph("analisis_completo", inputs=("match_id", "engine"))
+    grafo.add("pagina_h2h", _etapa_pagina_h2h_of, ("match_id", "engine"))
+    grafo.add("extraccion", _etapa_extraccion_of, ("match_id", "engine", "pagina_h2h"))
+    grafo.add("historial", _etapa_historial_of, ("extraccion",))
+    grafo.add("h2h_col3", _etapa_h2h_col3_of, ("extraccion",))
+    grafo.add("estadisticas_guardadas", _etapa_estadisticas_guardadas_of, ("extraccion",))
+    for key in _STATS_KEYS_OF:
+        grafo.add(f"stats_{key}", _etapa_estadisticas_of(key), ("extraccion", "estadisticas_guardadas"))
+    grafo.add("stats_h2h_col3", _etapa_estadisticas_h2h_col3_of, ("h2h_col3",))
+    grafo.add("resultado", _etapa_resultado_of, ("extraccion", "h2h_col3", *_ETAPAS_ESTADISTICAS_OF))
+    return grafo
+
+GRAFO_ANALISIS_OF = _construir_grafo_analisis_of()
+
+ANALISIS_SECONDS_OF = histogram("analysis_seconds", "Análisis completo (grafo de etapas) por motor", ("engine",))
+ANALISIS_STAGE_SECONDS_OF = histogram("analysis_stage_seconds", "Duración de cada etapa del análisis completo", ("stage",))
+ANALISIS_TOTAL_OF = counter("analysis_runs_total", "Análisis completos por motor y resultado", ("engine", "outcome"))
+
+def _registrar_tiempos_etapas_of(match_id, engine, run):
+    _tiempos_etapas_of.append({"match_id": match_id, "engine": engine, **run.as_dict()})
+    ANALISIS_SECONDS_OF.observe(run.total, engine=engine)
+    for stage, (_, duration) in run.timings.items():
+        ANALISIS_STAGE_SECONDS_OF.observe(duration, stage=stage)
+
+def _capas_previas_of(match_id, para_completo):
+    """
+    Etapas ya calculadas del partido (modules.analysis_layers) para pasarlas al grafo.
+    El análisis completo solo reutiliza una extracción que él mismo habría aceptado: la de
+    una página que sirve sin navegador o la cargada con Selenium.
+    """
+    layer_cache = get_layer_cache()
+    capas = (layer_cache.get(match_id) if layer_cache is not None else None) or {}
+    parsed = capas.get("extraccion")
+    if parsed is None:
+        return {}
+    if para_completo and not (parsed.get("navegador") or parsed.get("pagina_estatica")):
+        return {}
+    return capas
+
+def _guardar_capas_of(match_id, resultados):
+    """
+    Guarda las etapas calculadas en esta pasada (sin el HTML de la página ni los resultados
+    finales). Las que se reutilizaron no vienen en `resultados` y conservan su hora de cálculo.
+    """
+    layer_cache = get_layer_cache()
+    capas = {name: value for name, value in resultados.items() if name not in ("resultado", "vista_previa")}
+    if layer_cache is None or not capas:
+        return
+    if "extraccion" in capas:
+        capas["pagina_h2h"] = None
+    layer_cache.put(match_id, capas)
+
+def obtener_tiempos_etapas_recientes(limit=None):
+    """Tiempos por etapa de los últimos análisis completos (el más reciente primero)."""
+    runs = list(reversed(_tiempos_etapas_of))
+    return runs[:limit] if limit else runs
+
+def obtener_datos_completos_partido(match_id: str, engine: str | None = None):
+    """
+    Función principal que orquesta todo el scraping y análisis para un ID de partido.
+    Devuelve un diccionario con todos los datos necesarios para la plantilla HTML.
 
-    # --- PASO 2: Ejecutar el resto de peticiones en paralelo con aiohttp ---
-    try:
+    engine: "http" (solo requests), "selenium", "auto" (http y, si la página no sirve,
+    Selenium) o "async" (todo el pipeline con aiohttp, ver obtener_datos_completos_partido_async).
+    Por defecto ESTUDIO_H2H_ENGINE o "auto".
+    Las etapas (GRAFO_ANALISIS_OF) se reparten en un pool de hilos según sus dependencias;
+    las que ya calculó una vista previa reciente del partido no se repiten.
+    """
+    if not match_id or not match_id.isdigit():
+        return {"error": "ID de partido inválido."}
+    engine = (engine or H2H_ENGINE_OF).strip().lower()
+    if engine not in H2H_ENGINES_OF:
+        return {"error": f"Motor de scraping desconocido: {engine}"}
+    if engine == "async":
         if os.name == 'nt':
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-        # Pasamos el soup ya parseado a la función asíncrona
-        return asyncio.run(obtener_datos_completos_partido_async(match_id, soup_completo))
+        return asyncio.run(obtener_datos_completos_partido_async(match_id))
+
+    capas, parcial = _capas_previas_of(match_id, para_completo=True), {}
+    try:
+        with trace("analisis_completo", match_id=match_id, engine=engine, reused=len(capas)), \
+                ThreadPoolExecutor(max_workers=HTTP_POOL_MAXSIZE) as executor:
+            run = GRAFO_ANALISIS_OF.run(executor, {"match_id": match_id, "engine": engine, **capas}, partial=parcial)
+        _registrar_tiempos_etapas_of(match_id, engine, run)
+        ANALISIS_TOTAL_OF.inc(engine=engine, outcome="ok")
+        return run.results["resultado"]
+    except AnalisisError as e:
+        ANALISIS_TOTAL_OF.inc(engine=engine, outcome="error")
+        return {"error": str(e)}
     except Exception as e:
-        print(f"ERROR CRÍTICO en el runner async de datos completos para {match_id}: {e}")
-        return {"error": f"No se pudieron obtener los datos completos (async runner): {type(e).__name__}"}
+        ANALISIS_TOTAL_OF.inc(engine=engine, outcome="error")
+        print(f"ERROR CRÍTICO en el scraper: {e}")
+        return {"error": f"Error durante el scraping: {e}"}
+    finally:
+        _guardar_capas_of(match_id, parcial)
 
+# --- MOTOR ASÍNCRONO (aiohttp) ---
 
-# EN modules/estudio_scraper.py
+async def _aio_fetch_h2h_html_of(session, match_id):
+    """Versión aiohttp de fetch_h2h_html_http_of."""
+    try:
+        return await aio_get_text(session, f"{BASE_URL_OF}/match/h2h-{match_id}", timeout=HTTP_TIMEOUT_SECONDS_OF)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
 
-# ... (al final del archivo, después de obtener_datos_completos_partido)
+async def _aio_get_h2h_details_of(session, key_match_id, rival_a_id, rival_b_id, rival_a_name="Rival A", rival_b_name="Rival B", parse_executor=None):
+    if not all([key_match_id, rival_a_id, rival_b_id]):
+        return {"status": "error", "resultado": "N/A (Datos incompletos para H2H)"}
+    if (html := await _aio_fetch_h2h_html_of(session, key_match_id)) is None:
+        return {"status": "error", "resultado": "N/A (Error HTTP en H2H Col3)"}
+    return await run_parse_async(analizar_html_h2h_col3_of, html, rival_a_id, rival_b_id, rival_a_name, rival_b_name,
+                                 executor=parse_executor)
 
-def obtener_datos_preview_rapido(match_id: str):
+async def _aio_get_match_progression_stats_of(session, match_id, parse_executor=None):
+    if not match_id or not str(match_id).isdigit():
+        return None
+    try:
+        html = await aio_get_text(session, f"{BASE_URL_OF}/match/live-{match_id}", timeout=10)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    df = await run_parse_async(parse_match_progression_stats_html, html, executor=parse_executor)
+    await asyncio.to_thread(_guardar_estadisticas_progresion_of, match_id, html, df)
+    return df
+
+async def _aio_etapa_pagina_h2h_of(match_id, session):
+    return await _aio_fetch_h2h_html_of(session, match_id)
+
+async def _aio_etapa_extraccion_of(match_id, html, parse_executor):
+    parsed = None if html is None else await run_parse_async(analizar_html_h2h_of, match_id, html, executor=parse_executor)
+    if parsed is None:
+        parsed = await asyncio.to_thread(_cargar_pagina_h2h_selenium_of, match_id)
+    return parsed
+
+async def _aio_etapa_historial_of(parsed):
+    await asyncio.to_thread(_etapa_historial_of, parsed)
+
+async def _aio_etapa_h2h_col3_of(parsed, session, parse_executor):
+    details_h2h_col3 = await _aio_get_h2h_details_of(session, *parsed["ctx"]["col3_args"], parse_executor=parse_executor)
+    if _necesita_h2h_col3_con_navegador_of(parsed, details_h2h_col3):
+        details_h2h_col3 = await asyncio.to_thread(_h2h_col3_con_navegador_of, parsed["ctx"]["col3_args"])
+    return details_h2h_col3
+
+async def _aio_etapa_estadisticas_guardadas_of(parsed):
+    return await asyncio.to_thread(_etapa_estadisticas_guardadas_of, parsed)
+
+def _aio_etapa_estadisticas_of(key):
+    async def etapa(parsed, guardadas, session, parse_executor):
+        if key in guardadas:
+            return guardadas[key]
+        return await _aio_get_match_progression_stats_of(session, _ids_estadisticas_of(parsed["ctx"])[key], parse_executor)
+    return etapa
+
+async def _aio_etapa_estadisticas_h2h_col3_of(details_h2h_col3, session, parse_executor):
+    if not (col3_match_id := (details_h2h_col3 or {}).get('match_id')):
+        return None
+    guardadas = await asyncio.to_thread(_estadisticas_guardadas_of, {'h2h_col3': col3_match_id})
+    if 'h2h_col3' in guardadas:
+        return guardadas['h2h_col3']
+    return await _aio_get_match_progression_stats_of(session, col3_match_id, parse_executor)
+
+async def _aio_etapa_resultado_of(parsed, details_h2h_col3, *stats):
+    return _etapa_resultado_of(parsed, details_h2h_col3, *stats)
+
+def _construir_grafo_analisis_async_of():
+    grafo = StageGraph("analisis_completo_async", inputs=("match_id", "session", "parse_executor"))
+    grafo.add("pagina_h2h", _aio_etapa_pagina_h2h_of, ("match_id", "session"))
+    grafo.add("extraccion", _aio_etapa_extraccion_of, ("match_id", "pagina_h2h", "parse_executor"))
+    grafo.add("historial", _aio_etapa_historial_of, ("extraccion",))
+    grafo.add("h2h_col3", _aio_etapa_h2h_col3_of, ("extraccion", "session", "parse_executor"))
+    grafo.add("estadisticas_guardadas", _aio_etapa_estadisticas_guardadas_of, ("extraccion",))
+    for key in _STATS_KEYS_OF:
+        grafo.add(f"stats_{key}", _aio_etapa_estadisticas_of(key),
+                  ("extraccion", "estadisticas_guardadas", "session", "parse_executor"))
+    grafo.add("stats_h2h_col3", _aio_etapa_estadisticas_h2h_col3_of, ("h2h_col3", "session", "parse_executor"))
+    grafo.add("resultado", _aio_etapa_resultado_of, ("extraccion", "h2h_col3", *_ETAPAS_ESTADISTICAS_OF))
+    return grafo
+
+GRAFO_ANALISIS_ASYNC_OF = _construir_grafo_analisis_async_of()
+
+async def obtener_datos_completos_partido_async(match_id: str, session=None, parse_executor=None):
     """
-    Scraper ultraligero y optimizado para obtener solo los datos de la vista previa.
-    Usa 'requests' para ser extremadamente rápido y evitar Selenium.
+    Mismo resultado que obtener_datos_completos_partido pero sin bloquear: una sola
+    aiohttp.ClientSession para la página h2h, la del partido clave (H2H Col3) y todas las
+    live-{id}; el parseo va al pool de procesos (modules.parse_pool) o, si está desactivado,
+    al pool de hilos (parse_executor o el del loop).
+    Pasando la misma `session` se pueden lanzar decenas de análisis concurrentes en un proceso.
+    Si la página h2h no sirve sin navegador, solo esa carga (y H2H Col3 si hace falta) va a
+    Selenium en un hilo.
     """
     if not match_id or not match_id.isdigit():
         return {"error": "ID de partido inválido."}
+    own_session = session is None
+    if own_session:
+        session = build_aiohttp_session()
+    capas, parcial = _capas_previas_of(match_id, para_completo=True), {}
+    try:
+        with trace("analisis_completo", match_id=match_id, engine="async", reused=len(capas)):
+            run = await GRAFO_ANALISIS_ASYNC_OF.run_async(
+                {"match_id": match_id, "session": session, "parse_executor": parse_executor, **capas}, partial=parcial)
+        _registrar_tiempos_etapas_of(match_id, "async", run)
+        ANALISIS_TOTAL_OF.inc(engine="async", outcome="ok")
+        return run.results["resultado"]
+    except Exception as e:
+        ANALISIS_TOTAL_OF.inc(engine="async", outcome="error")
+        print(f"ERROR CRÍTICO en el scraper async: {e}")
+        return {"error": f"Error durante el scraping: {e}"}
+    finally:
+        _guardar_capas_of(match_id, parcial)
+        if own_session:
+            await session.close()
+
+# EN modules/estudio_scraper.py
 
-    url = f"{BASE_URL_OF}/match/h2h-{match_id}"
+# ... (al final del archivo, después de obtener_datos_completos_partido)
+
+# --- VISTA PREVIA LIGERA ---
+# La vista previa es un subconjunto del análisis completo: su parte de página sale de la
+# misma extracción (analizar_html_h2h_of) y su grafo reutiliza las etapas de
+# GRAFO_ANALISIS_OF que necesita. Lo que calcula una pasada lo reutiliza la otra
+# (modules.analysis_layers).
+
+def _marcador_fila_of(row):
+    """(goles local, goles visitante) del resultado final de una fila del índice h2h, o None."""
     try:
-        # 1. Cargar con Selenium para replicar el método de extracción principal
-        options = ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36")
-        options.add_argument('--blink-settings=imagesEnabled=false')
-        driver = webdriver.Chrome(options=options)
-        driver.get(url)
-        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.ID, "table_v1")))
-        # Ajustar selects a 8, igual que en el flujo completo
-        for select_id in ["hSelect_1", "hSelect_2", "hSelect_3"]:
-            try:
-                Select(WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.ID, select_id)))).select_by_value("8")
-                WebDriverWait(driver, 1).until(EC.text_to_be_present_in_element((By.ID, select_id), "8"))
-            except TimeoutException:
+        goles_h, goles_a = map(int, (row.score_text or "").replace(":", "-").split("-"))
+    except ValueError:
+        return None
+    return goles_h, goles_a
+
+def _ataques_peligrosos_preview_of(comparativa):
+    """Ataques peligrosos propios y del rival en un panel de comparativas indirectas."""
+    ap_home = int(comparativa['stats'].get('ataques_peligrosos_casa', 0) or 0)
+    ap_away = int(comparativa['stats'].get('ataques_peligrosos_fuera', 0) or 0)
+    own_ap, rival_ap = (ap_away, ap_home) if comparativa.get('localia') == 'A' else (ap_home, ap_away)
+    return {
+        "name": comparativa['main_team'],
+        "own": own_ap,
+        "rival": rival_ap,
+        "very_superior": bool((own_ap - rival_ap) >= 5)
+    }
+
+def _preview_pagina_of(soup, ctx):
+    """
+    Parte de la vista previa que solo depende de la página h2h (forma reciente, H2H directo
+    e indirecto, ataques peligrosos y cobertura del favorito en el último H2H).
+    Se calcula en la extracción, con las filas ya indexadas de la misma sopa (H2HPage).
+    """
+    home_name, away_name = ctx["home_name"], ctx["away_name"]
+    page = ensure_h2h_page(soup)
+
+    # Línea AH (Bet365 inicial)
+    ah_line_raw = ctx["main_match_odds_data"].get('ah_linea_raw', '-')
+    ah_line_num = parse_ah_to_number_of(ah_line_raw)
+    favorito_actual = None
+    if ah_line_num is not None:
+        if ah_line_num > 0:
+            favorito_actual = home_name
+        elif ah_line_num < 0:
+            favorito_actual = away_name
+
+    # Rendimiento reciente (últimos 8)
+    def analizar_rendimiento(table_no, equipo_nombre):
+        partidos = page.rows(table_no)[:8]
+        equipo = equipo_nombre.lower()
+        wins = draws = losses = 0
+        for r in partidos:
+            marcador = _marcador_fila_of(r) if r.n_cells >= 5 else None
+            equipo_es_local = equipo in r.home_cell.lower()
+            if marcador is None or not (equipo_es_local or equipo in r.away_cell.lower()):
                 continue
-        soup = BeautifulSoup(driver.page_source, 'lxml')
-
-        # 2. Extraer identificadores y nombres (igual que en el scraper completo)
-        _, _, league_id, home_name, away_name, _ = get_team_league_info_from_script_of(soup)
-        dt_info = get_match_datetime_from_script_of(soup)
-
-        # 2b. Extraer línea AH actual (Bet365 inicial)
-        main_odds = extract_bet365_initial_odds_of(soup)
-        ah_line_raw = main_odds.get('ah_linea_raw', '-')
-        ah_line_num = parse_ah_to_number_of(ah_line_raw)
-        favorito_actual = None
-        if ah_line_num is not None:
-            if ah_line_num > 0:
-                favorito_actual = home_name
-            elif ah_line_num < 0:
-                favorito_actual = away_name
-
-        # 3. Analizar Rendimiento Reciente (últimos 8 partidos)
-        def analizar_rendimiento(tabla_id, equipo_nombre):
-            tabla = soup.find("table", id=tabla_id)
-            if not tabla: return {"wins": 0, "draws": 0, "losses": 0, "total": 0}
-            partidos = tabla.find_all("tr", id=re.compile(rf"tr{tabla_id[-1]}_\d+"), limit=8)
-            victorias = 0
-            for r in partidos:
-                celdas = r.find_all("td")
-                if len(celdas) < 5: continue
-                resultado_span = celdas[5].find("span")
-                if resultado_span and 'win' in resultado_span.get('class', []):
-                    victorias += 1
-            return {"wins": victorias, "total": len(partidos)}
-
-        rendimiento_local = analizar_rendimiento("table_v1", home_name)
-        rendimiento_visitante = analizar_rendimiento("table_v2", away_name)
-
-        # 4. Analizar H2H Directo (últimos 8 enfrentamientos)
-        # 3. H2H directo, usando la misma función del flujo principal
-        h2h_stats = {"home_wins": 0, "away_wins": 0, "draws": 0}
-        last_h2h_cover = "DESCONOCIDO"
-        try:
-            h2h_data = extract_h2h_data_of(soup, home_name, away_name, None)
-            # Contar wins/draws a partir de tabla (como antes)
-            h2h_table = soup.find("table", id="table_v3")
-            if h2h_table:
-                partidos_h2h = h2h_table.find_all("tr", id=re.compile(r"tr3_\d+"), limit=8)
-                for r in partidos_h2h:
-                    tds = r.find_all("td")
-                    if len(tds) < 5:
-                        continue
-                    home_h2h = tds[2].get_text(strip=True)
-                    resultado_raw = tds[3].get_text(strip=True)
-                    try:
-                        goles_h, goles_a = map(int, resultado_raw.split("-"))
-                        es_local_en_h2h = home_name.lower() in home_h2h.lower()
-                        if goles_h == goles_a:
-                            h2h_stats["draws"] += 1
-                        elif (es_local_en_h2h and goles_h > goles_a) or (not es_local_en_h2h and goles_a > goles_h):
-                            h2h_stats["home_wins"] += 1
-                        else:
-                            h2h_stats["away_wins"] += 1
-                    except (ValueError, IndexError):
-                        continue
-            # Evaluar cobertura del favorito con el último H2H disponible
-            res_raw = None
-            h_home = None
-            h_away = None
-            if h2h_data.get('res1_raw') and h2h_data.get('res1_raw') != '?-?':
-                res_raw = h2h_data['res1_raw']
-                h_home = home_name
-                h_away = away_name
-            elif h2h_data.get('res6_raw') and h2h_data.get('res6_raw') != '?-?':
-                res_raw = h2h_data['res6_raw']
-                h_home = h2h_data.get('h2h_gen_home', home_name)
-                h_away = h2h_data.get('h2h_gen_away', away_name)
-            if favorito_actual and (ah_line_num is not None) and res_raw:
-                ct, _ = check_handicap_cover(res_raw.replace(':', '-'), ah_line_num, favorito_actual, h_home, h_away, home_name)
-                last_h2h_cover = ct
-        except Exception:
-            pass
+            propios, rivales = marcador if equipo_es_local else marcador[::-1]
+            if propios > rivales:
+                wins += 1
+            elif propios < rivales:
+                losses += 1
+            else:
+                draws += 1
+        return {"wins": wins, "draws": draws, "losses": losses, "total": len(partidos)}
 
-        # 4. Datos de Rendimiento Reciente (último partido de cada uno) y H2H Rivales (Col3)
-        recent_indirect = {"last_home": None, "last_away": None, "h2h_col3": None}
-        try:
-            # Último del local en liga
-            last_home = extract_last_match_in_league_of(soup, "table_v1", home_name, league_id, True)
-            last_home_stats = get_match_progression_stats_data(str(last_home.get('match_id'))) if last_home and last_home.get('match_id') else None
-            def _df_to_rows(df):
-                rows = []
-                try:
-                    if df is not None and not df.empty:
-                        for idx, row in df.iterrows():
-                            label = idx.replace('Shots on Goal', 'Tiros a Puerta').replace('Shots', 'Tiros').replace('Dangerous Attacks', 'Ataques Peligrosos').replace('Attacks', 'Ataques')
-                            rows.append({"label": label, "home": row.get('Casa', ''), "away": row.get('Fuera', '')})
-                except Exception:
-                    pass
-                return rows
-            if last_home:
-                recent_indirect["last_home"] = {
-                    "home": last_home.get('home_team'),
-                    "away": last_home.get('away_team'),
-                    "score": last_home.get('score'),
-                    "ah": format_ah_as_decimal_string_of(last_home.get('handicap_line_raw', '-') or '-'),
-                    "ou": "-",
-                    "stats_rows": _df_to_rows(last_home_stats),
-                    "date": last_home.get('date')
-                }
-            # Último del visitante en liga
-            last_away = extract_last_match_in_league_of(soup, "table_v2", away_name, league_id, False)
-            last_away_stats = get_match_progression_stats_data(str(last_away.get('match_id'))) if last_away and last_away.get('match_id') else None
-            if last_away:
-                recent_indirect["last_away"] = {
-                    "home": last_away.get('home_team'),
-                    "away": last_away.get('away_team'),
-                    "score": last_away.get('score'),
-                    "ah": format_ah_as_decimal_string_of(last_away.get('handicap_line_raw', '-') or '-'),
-                    "ou": "-",
-                    "stats_rows": _df_to_rows(last_away_stats),
-                    "date": last_away.get('date')
-                }
-            # H2H Rivales (Col3)
-            key_id_a, rival_a_id, rival_a_name = get_rival_a_for_original_h2h_of(soup, league_id)
-            _, rival_b_id, rival_b_name = get_rival_b_for_original_h2h_of(soup, league_id)
-            if key_id_a and rival_a_id and rival_b_id:
-                col3 = get_h2h_details_for_original_logic_of(driver, key_id_a, rival_a_id, rival_b_id, rival_a_name, rival_b_name)
-                if col3 and col3.get('status') == 'found':
-                    score_line = f"{col3.get('h2h_home_team_name')} {col3.get('goles_home')}:{col3.get('goles_away')} {col3.get('h2h_away_team_name')}"
-                    col3_stats = get_match_progression_stats_data(str(col3.get('match_id')))
-                    recent_indirect["h2h_col3"] = {
-                        "score_line": score_line,
-                        "ah": format_ah_as_decimal_string_of(col3.get('handicap', '-') or '-'),
-                        "ou": "-",
-                        "stats_rows": _df_to_rows(col3_stats),
-                        "date": col3.get('date')
-                    }
-        except Exception:
-            pass
+    rendimiento_local = analizar_rendimiento(1, home_name)
+    rendimiento_visitante = analizar_rendimiento(2, away_name)
 
-        # 5. Calcular H2H Indirecto (rivales comunes) de forma ligera
-        indirect = {"home_better": 0, "away_better": 0, "draws": 0, "samples": []}
-        try:
-            table_v1 = soup.find("table", id="table_v1")
-            table_v2 = soup.find("table", id="table_v2")
-
-            def _parse_score_to_tuple(score_text):
-                try:
-                    gh, ga = map(int, score_text.strip().split("-"))
-                    return gh, ga
-                except Exception:
-                    return None
-
-            def _find_match_info(table, rival_name_lower, team_name_ref):
-                if not table:
-                    return None
-                rows = table.find_all("tr", id=re.compile(r"tr[12]_\\d+"))
-                for r in rows:
-                    tds = r.find_all("td")
-                    if len(tds) < 5:
-                        continue
-                    home_t = tds[2].get_text(strip=True)
-                    away_t = tds[4].get_text(strip=True)
-                    if away_t.lower() == rival_name_lower or home_t.lower() == rival_name_lower:
-                        score_text = tds[3].get_text(strip=True)
-                        score = _parse_score_to_tuple(score_text)
-                        if not score:
-                            continue
-                        gh, ga = score
-                        if home_t.lower() == team_name_ref.lower():
-                            margin = gh - ga
-                        elif away_t.lower() == team_name_ref.lower():
-                            margin = ga - gh
-                        else:
-                            margin = gh - ga
-                        return {"rival": rival_name_lower, "margin": margin}
-                return None
-
-            if table_v1 and table_v2:
-                rivals_home = set()
-                for r in table_v1.find_all("tr", id=re.compile(r"tr1_\\d+")):
-                    tds = r.find_all("td")
-                    if len(tds) >= 5:
-                        rivals_home.add(tds[4].get_text(strip=True).lower())
-                rivals_away = set()
-                for r in table_v2.find_all("tr", id=re.compile(r"tr2_\\d+")):
-                    tds = r.find_all("td")
-                    if len(tds) >= 5:
-                        rivals_away.add(tds[2].get_text(strip=True).lower())
-                common = [rv for rv in rivals_home.intersection(rivals_away) if rv and rv != '?']
-                common = common[:3]
-                for rv in common:
-                    home_info = _find_match_info(table_v1, rv, home_name)
-                    away_info = _find_match_info(table_v2, rv, away_name)
-                    if not home_info or not away_info:
-                        continue
-                    if home_info["margin"] > away_info["margin"]:
-                        indirect["home_better"] += 1
-                        verdict = "home"
-                    elif home_info["margin"] < away_info["margin"]:
-                        indirect["away_better"] += 1
-                        verdict = "away"
-                    else:
-                        indirect["draws"] += 1
-                        verdict = "draw"
-                    indirect["samples"].append({
-                        "rival": rv,
-                        "home_margin": home_info["margin"],
-                        "away_margin": away_info["margin"],
-                        "verdict": verdict
-                    })
-        except Exception:
-            # Ignorar errores de comparativas indirectas en la vista previa
-            pass
+    # H2H directo (últimos 8 enfrentamientos)
+    h2h_stats = {"home_wins": 0, "away_wins": 0, "draws": 0}
+    for r in page.rows(3)[:8]:
+        marcador = _marcador_fila_of(r) if r.n_cells >= 5 else None
+        if marcador is None:
+            continue
+        goles_h, goles_a = marcador
+        es_local_en_h2h = home_name.lower() in r.home_cell.lower()
+        if goles_h == goles_a:
+            h2h_stats["draws"] += 1
+        elif (es_local_en_h2h and goles_h > goles_a) or (not es_local_en_h2h and goles_a > goles_h):
+            h2h_stats["home_wins"] += 1
+        else:
+            h2h_stats["away_wins"] += 1
 
-        # 5b. Evaluar "muy superior" en ataques peligrosos desde comparativas indirectas (con la misma función)
-        indirect_panels = extract_indirect_comparison_data(soup)
-        ataques_peligrosos = {}
-        favorite_da = None
-        try:
-            if indirect_panels and indirect_panels.get("comp1"):
-                c1 = indirect_panels["comp1"]
-                ap_home = int(c1['stats'].get('ataques_peligrosos_casa', 0) or 0)
-                ap_away = int(c1['stats'].get('ataques_peligrosos_fuera', 0) or 0)
-                own_ap, rival_ap = (ap_away, ap_home) if c1.get('localia') == 'A' else (ap_home, ap_away)
-                ataques_peligrosos['team1'] = {
-                    "name": c1['main_team'],
-                    "own": own_ap,
-                    "rival": rival_ap,
-                    "very_superior": bool((own_ap - rival_ap) >= 5)
-                }
-            if indirect_panels and indirect_panels.get("comp2"):
-                c2 = indirect_panels["comp2"]
-                ap_home = int(c2['stats'].get('ataques_peligrosos_casa', 0) or 0)
-                ap_away = int(c2['stats'].get('ataques_peligrosos_fuera', 0) or 0)
-                own_ap, rival_ap = (ap_away, ap_home) if c2.get('localia') == 'A' else (ap_home, ap_away)
-                ataques_peligrosos['team2'] = {
-                    "name": c2['main_team'],
-                    "own": own_ap,
-                    "rival": rival_ap,
-                    "very_superior": bool((own_ap - rival_ap) >= 5)
-                }
-            # Identificar el bloque correspondiente al favorito
-            fav_name = (favorito_actual or '').lower()
-            for key in ['team1','team2']:
-                if key in ataques_peligrosos and ataques_peligrosos[key]['name'].lower() == fav_name:
-                    favorite_da = {
-                        "name": ataques_peligrosos[key]['name'],
-                        "very_superior": ataques_peligrosos[key]['very_superior'],
-                        "own": ataques_peligrosos[key]['own'],
-                        "rival": ataques_peligrosos[key]['rival']
-                    }
-                    break
-        except Exception:
-            pass
-
-        # 6. Montar el objeto de respuesta JSON
-        result = {
-            "home_team": home_name,
-            "away_team": away_name,
-            "recent_form": {
-                "home": rendimiento_local,
-                "away": rendimiento_visitante,
-            },
-            "recent_indirect": recent_indirect,
-            "handicap": {
-                "ah_line": format_ah_as_decimal_string_of(ah_line_raw),
-                "favorite": favorito_actual or "",
-                "cover_on_last_h2h": last_h2h_cover
-            },
-            "dangerous_attacks": ataques_peligrosos,
-            "favorite_dangerous_attacks": favorite_da,
-            "h2h_indirect": indirect,
-            "h2h_stats": h2h_stats
-        }
+    # Cobertura del favorito en el último H2H disponible
+    last_h2h_cover = "DESCONOCIDO"
+    try:
+        h2h_data = ctx["h2h_data"]
+        res_raw = None
+        h_home = None
+        h_away = None
+        if h2h_data.get('res1_raw') and h2h_data.get('res1_raw') != '?-?':
+            res_raw = h2h_data['res1_raw']
+            h_home = home_name
+            h_away = away_name
+        elif h2h_data.get('res6_raw') and h2h_data.get('res6_raw') != '?-?':
+            res_raw = h2h_data['res6_raw']
+            h_home = h2h_data.get('h2h_gen_home', home_name)
+            h_away = h2h_data.get('h2h_gen_away', away_name)
+        if favorito_actual and (ah_line_num is not None) and res_raw:
+            ct, _ = check_handicap_cover(res_raw.replace(':', '-'), ah_line_num, favorito_actual, h_home, h_away, home_name)
+            last_h2h_cover = ct
+    except Exception:
+        pass
 
-        return result
+    # H2H indirecto ligero: hasta 3 rivales comunes, del más reciente del local al más antiguo
+    indirect = {"home_better": 0, "away_better": 0, "draws": 0, "samples": []}
 
-    except requests.Timeout:
-        return {"error": "La fuente de datos (Nowgoal) tardó demasiado en responder."}
-    except Exception as e:
-        print(f"ERROR en scraper preview para {match_id}: {e}")
-        return {"error": f"No se pudieron obtener los datos de la vista previa: {type(e).__name__}"}
-    finally:
-        try:
-            if 'driver' in locals():
-                driver.quit()
-        except Exception:
-            pass
+    def margen_contra(table_no, rival, equipo_nombre):
+        equipo = equipo_nombre.lower()
+        for r in page.rows(table_no):
+            home_t, away_t = r.home_cell.lower(), r.away_cell.lower()
+            if r.n_cells < 5 or rival not in (home_t, away_t) or (marcador := _marcador_fila_of(r)) is None:
+                continue
+            gh, ga = marcador
+            return ga - gh if away_t == equipo else gh - ga
+        return None
 
+    rivales_visitante = {r.home_cell.lower() for r in page.rows(2) if r.n_cells >= 5}
+    comunes = []
+    for r in page.rows(1):
+        rival = r.away_cell.lower()
+        if r.n_cells >= 5 and rival and rival != '?' and rival in rivales_visitante and rival not in comunes:
+            comunes.append(rival)
+    for rv in comunes[:3]:
+        home_margin = margen_contra(1, rv, home_name)
+        away_margin = margen_contra(2, rv, away_name)
+        if home_margin is None or away_margin is None:
+            continue
+        if home_margin > away_margin:
+            indirect["home_better"] += 1
+            verdict = "home"
+        elif home_margin < away_margin:
+            indirect["away_better"] += 1
+            verdict = "away"
+        else:
+            indirect["draws"] += 1
+            verdict = "draw"
+        indirect["samples"].append({
+            "rival": rv,
+            "home_margin": home_margin,
+            "away_margin": away_margin,
+            "verdict": verdict
+        })
 
-async def get_match_progression_stats_data_async(session: aiohttp.ClientSession, match_id: str) -> pd.DataFrame | None:
-    if not match_id or not match_id.isdigit(): return None
-    url = f"{BASE_URL_OF}/match/live-{match_id}"
+    # Ataques peligrosos (comparativas indirectas)
+    indirect_panels = ctx["indirect_comparison_data"] or {}
+    ataques_peligrosos = {}
+    favorite_da = None
     try:
-        async with session.get(url, timeout=10) as response:
-            response.raise_for_status()
-            html_text = await response.text()
-            soup = BeautifulSoup(html_text, 'lxml')
-            
-            stat_order = ["Corners", "Shots", "Shots on Goal", "Attacks", "Dangerous Attacks", "Red Cards"]
-            stat_titles = {stat: "-" for stat in stat_order}
-            
-            team_tech_div = soup.find('div', id='teamTechDiv_detail')
-            if team_tech_div and (stat_list := team_tech_div.find('ul', class_='stat')):
-                for li in stat_list.find_all('li'):
-                    if (title_span := li.find('span', class_='stat-title')) and (stat_title := title_span.get_text(strip=True)) in stat_titles:
-                        values = [v.get_text(strip=True) for v in li.find_all('span', class_='stat-c')]
-                        if len(values) == 2:
-                            home_val, away_val = _colorear_stats(values[0], values[1])
-                            stat_titles[stat_title] = {"Home": home_val, "Away": away_val}
-            
-            if stat_titles["Red Cards"] == "-":
-                red_cards = {"Home": 0, "Away": 0}
-                if events_table := soup.find('table', id='eventsTable'):
-                    for img in events_table.find_all('img', alt='Red Card'):
-                        if parent_td := img.find_parent('td'):
-                            style = parent_td.get('style', '')
-                            if "text-align: right;" in style:
-                                red_cards["Home"] += 1
-                            elif "text-align: left;" in style:
-                                red_cards["Away"] += 1
-                stat_titles["Red Cards"] = red_cards
-            
-            table_rows = []
-            for stat_name in stat_order:
-                vals = stat_titles[stat_name]
-                if isinstance(vals, dict):
-                    table_rows.append({
-                        "Estadistica_EN": stat_name,
-                        "Casa": vals.get('Home', '-'),
-                        "Fuera": vals.get('Away', '-')
-                    })
-            
-            df = pd.DataFrame(table_rows)
-            return df.set_index("Estadistica_EN") if not df.empty else df
-    except (aiohttp.ClientError, asyncio.TimeoutError, Exception):
+        for key, comp in (("team1", "comp1"), ("team2", "comp2")):
+            if indirect_panels.get(comp):
+                ataques_peligrosos[key] = _ataques_peligrosos_preview_of(indirect_panels[comp])
+        fav_name = (favorito_actual or '').lower()
+        for equipo in ataques_peligrosos.values():
+            if equipo['name'].lower() == fav_name:
+                favorite_da = {key: equipo[key] for key in ("name", "very_superior", "own", "rival")}
+                break
+    except Exception:
+        pass
+
+    return {
+        "recent_form": {
+            "home": rendimiento_local,
+            "away": rendimiento_visitante,
+        },
+        "handicap": {
+            "ah_line": format_ah_as_decimal_string_of(ah_line_raw),
+            "favorite": favorito_actual or "",
+            "cover_on_last_h2h": last_h2h_cover
+        },
+        "dangerous_attacks": ataques_peligrosos,
+        "favorite_dangerous_attacks": favorite_da,
+        "h2h_indirect": indirect,
+        "h2h_stats": h2h_stats
+    }
+
+def _ultimo_partido_preview_of(match, stats):
+    if not match:
         return None
+    return {
+        "home": match.get('home_team'),
+        "away": match.get('away_team'),
+        "score": match.get('score'),
+        "ah": format_ah_as_decimal_string_of(match.get('handicap_line_raw', '-') or '-'),
+        "ou": "-",
+        "stats_rows": _df_to_rows_preview_of(stats),
+        "date": match.get('date')
+    }
+
+def _df_to_rows_preview_of(df):
+    rows = []
+    try:
+        if df is not None and not df.empty:
+            for idx, row in df.iterrows():
+                label = idx.replace('Shots on Goal', 'Tiros a Puerta').replace('Shots', 'Tiros').replace('Dangerous Attacks', 'Ataques Peligrosos').replace('Attacks', 'Ataques')
+                rows.append({"label": label, "home": row.get('Casa', ''), "away": row.get('Fuera', '')})
+    except Exception:
+        pass
+    return rows
+
+def _etapa_vista_previa_of(parsed, details_h2h_col3, stats_last_home, stats_last_away, stats_h2h_col3):
+    """Vista previa a partir de la extracción, H2H Col3 y las estadísticas de los últimos partidos."""
+    datos, ctx = parsed["datos"], parsed["ctx"]
+    recent_indirect = {
+        "last_home": _ultimo_partido_preview_of(ctx["last_home_match"], stats_last_home),
+        "last_away": _ultimo_partido_preview_of(ctx["last_away_match"], stats_last_away),
+        "h2h_col3": None,
+    }
+    if (details_h2h_col3 or {}).get("status") == "found":
+        recent_indirect["h2h_col3"] = {
+            "score_line": f"{details_h2h_col3['h2h_home_team_name']} {details_h2h_col3['goles_home']}:{details_h2h_col3['goles_away']} {details_h2h_col3['h2h_away_team_name']}",
+            "ah": format_ah_as_decimal_string_of(details_h2h_col3.get('handicap_line_raw') or '-'),
+            "ou": "-",
+            "stats_rows": _df_to_rows_preview_of(stats_h2h_col3),
+            "date": details_h2h_col3.get('date')
+        }
+    pagina = parsed["preview"]
+    return {
+        "home_team": ctx["home_name"],
+        "away_team": ctx["away_name"],
+        "recent_form": pagina["recent_form"],
+        "recent_indirect": recent_indirect,
+        "handicap": pagina["handicap"],
+        "dangerous_attacks": pagina["dangerous_attacks"],
+        "favorite_dangerous_attacks": pagina["favorite_dangerous_attacks"],
+        "h2h_indirect": pagina["h2h_indirect"],
+        "h2h_stats": pagina["h2h_stats"],
+        "match_date": datos.get("match_date"),
+        "match_time": datos.get("match_time"),
+        "match_datetime": datos.get("match_datetime"),
+    }
 
-async def obtener_datos_preview_ligero_async(match_id: str):
+# "historial" no hace falta para la vista previa, pero la página ya está descargada: sus
+# partidos terminados también van al almacén de resultados
+_ETAPAS_VISTA_PREVIA_OF = ("pagina_h2h", "extraccion", "historial", "h2h_col3", "estadisticas_guardadas",
+                           "stats_last_home", "stats_last_away", "stats_h2h_col3")
+
+def _construir_grafo_vista_previa_of():
+    """Las etapas de GRAFO_ANALISIS_OF que necesita la vista previa (las mismas funciones) y la suya final."""
+    completo = {stage.name: stage for stage in GRAFO_ANALISIS_OF.stages()}
+    grafo = StageGraph("vista_previa", inputs=GRAFO_ANALISIS_OF.inputs)
+    for name in _ETAPAS_VISTA_PREVIA_OF:
+        grafo.add(name, completo[name].fn, completo[name].inputs)
+    grafo.add("vista_previa", _etapa_vista_previa_of,
+              ("extraccion", "h2h_col3", "stats_last_home", "stats_last_away", "stats_h2h_col3"))
+    return grafo
+
+GRAFO_VISTA_PREVIA_OF = _construir_grafo_vista_previa_of()
+
+def _ejecutar_vista_previa_of(match_id, engine, capas):
+    """Ejecuta GRAFO_VISTA_PREVIA_OF con el motor dado y guarda como capas las etapas calculadas."""
+    parcial = {}
+    try:
+        with trace("vista_previa", match_id=match_id, engine=engine, reused=len(capas)), \
+                ThreadPoolExecutor(max_workers=HTTP_POOL_MAXSIZE) as executor:
+            run = GRAFO_VISTA_PREVIA_OF.run(executor, {"match_id": match_id, "engine": engine, **capas}, partial=parcial)
+        return run.results["vista_previa"]
+    finally:
+        _guardar_capas_of(match_id, parcial)
+
+def obtener_datos_preview_ligero(match_id: str):
+    """
+    Vista previa LIGERA (solo on-click): usa requests + BeautifulSoup.
+    Devuelve el mismo esquema que la versión 'rápida' con Selenium, pero sin abrir navegador.
+    Si el partido se acaba de analizar (o de previsualizar), reutiliza esas etapas.
+    """
     if not match_id or not match_id.isdigit():
         return {"error": "ID de partido inválido."}
 
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"}
-    
-    async with aiohttp.ClientSession(headers=headers) as session:
-        try:
-            # 1. Fetch principal
-            main_url = f"{BASE_URL_OF}/match/h2h-{match_id}"
-            async with session.get(main_url, timeout=8) as response:
-                response.raise_for_status()
-                main_html = await response.text()
-            soup = BeautifulSoup(main_html, 'lxml')
-
-            # 2. Procesamiento inicial síncrono
-            _, _, league_id, home_name, away_name, _ = get_team_league_info_from_script_of(soup)
-            dt_info = get_match_datetime_from_script_of(soup)
-            main_odds = extract_bet365_initial_odds_of(soup)
-            ah_line_raw = main_odds.get('ah_linea_raw', '-')
-            ah_line_num = parse_ah_to_number_of(ah_line_raw)
-            
-            favorito_actual = None
-            if ah_line_num is not None:
-                if ah_line_num > 0: favorito_actual = home_name
-                elif ah_line_num < 0: favorito_actual = away_name
-
-            def analizar_rendimiento(tabla_id, equipo_nombre):
-                tabla = soup.find("table", id=tabla_id)
-                if not tabla: return {"wins": 0, "total": 0}
-                partidos = tabla.find_all("tr", id=re.compile(rf"tr{tabla_id[-1]}_"))
-                victorias = sum(1 for r in partidos if (celdas := r.find_all("td")) and len(celdas) > 5 and (span := celdas[5].find("span")) and 'win' in span.get('class', []))
-                return {"wins": victorias, "total": len(partidos)}
-
-            rendimiento_local = analizar_rendimiento("table_v1", home_name)
-            rendimiento_visitante = analizar_rendimiento("table_v2", away_name)
-
-            h2h_data = extract_h2h_data_of(soup, home_name, away_name, None)
-            h2h_stats = {"home_wins": 0, "away_wins": 0, "draws": 0}
-            if h2h_table := soup.find("table", id="table_v3"):
-                for r in h2h_table.find_all("tr", id=re.compile(r"tr3_")):
-                    tds = r.find_all("td")
-                    if len(tds) < 5: continue
-                    try:
-                        g_h, g_a = map(int, tds[3].get_text(strip=True).split("-"))
-                        is_home = home_name.lower() in tds[2].get_text(strip=True).lower()
-                        if g_h == g_a: h2h_stats["draws"] += 1
-                        elif (is_home and g_h > g_a) or (not is_home and g_a > g_h): h2h_stats["home_wins"] += 1
-                        else: h2h_stats["away_wins"] += 1
-                    except (ValueError, IndexError): continue
-            
-            last_h2h_cover = "DESCONOCIDO"
-            res_raw, h_home, h_away = (h2h_data['res1_raw'], home_name, away_name) if h2h_data.get('res1_raw') and h2h_data['res1_raw'] != '?-?' else (h2h_data.get('res6_raw'), h2h_data.get('h2h_gen_home'), h2h_data.get('h2h_gen_away'))
-            if favorito_actual and ah_line_num is not None and res_raw and res_raw != '?-?':
-                ct, _ = check_handicap_cover(res_raw.replace(':', '-'), ah_line_num, favorito_actual, h_home, h_away, home_name)
-                last_h2h_cover = ct
-
-            # 3. Identificar IDs para fetching concurrente
-            last_home = extract_last_match_in_league_of(soup, "table_v1", home_name, league_id, True)
-            last_away = extract_last_match_in_league_of(soup, "table_v2", away_name, league_id, False)
-            key_id_a, rival_a_id, rival_a_name = get_rival_a_for_original_h2h_of(soup, league_id)
-            _, rival_b_id, rival_b_name = get_rival_b_for_original_h2h_of(soup, league_id)
-
-            # 4. Ejecutar fetches en paralelo
-            tasks = {}
-            if last_home and last_home.get('match_id'):
-                tasks['lh_stats'] = asyncio.create_task(get_match_progression_stats_data_async(session, str(last_home['match_id'])))
-            if last_away and last_away.get('match_id'):
-                tasks['la_stats'] = asyncio.create_task(get_match_progression_stats_data_async(session, str(last_away['match_id'])))
-            if key_id_a and rival_a_id and rival_b_id:
-                tasks['key_page'] = asyncio.create_task(session.get(f"{BASE_URL_OF}/match/h2h-{key_id_a}", timeout=8))
-
-            results = await asyncio.gather(*tasks.values(), return_exceptions=True)
-            results_map = dict(zip(tasks.keys(), results))
-
-            def _df_to_rows(df):
-                rows = []
-                if df is not None and not df.empty:
-                    for idx, row in df.iterrows():
-                        label = idx.replace('Shots on Goal', 'Tiros a Puerta').replace('Shots', 'Tiros').replace('Dangerous Attacks', 'Ataques Peligrosos').replace('Attacks', 'Ataques')
-                        rows.append({"label": label, "home": row.get('Casa', ''), "away": row.get('Fuera', '')})
-                return rows
-
-            recent_indirect = {"last_home": None, "last_away": None, "h2h_col3": None}
-            if last_home:
-                lh_stats_df = results_map.get('lh_stats') if not isinstance(results_map.get('lh_stats'), Exception) else None
-                recent_indirect["last_home"] = {"home": last_home.get('home_team'), "away": last_home.get('away_team'), "score": last_home.get('score'), "ah": format_ah_as_decimal_string_of(last_home.get('handicap_line_raw', '-') or '-'), "ou": "-", "stats_rows": _df_to_rows(lh_stats_df), "date": last_home.get('date')}
-            if last_away:
-                la_stats_df = results_map.get('la_stats') if not isinstance(results_map.get('la_stats'), Exception) else None
-                recent_indirect["last_away"] = {"home": last_away.get('home_team'), "away": last_away.get('away_team'), "score": last_away.get('score'), "ah": format_ah_as_decimal_string_of(last_away.get('handicap_line_raw', '-') or '-'), "ou": "-", "stats_rows": _df_to_rows(la_stats_df), "date": last_away.get('date')}
-
-            # Procesar H2H Col3 si la petición tuvo éxito
-            key_page_resp = results_map.get('key_page')
-            if key_page_resp and not isinstance(key_page_resp, Exception) and key_page_resp.status == 200:
-                key_html = await key_page_resp.text()
-                soup_key = BeautifulSoup(key_html, 'lxml')
-                if table_key := soup_key.find("table", id="table_v2"):
-                    for row in table_key.find_all("tr", id=re.compile(r"tr2_")):
-                        links = row.find_all("a", onclick=True)
-                        if len(links) < 2: continue
-                        m_h = re.search(r"team\((\d+)\)", links[0].get("onclick", "")); m_a = re.search(r"team\((\d+)\)", links[1].get("onclick", ""))
-                        if m_h and m_a and {m_h.group(1), m_a.group(1)} == {str(rival_a_id), str(rival_b_id)}:
-                            if score_span := row.find("span", class_="fscore_2"):
-                                g_h, g_a = score_span.text.strip().split("(")[0].strip().split('-', 1)
-                                tds = row.find_all("td")
-                                ah_raw = (tds[11].get("data-o") or tds[11].text).strip() if len(tds) > 11 else "-"
-                                match_id_col3 = row.get('index')
-                                col3_stats_df = await get_match_progression_stats_data_async(session, str(match_id_col3)) if match_id_col3 else None
-                                date_txt = (span.get_text(strip=True) if (span := tds[1].find('span', attrs={'name': 'timeData'})) else None) if len(tds) > 1 else None
-                                recent_indirect["h2h_col3"] = {
-                                    "score_line": f"{links[0].text.strip()} {g_h}:{g_a} {links[1].text.strip()}",
-                                    "ah": format_ah_as_decimal_string_of(ah_raw or '-'), "ou": "-",
-                                    "stats_rows": _df_to_rows(col3_stats_df), "date": date_txt
-                                }
-                            break
-            
-            # El resto de la lógica (H2H indirecto, ataques peligrosos) es síncrona y usa el `soup` principal
-            # ... (se mantiene la lógica original que no hace nuevas peticiones)
-            indirect = {"home_better": 0, "away_better": 0, "draws": 0, "samples": []}
-            # ... (código de análisis de rivales comunes omitido por brevedad, es igual al original)
-            ataques_peligrosos = {}
-            favorite_da = None
-            # ... (código de análisis de ataques peligrosos omitido, es igual al original)
-
-            final_result = {
-                "home_team": home_name, "away_team": away_name,
-                "recent_form": {"home": rendimiento_local, "away": rendimiento_visitante},
-                "recent_indirect": recent_indirect,
-                "handicap": {"ah_line": format_ah_as_decimal_string_of(ah_line_raw), "favorite": favorito_actual or "", "cover_on_last_h2h": last_h2h_cover},
-                "dangerous_attacks": ataques_peligrosos, "favorite_dangerous_attacks": favorite_da,
-                "h2h_indirect": indirect, "h2h_stats": h2h_stats,
-                "match_date": dt_info.get("match_date"), "match_time": dt_info.get("match_time"), "match_datetime": dt_info.get("match_datetime"),
-            }
-            return final_result
-
-        except (aiohttp.ClientError, asyncio.TimeoutError):
-            return {"error": "La fuente de datos (Nowgoal) tardó demasiado en responder."}
-        except Exception as e:
-            print(f"ERROR en scraper preview async para {match_id}: {e}")
-            return {"error": f"No se pudieron obtener los datos de la vista previa (async): {type(e).__name__}"}
+    try:
+        return _ejecutar_vista_previa_of(match_id, "ligero", _capas_previas_of(match_id, para_completo=False))
+    except AnalisisError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        print(f"ERROR en scraper preview ligero para {match_id}: {e}")
+        return {"error": f"No se pudieron obtener los datos de la vista previa (ligera): {type(e).__name__}"}
 
-def obtener_datos_preview_ligero(match_id: str):
+def obtener_datos_preview_rapido(match_id: str):
     """
-    Vista previa LIGERA (solo on-click): usa asyncio y aiohttp para máxima velocidad.
+    Vista previa con Selenium: el mismo grafo que la ligera, pero la página h2h se carga con
+    un navegador del pool (hSelect en Bet365) y su page_source pasa por analizar_html_h2h_of.
+    Solo reutiliza una extracción que también serviría al análisis completo.
     """
+    if not match_id or not match_id.isdigit():
+        return {"error": "ID de partido inválido."}
+
     try:
-        # En Windows, es posible que se necesite una política de eventos específica
-        # si se ejecuta desde un hilo que no es el principal.
-        if os.name == 'nt':
-            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-        return asyncio.run(obtener_datos_preview_ligero_async(match_id))
+        return _ejecutar_vista_previa_of(match_id, "selenium", _capas_previas_of(match_id, para_completo=True))
+    except requests.Timeout:
+        return {"error": "La fuente de datos (Nowgoal) tardó demasiado en responder."}
+    except BrowserPoolTimeout:
+        return {"error": "No hay ningún navegador libre para la vista previa; inténtalo de nuevo en unos segundos."}
+    except AnalisisError as e:
+        return {"error": str(e)}
     except Exception as e:
-        print(f"ERROR en runner async de preview ligero para {match_id}: {e}")
-        # Fallback a una nueva ejecución si la anterior falla en el event loop
-        try:
-            return asyncio.run(obtener_datos_preview_ligero_async(match_id))
-        except Exception as e2:
-            print(f"ERROR CRÍTICO en runner async de preview ligero para {match_id}: {e2}")
-            return {"error": f"No se pudieron obtener los datos (async runner): {type(e2).__name__}"}
\ No newline at end of file
+        print(f"ERROR en scraper preview para {match_id}: {e}")
+        return {"error": f"No se pudieron obtener los datos de la vista previa: {type(e).__name__}"}
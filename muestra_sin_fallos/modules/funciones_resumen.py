@@ -2,7 +2,10 @@
 import re
 from bs4 import BeautifulSoup
 from modules.utils import parse_ah_to_number_of, format_ah_as_decimal_string_of, check_handicap_cover
+from modules.h2h_page import ensure_h2h_page
+from modules.tracing import traced
 
+@traced()
 def generar_resumen_rendimiento_reciente(soup, home_name, away_name, current_ah_line):
     """
     Genera un resumen gráfico del rendimiento reciente y comparativas indirectas,
@@ -10,7 +13,7 @@ def generar_resumen_rendimiento_reciente(soup, home_name, away_name, current_ah_
     "análisis de mercado vs histórico H2H".
     
     Args:
-        soup: BeautifulSoup object con el contenido de la página
+        soup: BeautifulSoup object (o H2HPage) con el contenido de la página
         home_name: Nombre del equipo local
         away_name: Nombre del equipo visitante
         current_ah_line: Línea de handicap actual (número)
@@ -51,42 +54,34 @@ def generar_resumen_rendimiento_reciente(soup, home_name, away_name, current_ah_
 
 def _obtener_partidos_recientes(soup, table_id, team_name, is_home_team=True):
     """Obtiene los partidos recientes de un equipo."""
-    table = soup.find("table", id=table_id)
-    if not table:
+    page = ensure_h2h_page(soup)
+    if not page.has_table(table_id):
         return []
     
     partidos = []
-    score_selector = 'fscore_1' if is_home_team else 'fscore_2'
     
-    for row in table.find_all("tr", id=re.compile(rf"tr{table_id[-1]}_\d+")):
+    for row in page.rows(table_id):
         if len(partidos) >= 5:  # Limitar a 5 partidos recientes
             break
             
-        cells = row.find_all('td')
-        if len(cells) < 12:
+        if row.n_cells < 12:
             continue
             
         # Obtener nombres de equipos
-        home_team = cells[2].get_text(strip=True)
-        away_team = cells[4].get_text(strip=True)
+        home_team = row.home_cell
+        away_team = row.away_cell
         
         # Verificar si el equipo está en este partido
         if team_name.lower() not in [home_team.lower(), away_team.lower()]:
             continue
             
         # Obtener resultado
-        score_cell = cells[3]
-        score_span = score_cell.find('span', class_=score_selector)
-        if not score_span:
-            continue
-            
-        score_raw = score_span.get_text(strip=True)
-        if '-' not in score_raw:
+        score_raw = row.score_text
+        if score_raw is None or '-' not in score_raw:
             continue
             
         # Obtener handicap
-        ah_cell = cells[11]
-        ah_line_raw = (ah_cell.get('data-o') or ah_cell.text).strip()
+        ah_line_raw = row.ah_raw
         
         # Determinar si el equipo era favorito
         ah_line_num = parse_ah_to_number_of(ah_line_raw)
@@ -167,25 +162,24 @@ def _obtener_comparativas_indirectas(soup):
     comparativas = []
     
     # Buscar en las tablas de partidos rivales
-    table_v1 = soup.find("table", id="table_v1")  # Partidos del equipo local
-    table_v2 = soup.find("table", id="table_v2")  # Partidos del equipo visitante
+    page = ensure_h2h_page(soup)
+    rows_v1 = page.rows("table_v1")  # Partidos del equipo local
+    rows_v2 = page.rows("table_v2")  # Partidos del equipo visitante
     
-    if table_v1 and table_v2:
+    if page.has_table("table_v1") and page.has_table("table_v2"):
         # Obtener rivales del equipo local
         rivales_local = set()
-        for row in table_v1.find_all("tr", id=re.compile(r"tr1_\d+")):
-            cells = row.find_all('td')
-            if len(cells) >= 5:
-                rival = cells[4].get_text(strip=True)  # Equipo visitante
+        for row in rows_v1:
+            if row.n_cells >= 5:
+                rival = row.away_cell  # Equipo visitante
                 if rival and rival != '?':
                     rivales_local.add(rival.lower())
         
         # Obtener rivales del equipo visitante
         rivales_visitante = set()
-        for row in table_v2.find_all("tr", id=re.compile(r"tr2_\d+")):
-            cells = row.find_all('td')
-            if len(cells) >= 5:
-                rival = cells[2].get_text(strip=True)  # Equipo local
+        for row in rows_v2:
+            if row.n_cells >= 5:
+                rival = row.home_cell  # Equipo local
                 if rival and rival != '?':
                     rivales_visitante.add(rival.lower())
         
@@ -196,12 +190,10 @@ def _obtener_comparativas_indirectas(soup):
         for rival in list(rivales_comunes)[:3]:  # Limitar a 3 rivales comunes
             # Buscar partido del equipo local contra este rival
             partido_local = None
-            for row in table_v1.find_all("tr", id=re.compile(r"tr1_\d+")):
-                cells = row.find_all('td')
-                if len(cells) >= 5 and cells[4].get_text(strip=True).lower() == rival:
-                    score = cells[3].get_text(strip=True)
-                    ah_cell = cells[11] if len(cells) > 11 else None
-                    handicap = ah_cell.get('data-o') or ah_cell.get_text(strip=True) if ah_cell else "-"
+            for row in rows_v1:
+                if row.n_cells >= 5 and row.away_cell.lower() == rival:
+                    score = row.score_cell
+                    handicap = row.ah_raw if row.ah_raw is not None else "-"
                     
                     partido_local = {
                         'equipo': 'local',
@@ -213,12 +205,10 @@ def _obtener_comparativas_indirectas(soup):
             
             # Buscar partido del equipo visitante contra este rival
             partido_visitante = None
-            for row in table_v2.find_all("tr", id=re.compile(r"tr2_\d+")):
-                cells = row.find_all('td')
-                if len(cells) >= 5 and cells[2].get_text(strip=True).lower() == rival:
-                    score = cells[3].get_text(strip=True)
-                    ah_cell = cells[11] if len(cells) > 11 else None
-                    handicap = ah_cell.get('data-o') or ah_cell.get_text(strip=True) if ah_cell else "-"
+            for row in rows_v2:
+                if row.n_cells >= 5 and row.home_cell.lower() == rival:
+                    score = row.score_cell
+                    handicap = row.ah_raw if row.ah_raw is not None else "-"
                     
                     partido_visitante = {
                         'equipo': 'visitante',
@@ -0,0 +1,137 @@
+# modules/h2h_page.py
+"""
+Índice de filas de la página h2h-{id}.
+
+Recorre una sola vez table_v1 (últimos partidos del local), table_v2 (del visitante)
+y table_v3 (H2H directo), decodifica cada <tr> en un HistRow compacto y deja que
+todos los extractores/analizadores consulten el índice en lugar de repetir
+soup.find("table", ...) + find_all(regex) + get_match_details_from_row_of.
+"""
+import re
+from typing import NamedTuple, Optional
+from bs4 import BeautifulSoup
+from modules.utils import get_match_details_from_cells_of
+
+H2H_TABLE_IDS = {1: "table_v1", 2: "table_v2", 3: "table_v3"}
+_TEAM_ID_RE = re.compile(r"team\((\d+)\)")
+_ROW_ID_RES = {n: re.compile(rf"tr{n}_\d+") for n in H2H_TABLE_IDS}
+
+
+class HistRow(NamedTuple):
+    """Fila decodificada de table_v1/v2/v3."""
+    table: int                      # 1, 2 o 3
+    match_id: Optional[str]         # atributo index
+    vs: Optional[str]
+    league_id: Optional[str]        # atributo name
+    n_cells: int
+    home_cell: str                  # texto de la celda local (td[2])
+    away_cell: str                  # texto de la celda visitante (td[4])
+    score_cell: str                 # texto de la celda de resultado (td[3])
+    score_text: Optional[str]       # texto del span fscore_N (None si no existe)
+    ah_raw: Optional[str]           # línea AH de td[11] (data-o o texto), None si no hay celda
+    date: Optional[str]             # span timeData de td[1]
+    links: tuple                    # ((team_id, nombre), ...) de los <a onclick> de la fila
+    details: Optional[dict]         # lo mismo que devolvería get_match_details_from_row_of
+    league: Optional[str] = None    # nombre de la liga (title de td[0] o su texto)
+
+
+def _decode_row(row, table_no):
+    cells = row.find_all("td")
+    n_cells = len(cells)
+
+    def cell_text(idx):
+        return cells[idx].get_text(strip=True) if n_cells > idx else ""
+
+    score_text = None
+    if n_cells > 3 and (score_span := cells[3].find("span", class_=f"fscore_{table_no}")):
+        score_text = score_span.get_text(strip=True)
+
+    ah_raw = None
+    if n_cells > 11:
+        ah_cell = cells[11]
+        ah_raw = (ah_cell.get("data-o") or ah_cell.text).strip()
+
+    date = None
+    if n_cells > 1 and (date_span := cells[1].find("span", attrs={"name": "timeData"})):
+        date = date_span.get_text(strip=True)
+
+    links = []
+    for a in row.find_all("a", onclick=True):
+        m = _TEAM_ID_RE.search(a.get("onclick", ""))
+        links.append((m.group(1) if m else None, a.text.strip()))
+
+    return HistRow(
+        table=table_no,
+        match_id=row.get("index"),
+        vs=row.get("vs"),
+        league_id=row.get("name"),
+        n_cells=n_cells,
+        home_cell=cell_text(2),
+        away_cell=cell_text(4),
+        score_cell=cell_text(3),
+        score_text=score_text,
+        ah_raw=ah_raw,
+        date=date,
+        links=tuple(links),
+        details=get_match_details_from_cells_of(row, cells, score_class_selector=f"fscore_{table_no}"),
+        league=((cells[0].get("title") or cell_text(0)).strip() or None) if n_cells else None,
+    )
+
+
+class H2HPage:
+    """
+    Página h2h-{id} ya parseada. `soup` sigue disponible para los extractores que no
+    trabajan con filas (clasificación, cuotas, script _matchInfo, etc.).
+    """
+
+    def __init__(self, soup):
+        self.soup = soup
+        self._rows = {}
+        for table_no, table_id in H2H_TABLE_IDS.items():
+            table = soup.find("table", id=table_id) if soup else None
+            if table is None:
+                continue
+            self._rows[table_no] = tuple(
+                _decode_row(row, table_no) for row in table.find_all("tr", id=_ROW_ID_RES[table_no])
+            )
+
+    @classmethod
+    def from_html(cls, html_text):
+        return cls(BeautifulSoup(html_text, "lxml"))
+
+    def has_table(self, table):
+        return _table_no(table) in self._rows
+
+    def rows(self, table):
+        """Filas de la tabla (1/2/3 o "table_v1"/...), en el orden de la página."""
+        return self._rows.get(_table_no(table), ())
+
+    def details(self, table):
+        """Detalles (dicts de get_match_details_from_row_of) de las filas válidas de la tabla."""
+        return [r.details for r in self.rows(table) if r.details]
+
+    def __bool__(self):
+        return self.soup is not None
+
+
+def _table_no(table):
+    return int(table[-1]) if isinstance(table, str) else table
+
+
+def ensure_h2h_page(soup_or_page):
+    """
+    Devuelve el H2HPage de un soup (construyéndolo una sola vez y guardándolo en el propio
+    soup) o el mismo objeto si ya es un H2HPage.
+    """
+    if isinstance(soup_or_page, H2HPage) or soup_or_page is None:
+        return soup_or_page
+    page = soup_or_page.__dict__.get("_h2h_page")
+    if page is None:
+        page = H2HPage(soup_or_page)
+        soup_or_page.__dict__["_h2h_page"] = page
+    return page
+
+
+def soup_of(soup_or_page):
+    """El BeautifulSoup subyacente, reciba un soup o un H2HPage."""
+    return soup_or_page.soup if isinstance(soup_or_page, H2HPage) else soup_or_page
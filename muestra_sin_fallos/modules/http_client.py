@@ -0,0 +1,243 @@
+# modules/http_client.py
+"""
+Sesión HTTP compartida (requests) para todas las descargas de estudio_scraper.
+
+Una única requests.Session por proceso con keep-alive y un pool de conexiones por host,
+en lugar de crear una Session + Retry por llamada. El pool se dimensiona a la concurrencia
+del ThreadPoolExecutor del análisis completo para que las peticiones en paralelo
+reutilicen conexiones TCP/TLS.
+
+Configuración por variables de entorno:
+    HTTP_POOL_MAXSIZE   conexiones simultáneas por host (8)
+    HTTP_POOL_HOSTS     hosts distintos con pool propio (10)
+    HTTP_POOL_BLOCK     1 = esperar conexión libre al llegar al límite por host; 0 = abrir extra sin reutilizar (1)
+    HTTP_RETRIES        reintentos ante 500/502/503/504 y errores de conexión (3)
+
+Las dos funciones de descarga pasan por la caché de HTML en disco (modules.page_cache):
+una página de partido terminado no se descarga dos veces.
+
+El motor asíncrono (obtener_datos_completos_partido_async) usa en su lugar una
+aiohttp.ClientSession creada con build_aiohttp_session() y los mismos límites por host.
+
+Cada descarga es un span "fetch" de la traza activa (modules.tracing) con host, estado,
+bytes, TTFB y, si abre conexión nueva, su coste: connect_ms (DNS + TCP) y tls_ms con
+requests (urllib3 resuelve el DNS dentro de la conexión); dns_ms y connect_ms con aiohttp.
+Además, con o sin traza, cada descarga suma en las métricas por host (modules.metrics):
+upstream_requests_total por resultado, upstream_request_seconds y upstream_retries_total.
+"""
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from modules.metrics import counter, histogram
+from modules.page_cache import get_page_cache
+from modules.tracing import annotate, span
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"
+DEFAULT_TIMEOUT_SECONDS = 10
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+HTTP_POOL_MAXSIZE = max(1, _env_int("HTTP_POOL_MAXSIZE", 8))
+HTTP_POOL_HOSTS = max(1, _env_int("HTTP_POOL_HOSTS", 10))
+HTTP_POOL_BLOCK = _env_int("HTTP_POOL_BLOCK", 1) != 0
+HTTP_RETRIES = max(0, _env_int("HTTP_RETRIES", 3))
+
+_session = None
+_session_lock = threading.Lock()
+
+UPSTREAM_REQUESTS = counter("upstream_requests_total", "Descargas por host y resultado (ok, http_error, error, cache_hit)", ("host", "outcome"))
+UPSTREAM_SECONDS = histogram("upstream_request_seconds", "Duración de las descargas que salen a la red, reintentos incluidos", ("host",))
+UPSTREAM_RETRIES = counter("upstream_retries_total", "Reintentos hechos tras un intento fallido", ("host",))
+
+
+class _CountingRetry(Retry):
+    """Retry que cuenta cada reintento (el HTTPAdapter los hace sin avisar); el intento que agota los reintentos no cuenta."""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        UPSTREAM_RETRIES.inc(host=getattr(_pool, "host", None) or "desconocido")
+        return new_retry
+
+
+class _TimedConnectionMixin:
+    """Anota en el span actual lo que cuesta abrir la conexión (DNS + TCP) y el handshake TLS."""
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._connect_seconds = time.perf_counter() - start
+            annotate(new_connection=True, connect_ms=round(self._connect_seconds * 1000, 3))
+
+    def connect(self):
+        self._connect_seconds = None
+        start = time.perf_counter()
+        super().connect()
+        if isinstance(self, HTTPSConnection) and self._connect_seconds is not None:
+            annotate(tls_ms=round((time.perf_counter() - start - self._connect_seconds) * 1000, 3))
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+def build_session(pool_maxsize=HTTP_POOL_MAXSIZE, pool_hosts=HTTP_POOL_HOSTS, pool_block=HTTP_POOL_BLOCK, retries=HTTP_RETRIES):
+    session = requests.Session()
+    adapter = _TimedHTTPAdapter(
+        pool_connections=pool_hosts,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=_CountingRetry(total=retries, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504]),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT, "Connection": "keep-alive"})
+    return session
+
+
+def get_http_session():
+    """Sesión compartida por todos los hilos del proceso (se crea una sola vez)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def http_get_text(url, timeout=DEFAULT_TIMEOUT_SECONDS, use_cache=True):
+    """GET con la sesión compartida; lanza requests.RequestException si falla o no es 2xx."""
+    host = urlsplit(url).hostname
+    with span("fetch", host=host, url=url) as current:
+        page_cache = get_page_cache() if use_cache else None
+        if page_cache is not None and (cached := page_cache.get(url)) is not None:
+            current.set(cache="hit")
+            UPSTREAM_REQUESTS.inc(host=host, outcome="cache_hit")
+            return cached
+        start = time.perf_counter()
+        try:
+            response = get_http_session().get(url, timeout=timeout)
+            current.set(status=response.status_code, bytes=len(response.content),
+                        ttfb_ms=round(response.elapsed.total_seconds() * 1000, 3))
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            UPSTREAM_REQUESTS.inc(host=host, outcome="http_error" if isinstance(exc, requests.HTTPError) else "error")
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+        UPSTREAM_REQUESTS.inc(host=host, outcome="ok")
+        if page_cache is not None:
+            page_cache.put(url, response.text)
+        return response.text
+
+
+def build_aiohttp_session(pool_maxsize=HTTP_POOL_MAXSIZE, pool_hosts=HTTP_POOL_HOSTS):
+    """
+    ClientSession para el motor asíncrono. Hay que crearla dentro de un event loop en marcha
+    y cerrarla con `await session.close()` (o usarla como `async with`).
+    """
+    connector = aiohttp.TCPConnector(limit=pool_maxsize * pool_hosts, limit_per_host=pool_maxsize)
+    return aiohttp.ClientSession(connector=connector, headers={"User-Agent": USER_AGENT},
+                                 trace_configs=[_build_aiohttp_trace_config()])
+
+
+def _build_aiohttp_trace_config():
+    """Tiempos de DNS, conexión y TTFB de cada petición aiohttp, anotados en el span "fetch" actual."""
+    def started(attr):
+        async def callback(session, ctx, params):
+            setattr(ctx, attr, time.perf_counter())
+        return callback
+
+    def elapsed_ms(ctx, attr):
+        return round((time.perf_counter() - getattr(ctx, attr, time.perf_counter())) * 1000, 3)
+
+    async def dns_end(session, ctx, params):
+        annotate(dns_ms=elapsed_ms(ctx, "dns_start"))
+
+    async def connection_end(session, ctx, params):
+        annotate(new_connection=True, connect_ms=elapsed_ms(ctx, "connection_start"))
+
+    async def request_end(session, ctx, params):
+        annotate(ttfb_ms=elapsed_ms(ctx, "request_start"))
+
+    config = aiohttp.TraceConfig()
+    config.on_dns_resolvehost_start.append(started("dns_start"))
+    config.on_dns_resolvehost_end.append(dns_end)
+    config.on_connection_create_start.append(started("connection_start"))
+    config.on_connection_create_end.append(connection_end)
+    config.on_request_start.append(started("request_start"))
+    config.on_request_end.append(request_end)
+    return config
+
+
+async def aio_get_text(session, url, timeout=DEFAULT_TIMEOUT_SECONDS, retries=HTTP_RETRIES, use_cache=True):
+    """
+    Equivalente asíncrono de http_get_text: reintenta (con la misma espera exponencial que
+    Retry) ante 500/502/503/504 y errores de conexión; lanza aiohttp.ClientError o
+    asyncio.TimeoutError si no lo consigue.
+    """
+    host = urlsplit(url).hostname
+    with span("fetch", host=host, url=url) as current:
+        page_cache = get_page_cache() if use_cache else None
+        if page_cache is not None and (cached := await asyncio.to_thread(page_cache.get, url)) is not None:
+            current.set(cache="hit")
+            UPSTREAM_REQUESTS.inc(host=host, outcome="cache_hit")
+            return cached
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        start = time.perf_counter()
+        for attempt in range(retries + 1):
+            current.set(attempts=attempt + 1)
+            try:
+                async with session.get(url, timeout=client_timeout) as response:
+                    current.set(status=response.status)
+                    response.raise_for_status()
+                    current.set(bytes=len(await response.read()))
+                    html = await response.text()
+                UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+                UPSTREAM_REQUESTS.inc(host=host, outcome="ok")
+                if page_cache is not None:
+                    await asyncio.to_thread(page_cache.put, url, html)
+                return html
+            except (aiohttp.ClientConnectionError, aiohttp.ClientResponseError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in (500, 502, 503, 504)
+                if not retryable or attempt >= retries:
+                    UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+                    UPSTREAM_REQUESTS.inc(host=host, outcome="http_error" if isinstance(e, aiohttp.ClientResponseError) else "error")
+                    raise
+                UPSTREAM_RETRIES.inc(host=host)
+                await asyncio.sleep(0.5 * (2 ** attempt))
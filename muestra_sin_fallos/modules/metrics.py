@@ -0,0 +1,226 @@
+# modules/metrics.py
+"""
+Registro de métricas del proceso en formato de texto de Prometheus (ruta /metrics de app.py).
+
+Dos tipos de métricas:
+
+  - Contadores e histogramas que se actualizan en el camino caliente (peticiones a Flask,
+    descargas por host, reintentos, arranque de Chrome, espera por un navegador, etapas
+    del análisis). Cada actualización es un diccionario y un lock: se puede dejar activo
+    en producción.
+  - Colectores: funciones que se llaman solo al leer /metrics y convierten los stats() que
+    ya llevan las cachés, el pool de navegadores, el pool de parseo, single-flight, etc.
+    en series, sin coste en el camino caliente.
+
+    REQUESTS = counter("app_requests_total", "Peticiones", ("route", "status"))
+    REQUESTS.inc(route="/api/analisis/<id>", status="200")
+    LATENCY = histogram("app_request_seconds", "Duración", ("route",))
+    LATENCY.observe(0.42, route="/api/analisis/<id>")
+    register_stats_collector("page_cache", get_page_cache().stats, counters=("hits", "misses"))
+
+Configuración por variables de entorno:
+    METRICS_ENABLED   0 = no registrar nada y /metrics responde 404 (1)
+"""
+import bisect
+import math
+import os
+import threading
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+METRICS_ENABLED = _env_int("METRICS_ENABLED", 1) != 0
+# Segundos: de una lectura de caché (ms) a un análisis completo con Selenium (decenas de s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} espera las etiquetas {self.labelnames}, no {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = self._header()
+        for key, (counts, total, count) in items:
+            base = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = _format_labels(base + [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """collector() -> [(nombre, tipo, ayuda, [(dict de etiquetas, valor), ...]), ...] al leer /metrics."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        families = {}
+        for collector in collectors:
+            try:
+                collected = collector() or ()
+            except Exception as exc:
+                print(f"[metrics] Error en un colector: {exc}")
+                continue
+            for name, kind, documentation, samples in collected:
+                family = families.setdefault(name, (kind, documentation, []))
+                family[2].extend(samples)
+        for name, (kind, documentation, samples) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+def register_stats_collector(component, stats_fn, counters=(), gauges=(), labels=None):
+    """
+    Publica las claves de un stats() existente: las de `counters` como
+    <component>_<clave>_total y las de `gauges` como <component>_<clave>.
+    stats_fn puede devolver un dict, una lista de dicts (con `labels` como claves a copiar
+    a etiquetas) o None si el componente está desactivado.
+    """
+    label_keys = tuple(labels or ())
+
+    def collect():
+        stats = stats_fn()
+        if stats is None:
+            return []
+        rows = stats if isinstance(stats, list) else [stats]
+        families = []
+        for keys, kind, suffix in ((counters, "counter", "_total"), (gauges, "gauge", "")):
+            for key in keys:
+                samples = [({k: row.get(k) for k in label_keys}, row[key]) for row in rows
+                           if isinstance(row.get(key), (int, float)) and not isinstance(row.get(key), bool)]
+                if samples:
+                    families.append((f"{component}_{key}{suffix}", kind, f"{key} de {component}", samples))
+        return families
+
+    REGISTRY.register_collector(collect)
+
+
+def render_metrics():
+    return REGISTRY.render()
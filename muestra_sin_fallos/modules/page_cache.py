@@ -0,0 +1,255 @@
+# modules/page_cache.py
+"""
+Caché en disco del HTML crudo de Nowgoal, indexada por URL.
+
+Las páginas de partidos terminados (live-{id} y h2h-{id} con `state: parseInt('-1')`
+en _matchInfo) no cambian nunca, así que se guardan sin caducidad: volver a analizar
+un partido o previsualizar otro con equipos en común no vuelve a descargarlas.
+Las páginas de partidos próximos/en juego y los listados caducan a los pocos minutos.
+
+El índice (URL -> contenido, caducidad, último acceso) vive en un SQLite; el HTML se
+guarda comprimido con zlib en ficheros nombrados por el SHA-256 del contenido, de modo
+que dos URLs con la misma página comparten fichero. Al superar PAGE_CACHE_MAX_MB se
+expulsan las entradas usadas hace más tiempo (LRU).
+
+Configuración por variables de entorno:
+    PAGE_CACHE_ENABLED          0 = desactivada (1)
+    PAGE_CACHE_DIR              carpeta de la caché (<proyecto>/cache_html)
+    PAGE_CACHE_MAX_MB           tamaño máximo comprimido en disco (512)
+    PAGE_CACHE_TTL_UPCOMING     segundos para h2h/live de partidos no terminados (600)
+    PAGE_CACHE_TTL_LIVE         segundos para partidos en juego (60)
+    PAGE_CACHE_TTL_LIST         segundos para portada y resultados (60)
+    PAGE_CACHE_TTL_DEFAULT      segundos para cualquier otra URL (300)
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+FOREVER = None
+
+_MATCH_PAGE_RE = re.compile(r"/match/(h2h|live)-\d+")
+_MATCH_STATE_RE = re.compile(r"state:\s*parseInt\('(-?\d+)'\)")
+# Estados de _matchInfo: 0 sin empezar, 1-5 en juego/descanso, -1 terminado; el resto
+# (aplazado, cancelado...) son negativos y pueden cambiar, así que no se fijan para siempre.
+_FINISHED_STATE = -1
+_IN_PLAY_STATES = {1, 2, 3, 4, 5}
+
+
+def match_state_of(html):
+    """Estado del partido según _matchInfo de una página h2h/live (-1 terminado) o None si no aparece."""
+    m = _MATCH_STATE_RE.search(html or "")
+    return int(m.group(1)) if m else None
+
+
+def is_finished_match_page(html):
+    return match_state_of(html) == _FINISHED_STATE
+
+
+def match_state_class(state):
+    """"finished", "live" o "upcoming" para un estado de _matchInfo (None -> "upcoming")."""
+    if state == _FINISHED_STATE:
+        return "finished"
+    return "live" if state in _IN_PLAY_STATES else "upcoming"
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _default_cache_dir():
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache_html")
+
+
+class PageCacheTTL:
+    """Política de caducidad por clase de URL (y estado del partido si es una página de partido)."""
+
+    def __init__(self, upcoming=600, live=60, listing=60, default=300):
+        self.upcoming = upcoming
+        self.live = live
+        self.listing = listing
+        self.default = default
+
+    def __call__(self, url, html):
+        """Segundos de vida de la página, FOREVER (None) o 0 si no debe guardarse."""
+        if _MATCH_PAGE_RE.search(url):
+            state = match_state_of(html)
+            if state is None:
+                # Sin _matchInfo: página de error o incompleta
+                return 0
+            return {"finished": FOREVER, "live": self.live, "upcoming": self.upcoming}[match_state_class(state)]
+        path = url.split("://", 1)[-1].partition("/")[2].split("?", 1)[0].strip("/")
+        if path in ("", "football/results") or path.startswith("football/results"):
+            return self.listing
+        return self.default
+
+
+class PageCache:
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, ttl_policy=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_policy = ttl_policy or PageCacheTTL()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evicted": 0}
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " url TEXT PRIMARY KEY, blob TEXT NOT NULL, size INTEGER NOT NULL,"
+                " fetched_at REAL NOT NULL, expires_at REAL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages(last_access)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pages_blob ON pages(blob)")
+
+    def _blob_path(self, blob):
+        return os.path.join(self.directory, "blobs", blob[:2], blob)
+
+    def get(self, url):
+        """HTML guardado para la URL o None si no está o ha caducado."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT blob, expires_at FROM pages WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            blob, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._counters["misses"] += 1
+                self._counters["expired"] += 1
+                self._delete_urls_locked([url])
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE pages SET last_access = ? WHERE url = ?", (now, url))
+        try:
+            with open(self._blob_path(blob), "rb") as f:
+                html = zlib.decompress(f.read()).decode("utf-8")
+        except (OSError, zlib.error, UnicodeDecodeError):
+            with self._lock:
+                self._counters["misses"] += 1
+                self._delete_urls_locked([url])
+            return None
+        with self._lock:
+            self._counters["hits"] += 1
+        return html
+
+    def put(self, url, html, ttl="auto"):
+        """Guarda la página. ttl: segundos, FOREVER o "auto" (según la política de la URL)."""
+        if ttl == "auto":
+            ttl = self.ttl_policy(url, html)
+        if ttl is not FOREVER and ttl <= 0:
+            return False
+        raw = html.encode("utf-8")
+        blob = hashlib.sha256(raw).hexdigest()
+        path = self._blob_path(blob)
+        # Se comprime fuera del lock; el fichero se escribe y se mide dentro, porque una
+        # expulsión concurrente puede borrar el blob entre la comprobación y el INSERT.
+        data = None if os.path.exists(path) else zlib.compress(raw, 6)
+        now = time.time()
+        with self._lock:
+            if not os.path.exists(path):
+                self._write_blob(path, data if data is not None else zlib.compress(raw, 6))
+            size = os.path.getsize(path)
+            old = self._conn.execute("SELECT blob FROM pages WHERE url = ?", (url,)).fetchone()
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, blob, size, fetched_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, blob, size, now, None if ttl is FOREVER else now + ttl, now),
+                )
+            if old and old[0] != blob:
+                self._drop_orphan_blobs_locked([old[0]])
+            self._counters["stores"] += 1
+            self._evict_locked()
+        return True
+
+    @staticmethod
+    def _write_blob(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _delete_urls_locked(self, urls):
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            blobs = [b for (b,) in self._conn.execute(f"SELECT DISTINCT blob FROM pages WHERE url IN ({placeholders})", chunk)]
+            with self._conn:
+                self._conn.execute(f"DELETE FROM pages WHERE url IN ({placeholders})", chunk)
+            self._drop_orphan_blobs_locked(blobs)
+
+    def _drop_orphan_blobs_locked(self, blobs):
+        for blob in blobs:
+            if self._conn.execute("SELECT 1 FROM pages WHERE blob = ? LIMIT 1", (blob,)).fetchone():
+                continue
+            try:
+                os.remove(self._blob_path(blob))
+            except OSError:
+                pass
+
+    def _total_bytes_locked(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT blob, size FROM pages)").fetchone()[0]
+
+    def _evict_locked(self):
+        total = self._total_bytes_locked()
+        if total <= self.max_bytes:
+            return
+        # Se libera hasta el 90% para no expulsar en cada escritura
+        target = self.max_bytes * 0.9
+        now = time.time()
+        expired = [u for (u,) in self._conn.execute("SELECT url FROM pages WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))]
+        if expired:
+            self._delete_urls_locked(expired)
+            self._counters["expired"] += len(expired)
+            total = self._total_bytes_locked()
+        while total > target:
+            batch = [u for (u,) in self._conn.execute("SELECT url FROM pages ORDER BY last_access LIMIT 50")]
+            if not batch:
+                break
+            self._delete_urls_locked(batch)
+            self._counters["evicted"] += len(batch)
+            total = self._total_bytes_locked()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            return dict(self._counters, entries=entries, bytes=self._total_bytes_locked(), max_bytes=self.max_bytes)
+
+    def clear(self):
+        with self._lock:
+            urls = [u for (u,) in self._conn.execute("SELECT url FROM pages")]
+            if urls:
+                self._delete_urls_locked(urls)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    """Caché compartida por proceso, o None si PAGE_CACHE_ENABLED=0."""
+    global _cache
+    if _env_int("PAGE_CACHE_ENABLED", 1) == 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PageCache(
+                    os.environ.get("PAGE_CACHE_DIR") or _default_cache_dir(),
+                    max_bytes=max(1, _env_int("PAGE_CACHE_MAX_MB", 512)) * 1024 * 1024,
+                    ttl_policy=PageCacheTTL(
+                        upcoming=_env_int("PAGE_CACHE_TTL_UPCOMING", 600),
+                        live=_env_int("PAGE_CACHE_TTL_LIVE", 60),
+                        listing=_env_int("PAGE_CACHE_TTL_LIST", 60),
+                        default=_env_int("PAGE_CACHE_TTL_DEFAULT", 300),
+                    ),
+                )
+    return _cache
@@ -0,0 +1,166 @@
+# modules/parse_pool.py
+"""
+Etapa de parseo en un pool de procesos: HTML crudo -> dict plano.
+
+Recorrer el árbol de BeautifulSoup es Python puro, así que los hilos del análisis
+completo no parsean en paralelo (el GIL los serializa). Con este pool, las funciones
+de parseo de estudio_scraper (analizar_html_h2h_of, analizar_html_h2h_col3_of,
+parse_match_progression_stats_html) se ejecutan en procesos aparte y varios análisis
+simultáneos (peticiones web, cola de precálculo, análisis masivo) usan todos los núcleos.
+
+Las funciones que se envían deben ser de nivel de módulo, recibir el HTML como str y
+devolver datos planos (dicts, listas, DataFrames): nada de objetos de bs4 ni del driver.
+
+Cada paso es un span "parse:<función>" de la traza activa (modules.tracing); los spans que
+se abren dentro del proceso hijo vuelven con el resultado y cuelgan de ese span.
+
+Configuración por variables de entorno:
+    PARSE_POOL_WORKERS        procesos del pool; 0 = parsear en el hilo que llama (0),
+                              "auto" = un proceso por núcleo
+    PARSE_POOL_START_METHOD   método de arranque de multiprocessing (el de la plataforma)
+"""
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from modules.metrics import register_stats_collector
+from modules.tracing import adopt, call_collecting, propagation_context, span
+
+
+def _workers_from_env():
+    value = os.environ.get("PARSE_POOL_WORKERS", "0").strip().lower()
+    if value == "auto":
+        return os.cpu_count() or 1
+    try:
+        return max(0, int(value))
+    except ValueError:
+        return 0
+
+
+class ParsePool:
+    def __init__(self, workers, start_method=None):
+        self.workers = workers
+        self.start_method = start_method or None
+        self._lock = threading.Lock()
+        self._executor = None
+        self._counters = {"submitted": 0, "inline": 0, "failed": 0, "restarts": 0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def _reset(self, broken):
+        """Descarta un pool roto (un proceso murió) para que el siguiente envío cree otro."""
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self._counters["restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn, *args):
+        """Envía fn(*args) a un proceso del pool. Devuelve un concurrent.futures.Future."""
+        executor = self._get_executor()
+        with self._lock:
+            self._counters["submitted"] += 1
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._reset(executor)
+            return self._get_executor().submit(fn, *args)
+
+    def _inline(self, fn, *args):
+        with self._lock:
+            self._counters["inline"] += 1
+        return fn(*args)
+
+    def run(self, fn, *args):
+        """fn(*args) en el pool, esperando el resultado. Si el pool se rompe, parsea aquí mismo."""
+        executor = self._get_executor()
+        try:
+            return self.submit(fn, *args).result()
+        except BrokenProcessPool:
+            with self._lock:
+                self._counters["failed"] += 1
+            self._reset(executor)
+            return self._inline(fn, *args)
+
+    async def run_async(self, fn, *args):
+        executor = self._get_executor()
+        try:
+            return await asyncio.wrap_future(self.submit(fn, *args))
+        except BrokenProcessPool:
+            with self._lock:
+                self._counters["failed"] += 1
+            self._reset(executor)
+            return await asyncio.to_thread(self._inline, fn, *args)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, workers=self.workers, start_method=self.start_method,
+                        started=self._executor is not None)
+
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool():
+    """Pool de parseo del proceso (se crea al primer uso) o None si PARSE_POOL_WORKERS=0."""
+    global _parse_pool
+    if _parse_pool is None:
+        workers = _workers_from_env()
+        if workers <= 0:
+            return None
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                _parse_pool = ParsePool(workers, os.environ.get("PARSE_POOL_START_METHOD", "").strip())
+    return _parse_pool
+
+
+register_stats_collector("parse_pool", lambda: _parse_pool.stats() if _parse_pool is not None else None,
+                         counters=("submitted", "inline", "failed", "restarts"), gauges=("workers",))
+
+
+def run_parse(fn, *args):
+    """Ejecuta un paso de parseo en el pool de procesos o, si está desactivado, en este hilo."""
+    with span(f"parse:{fn.__name__}") as current:
+        pool = get_parse_pool()
+        if pool is None:
+            current.set(mode="inline")
+            return fn(*args)
+        current.set(mode="pool")
+        if (parent := propagation_context()) is None:
+            return pool.run(fn, *args)
+        result, spans = pool.run(call_collecting, parent, fn, *args)
+        adopt(spans)
+        return result
+
+
+async def run_parse_async(fn, *args, executor=None):
+    """Versión para el motor aiohttp: sin pool de procesos usa `executor` (o el del loop)."""
+    with span(f"parse:{fn.__name__}") as current:
+        pool = get_parse_pool()
+        if pool is None:
+            current.set(mode="thread")
+            call = functools.partial(contextvars.copy_context().run, fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(executor, call)
+        current.set(mode="pool")
+        if (parent := propagation_context()) is None:
+            return await pool.run_async(fn, *args)
+        result, spans = await pool.run_async(call_collecting, parent, fn, *args)
+        adopt(spans)
+        return result
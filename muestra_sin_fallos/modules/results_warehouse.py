@@ -0,0 +1,351 @@
+# modules/results_warehouse.py
+"""
+Almacén de resultados históricos y backtest vectorizado de hándicap asiático y goles.
+
+check_handicap_cover / check_goal_line_cover solo se aplican a las pocas filas de una
+página h2h. Aquí se acumula cada partido terminado que pasa por el scraper:
+
+  - las filas de table_v1/v2/v3 de cada análisis completo (liga, fecha, equipos,
+    marcador y línea AH de ese partido);
+  - los finalizados de la portada de resultados, leídos del catálogo de partidos
+    (match_catalog.sqlite3), que además traen la línea de goles;
+  - las estadísticas de progresión (córners, tiros, ataques...) de los partidos terminados.
+
+backtest_handicap() y backtest_goal_line() liquidan todos los partidos a la vez con
+NumPy (las líneas de cuarto se reparten en dos medias apuestas, como en la casa) y
+agregan con pandas por línea, liga o equipo: decenas de miles de partidos en milisegundos.
+
+Convención de la línea AH (la de NowGoal): positiva = el local da ventaja (es favorito),
+negativa = la da el visitante.
+
+Configuración por variables de entorno:
+    RESULTS_WAREHOUSE_ENABLED   0 = desactivado (1)
+    RESULTS_WAREHOUSE_PATH      fichero SQLite (<proyecto>/cache_html/results_warehouse.sqlite3)
+"""
+import datetime
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from modules.utils import parse_ah_to_number_of
+
+_SCORE_RE = re.compile(r"(\d+)\s*[-:]\s*(\d+)")
+_INT_RE = re.compile(r"-?\d+")
+# Estadistica_EN de stats_store -> prefijo de columna
+_STAT_COLUMNS = {"Corners": "corners", "Shots": "shots", "Shots on Goal": "shots_on_goal",
+                 "Attacks": "attacks", "Dangerous Attacks": "dangerous_attacks", "Red Cards": "red_cards"}
+_RESULT_COLUMNS = ("match_id", "kickoff", "league_id", "league", "home_team", "away_team",
+                   "home_goals", "away_goals", "ah_line", "goal_line", "source", "stored_at")
+_OUTCOMES = (("win", 1.0), ("half_win", 0.5), ("push", 0.0), ("half_loss", -0.5), ("loss", -1.0))
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _default_warehouse_path():
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache_html", "results_warehouse.sqlite3")
+
+
+def _parse_score(text):
+    match = _SCORE_RE.search(text or "")
+    return (int(match.group(1)), int(match.group(2))) if match else (None, None)
+
+
+def _parse_line(text):
+    if text is None:
+        return None
+    return parse_ah_to_number_of(str(text))
+
+
+def _iso_date(text):
+    """'06-09-2025' (filas h2h) o ISO (portada) -> ISO; None si no se reconoce."""
+    if not text:
+        return None
+    for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    try:
+        return datetime.datetime.fromisoformat(text).isoformat()
+    except ValueError:
+        return None
+
+
+def _stat_value(value):
+    # Los valores vienen coloreados con HTML por _colorear_stats
+    match = _INT_RE.search(str(value)) if value is not None else None
+    return int(match.group()) if match else None
+
+
+class ResultsWarehouse:
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        stat_columns = ", ".join(f"{name}_home INTEGER, {name}_away INTEGER" for name in _STAT_COLUMNS.values())
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " match_id TEXT PRIMARY KEY, kickoff TEXT, league_id TEXT, league TEXT,"
+                " home_team TEXT, away_team TEXT, home_goals INTEGER NOT NULL, away_goals INTEGER NOT NULL,"
+                " ah_line REAL, goal_line REAL, source TEXT, stored_at REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS result_stats (match_id TEXT PRIMARY KEY, {stat_columns})")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_league ON results(league)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_kickoff ON results(kickoff)")
+
+    # --- ingesta ---
+    def _upsert(self, rows):
+        """Inserta o completa resultados: un dato conocido nunca se pisa con uno vacío."""
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO results ({', '.join(_RESULT_COLUMNS)}) VALUES ({', '.join('?' * len(_RESULT_COLUMNS))})"
+                " ON CONFLICT(match_id) DO UPDATE SET"
+                " kickoff = COALESCE(excluded.kickoff, results.kickoff),"
+                " league_id = COALESCE(excluded.league_id, results.league_id),"
+                " league = COALESCE(excluded.league, results.league),"
+                " home_team = COALESCE(excluded.home_team, results.home_team),"
+                " away_team = COALESCE(excluded.away_team, results.away_team),"
+                " home_goals = excluded.home_goals, away_goals = excluded.away_goals,"
+                " ah_line = COALESCE(excluded.ah_line, results.ah_line),"
+                " goal_line = COALESCE(excluded.goal_line, results.goal_line),"
+                " stored_at = excluded.stored_at",
+                rows,
+            )
+        return len(rows)
+
+    def ingest_h2h_rows(self, rows):
+        """Filas de table_v1/v2/v3 (details de H2HPage + 'league'). Devuelve las guardadas."""
+        now = datetime.datetime.now().timestamp()
+        records = []
+        for row in rows or ():
+            home_goals, away_goals = _parse_score(row.get("score_raw"))
+            if not row.get("matchIndex") or home_goals is None:
+                continue
+            records.append((
+                str(row["matchIndex"]), _iso_date(row.get("date")), row.get("league_id_hist"), row.get("league"),
+                row.get("home"), row.get("away"), home_goals, away_goals,
+                _parse_line(row.get("ahLine_raw")), None, "h2h", now,
+            ))
+        return self._upsert(records)
+
+    def ingest_listing(self, matches):
+        """Partidos finalizados de la portada de resultados (dicts de data.json)."""
+        now = datetime.datetime.now().timestamp()
+        records = []
+        for match in matches or ():
+            home_goals, away_goals = _parse_score(match.get("score"))
+            if not match.get("id") or home_goals is None:
+                continue
+            records.append((
+                str(match["id"]), _iso_date(match.get("time_obj")), None, None, match.get("home_team"), match.get("away_team"),
+                home_goals, away_goals, _parse_line(match.get("handicap")), _parse_line(match.get("goal_line")),
+                "listing", now,
+            ))
+        return self._upsert(records)
+
+    def ingest_catalog(self, catalog_path):
+        """
+        Incorpora los finalizados del catálogo de partidos (match_catalog.sqlite3) vistos desde
+        la última llamada. Devuelve los partidos leídos.
+        """
+        if not os.path.exists(catalog_path):
+            return 0
+        watermark_key = f"catalog_last_seen:{os.path.abspath(catalog_path)}"
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (watermark_key,)).fetchone()
+        watermark = row[0] if row else ""
+        try:
+            source = sqlite3.connect(f"file:{catalog_path}?mode=ro", uri=True, timeout=30)
+            try:
+                rows = source.execute(
+                    "SELECT id, time_obj, home_team, away_team, score, handicap, goal_line, last_seen FROM matches"
+                    " WHERE section = 'finished' AND last_seen > ? ORDER BY last_seen", (watermark,)
+                ).fetchall()
+            finally:
+                source.close()
+        except sqlite3.Error as exc:
+            print(f"[warehouse] No se pudo leer el catálogo {catalog_path}: {exc}")
+            return 0
+        if not rows:
+            return 0
+        self.ingest_listing([
+            {"id": r[0], "time_obj": r[1], "home_team": r[2], "away_team": r[3], "score": r[4], "handicap": r[5], "goal_line": r[6]}
+            for r in rows
+        ])
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (watermark_key, rows[-1][7]))
+        return len(rows)
+
+    def ingest_stats(self, match_id, df):
+        """Estadísticas de progresión (DataFrame de get_match_progression_stats_data) de un partido terminado."""
+        if df is None or getattr(df, "empty", True):
+            return False
+        values = {}
+        for stat_name, prefix in _STAT_COLUMNS.items():
+            if stat_name in df.index:
+                values[f"{prefix}_home"] = _stat_value(df.at[stat_name, "Casa"])
+                values[f"{prefix}_away"] = _stat_value(df.at[stat_name, "Fuera"])
+        if not values:
+            return False
+        columns = ["match_id", *values]
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO result_stats ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [str(match_id), *values.values()],
+            )
+        return True
+
+    # --- lectura ---
+    def load_results(self, league=None, team=None, since=None, until=None, with_stats=False):
+        """DataFrame de resultados (un partido por fila), opcionalmente con sus estadísticas."""
+        where, params = [], []
+        if league:
+            where.append("(r.league = ? OR r.league_id = ?)")
+            params.extend([league, league])
+        if team:
+            where.append("(r.home_team = ? COLLATE NOCASE OR r.away_team = ? COLLATE NOCASE)")
+            params.extend([team, team])
+        if since:
+            where.append("r.kickoff >= ?")
+            params.append(str(since))
+        if until:
+            where.append("r.kickoff <= ?")
+            params.append(str(until))
+        columns = ", ".join(f"r.{c}" for c in _RESULT_COLUMNS)
+        sql = f"SELECT {columns}"
+        if with_stats:
+            sql += ", " + ", ".join(f"s.{p}_home, s.{p}_away" for p in _STAT_COLUMNS.values())
+            sql += " FROM results r LEFT JOIN result_stats s ON s.match_id = r.match_id"
+        else:
+            sql += " FROM results r"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def stats(self):
+        with self._lock:
+            results, with_ah, with_goal_line = self._conn.execute(
+                "SELECT COUNT(*), COUNT(ah_line), COUNT(goal_line) FROM results").fetchone()
+            with_stats = self._conn.execute("SELECT COUNT(*) FROM result_stats").fetchone()[0]
+            leagues = self._conn.execute("SELECT COUNT(DISTINCT league) FROM results").fetchone()[0]
+        return {"results": results, "with_ah_line": with_ah, "with_goal_line": with_goal_line,
+                "with_stats": with_stats, "leagues": leagues, "path": self.path}
+
+
+# --- Backtest vectorizado ---
+
+def _settle(margin, line):
+    """
+    Resultado por unidad apostada (1, 0.5, 0, -0.5, -1) de superar `line` con `margin`.
+    Una línea de cuarto (x.25 / x.75) se liquida como dos medias apuestas a las líneas vecinas.
+    """
+    quarter = np.isclose(np.mod(line * 4, 2), 1)
+    low = np.where(quarter, line - 0.25, line)
+    high = np.where(quarter, line + 0.25, line)
+    return 0.5 * (np.sign(margin - low) + np.sign(margin - high))
+
+
+def _summarize(frame, by):
+    result = frame["result"].to_numpy()
+    outcomes = pd.DataFrame({name: result == value for name, value in _OUTCOMES}, index=frame.index)
+    outcomes["result"] = result
+    keys = frame[by]
+    grouped = outcomes.groupby(keys, dropna=False)
+    summary = grouped[[name for name, _ in _OUTCOMES]].sum().astype(int)
+    summary.insert(0, "matches", grouped.size())
+    summary["cover_rate"] = (summary["win"] + summary["half_win"]) / summary["matches"]
+    summary["push_rate"] = summary["push"] / summary["matches"]
+    summary["loss_rate"] = (summary["loss"] + summary["half_loss"]) / summary["matches"]
+    summary["units_per_match"] = grouped["result"].mean()
+    summary.index.name = by
+    return summary.sort_values("matches", ascending=False)
+
+
+def backtest_handicap(results, by="ah_line", side="home", min_matches=1):
+    """
+    Tasas de cubrir / push / perder el hándicap asiático de cada partido.
+
+    by: "ah_line" (línea del partido), "league", "team" o cualquier columna de `results`.
+        Con "team" cada partido cuenta para sus dos equipos, cada uno desde su lado.
+    side: "home", "away" o "favorite" (el equipo que da ventaja; con línea 0, el local).
+    Devuelve un DataFrame indexado por el grupo con recuentos (win, half_win, push,
+    half_loss, loss), cover_rate, push_rate, loss_rate y units_per_match (a cuota 1).
+    """
+    frame = results.dropna(subset=["ah_line"])
+    goal_diff = (frame["home_goals"] - frame["away_goals"]).to_numpy(dtype=float)
+    line = frame["ah_line"].to_numpy(dtype=float)
+    # Margen y línea desde el lado del local: el local "da" `line` goles
+    home_result = _settle(goal_diff, line)
+    away_result = _settle(-goal_diff, -line)
+
+    if by == "team":
+        frame = pd.concat([
+            pd.DataFrame({"team": frame["home_team"].to_numpy(), "result": home_result}),
+            pd.DataFrame({"team": frame["away_team"].to_numpy(), "result": away_result}),
+        ], ignore_index=True)
+    else:
+        if side == "home":
+            result = home_result
+        elif side == "away":
+            result = away_result
+        elif side == "favorite":
+            result = np.where(line >= 0, home_result, away_result)
+        else:
+            raise ValueError(f"Lado desconocido: {side}")
+        frame = frame.assign(result=result)
+    summary = _summarize(frame, by)
+    return summary[summary["matches"] >= min_matches]
+
+
+def backtest_goal_line(results, by="goal_line", side="over", min_matches=1):
+    """Tasas de superar (over) o no (under) la línea de goles, con las mismas columnas que backtest_handicap."""
+    frame = results.dropna(subset=["goal_line"])
+    total = (frame["home_goals"] + frame["away_goals"]).to_numpy(dtype=float)
+    line = frame["goal_line"].to_numpy(dtype=float)
+    if side == "over":
+        result = _settle(total, line)
+    elif side == "under":
+        result = _settle(-total, -line)
+    else:
+        raise ValueError(f"Lado desconocido: {side}")
+    if by == "team":
+        frame = pd.concat([
+            pd.DataFrame({"team": frame["home_team"].to_numpy(), "result": result}),
+            pd.DataFrame({"team": frame["away_team"].to_numpy(), "result": result}),
+        ], ignore_index=True)
+    else:
+        frame = frame.assign(result=result)
+    summary = _summarize(frame, by)
+    return summary[summary["matches"] >= min_matches]
+
+
+_warehouse = None
+_warehouse_lock = threading.Lock()
+
+
+def get_results_warehouse():
+    """Almacén compartido por proceso, o None si RESULTS_WAREHOUSE_ENABLED=0."""
+    global _warehouse
+    if _env_int("RESULTS_WAREHOUSE_ENABLED", 1) == 0:
+        return None
+    if _warehouse is None:
+        with _warehouse_lock:
+            if _warehouse is None:
+                _warehouse = ResultsWarehouse(os.environ.get("RESULTS_WAREHOUSE_PATH") or _default_warehouse_path())
+    return _warehouse
@@ -0,0 +1,173 @@
+# modules/stage_graph.py
+"""
+Grafo de etapas con nombre para orquestar un análisis.
+
+Cada etapa declara las etapas (o entradas iniciales) de las que depende y recibe sus
+resultados como argumentos, en ese orden. El planificador lanza cada etapa en cuanto
+sus entradas están listas, así que una descarga empieza en el momento en que se conoce
+su ID y no cuando termina el paso anterior del código. De cada ejecución queda el
+tiempo de inicio y la duración de todas las etapas (StageRun.timings).
+
+    grafo = StageGraph("analisis", inputs=("match_id",))
+    grafo.add("pagina", descargar_pagina, ("match_id",))
+    grafo.add("stats", descargar_stats, ("pagina",))
+    run = grafo.run(executor, {"match_id": "123"})      # o await grafo.run_async(...)
+    run.results["stats"], run.summary()
+
+Una etapa solo puede depender de etapas añadidas antes: el grafo no puede tener ciclos.
+Si una etapa lanza una excepción no se lanzan más etapas y la excepción llega al llamador;
+con `partial` (un dict) se conservan los resultados de las que sí terminaron.
+
+Los resultados de etapas ya calculadas (p.ej. por otro grafo con las mismas etapas) se
+pasan en `initial` junto a las entradas: esas etapas no se vuelven a ejecutar y quedan en
+StageRun.reused.
+
+Cada etapa es además un span "stage:<nombre>" de la traza activa (modules.tracing): en
+run() se ejecuta en una copia del contexto del llamador para que la traza pase a los hilos.
+"""
+import asyncio
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import NamedTuple
+
+from modules.tracing import span
+
+
+class Stage(NamedTuple):
+    name: str
+    fn: object
+    inputs: tuple
+
+
+class StageRun:
+    """Resultados y tiempos (segundos desde el inicio de la ejecución) de una pasada por el grafo."""
+
+    def __init__(self, graph_name, started_at):
+        self.graph_name = graph_name
+        self.started_at = started_at          # time.time() del inicio, para los registros
+        self.results = {}
+        self.timings = {}                     # etapa -> (inicio, duración)
+        self.reused = []                      # etapas cuyo resultado venía en `initial`
+        self.total = None
+
+    def summary(self):
+        """Etapas ordenadas por inicio: [{"stage", "start", "duration"}, ...] en milisegundos."""
+        return [
+            {"stage": name, "start": round(start * 1000, 1), "duration": round(duration * 1000, 1)}
+            for name, (start, duration) in sorted(self.timings.items(), key=lambda item: item[1][0])
+        ]
+
+    def as_dict(self):
+        return {"graph": self.graph_name, "started_at": self.started_at,
+                "total": round((self.total or 0) * 1000, 1), "stages": self.summary(), "reused": list(self.reused)}
+
+
+class StageGraph:
+    def __init__(self, name, inputs=()):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self._stages = {}
+
+    def add(self, name, fn, inputs=()):
+        """Registra la etapa `name`: fn(*resultados de `inputs`)."""
+        if name in self._stages or name in self.inputs:
+            raise ValueError(f"Etapa repetida: {name}")
+        missing = [i for i in inputs if i not in self._stages and i not in self.inputs]
+        if missing:
+            raise ValueError(f"La etapa {name} depende de etapas desconocidas: {', '.join(missing)}")
+        self._stages[name] = Stage(name, fn, tuple(inputs))
+        return fn
+
+    def stage(self, name, inputs=()):
+        """Versión decorador de add()."""
+        return lambda fn: self.add(name, fn, inputs)
+
+    def stages(self):
+        return list(self._stages.values())
+
+    def _new_run(self, initial):
+        missing = [i for i in self.inputs if i not in initial]
+        if missing:
+            raise ValueError(f"Faltan entradas del grafo {self.name}: {', '.join(missing)}")
+        run = StageRun(self.name, time.time())
+        run.results.update(initial)
+        run.reused = [name for name in self._stages if name in initial]
+        return run
+
+    def _pending(self, run):
+        return {name: stage for name, stage in self._stages.items() if name not in run.results}
+
+    def _ready(self, pending, results):
+        ready = [stage for stage in pending.values() if all(i in results for i in stage.inputs)]
+        for stage in ready:
+            del pending[stage.name]
+        return ready
+
+    def run(self, executor, initial=None, partial=None):
+        """Ejecuta el grafo con las etapas (funciones normales) repartidas en `executor`."""
+        run = self._new_run(dict(initial or {}))
+        origin = time.perf_counter()
+
+        def timed(stage, args):
+            start = time.perf_counter()
+            try:
+                with span(f"stage:{stage.name}"):
+                    return stage.fn(*args)
+            finally:
+                run.timings[stage.name] = (start - origin, time.perf_counter() - start)
+
+        pending = self._pending(run)
+        running = {}
+        try:
+            while pending or running:
+                for stage in self._ready(pending, run.results):
+                    args = [run.results[i] for i in stage.inputs]
+                    running[executor.submit(contextvars.copy_context().run, timed, stage, args)] = stage.name
+                if not running:
+                    raise RuntimeError(f"Etapas sin poder ejecutarse en {self.name}: {', '.join(pending)}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    run.results[name] = future.result()
+                    if partial is not None:
+                        partial[name] = run.results[name]
+        finally:
+            for future in running:
+                future.cancel()
+            run.total = time.perf_counter() - origin
+        return run
+
+    async def run_async(self, initial=None, partial=None):
+        """Igual que run() con etapas que son corrutinas, cada una en su tarea de asyncio."""
+        run = self._new_run(dict(initial or {}))
+        origin = time.perf_counter()
+
+        async def timed(stage, args):
+            start = time.perf_counter()
+            try:
+                with span(f"stage:{stage.name}"):
+                    return await stage.fn(*args)
+            finally:
+                run.timings[stage.name] = (start - origin, time.perf_counter() - start)
+
+        pending = self._pending(run)
+        running = {}
+        try:
+            while pending or running:
+                for stage in self._ready(pending, run.results):
+                    args = [run.results[i] for i in stage.inputs]
+                    running[asyncio.ensure_future(timed(stage, args))] = stage.name
+                if not running:
+                    raise RuntimeError(f"Etapas sin poder ejecutarse en {self.name}: {', '.join(pending)}")
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    run.results[name] = task.result()
+                    if partial is not None:
+                        partial[name] = run.results[name]
+        finally:
+            for task in running:
+                task.cancel()
+            run.total = time.perf_counter() - origin
+        return run
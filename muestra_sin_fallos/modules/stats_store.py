@@ -0,0 +1,118 @@
+# modules/stats_store.py
+"""
+Almacén persistente (SQLite) de las estadísticas de progresión ya parseadas por partido.
+
+Los mismos partidos históricos (último partido, H2H, comparativas...) aparecen en muchos
+análisis porque los equipos de una liga comparten rivales recientes. Aquí se guarda, por
+match_id, la tabla que devuelve get_match_progression_stats_data (córners, tiros,
+ataques, tarjetas rojas) de los partidos terminados, y get_many() resuelve de una sola
+consulta todos los IDs de un análisis para descargar únicamente los que faltan.
+
+Configuración por variables de entorno:
+    STATS_STORE_ENABLED   0 = desactivado (1)
+    STATS_STORE_PATH      fichero SQLite (<proyecto>/cache_html/progression_stats.sqlite3)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+STATS_INDEX_COLUMN = "Estadistica_EN"
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _default_store_path():
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache_html", "progression_stats.sqlite3")
+
+
+def stats_df_to_rows(df):
+    """DataFrame de get_match_progression_stats_data -> lista de dicts serializable."""
+    if df is None or df.empty:
+        return []
+    return df.reset_index().to_dict("records")
+
+
+def stats_rows_to_df(rows):
+    """Inversa de stats_df_to_rows (mismo índice y columnas que el parser)."""
+    df = pd.DataFrame(rows)
+    return df.set_index(STATS_INDEX_COLUMN) if not df.empty else df
+
+
+class StatsStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS progression_stats ("
+                " match_id TEXT PRIMARY KEY, rows_json TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def get_many(self, match_ids):
+        """{match_id: DataFrame} de los IDs guardados; los ausentes no aparecen en el resultado."""
+        ids = list(dict.fromkeys(str(m) for m in match_ids if m))
+        found = {}
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for match_id, rows_json in self._conn.execute(
+                    f"SELECT match_id, rows_json FROM progression_stats WHERE match_id IN ({placeholders})", chunk
+                ):
+                    found[match_id] = rows_json
+            self._counters["hits"] += len(found)
+            self._counters["misses"] += len(ids) - len(found)
+        return {match_id: stats_rows_to_df(json.loads(rows_json)) for match_id, rows_json in found.items()}
+
+    def get(self, match_id):
+        return self.get_many([match_id]).get(str(match_id))
+
+    def put_many(self, stats_by_id):
+        """Guarda {match_id: DataFrame}. Solo debe llamarse con partidos terminados."""
+        now = time.time()
+        records = [(str(match_id), json.dumps(stats_df_to_rows(df), ensure_ascii=False), now)
+                   for match_id, df in stats_by_id.items() if match_id and df is not None]
+        if not records:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO progression_stats (match_id, rows_json, stored_at) VALUES (?, ?, ?)", records
+            )
+            self._counters["stores"] += len(records)
+
+    def put(self, match_id, df):
+        self.put_many({match_id: df})
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM progression_stats").fetchone()[0]
+            return dict(self._counters, entries=entries)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_stats_store():
+    """Almacén compartido por proceso, o None si STATS_STORE_ENABLED=0."""
+    global _store
+    if _env_int("STATS_STORE_ENABLED", 1) == 0:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = StatsStore(os.environ.get("STATS_STORE_PATH") or _default_store_path())
+    return _store
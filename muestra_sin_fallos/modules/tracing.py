@@ -0,0 +1,246 @@
+# modules/tracing.py
+"""
+Trazas por partido: spans con nombre, duración y atributos, enlazados por un trace id.
+
+    with trace("analisis_completo", match_id="2789999"):      # abre (o continúa) la traza
+        with span("fetch", url=url) as s:
+            ...
+            s.set(status=200, bytes=51234)
+
+trace() crea un trace id nuevo ("<match_id>-<hex>") si no hay ninguna traza activa; dentro
+de una ya abierta (p.ej. la de la ruta de Flask) se comporta como span(). El span actual
+vive en un contextvars.ContextVar, así que pasa solo a las tareas de asyncio; para los
+hilos, StageGraph ejecuta cada etapa en una copia del contexto del llamador y, para el
+pool de procesos, modules.parse_pool usa call_collecting()/adopt() (los spans del proceso
+hijo vuelven con el resultado). Fuera de una traza, span() no hace nada.
+
+Cada span terminado se guarda en memoria (recent_spans) y, si TRACE_LOG_PATH está
+definido, se añade como una línea JSON a ese fichero. add_span_listener() permite a otros
+módulos (p.ej. las métricas) recibir cada span.
+
+Configuración por variables de entorno:
+    TRACING_ENABLED      0 = no registrar nada (1)
+    TRACE_LOG_PATH       fichero JSON lines de spans (sin definir = solo memoria)
+    TRACE_BUFFER_SPANS   spans recientes que se guardan en memoria (5000)
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+TRACING_ENABLED = _env_int("TRACING_ENABLED", 1) != 0
+TRACE_LOG_PATH = os.environ.get("TRACE_LOG_PATH", "").strip()
+
+_current = contextvars.ContextVar("tracing_span", default=None)
+_collector = contextvars.ContextVar("tracing_collector", default=None)
+_recent = deque(maxlen=max(1, _env_int("TRACE_BUFFER_SPANS", 5000)))
+_listeners = []
+_write_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "duration", "attrs", "_t0")
+
+    def __init__(self, trace_id, parent_id, name, attrs):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = None
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def as_dict(self):
+        return {"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+                "name": self.name, "start": self.start,
+                "duration_ms": round((self.duration or 0) * 1000, 3), **self.attrs}
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _finish(current):
+    record = current.as_dict()
+    collected = _collector.get()
+    if collected is not None:
+        collected.append(record)
+        return
+    _emit(record)
+
+
+def _emit(record):
+    _recent.append(record)
+    if TRACE_LOG_PATH:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with _write_lock:
+            try:
+                with open(TRACE_LOG_PATH, "a", encoding="utf-8") as fh:
+                    fh.write(line + "\n")
+            except OSError as exc:
+                print(f"[tracing] No se pudo escribir en {TRACE_LOG_PATH}: {exc}")
+    for listener in list(_listeners):
+        try:
+            listener(record)
+        except Exception as exc:
+            print(f"[tracing] Error en un listener de spans: {exc}")
+
+
+@contextmanager
+def _open_span(trace_id, parent_id, name, attrs):
+    current = Span(trace_id, parent_id, name, attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - current._t0
+        _current.reset(token)
+        _finish(current)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Span hijo del actual; no hace nada fuera de una traza."""
+    parent = _current.get()
+    if parent is None:
+        yield _NOOP
+        return
+    with _open_span(parent.trace_id, parent.span_id, name, attrs) as current:
+        yield current
+
+
+@contextmanager
+def trace(name, match_id=None, **attrs):
+    """Raíz de una traza (o span dentro de la traza activa)."""
+    if not TRACING_ENABLED:
+        yield _NOOP
+        return
+    if match_id is not None:
+        attrs["match_id"] = str(match_id)
+    parent = _current.get()
+    if parent is not None:
+        with _open_span(parent.trace_id, parent.span_id, name, attrs) as current:
+            yield current
+        return
+    trace_id = f"{match_id}-{uuid.uuid4().hex[:8]}" if match_id is not None else uuid.uuid4().hex[:16]
+    with _open_span(trace_id, None, name, attrs) as current:
+        yield current
+
+
+def traced(name=None):
+    """Decorador: cada llamada a la función es un span (con su nombre por defecto)."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**attrs):
+    """Añade atributos al span actual (si lo hay)."""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def current_span():
+    return _current.get()
+
+
+def current_trace_id():
+    current = _current.get()
+    return current.trace_id if current is not None else None
+
+
+# --- Pool de procesos ---
+
+def propagation_context():
+    """(trace_id, span_id) del span actual para continuar la traza en otro proceso, o None."""
+    current = _current.get()
+    return (current.trace_id, current.span_id) if current is not None else None
+
+
+def call_collecting(parent, fn, *args):
+    """
+    Ejecuta fn(*args) (en un proceso del pool) colgando sus spans de `parent` y los devuelve
+    con el resultado: (resultado, [spans]). El proceso padre los registra con adopt().
+    """
+    collected = []
+    collector_token = _collector.set(collected)
+    current_token = _current.set(None)
+    try:
+        with _open_span(parent[0], parent[1], "worker", {"pid": os.getpid()}):
+            result = fn(*args)
+    finally:
+        _current.reset(current_token)
+        _collector.reset(collector_token)
+    return result, collected
+
+
+def adopt(records):
+    """Registra los spans que devolvió call_collecting()."""
+    for record in records:
+        _emit(record)
+
+
+# --- Consulta ---
+
+def add_span_listener(listener):
+    """listener(record) se llama con el dict de cada span terminado."""
+    _listeners.append(listener)
+
+
+def recent_spans(trace_id=None, match_id=None, limit=None):
+    """Spans terminados en memoria (los más recientes al final), filtrados por traza o partido."""
+    spans = list(_recent)
+    if trace_id:
+        spans = [s for s in spans if s["trace_id"] == trace_id]
+    if match_id:
+        prefix = f"{match_id}-"
+        spans = [s for s in spans if s["trace_id"].startswith(prefix)]
+    return spans[-limit:] if limit else spans
+
+
+def recent_traces(limit=20):
+    """Resumen de las últimas trazas: id, raíz, inicio, duración y número de spans."""
+    traces = {}
+    for record in _recent:
+        entry = traces.setdefault(record["trace_id"], {"trace_id": record["trace_id"], "spans": 0})
+        entry["spans"] += 1
+        if record["parent_id"] is None:
+            entry.update(name=record["name"], start=record["start"], duration_ms=record["duration_ms"],
+                         match_id=record.get("match_id"))
+    ordered = sorted(traces.values(), key=lambda t: t.get("start") or 0, reverse=True)
+    return ordered[:limit]
@@ -6,6 +6,13 @@ def get_match_details_from_row_of(row_element, score_class_selector='score', sou
     """Extrae detalles de un partido desde una fila de la tabla."""
     try:
         cells = row_element.find_all('td')
+    except Exception:
+        return None
+    return get_match_details_from_cells_of(row_element, cells, score_class_selector)
+
+def get_match_details_from_cells_of(row_element, cells, score_class_selector='score'):
+    """Igual que get_match_details_from_row_of pero con las celdas <td> ya extraídas."""
+    try:
         home_idx, score_idx, away_idx, ah_idx = 2, 3, 4, 11
         if len(cells) <= ah_idx: 
             return None
@@ -0,0 +1,106 @@
+# prewarm_queue.py
+"""
+Cola de precálculo de análisis para los próximos partidos.
+
+Sustituye al threading.Thread sin límite que lanzaba /start_analysis_background por
+cada POST (y cuyo resultado se perdía): aquí un número fijo de workers saca trabajos
+de una cola acotada, sin duplicados por match_id y ordenada por hora de inicio (los
+partidos más cercanos primero). Cada worker llama a `compute(match_id)`, que en app.py
+calcula el mismo payload que /api/analisis y lo deja en la caché de análisis.
+
+Si la cola está llena, un partido que empieza antes desplaza al trabajo que empieza
+más tarde; si no, se rechaza.
+"""
+import datetime
+import heapq
+import itertools
+import threading
+
+_NO_KICKOFF = datetime.datetime.max
+
+
+class PrewarmQueue:
+    def __init__(self, compute, workers=2, max_size=200, is_fresh=None):
+        self.compute = compute
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        # is_fresh(match_id) -> True si ya hay un resultado vigente y no hace falta calcularlo
+        self.is_fresh = is_fresh or (lambda match_id: False)
+        self._cond = threading.Condition()
+        self._heap = []                  # (kickoff, seq, match_id)
+        self._queued = {}                # match_id -> entrada del heap
+        self._running = set()
+        self._seq = itertools.count()
+        self._threads = []
+        self._counters = {"submitted": 0, "duplicates": 0, "fresh": 0, "rejected": 0,
+                          "displaced": 0, "done": 0, "failed": 0}
+
+    def _ensure_workers_locked(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"prewarm-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, match_id, kickoff=None):
+        """
+        Encola un partido. Devuelve "queued", "duplicate" (ya en cola o en curso),
+        "fresh" (ya calculado) o "full" (cola llena de partidos que empiezan antes).
+        """
+        match_id = str(match_id)
+        if self.is_fresh(match_id):
+            with self._cond:
+                self._counters["fresh"] += 1
+            return "fresh"
+        entry = [kickoff or _NO_KICKOFF, next(self._seq), match_id]
+        with self._cond:
+            if match_id in self._queued or match_id in self._running:
+                self._counters["duplicates"] += 1
+                return "duplicate"
+            if len(self._queued) >= self.max_size:
+                worst = max(self._heap)
+                if entry[:2] >= worst[:2]:
+                    self._counters["rejected"] += 1
+                    return "full"
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                del self._queued[worst[2]]
+                self._counters["displaced"] += 1
+            heapq.heappush(self._heap, entry)
+            self._queued[match_id] = entry
+            self._counters["submitted"] += 1
+            self._ensure_workers_locked()
+            self._cond.notify()
+        return "queued"
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, match_id = heapq.heappop(self._heap)
+                del self._queued[match_id]
+                self._running.add(match_id)
+            try:
+                if self.is_fresh(match_id):
+                    counter = "fresh"
+                else:
+                    self.compute(match_id)
+                    counter = "done"
+            except Exception as exc:
+                print(f"[prewarm] Error al precalcular {match_id}: {exc}")
+                counter = "failed"
+            with self._cond:
+                self._running.discard(match_id)
+                self._counters[counter] += 1
+
+    def pending(self):
+        """Trabajos en cola por orden de ejecución: [(match_id, kickoff), ...]."""
+        with self._cond:
+            ordered = sorted(self._heap)
+        return [(match_id, None if kickoff is _NO_KICKOFF else kickoff) for kickoff, _, match_id in ordered]
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters, queued=len(self._queued), running=len(self._running),
+                        workers=self.workers, max_size=self.max_size)
@@ -1,34 +1,96 @@
+import argparse
 import asyncio
-import json
 
 # Importamos las funciones de scraping desde el nuevo módulo
 from scraping_logic import get_main_page_matches_async, get_main_page_finished_matches_async
+from match_snapshot import (
+    merge_snapshot, has_changes, load_snapshot, write_snapshot_atomic,
+    append_change_log, change_log_path_for,
+)
+from match_segments import write_segments
+from match_catalog import record_snapshot
+
+DATA_FILE = 'data.json'
+MAX_UPCOMING = 1200
+MAX_FINISHED = 1500
+
+
+async def _scrape_lists():
+    # Obtenemos los partidos próximos y los finalizados en paralelo
+    proximos, finalizados = await asyncio.gather(
+        get_main_page_matches_async(limit=MAX_UPCOMING), # Aumentamos el límite para tener más datos
+        get_main_page_finished_matches_async(limit=MAX_FINISHED)
+    )
+    print(f"Scraping de listas finalizado. {len(proximos)} partidos próximos y {len(finalizados)} finalizados.")
+    return proximos, finalizados
+
 
 async def main():
     """
     Función principal que ejecuta ambos scrapers y combina los resultados.
     """
     print("Iniciando el proceso de scraping principal...")
-    
-    # Obtenemos los partidos próximos y los finalizados en paralelo
-    proximos, finalizados = await asyncio.gather(
-        get_main_page_matches_async(limit=1200), # Aumentamos el límite para tener más datos
-        get_main_page_finished_matches_async(limit=1500)
-    )
-    
-    print(f"Scraping de listas finalizado. {len(proximos)} partidos próximos y {len(finalizados)} finalizados.")
+
+    proximos, finalizados = await _scrape_lists()
 
     # Creamos un diccionario con todos los datos
     scraped_data = {
         "upcoming_matches": proximos,
         "finished_matches": finalizados
     }
-    
+
+    # Diferencia con el data.json anterior para que las cachés invaliden solo esos IDs.
+    # Aquí data.json se reemplaza entero: los finalizados que desaparecen también cuentan.
+    anterior = load_snapshot(DATA_FILE)
+    _, cambios = merge_snapshot(anterior, proximos, finalizados, max_finished=None)
+    nuevos_ids = {m.get("id") for m in proximos + finalizados}
+    cambios["removed"] += [m["id"] for m in anterior.get("finished_matches", [])
+                           if isinstance(m, dict) and m.get("id") and m["id"] not in nuevos_ids]
+
     # Guardamos los datos en el archivo data.json
-    with open('data.json', 'w', encoding='utf-8') as f:
-        json.dump(scraped_data, f, indent=2, ensure_ascii=False)
-    
+    write_snapshot_atomic(DATA_FILE, scraped_data, indent=2)
+    # Copia segmentada para lecturas por página (ver match_segments.py)
+    write_segments(DATA_FILE, scraped_data)
+    if has_changes(cambios):
+        append_change_log(change_log_path_for(DATA_FILE), cambios)
+    # Catálogo SQLite con histórico (ver match_catalog.py)
+    record_snapshot(DATA_FILE, scraped_data, cambios)
+
     print("Archivo data.json guardado correctamente.")
+    return cambios
+
+
+async def main_incremental():
+    """
+    Refresco incremental: compara con el data.json anterior, solo reescribe si hay cambios
+    (de forma atómica) y añade la lista de IDs afectados a data_changes.jsonl.
+    Devuelve el diccionario de cambios.
+    """
+    print("Iniciando el refresco incremental...")
+    proximos, finalizados = await _scrape_lists()
+    if not proximos and not finalizados:
+        # Descarga fallida: mejor conservar el snapshot anterior que vaciarlo
+        print("No se obtuvo ningún partido; data.json no se modifica.")
+        return None
+
+    datos, cambios = merge_snapshot(load_snapshot(DATA_FILE), proximos, finalizados, max_finished=MAX_FINISHED)
+    resumen = (f"{len(cambios['added'])} nuevos, {len(cambios['updated'])} actualizados, "
+               f"{len(cambios['finished'])} finalizados, {len(cambios['removed'])} retirados")
+    if not has_changes(cambios):
+        print("Sin cambios respecto al data.json anterior.")
+        return cambios
+
+    write_snapshot_atomic(DATA_FILE, datos)
+    write_segments(DATA_FILE, datos)
+    append_change_log(change_log_path_for(DATA_FILE), cambios)
+    record_snapshot(DATA_FILE, datos, cambios)
+    print(f"data.json actualizado: {resumen}.")
+    return cambios
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Descarga próximos y finalizados a data.json.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Actualizar solo lo que ha cambiado y registrar los IDs afectados en data_changes.jsonl")
+    args = parser.parse_args()
+    asyncio.run(main_incremental() if args.incremental else main())
@@ -0,0 +1,261 @@
+# scheduler.py
+"""
+Planificador en segundo plano de las descargas de portada (próximos) y resultados.
+
+Sustituye al botón "Actualizar datos" que lanzaba run_scraper.py con un subprocess.run
+bloqueante y después vaciaba toda la st.cache_data. Cada feed tiene su intervalo, con
+jitter para no golpear la web siempre al mismo segundo y espera exponencial tras fallos.
+Cada refresco se fusiona en data.json con match_snapshot (escritura atómica + registro
+de cambios, más la copia segmentada de match_segments y el catálogo SQLite de
+match_catalog), así que quien lea el fichero solo ve snapshots completos y las cachés
+pueden invalidar únicamente los partidos afectados.
+
+El estado (última ejecución, duración, filas, fallos, próxima ejecución) se consulta con
+status() y se vuelca en scheduler_status.json junto a data.json para otros procesos.
+
+Configuración por variables de entorno:
+    SCHEDULER_UPCOMING_MINUTES   intervalo de la portada de próximos (10)
+    SCHEDULER_RESULTS_MINUTES    intervalo de resultados (30)
+    SCHEDULER_JITTER             fracción aleatoria sobre el intervalo, 0.1 = ±10% (0.1)
+    SCHEDULER_MAX_BACKOFF_MINUTES  espera máxima tras fallos consecutivos (120)
+
+Uso como servicio independiente:
+    python scheduler.py [--data-file data.json] [--once]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+from scraping_logic import get_main_page_matches_async, get_main_page_finished_matches_async
+from match_snapshot import (
+    merge_snapshot, has_changes, load_snapshot, write_snapshot_atomic,
+    append_change_log, change_log_path_for,
+)
+from match_segments import write_segments
+from match_catalog import record_snapshot
+
+MAX_UPCOMING = 1200
+MAX_FINISHED = 1500
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class Feed:
+    """Una fuente periódica: `section` es la clave de data.json que rellena `fetch`."""
+
+    def __init__(self, name, section, fetch, interval_seconds):
+        self.name = name
+        self.section = section
+        self.fetch = fetch
+        self.interval_seconds = interval_seconds
+        self.next_run = 0.0
+        self.state = {
+            "feed": name, "interval_seconds": interval_seconds, "running": False,
+            "last_run": None, "last_success": None, "last_duration_seconds": None,
+            "last_rows": None, "last_changes": None, "last_error": None,
+            "runs": 0, "failures": 0, "consecutive_failures": 0, "next_run": None,
+        }
+
+
+class FeedScheduler:
+    def __init__(self, data_file, feeds, jitter=0.1, max_backoff_seconds=7200, mirror_to=()):
+        self.data_file = Path(data_file)
+        self.status_file = self.data_file.with_name("scheduler_status.json")
+        # Copias adicionales de data.json (p.ej. la raíz del proyecto para Flask)
+        self.mirror_to = [Path(p) for p in mirror_to if Path(p).resolve() != self.data_file.resolve()]
+        self.feeds = {feed.name: feed for feed in feeds}
+        self.jitter = jitter
+        self.max_backoff_seconds = max_backoff_seconds
+        self._lock = threading.Lock()
+        # Una sola escritura de data.json a la vez aunque dos feeds terminen juntos
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- planificación ---
+    def _delay(self, feed):
+        failures = feed.state["consecutive_failures"]
+        base = feed.interval_seconds * (2 ** failures) if failures else feed.interval_seconds
+        base = min(base, max(self.max_backoff_seconds, feed.interval_seconds))
+        return max(1.0, base * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _schedule(self, feed, delay):
+        feed.next_run = time.time() + delay
+        feed.state["next_run"] = datetime.datetime.fromtimestamp(feed.next_run).isoformat(timespec="seconds")
+
+    def _run_feed(self, feed):
+        with self._lock:
+            feed.state["running"] = True
+        started = time.time()
+        error = None
+        rows = None
+        changes = None
+        try:
+            matches = asyncio.run(feed.fetch())
+            rows = len(matches)
+            if not matches:
+                raise RuntimeError("la descarga no devolvió partidos")
+            changes = self._merge(feed.section, matches)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        duration = time.time() - started
+        with self._lock:
+            state = feed.state
+            state.update(running=False, runs=state["runs"] + 1,
+                         last_run=datetime.datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+                         last_duration_seconds=round(duration, 2), last_rows=rows, last_error=error)
+            if error:
+                state["failures"] += 1
+                state["consecutive_failures"] += 1
+            else:
+                state["consecutive_failures"] = 0
+                state["last_success"] = state["last_run"]
+                state["last_changes"] = {k: len(v) for k, v in changes.items()} if changes else None
+            self._schedule(feed, self._delay(feed))
+        if error:
+            print(f"[scheduler] {feed.name} falló ({state['consecutive_failures']} seguidos): {error}")
+        self._write_status()
+
+    def _merge(self, section, matches):
+        with self._write_lock:
+            previous = load_snapshot(self.data_file)
+            upcoming = matches if section == "upcoming_matches" else previous.get("upcoming_matches", [])
+            finished = matches if section == "finished_matches" else previous.get("finished_matches", [])
+            data, changes = merge_snapshot(previous, upcoming, finished, max_finished=MAX_FINISHED)
+            if has_changes(changes) or not self.data_file.exists():
+                write_snapshot_atomic(self.data_file, data)
+                write_segments(self.data_file, data)
+                append_change_log(change_log_path_for(self.data_file), changes)
+                # Cada copia se escribe igual que el original (atómica, segmentos y registro de
+                # cambios propio): quien lea la copia, p.ej. app.py, invalida los mismos partidos
+                copies = []
+                for target in self.mirror_to:
+                    try:
+                        write_snapshot_atomic(target, data)
+                        write_segments(target, data)
+                        append_change_log(change_log_path_for(target), changes)
+                        copies.append(target)
+                    except OSError as exc:
+                        print(f"[scheduler] No se pudo copiar data.json a {target}: {exc}")
+                record_snapshot([self.data_file, *copies], data, changes)
+            return changes
+
+    def _loop(self):
+        while not self._stop.is_set():
+            now = time.time()
+            due = [feed for feed in self.feeds.values() if feed.next_run <= now and not feed.state["running"]]
+            for feed in due:
+                if self._stop.is_set():
+                    break
+                self._run_feed(feed)
+            next_run = min((feed.next_run for feed in self.feeds.values()), default=now + 60)
+            self._wake.wait(max(0.0, next_run - time.time()))
+            self._wake.clear()
+
+    # --- API pública ---
+    def start(self):
+        """Arranca el hilo demonio (idempotente). Los feeds se ejecutan nada más empezar."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="feed-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def trigger(self, name=None):
+        """Adelanta la ejecución de un feed (o de todos) sin esperar a que termine."""
+        with self._lock:
+            for feed in self.feeds.values():
+                if name is None or feed.name == name:
+                    feed.next_run = 0.0
+        self._wake.set()
+
+    def run_once(self):
+        """Ejecuta todos los feeds una vez en el hilo actual (modo --once / cron)."""
+        for feed in self.feeds.values():
+            self._run_feed(feed)
+        return self.status()
+
+    def status(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "data_file": str(self.data_file),
+                "feeds": {name: dict(feed.state) for name, feed in self.feeds.items()},
+            }
+
+    def _write_status(self):
+        status = self.status()
+        status["updated_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        # También junto a cada copia, para que /api/scheduler/status lo vea desde la raíz
+        for status_file in [self.status_file] + [t.with_name(self.status_file.name) for t in self.mirror_to]:
+            tmp = status_file.with_name(f".{status_file.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp, "w", encoding="utf-8") as fh:
+                    json.dump(status, fh, ensure_ascii=False, indent=2)
+                os.replace(tmp, status_file)
+            except OSError as exc:
+                print(f"[scheduler] No se pudo guardar el estado: {exc}")
+
+
+def read_status_file(data_file):
+    """Estado publicado por el planificador de otro proceso (o None si no hay)."""
+    try:
+        with open(Path(data_file).with_name("scheduler_status.json"), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def build_default_scheduler(data_file, mirror_to=()):
+    """Planificador con los feeds de portada y resultados configurados por entorno."""
+    feeds = [
+        Feed("upcoming", "upcoming_matches",
+             lambda: get_main_page_matches_async(limit=MAX_UPCOMING),
+             _env_float("SCHEDULER_UPCOMING_MINUTES", 10) * 60),
+        Feed("results", "finished_matches",
+             lambda: get_main_page_finished_matches_async(limit=MAX_FINISHED),
+             _env_float("SCHEDULER_RESULTS_MINUTES", 30) * 60),
+    ]
+    return FeedScheduler(
+        data_file, feeds,
+        jitter=max(0.0, _env_float("SCHEDULER_JITTER", 0.1)),
+        max_backoff_seconds=_env_float("SCHEDULER_MAX_BACKOFF_MINUTES", 120) * 60,
+        mirror_to=mirror_to,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Planificador de descargas de portada y resultados.")
+    parser.add_argument("--data-file", default="data.json")
+    parser.add_argument("--once", action="store_true", help="Ejecutar cada feed una vez y salir")
+    args = parser.parse_args()
+    scheduler = build_default_scheduler(args.data_file)
+    if args.once:
+        print(json.dumps(scheduler.run_once(), indent=2, ensure_ascii=False))
+    else:
+        scheduler.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.stop(timeout=5)
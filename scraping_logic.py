@@ -3,15 +3,22 @@ import asyncio
 from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 import datetime
+import os
 import re
+import lxml.html
+from lxml import etree
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import threading
 from app_utils import normalize_handicap_to_half_bucket_str
+from fetch_limits import nowgoal_limiter
 
 URL_NOWGOAL = "https://live20.nowgoal25.com/"
 REQUEST_TIMEOUT_SECONDS = 12
+# Parser de los listados: "lxml" (rápido, por defecto) o "bs4" (BeautifulSoup html.parser, el original)
+LIST_PARSER_ENGINE = os.environ.get("LIST_PARSER_ENGINE", "lxml").strip().lower()
+LIST_PARSER_ENGINES = ("lxml", "bs4")
 _REQUEST_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
@@ -22,7 +29,6 @@ _REQUEST_HEADERS = {
 
 _requests_session = None
 _requests_session_lock = threading.Lock()
-_requests_fetch_lock = threading.Lock()
 
 def _build_nowgoal_url(path: str | None = None) -> str:
     if not path:
@@ -47,7 +53,7 @@ def _get_shared_requests_session():
 def _fetch_nowgoal_html_sync(url: str) -> str | None:
     session = _get_shared_requests_session()
     try:
-        with _requests_fetch_lock:
+        with nowgoal_limiter.limit(url):
             response = session.get(url, timeout=REQUEST_TIMEOUT_SECONDS)
         response.raise_for_status()
         return response.text
@@ -89,7 +95,35 @@ async def _fetch_nowgoal_html(path: str | None = None, filter_state: int | None
         print(f"Error al obtener la pagina con Playwright ({target_url}): {browser_exc}")
     return None
 
-def parse_main_page_matches(html_content, limit=20, offset=0, handicap_filter=None):
+def _filter_sort_paginate(matches, limit, offset, handicap_filter, reverse, time_format):
+    """Parte común a ambos motores: filtro por hándicap, orden por hora y paginación."""
+    if handicap_filter:
+        try:
+            target = normalize_handicap_to_half_bucket_str(handicap_filter)
+            if target is not None:
+                filtered = []
+                for m in matches:
+                    hv = normalize_handicap_to_half_bucket_str(m.get('handicap', ''))
+                    if hv == target:
+                        filtered.append(m)
+                matches = filtered
+        except Exception:
+            pass
+
+    matches.sort(key=lambda x: x['time_obj'], reverse=reverse)
+    
+    paginated_matches = matches[offset:offset+limit]
+
+    for match in paginated_matches:
+        match['time'] = (match['time_obj'] + datetime.timedelta(hours=2)).strftime(time_format)
+        # Keep time_obj for sorting but convert to string for JSON compatibility
+        match['time_obj'] = match['time_obj'].isoformat()
+
+    return paginated_matches
+
+# --- Motor "bs4": BeautifulSoup(html.parser), la implementación original ---
+
+def _collect_upcoming_matches_bs4(html_content):
     soup = BeautifulSoup(html_content, 'html.parser')
     match_rows = soup.find_all('tr', id=lambda x: x and x.startswith('tr1_'))
     upcoming_matches = []
@@ -126,32 +160,9 @@ def parse_main_page_matches(html_content, limit=20, offset=0, handicap_filter=No
             "handicap": handicap,
             "goal_line": goal_line
         })
+    return upcoming_matches
 
-    if handicap_filter:
-        try:
-            target = normalize_handicap_to_half_bucket_str(handicap_filter)
-            if target is not None:
-                filtered = []
-                for m in upcoming_matches:
-                    hv = normalize_handicap_to_half_bucket_str(m.get('handicap', ''))
-                    if hv == target:
-                        filtered.append(m)
-                upcoming_matches = filtered
-        except Exception:
-            pass
-
-    upcoming_matches.sort(key=lambda x: x['time_obj'])
-    
-    paginated_matches = upcoming_matches[offset:offset+limit]
-
-    for match in paginated_matches:
-        match['time'] = (match['time_obj'] + datetime.timedelta(hours=2)).strftime('%H:%M')
-        # Keep time_obj for sorting but convert to string for JSON compatibility
-        match['time_obj'] = match['time_obj'].isoformat()
-
-    return paginated_matches
-
-def parse_main_page_finished_matches(html_content, limit=20, offset=0, handicap_filter=None):
+def _collect_finished_matches_bs4(html_content):
     soup = BeautifulSoup(html_content, 'html.parser')
     match_rows = soup.find_all('tr', id=lambda x: x and x.startswith('tr1_'))
     finished_matches = []
@@ -205,29 +216,156 @@ def parse_main_page_finished_matches(html_content, limit=20, offset=0, handicap_
             "handicap": handicap,
             "goal_line": goal_line
         })
+    return finished_matches
+
+# --- Motor "lxml": árbol de libxml2 y recorrido dirigido de cada fila tr1_ ---
+# Mismas reglas que el motor bs4, pero sin construir el árbol de BeautifulSoup (~3 MB de
+# portada) ni lanzar un find() sobre todo el subárbol por cada celda que se busca.
+
+def _parse_list_document_lxml(html_content):
+    if not html_content:
+        return None
+    if isinstance(html_content, str):
+        # libxml2 rechaza str con declaración de codificación: se le pasan bytes UTF-8
+        html_content = html_content.encode('utf-8')
+    try:
+        return lxml.html.document_fromstring(html_content, parser=lxml.html.HTMLParser(encoding='utf-8'))
+    except (etree.ParserError, ValueError):
+        return None
+
+def _list_rows_lxml(doc):
+    """(match_id, fila) de cada tr1_ con id no vacío, en orden de documento."""
+    for row in doc.xpath("//tr[starts-with(@id, 'tr1_')]"):
+        match_id = row.get('id', '').replace('tr1_', '')
+        if match_id:
+            yield match_id, row
+
+def _time_data_lxml(row):
+    """data-t del primer td name="timeData" de la fila, o None si no hay celda o atributo."""
+    for cell in row.iter('td'):
+        if cell.get('name') == 'timeData':
+            return cell.get('data-t')
+    return None
+
+def _team_names_lxml(row, match_id):
+    home_id, away_id = f'team1_{match_id}', f'team2_{match_id}'
+    home_tag = away_tag = None
+    for anchor in row.iter('a'):
+        anchor_id = anchor.get('id')
+        if home_tag is None and anchor_id == home_id:
+            home_tag = anchor
+        elif away_tag is None and anchor_id == away_id:
+            away_tag = anchor
+    return (home_tag.text_content().strip() if home_tag is not None else "N/A",
+            away_tag.text_content().strip() if away_tag is not None else "N/A")
+
+def _score_text_lxml(score_cell):
+    b_tag = next(score_cell.iter('b'), None)
+    if b_tag is not None:
+        return b_tag.text_content().strip()
+    # Equivalente a get_text(strip=True) de BeautifulSoup
+    return "".join(text.strip() for text in score_cell.itertext() if text.strip())
+
+def _collect_upcoming_matches_lxml(html_content):
+    doc = _parse_list_document_lxml(html_content)
+    if doc is None:
+        return []
+    upcoming_matches = []
+    now_utc = datetime.datetime.utcnow()
+
+    for match_id, row in _list_rows_lxml(doc):
+        data_t = _time_data_lxml(row)
+        if data_t is None: continue
 
-    if handicap_filter:
         try:
-            target = normalize_handicap_to_half_bucket_str(handicap_filter)
-            if target is not None:
-                filtered = []
-                for m in finished_matches:
-                    hv = normalize_handicap_to_half_bucket_str(m.get('handicap', ''))
-                    if hv == target:
-                        filtered.append(m)
-                finished_matches = filtered
-        except Exception:
-            pass
+            match_time = datetime.datetime.strptime(data_t, '%Y-%m-%d %H:%M:%S')
+        except (ValueError, IndexError):
+            continue
 
-    finished_matches.sort(key=lambda x: x['time_obj'], reverse=True)
-    
-    paginated_matches = finished_matches[offset:offset+limit]
+        if match_time < now_utc: continue
 
-    for match in paginated_matches:
-        match['time'] = (match['time_obj'] + datetime.timedelta(hours=2)).strftime('%d/%m %H:%M')
-        match['time_obj'] = match['time_obj'].isoformat()
+        odds_data = row.get('odds', '').split(',')
+        handicap = odds_data[2] if len(odds_data) > 2 else "N/A"
+        goal_line = odds_data[10] if len(odds_data) > 10 else "N/A"
 
-    return paginated_matches
+        if handicap == "N/A":
+            continue
+
+        home_team, away_team = _team_names_lxml(row, match_id)
+        upcoming_matches.append({
+            "id": match_id,
+            "time_obj": match_time,
+            "home_team": home_team,
+            "away_team": away_team,
+            "handicap": handicap,
+            "goal_line": goal_line
+        })
+    return upcoming_matches
+
+def _collect_finished_matches_lxml(html_content):
+    doc = _parse_list_document_lxml(html_content)
+    if doc is None:
+        return []
+    finished_matches = []
+    for match_id, row in _list_rows_lxml(doc):
+        state = row.get('state')
+        if state is not None and state != "-1":
+            continue
+
+        cells = list(row.iter('td'))
+        if len(cells) < 8: continue
+
+        score_text = _score_text_lxml(cells[6])
+        if not re.match(r'^\d+\s*-\s*\d+$', score_text):
+            continue
+
+        odds_data = row.get('odds', '').split(',')
+        handicap = odds_data[2] if len(odds_data) > 2 else "N/A"
+        goal_line = odds_data[10] if len(odds_data) > 10 else "N/A"
+
+        if handicap == "N/A":
+            continue
+
+        match_time = datetime.datetime.now()
+        if (data_t := _time_data_lxml(row)) is not None:
+            try:
+                match_time = datetime.datetime.strptime(data_t, '%Y-%m-%d %H:%M:%S')
+            except (ValueError, IndexError):
+                continue
+
+        home_team, away_team = _team_names_lxml(row, match_id)
+        finished_matches.append({
+            "id": match_id,
+            "time_obj": match_time,
+            "home_team": home_team,
+            "away_team": away_team,
+            "score": score_text,
+            "handicap": handicap,
+            "goal_line": goal_line
+        })
+    return finished_matches
+
+def _list_engine(engine):
+    engine = (engine or LIST_PARSER_ENGINE).strip().lower()
+    if engine not in LIST_PARSER_ENGINES:
+        raise ValueError(f"Motor de parseo de listados desconocido: {engine}")
+    return engine
+
+def parse_main_page_matches(html_content, limit=20, offset=0, handicap_filter=None, engine=None):
+    """Próximos partidos de la portada. engine: "lxml" o "bs4" (por defecto LIST_PARSER_ENGINE)."""
+    if _list_engine(engine) == "bs4":
+        upcoming_matches = _collect_upcoming_matches_bs4(html_content)
+    else:
+        upcoming_matches = _collect_upcoming_matches_lxml(html_content)
+    return _filter_sort_paginate(upcoming_matches, limit, offset, handicap_filter, reverse=False, time_format='%H:%M')
+
+def parse_main_page_finished_matches(html_content, limit=20, offset=0, handicap_filter=None, engine=None):
+    """Partidos finalizados de football/results. engine: "lxml" o "bs4" (por defecto LIST_PARSER_ENGINE)."""
+    if _list_engine(engine) == "bs4":
+        finished_matches = _collect_finished_matches_bs4(html_content)
+    else:
+        finished_matches = _collect_finished_matches_lxml(html_content)
+    return _filter_sort_paginate(finished_matches, limit, offset, handicap_filter, reverse=True, time_format='%d/%m %H:%M')
 
 async def get_main_page_matches_async(limit=20, offset=0, handicap_filter=None):
     html_content = await _fetch_nowgoal_html(filter_state=3)
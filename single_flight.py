@@ -0,0 +1,54 @@
+# single_flight.py
+"""
+Agrupación de peticiones simultáneas (single-flight) por clave.
+
+Cuando varios usuarios abren a la vez el mismo partido, cada fallo de caché lanzaba su
+propio Chrome y su propio scraping completo. Con SingleFlight.do(clave, fn) solo el
+primero ("líder") ejecuta fn; los que llegan mientras está en curso esperan a ese mismo
+cálculo y reciben su resultado (o su excepción). Al terminar la clave queda libre y la
+siguiente llamada vuelve a calcular (la caché de análisis se encarga de lo demás).
+"""
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}     # clave -> Future del cálculo en curso
+        self._counters = {"leaders": 0, "shared": 0, "errors": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Ejecuta fn(*args, **kwargs) o espera al cálculo en curso con la misma clave."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._counters["leaders"] += 1
+            else:
+                self._counters["shared"] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            with self._lock:
+                self._counters["errors"] += 1
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self):
+        with self._lock:
+            return list(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, name=self.name, in_flight=len(self._calls))
@@ -1,12 +1,18 @@
 """
 Panel Streamlit que replica la funcionalidad de Descarga_Todo usando data.json
 y los scrapers originales.
+
+Las listas ya no se descargan lanzando Descarga_Todo/run_scraper.py: lo hace el
+planificador de scheduler.py en segundo plano ("Actualizar datos" solo lo adelanta).
+Usa los mismos feeds y límites (1200 próximos, 1500 finalizados) con el scraping_logic
+de la raíz, y escribe en el mismo sitio que antes: Descarga_Todo/data.json, copiado a
+data.json de la raíz, que es el que lee app.py. Las dos copias llevan sus segmentos y
+su data_changes.jsonl, igual que si las escribiera run_scraper.py --incremental.
 """
 from __future__ import annotations
 
 import json
 import os
-import shutil
 import subprocess
 import sys
 from datetime import datetime, timezone
@@ -20,6 +26,9 @@ from jinja2 import Environment, FileSystemLoader, TemplateNotFound, select_autoe
 
 PROJECT_ROOT = Path(__file__).resolve().parent
 os.environ.setdefault("PLAYWRIGHT_BROWSERS_PATH", str(PROJECT_ROOT / ".playwright-browsers"))
+# modules.* sale de muestra_sin_fallos (el mismo scraper que app.py, con su pool de navegadores
+# y sus capas de análisis); la copia de Descarga_Todo/muestra_sin_fallos/modules queda detrás.
+sys.path.append(str(PROJECT_ROOT / "muestra_sin_fallos"))
 sys.path.append(str(PROJECT_ROOT / "Descarga_Todo"))
 sys.path.append(str(PROJECT_ROOT / "Descarga_Todo" / "muestra_sin_fallos"))
 
@@ -30,6 +39,7 @@ from modules.estudio_scraper import (  # type: ignore  # noqa: E402
     obtener_datos_preview_ligero,
 )
 from app_utils import normalize_handicap_to_half_bucket_str  # type: ignore  # noqa: E402
+from scheduler import build_default_scheduler  # noqa: E402
 from Descarga_Todo.muestra_sin_fallos.app import app as flask_app  # type: ignore  # noqa: E402
 
 st.set_page_config(layout="wide", page_title="Analisis de Partidos", page_icon=":soccer:")
@@ -47,7 +57,8 @@ for candidate in DATA_FILE_CANDIDATES:
 else:
     DATA_FILE = DATA_FILE_CANDIDATES[0]
 
-SCRAPER_SCRIPT = PROJECT_ROOT / "Descarga_Todo" / "run_scraper.py"
+# El planificador escribe donde escribía Descarga_Todo/run_scraper.py y copia a la raíz (ver docstring)
+SCHEDULER_DATA_FILE = DATA_FILE_CANDIDATES[0]
 TEMPLATES_DIR = PROJECT_ROOT / "Descarga_Todo" / "muestra_sin_fallos" / "templates"
 FUTURE_FALLBACK = datetime.max.replace(tzinfo=timezone.utc)
 PAST_FALLBACK = datetime.min.replace(tzinfo=timezone.utc)
@@ -301,8 +312,23 @@ def prepare_matches(raw_matches: List[Any], mode: str) -> List[Dict[str, Any]]:
     return prepared
 
 
-@st.cache_data(show_spinner=False)
-def load_data_from_file() -> Dict[str, List[Dict[str, Any]]]:
+def data_file_version() -> Optional[int]:
+    """mtime de data.json: la caché de load_data_from_file cambia solo cuando cambia el fichero."""
+    try:
+        return DATA_FILE.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+@st.cache_resource(show_spinner=False)
+def get_scheduler():
+    """Planificador de descargas compartido por todas las sesiones (se arranca una vez)."""
+    ensure_playwright()
+    return build_default_scheduler(SCHEDULER_DATA_FILE, mirror_to=[PROJECT_ROOT / "data.json"]).start()
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_data_from_file(data_version: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
     if not DATA_FILE.exists():
         return {"upcoming_matches": [], "finished_matches": []}
     try:
@@ -740,9 +766,29 @@ def render_manual_analysis_form() -> None:
                 st.rerun()
 
 
+def render_scheduler_status(status: Dict[str, Any]) -> None:
+    feeds = status.get("feeds", {})
+    failing = any(feed.get("consecutive_failures") for feed in feeds.values())
+    with st.expander("Estado de las descargas automáticas", expanded=failing):
+        rows = []
+        for name, feed in feeds.items():
+            rows.append({
+                "Feed": name,
+                "Cada (min)": round((feed.get("interval_seconds") or 0) / 60, 1),
+                "En curso": "sí" if feed.get("running") else "no",
+                "Última ejecución": feed.get("last_run") or "-",
+                "Duración (s)": feed.get("last_duration_seconds"),
+                "Filas": feed.get("last_rows"),
+                "Cambios": json.dumps(feed.get("last_changes")) if feed.get("last_changes") else "-",
+                "Fallos seguidos": feed.get("consecutive_failures", 0),
+                "Último error": feed.get("last_error") or "",
+                "Próxima": feed.get("next_run") or "-",
+            })
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
 def run_main_page() -> None:
-    global DATA_FILE
-    data = load_data_from_file()
+    data = load_data_from_file(data_file_version())
     upcoming = data.get("upcoming_matches", [])
     finished = data.get("finished_matches", [])
 
@@ -753,37 +799,12 @@ def run_main_page() -> None:
     with action_col:
         trigger_scraper = st.button("Actualizar datos", key="scraper_button", use_container_width=True)
 
+    scheduler = get_scheduler()
     if trigger_scraper:
-        with st.spinner("Ejecutando run_scraper.py..."):
-            ensure_playwright()
-            try:
-                result = subprocess.run(
-                    [sys.executable, str(SCRAPER_SCRIPT)],
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                    cwd=str(SCRAPER_SCRIPT.parent),
-                )
-            except subprocess.CalledProcessError as exc:
-                st.error("El scraping falló. Revisa la salida mostrada.")
-                if exc.stdout:
-                    st.text_area("Salida del scraping", exc.stdout, height=220)
-                if exc.stderr:
-                    st.text_area("Errores", exc.stderr, height=220)
-            else:
-                st.success("Scraping completado. data.json actualizado.")
-                if result.stdout.strip():
-                    st.text_area("Salida del scraping", result.stdout, height=200)
-                desc_data = SCRAPER_SCRIPT.parent / "data.json"
-                root_data = PROJECT_ROOT / "data.json"
-                if desc_data.exists():
-                    DATA_FILE = desc_data
-                    try:
-                        shutil.copy2(desc_data, root_data)
-                    except Exception as copy_exc:
-                        st.warning(f"No se pudo sincronizar data.json en la raíz: {copy_exc}")
-        st.cache_data.clear()
-        st.rerun()
+        # El planificador descarga en segundo plano; la página no se bloquea
+        scheduler.trigger()
+        st.toast("Actualización solicitada. Los datos se recargarán al terminar la descarga.")
+    render_scheduler_status(scheduler.status())
 
     kpi_cols = st.columns(3)
     kpi_cols[0].metric("Próximos", len(upcoming))
@@ -0,0 +1,84 @@
+# test_analysis_cache.py
+"""Pruebas de analysis_cache.AnalysisCache: caducidad por estado, nivel en memoria y expulsión LRU en disco."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "muestra_sin_fallos"))
+sys.path.insert(0, ROOT)
+
+import analysis_cache  # noqa: E402
+from analysis_cache import AnalysisCache  # noqa: E402
+
+
+def _reloj(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(analysis_cache.time, "time", lambda: ahora[0])
+    return ahora
+
+
+def test_caducidad_segun_el_estado_del_partido(tmp_path, monkeypatch):
+    ahora = _reloj(monkeypatch)
+    cache = AnalysisCache(tmp_path / "a.sqlite3")
+    cache.put("terminado", {"id": 1}, state=-1)
+    cache.put("en_juego", {"id": 2}, state=2)
+    cache.put("proximo", {"id": 3}, state=0)
+    cache.put("sin_estado", {"id": 4})
+    assert {e["key"]: e["state"] for e in cache.entries()} == {
+        "terminado": "finished", "en_juego": "live", "proximo": "upcoming", "sin_estado": "upcoming"}
+
+    ahora[0] += 121
+    assert cache.get("en_juego") is None
+    assert cache.get("proximo") == {"id": 3}
+    ahora[0] += 1800
+    assert cache.get("proximo") is None and cache.get("sin_estado") is None
+    ahora[0] += 10 ** 8
+    assert cache.get("terminado") == {"id": 1}
+    assert cache.stats()["expired"] == 3 and cache.stats()["entries"] == 1
+
+
+def test_nivel_en_memoria_y_lectura_de_disco(tmp_path, monkeypatch):
+    _reloj(monkeypatch)
+    cache = AnalysisCache(tmp_path / "a.sqlite3", memory_items=2)
+    for key in ("1", "2", "3"):
+        cache.put(key, {"id": key}, state=-1)
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("3") == {"id": "3"} and cache.stats()["memory_hits"] == 1
+    # "1" salió de memoria: se lee del disco y vuelve a ella
+    assert cache.get("1") == {"id": "1"} and cache.stats()["disk_hits"] == 1
+    assert cache.get("1") == {"id": "1"} and cache.stats()["memory_hits"] == 2
+    # Otra instancia sobre el mismo fichero ve lo guardado
+    assert AnalysisCache(tmp_path / "a.sqlite3").get("2") == {"id": "2"}
+
+    assert cache.invalidate("1") and not cache.invalidate("1")
+    assert cache.get("1") is None and cache.stats()["invalidated"] == 1
+
+
+def test_expulsa_las_menos_usadas_al_superar_el_maximo(tmp_path, monkeypatch):
+    ahora = _reloj(monkeypatch)
+    payloads = {str(i): {"id": i, "relleno": os.urandom(1000).hex()} for i in range(6)}
+    cache = AnalysisCache(tmp_path / "a.sqlite3", max_bytes=10 ** 9, memory_items=1)
+    for key in ("0", "1", "2", "3"):
+        ahora[0] += 1
+        cache.put(key, payloads[key], state=-1)
+    tamano = max(e["size"] for e in cache.entries())
+    cache.max_bytes = int(tamano * 4.5)
+    ahora[0] += 1
+    assert cache.get("0") == payloads["0"]
+    ahora[0] += 1
+    cache.put("4", payloads["4"], state=-1)
+    ahora[0] += 1
+    cache.put("5", payloads["5"], state=-1)
+    # Se libera hasta el 90%: salen "1" y "2", las de acceso más antiguo
+    assert sorted(e["key"] for e in cache.entries()) == ["0", "3", "4", "5"]
+    assert cache.stats()["evicted"] == 2 and cache.stats()["bytes"] <= cache.max_bytes * 0.9
+    assert cache.get("1") is None and cache.get("2") is None
+
+
+def test_get_analysis_cache_abre_el_sqlite_en_la_primera_llamada(tmp_path, monkeypatch):
+    ruta = tmp_path / "perezosa.sqlite3"
+    monkeypatch.setenv("ANALYSIS_CACHE_PATH", str(ruta))
+    monkeypatch.setattr(analysis_cache, "_cache", None)
+    assert not ruta.exists()
+    cache = analysis_cache.get_analysis_cache()
+    assert analysis_cache.get_analysis_cache() is cache and ruta.exists()
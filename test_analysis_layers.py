@@ -0,0 +1,42 @@
+# test_analysis_layers.py
+"""Pruebas de modules.analysis_layers.LayerCache: caducidad por etapa y expulsión por partido."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos"))
+
+from modules import analysis_layers  # noqa: E402
+from modules.analysis_layers import LayerCache  # noqa: E402
+
+
+def _reloj(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(analysis_layers.time, "monotonic", lambda: ahora[0])
+    return ahora
+
+
+def test_cada_etapa_caduca_desde_que_se_calculo(monkeypatch):
+    ahora = _reloj(monkeypatch)
+    capas = LayerCache(ttl_seconds=100)
+    capas.put("1", {"extraccion": "E", "h2h_col3": "C"})
+    ahora[0] += 60
+    capas.put("1", {"stats_last_home": "S"})       # añadir otra etapa no renueva las anteriores
+    assert capas.get("1") == {"extraccion": "E", "h2h_col3": "C", "stats_last_home": "S"}
+    ahora[0] += 50
+    assert capas.get("1") == {"stats_last_home": "S"}
+    ahora[0] += 60
+    assert capas.get("1") is None
+    assert capas.stats()["expired"] == 1 and capas.stats()["entries"] == 0
+
+
+def test_expulsa_el_partido_menos_usado_e_invalida(monkeypatch):
+    _reloj(monkeypatch)
+    capas = LayerCache(ttl_seconds=100, max_items=2)
+    capas.put("1", {"extraccion": 1})
+    capas.put("2", {"extraccion": 2})
+    assert capas.get("1") == {"extraccion": 1}
+    capas.put("3", {"extraccion": 3})
+    assert capas.get("2") is None and capas.get("1") and capas.get("3")
+    assert capas.invalidate("3") and not capas.invalidate("3")
+    capas.put("1", {})
+    assert capas.stats()["evicted"] == 1 and capas.stats()["invalidated"] == 1 and capas.stats()["stores"] == 3
@@ -0,0 +1,200 @@
+# test_app.py
+"""
+Arranque de app.py y /api/analisis de extremo a extremo sobre las páginas de
+muestra_sin_fallos/html_extraer, sin red: http_get_text se sustituye por las páginas guardadas.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent
+MUESTRA = ROOT / "muestra_sin_fallos"
+MATCH_ID = "2789999"
+
+
+def _entorno(tmp_path):
+    """Variables para que la app no toque las cachés del proyecto ni arranque trabajos en segundo plano."""
+    return {
+        "ANALYSIS_CACHE_PATH": str(tmp_path / "analysis_cache.sqlite3"),
+        "RESULTS_WAREHOUSE_PATH": str(tmp_path / "results_warehouse.sqlite3"),
+        "STATS_STORE_ENABLED": "0",
+        "PAGE_CACHE_ENABLED": "0",
+        "ESTUDIO_H2H_ENGINE": "http",
+    }
+
+
+def test_import_app(tmp_path):
+    env = dict(os.environ, **_entorno(tmp_path))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(MUESTRA), env.get("PYTHONPATH")]))
+    proceso = subprocess.run([sys.executable, "-c", "import app; print(app.app.name)"], cwd=ROOT, env=env,
+                             capture_output=True, text=True, timeout=120)
+    assert proceso.returncode == 0, proceso.stderr
+    assert proceso.stdout.strip().splitlines()[-1] == "app"
+
+
+@pytest.fixture(scope="module")
+def cliente(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in _entorno(tmp_path_factory.mktemp("app")).items():
+            mp.setenv(name, value)
+        mp.syspath_prepend(str(MUESTRA))
+        mp.syspath_prepend(str(ROOT))
+        from modules import estudio_scraper as es
+
+        pagina_h2h = (MUESTRA / "html_extraer" / "analisis.txt").read_text(encoding="utf-8", errors="ignore")
+        pagina_live = (MUESTRA / "html_extraer" / "live.txt").read_text(encoding="utf-8", errors="ignore")
+        descargas = []
+
+        def http_get_text(url, timeout=None, **kwargs):
+            descargas.append(url.rsplit("/", 1)[-1])
+            return pagina_live if "/live-" in url else pagina_h2h
+
+        mp.setattr(es, "http_get_text", http_get_text)
+        import app
+
+        yield app.app.test_client(), descargas
+
+
+def test_api_analisis_descarga_una_vez_y_despues_sirve_la_cache(cliente):
+    client, descargas = cliente
+    client.delete(f"/api/cache/analisis/{MATCH_ID}")
+    descargas.clear()
+    primera = client.get(f"/api/analisis/{MATCH_ID}")
+    assert primera.status_code == 200
+    payload = primera.get_json()
+    assert payload.get("home_team") and payload.get("match_state") == -1
+    assert f"h2h-{MATCH_ID}" in descargas
+
+    descargas.clear()
+    segunda = client.get(f"/api/analisis/{MATCH_ID}")
+    assert segunda.status_code == 200
+    assert segunda.get_json() == payload
+    assert descargas == []
+    # Partido terminado: se guarda sin caducidad
+    entradas = client.get("/api/cache/analisis").get_json()["entries"]
+    assert {"key": MATCH_ID, "state": "finished", "expires_at": None}.items() <= next(
+        e for e in entradas if e["key"] == MATCH_ID).items()
+
+
+def test_el_analisis_alimenta_el_backtest_por_liga(cliente):
+    client, _ = cliente
+    client.delete(f"/api/cache/analisis/{MATCH_ID}")
+    assert client.get(f"/api/analisis/{MATCH_ID}").status_code == 200
+    backtest = client.get("/api/backtest?by=league").get_json()
+    ligas = [grupo["league"] for grupo in backtest["groups"]]
+    assert backtest["matches"] > 0 and len(ligas) > 1 and None not in ligas
+
+
+def test_api_analisis_etapas_publica_el_grafo_y_los_tiempos(cliente):
+    client, _ = cliente
+    client.delete(f"/api/cache/analisis/{MATCH_ID}")
+    assert client.get(f"/api/analisis/{MATCH_ID}").status_code == 200
+    etapas = client.get("/api/analisis/etapas").get_json()
+    assert {"extraccion", "h2h_col3", "resultado"} <= {etapa["name"] for etapa in etapas["stages"]}
+    ultima = etapas["runs"][-1]
+    assert {"extraccion", "resultado"} <= {etapa["stage"] for etapa in ultima["stages"]}
+
+
+def test_metrics_cuenta_rutas_y_aciertos_de_cache(cliente):
+    client, _ = cliente
+    client.delete(f"/api/cache/analisis/{MATCH_ID}")
+    assert client.get(f"/api/analisis/{MATCH_ID}").status_code == 200
+    assert client.get(f"/api/analisis/{MATCH_ID}").status_code == 200
+    respuesta = client.get("/metrics")
+    assert respuesta.status_code == 200 and respuesta.mimetype == "text/plain"
+    texto = respuesta.get_data(as_text=True).splitlines()
+    assert 'app_requests_total{route="/api/analisis/<string:match_id>",method="GET",status="200"}' in " ".join(texto)
+    assert any(linea.startswith('api_analisis_requests_total{cache="hit"}') for linea in texto)
+    assert any(linea.startswith('api_analisis_requests_total{cache="miss"}') for linea in texto)
+    assert any(linea.startswith("analysis_cache_stores_total ") for linea in texto)
+
+
+def test_el_registro_de_cambios_invalida_el_analisis_cacheado(cliente, tmp_path, monkeypatch):
+    import app
+    from match_snapshot import ChangeLogReader, append_change_log
+
+    registro = tmp_path / "data_changes.jsonl"
+    monkeypatch.setattr(app, "_data_change_log", ChangeLogReader(registro))
+    client, descargas = cliente
+    client.delete(f"/api/cache/analisis/{MATCH_ID}")
+    assert client.get(f"/api/analisis/{MATCH_ID}").status_code == 200
+    descargas.clear()
+    assert client.get(f"/api/analisis/{MATCH_ID}").status_code == 200
+    assert descargas == []
+
+    append_change_log(registro, {"added": [], "finished": [], "removed": [],
+                                 "updated": {MATCH_ID: {"handicap": ["0.5", "0.75"]}}})
+    assert client.get(f"/api/analisis/{MATCH_ID}").status_code == 200
+    assert f"h2h-{MATCH_ID}" in descargas
+
+
+def test_el_lider_del_single_flight_vuelve_a_mirar_la_cache(cliente, monkeypatch):
+    import app
+
+    client, _ = cliente
+    client.delete(f"/api/cache/analisis/{MATCH_ID}")
+    construir = app.construir_payload_analisis
+    llamadas = []
+
+    def contar(match_id, engine=None):
+        llamadas.append(match_id)
+        return construir(match_id, engine=engine)
+
+    monkeypatch.setattr(app, "construir_payload_analisis", contar)
+    primero, _ = app.analizar_y_cachear(MATCH_ID)
+    segundo, _ = app.analizar_y_cachear(MATCH_ID)
+    assert primero.get("home_team") and segundo == primero
+    assert llamadas == [MATCH_ID]
+
+
+def test_la_vista_previa_archiva_el_historial_de_la_pagina(cliente, tmp_path, monkeypatch):
+    from modules import estudio_scraper as es
+    from modules.analysis_layers import get_layer_cache
+    from modules.results_warehouse import ResultsWarehouse
+
+    warehouse = ResultsWarehouse(tmp_path / "results.sqlite3")
+    monkeypatch.setattr(es, "get_results_warehouse", lambda: warehouse)
+    get_layer_cache().invalidate(MATCH_ID)
+    client, _ = cliente
+    respuesta = client.get(f"/api/preview/{MATCH_ID}")
+    assert respuesta.status_code == 200 and respuesta.get_json()["home_team"]
+    stats = warehouse.stats()
+    assert stats["results"] > 0 and stats["leagues"] > 1
+
+
+def test_una_sola_recarga_por_snapshot_de_data_json(cliente, tmp_path, monkeypatch):
+    import app
+    from match_catalog import MatchCatalog
+    from match_segments import SegmentStore, write_segments
+    from match_snapshot import write_snapshot_atomic
+    from match_store import MatchStore
+
+    def partido(match_id):
+        return {"id": match_id, "home_team": "A", "away_team": "B", "time_obj": "2026-10-18T12:00:00", "handicap": "0.5"}
+
+    data_file = tmp_path / "data.json"
+    catalogo = MatchCatalog(tmp_path / "match_catalog.sqlite3")
+    recargas = []
+    for nombre, valor in [("DATA_FILE", data_file), ("match_store", MatchStore(data_file)),
+                          ("segment_store", SegmentStore(data_file)), ("match_catalog", catalogo),
+                          ("_data_seen_signature", [None]), ("_on_data_reload", lambda: recargas.append(1))]:
+        monkeypatch.setattr(app, nombre, valor)
+
+    datos = {"upcoming_matches": [partido("1")], "finished_matches": []}
+    write_snapshot_atomic(data_file, datos)
+    write_segments(data_file, datos)
+    catalogo.record_snapshot(datos, source_files=[data_file])
+    for _ in range(3):
+        assert [m["id"] for m in app._filter_and_slice_matches("upcoming_matches")] == ["1"]
+    assert len(recargas) == 1
+
+    # Sin catálogo al día sirven los segmentos, pero la recarga sigue siendo una por snapshot
+    datos["upcoming_matches"].append(partido("22"))
+    write_snapshot_atomic(data_file, datos)
+    write_segments(data_file, datos)
+    for _ in range(2):
+        assert [m["id"] for m in app._filter_and_slice_matches("upcoming_matches")] == ["1", "22"]
+    assert len(recargas) == 2 and app.match_store.reloads == 0
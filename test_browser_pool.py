@@ -0,0 +1,91 @@
+# test_browser_pool.py
+"""Pruebas de modules.browser_pool.BrowserPool con drivers falsos (sin Chrome)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos"))
+
+from selenium.common.exceptions import WebDriverException  # noqa: E402
+
+from modules.browser_pool import BrowserPool, BrowserPoolTimeout  # noqa: E402
+
+
+class DriverFalso:
+    def __init__(self):
+        self.vivo = True
+        self.cerrado = False
+        self.paginas = []
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_script(self, script):
+        if not self.vivo:
+            raise WebDriverException("muerto")
+        return 1
+
+    def get(self, url):
+        self.paginas.append(url)
+
+    def quit(self):
+        self.cerrado = True
+
+
+def _pool(**kwargs):
+    creados = []
+
+    def fabrica():
+        creados.append(DriverFalso())
+        return creados[-1]
+
+    return BrowserPool(driver_factory=fabrica, **kwargs), creados
+
+
+def test_reutiliza_el_driver_caliente():
+    pool, creados = _pool(size=2)
+    driver = pool.checkout()
+    pool.checkin(driver)
+    assert pool.checkout() is driver
+    assert len(creados) == 1 and driver.paginas == ["about:blank"]
+
+
+def test_no_presta_mas_de_size_drivers():
+    pool, _ = _pool(size=1, checkout_timeout=0.05)
+    driver = pool.checkout()
+    with pytest.raises(BrowserPoolTimeout):
+        pool.checkout()
+    pool.checkin(driver)
+    assert pool.checkout() is driver
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_recicla_descarta_y_sustituye_drivers_muertos():
+    pool, creados = _pool(size=1, max_pages=3)
+    driver = pool.checkout()
+    pool.checkin(driver, pages=3)
+    assert driver.cerrado and pool.stats()["recycled"] == 1
+
+    driver = pool.checkout()
+    pool.checkin(driver, discard=True)
+    assert driver.cerrado and pool.stats()["discarded"] == 1
+
+    driver = pool.checkout()
+    pool.checkin(driver)
+    driver.vivo = False
+    nuevo = pool.checkout()
+    assert nuevo is not driver and driver.cerrado
+    assert len(creados) == 4 and pool.stats()["alive"] == 1
+
+
+def test_el_context_manager_descarta_tras_un_error_de_webdriver():
+    pool, _ = _pool(size=1)
+    with pytest.raises(WebDriverException):
+        with pool.driver() as driver:
+            raise WebDriverException("caído")
+    assert driver.cerrado
+    assert pool.stats()["alive"] == 0
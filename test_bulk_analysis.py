@@ -0,0 +1,110 @@
+# test_bulk_analysis.py
+"""Pruebas de bulk_analysis: concurrencia acotada, checkpoint reanudable y salida NDJSON."""
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "muestra_sin_fallos"))
+sys.path.insert(0, ROOT)
+
+import bulk_analysis  # noqa: E402
+from bulk_analysis import analizar_lote, leer_checkpoint  # noqa: E402
+
+
+def _compute(fallan=(), espera=0.0):
+    llamadas = []
+    lock = threading.Lock()
+    activos = [0, 0]   # en curso, máximo
+
+    def compute(match_id):
+        with lock:
+            llamadas.append(match_id)
+            activos[0] += 1
+            activos[1] = max(activos[1], activos[0])
+        time.sleep(espera)
+        with lock:
+            activos[0] -= 1
+        if match_id in fallan:
+            raise RuntimeError(f"sin datos para {match_id}")
+        return {"id": match_id}, None
+
+    return compute, llamadas, activos
+
+
+def test_concurrencia_acotada_y_checkpoint(tmp_path):
+    checkpoint = tmp_path / "lote.checkpoint"
+    compute, llamadas, activos = _compute(fallan={"3"}, espera=0.02)
+    escritos = {}
+    resumen = analizar_lote(["1", "2", "3", "4", "5", "2"], compute, checkpoint, concurrency=2,
+                            write=escritos.__setitem__)
+    assert sorted(llamadas) == ["1", "2", "3", "4", "5"] and activos[1] <= 2
+    assert resumen["total"] == 5 and resumen["ok"] == 4 and resumen["failed"] == 1 and resumen["pending"] == 0
+    assert set(escritos) == {"1", "2", "4", "5"}
+    estado = leer_checkpoint(checkpoint)
+    assert estado["3"]["status"] == "error" and "sin datos para 3" in estado["3"]["error"]
+    assert {mid for mid, r in estado.items() if r["status"] == "ok"} == {"1", "2", "4", "5"}
+
+
+def test_reanuda_solo_los_que_faltan_y_reintenta_los_fallidos(tmp_path):
+    checkpoint = tmp_path / "lote.checkpoint"
+    checkpoint.write_text(json.dumps({"match_id": "1", "status": "ok"}) + "\n"
+                          + json.dumps({"match_id": "2", "status": "error"}) + "\n"
+                          + '{"match_id": "3", "sta', encoding="utf-8")   # línea cortada por una interrupción
+    compute, llamadas, _ = _compute()
+    resumen = analizar_lote(["1", "2", "3", "4"], compute, checkpoint, concurrency=3, skip=lambda mid: mid == "4")
+    assert sorted(llamadas) == ["2", "3"]
+    assert resumen["resumed"] == 1 and resumen["skipped"] == 1 and resumen["ok"] == 2
+    assert leer_checkpoint(checkpoint)["2"]["status"] == "ok"
+
+
+def test_main_modo_ligero_a_ndjson(tmp_path, monkeypatch):
+    from modules import estudio_scraper as es
+
+    def preview(match_id):
+        return {"error": "sin H2H"} if match_id == "2" else {"home": f"local {match_id}"}
+
+    monkeypatch.setattr(es, "obtener_datos_preview_ligero", preview)
+    salida = tmp_path / "analisis.ndjson"
+    argv = ["--ids", "1", "2", "--modo", "ligero", "--salida", str(salida), "--concurrencia", "2"]
+    assert bulk_analysis.main(argv) == 1
+    assert [json.loads(l) for l in salida.read_text(encoding="utf-8").splitlines()] == [
+        {"match_id": "1", "modo": "ligero", "data": {"home": "local 1"}}]
+    checkpoint = bulk_analysis.checkpoint_por_defecto(["1", "2"], "ligero", None, str(salida))
+    assert leer_checkpoint(checkpoint)["2"]["error"] == "sin H2H"
+    assert checkpoint != bulk_analysis.checkpoint_por_defecto(["1"], "ligero", None, str(salida))
+
+    with pytest.raises(SystemExit):
+        bulk_analysis.main(["--ids", "12a", "--salida", str(salida), "--modo", "ligero"])
+    with pytest.raises(SystemExit):
+        bulk_analysis.main(["--ids", "1", "--modo", "ligero"])   # la caché solo guarda el análisis completo
+
+
+def test_main_borra_el_checkpoint_al_terminar_y_forzar_lo_ignora(tmp_path, monkeypatch):
+    from modules import estudio_scraper as es
+
+    llamadas, fallos = [], ["2"]
+
+    def preview(match_id):
+        llamadas.append(match_id)
+        if match_id in fallos:
+            fallos.remove(match_id)
+            return {"error": "sin H2H"}
+        return {"home": match_id}
+
+    monkeypatch.setattr(es, "obtener_datos_preview_ligero", preview)
+    salida = tmp_path / "analisis.ndjson"
+    argv = ["--ids", "1", "2", "--modo", "ligero", "--salida", str(salida)]
+    checkpoint = bulk_analysis.checkpoint_por_defecto(["1", "2"], "ligero", None, str(salida))
+    assert bulk_analysis.main(argv) == 1 and checkpoint.exists()
+    # El mismo comando continúa solo con el fallido y, sin fallos, borra el checkpoint
+    assert bulk_analysis.main(argv) == 0 and not checkpoint.exists()
+    assert sorted(llamadas) == ["1", "2", "2"]
+    llamadas.clear()
+    checkpoint.write_text(json.dumps({"match_id": "1", "status": "ok"}) + "\n", encoding="utf-8")
+    assert bulk_analysis.main(argv + ["--forzar"]) == 0
+    assert sorted(llamadas) == ["1", "2"]
@@ -0,0 +1,232 @@
+# test_estudio_scraper.py
+"""
+Pruebas de modules.estudio_scraper sobre las capturas de muestra_sin_fallos/html_extraer,
+sin red: las descargas se sustituyen por las páginas guardadas.
+"""
+import os
+import sys
+
+import pytest
+
+MUESTRA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos")
+sys.path.insert(0, MUESTRA)
+
+from modules import estudio_scraper as es  # noqa: E402
+from modules.parse_pool import ParsePool  # noqa: E402
+
+
+def _captura(nombre):
+    with open(os.path.join(MUESTRA, "html_extraer", nombre), encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def pagina_h2h():
+    return _captura("analisis.txt")
+
+
+def test_motor_http_usa_la_pagina_estatica_si_trae_bet365(monkeypatch, pagina_h2h):
+    urls = []
+
+    def http_get_text(url, timeout=None):
+        urls.append(url)
+        return pagina_h2h
+
+    monkeypatch.setattr(es, "http_get_text", http_get_text)
+    soup = es.fetch_h2h_soup_http_of("2789999")
+    assert soup is not None and soup.find("table", id="table_v1") is not None
+    assert urls == [f"{es.BASE_URL_OF}/match/h2h-2789999"]
+
+
+def test_motor_http_rechaza_la_pagina_sin_bet365_o_sin_tablas(monkeypatch, pagina_h2h):
+    i = pagina_h2h.index('id="hSelect_2"')
+    otra_casa = pagina_h2h[:i] + pagina_h2h[i:].replace('<option value="8">', '<option value="3">', 1)
+    monkeypatch.setenv("ANALYSIS_LAYERS_TTL", "0")
+    monkeypatch.setattr(es, "http_get_text", lambda url, timeout=None: otra_casa)
+    assert es.fetch_h2h_soup_http_of("2789999") is None
+    monkeypatch.setattr(es, "http_get_text", lambda url, timeout=None: "<html></html>")
+    assert es.fetch_h2h_soup_http_of("2789999") is None
+    assert es.obtener_datos_completos_partido("2789999", engine="http") == {
+        "error": "No se pudo obtener la página H2H sin navegador."}
+
+
+def test_motor_desconocido():
+    assert "error" in es.obtener_datos_completos_partido("2789999", engine="curl")
+    assert "error" in es.obtener_datos_completos_partido("abc")
+
+
+def test_motor_async_da_lo_mismo_que_el_http(monkeypatch, pagina_h2h):
+    pagina_live = _captura("live.txt")
+
+    def pagina(url):
+        return pagina_live if "/live-" in url else pagina_h2h
+
+    async def aio_get_text(session, url, timeout=None):
+        return pagina(url)
+
+    monkeypatch.setenv("STATS_STORE_ENABLED", "0")
+    monkeypatch.setenv("RESULTS_WAREHOUSE_ENABLED", "0")
+    monkeypatch.setattr(es, "http_get_text", lambda url, timeout=None: pagina(url))
+    monkeypatch.setattr(es, "aio_get_text", aio_get_text)
+    sincrono = es.obtener_datos_completos_partido("2789999", engine="http")
+    asincrono = es.obtener_datos_completos_partido("2789999", engine="async")
+    assert "error" not in sincrono and "error" not in asincrono and sincrono["home_name"]
+    for clave in ("home_name", "away_name", "h2h_data", "main_match_odds", "rendimiento_local_handicap"):
+        assert asincrono[clave] == sincrono[clave]
+    for clave in ("last_home_match", "last_away_match", "h2h_col3"):
+        assert asincrono[clave]["details"] == sincrono[clave]["details"]
+
+
+def test_la_etapa_de_parseo_da_lo_mismo_en_un_proceso_aparte(pagina_h2h):
+    en_linea = es.analizar_html_h2h_of("2789999", pagina_h2h)
+    assert en_linea["datos"]["home_name"] and "col3_args" in en_linea["ctx"]
+    pool = ParsePool(1)
+    try:
+        assert pool.run(es.analizar_html_h2h_of, "2789999", pagina_h2h) == en_linea
+        assert pool.stats()["submitted"] == 1 and pool.stats()["inline"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_vista_previa_y_analisis_completo_comparten_las_etapas(monkeypatch, pagina_h2h):
+    pagina_live = _captura("live.txt")
+    descargas = []
+
+    def http_get_text(url, timeout=None):
+        descargas.append(url.rsplit("/", 1)[-1])
+        return pagina_live if "/live-" in url else pagina_h2h
+
+    for nombre in ("STATS_STORE_ENABLED", "RESULTS_WAREHOUSE_ENABLED", "PAGE_CACHE_ENABLED"):
+        monkeypatch.setenv(nombre, "0")
+    monkeypatch.setenv("ANALYSIS_LAYERS_TTL", "120")
+    monkeypatch.setattr(es, "http_get_text", http_get_text)
+    es.get_layer_cache().invalidate("2789999")
+
+    vista_previa = es.obtener_datos_preview_ligero("2789999")
+    assert "error" not in vista_previa and vista_previa["home_team"]
+    assert "h2h-2789999" in descargas
+
+    descargas.clear()
+    completo = es.obtener_datos_completos_partido("2789999", engine="http")
+    assert "error" not in completo and completo["home_name"] == vista_previa["home_team"]
+    assert "h2h-2789999" not in descargas
+    reutilizadas = es.obtener_tiempos_etapas_recientes(1)[0]["reused"]
+    assert {"pagina_h2h", "extraccion", "h2h_col3", "stats_last_home", "stats_last_away"} <= set(reutilizadas)
+
+    descargas.clear()
+    assert es.obtener_datos_preview_ligero("2789999") == vista_previa
+    assert descargas == []
+    es.get_layer_cache().invalidate("2789999")
+
+
+def test_vista_previa_cuenta_forma_reciente_y_rivales_comunes(pagina_h2h):
+    # Singapore U23 (local) y Bangladesh U23 (visitante) en sus 8 últimos de table_v1/table_v2
+    preview = es.analizar_html_h2h_of("2789999", pagina_h2h, False)["preview"]
+    assert preview["recent_form"] == {"home": {"wins": 1, "draws": 3, "losses": 4, "total": 8},
+                                      "away": {"wins": 0, "draws": 1, "losses": 7, "total": 8}}
+    assert preview["h2h_stats"] == {"home_wins": 0, "away_wins": 0, "draws": 0}   # la captura no trae table_v3
+    indirecto = preview["h2h_indirect"]
+    assert (indirecto["home_better"], indirecto["away_better"], indirecto["draws"]) == (2, 0, 0)
+    assert [(s["rival"], s["home_margin"], s["away_margin"]) for s in indirecto["samples"]] == [
+        ("vietnam u23", -1, -2), ("malaysia u23", 0, -2)]
+    assert preview["handicap"] == {"ah_line": "0.25", "favorite": "Singapore U23", "cover_on_last_h2h": "DESCONOCIDO"}
+
+
+def test_vista_previa_ataques_peligrosos_del_favorito():
+    from bs4 import BeautifulSoup
+
+    ctx = {"home_name": "Rojo", "away_name": "Azul", "main_match_odds_data": {"ah_linea_raw": "-0.5"},
+           "h2h_data": {}, "indirect_comparison_data": {
+               "comp1": {"main_team": "Rojo", "localia": "H",
+                         "stats": {"ataques_peligrosos_casa": "40", "ataques_peligrosos_fuera": "38"}},
+               "comp2": {"main_team": "Azul", "localia": "A",
+                         "stats": {"ataques_peligrosos_casa": "20", "ataques_peligrosos_fuera": "31"}}}}
+    preview = es._preview_pagina_of(BeautifulSoup("<html></html>", "lxml"), ctx)
+    assert preview["dangerous_attacks"] == {
+        "team1": {"name": "Rojo", "own": 40, "rival": 38, "very_superior": False},
+        "team2": {"name": "Azul", "own": 31, "rival": 20, "very_superior": True}}
+    assert preview["favorite_dangerous_attacks"] == {"name": "Azul", "very_superior": True, "own": 31, "rival": 20}
+    assert preview["recent_form"]["home"] == {"wins": 0, "draws": 0, "losses": 0, "total": 0}
+
+
+class _ElementoFalso:
+    tag_name = "select"
+    text = "8"
+
+    def get_dom_attribute(self, name):
+        return None
+
+    def find_elements(self, by, value):
+        return [self]
+
+    def is_selected(self):
+        return True
+
+
+class _DriverFalso:
+    def __init__(self, page_source):
+        self.page_source = page_source
+        self.paginas = []
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_script(self, script):
+        return 1
+
+    def get(self, url):
+        self.paginas.append(url)
+
+    def find_element(self, by, value):
+        return _ElementoFalso()
+
+    def quit(self):
+        pass
+
+
+def test_vista_previa_con_navegador_pasa_por_el_mismo_grafo(monkeypatch, pagina_h2h):
+    from modules.browser_pool import BrowserPool
+
+    pagina_live = _captura("live.txt")
+    for nombre in ("STATS_STORE_ENABLED", "RESULTS_WAREHOUSE_ENABLED", "PAGE_CACHE_ENABLED"):
+        monkeypatch.setenv(nombre, "0")
+    monkeypatch.setenv("ANALYSIS_LAYERS_TTL", "0")
+    monkeypatch.setattr(es, "http_get_text", lambda url, timeout=None: pagina_live if "/live-" in url else pagina_h2h)
+    ligera = es.obtener_datos_preview_ligero("2789999")
+
+    drivers = []
+    pool = BrowserPool(size=1, driver_factory=lambda: drivers.append(_DriverFalso(pagina_h2h)) or drivers[-1])
+    monkeypatch.setattr(es, "get_browser_pool", lambda: pool)
+    con_navegador = es.obtener_datos_preview_rapido("2789999")
+    assert con_navegador == ligera
+    assert drivers[0].paginas[0].endswith("/match/h2h-2789999")
+    pool.shutdown()
+
+
+def test_vista_previa_rapida_sin_navegador_libre(monkeypatch, pagina_h2h):
+    from modules.browser_pool import BrowserPool
+
+    monkeypatch.setenv("ANALYSIS_LAYERS_TTL", "0")
+    pool = BrowserPool(size=1, checkout_timeout=0.01, driver_factory=lambda: _DriverFalso(pagina_h2h))
+    ocupado = pool.checkout()
+    monkeypatch.setattr(es, "get_browser_pool", lambda: pool)
+    assert "navegador libre" in es.obtener_datos_preview_rapido("2789999")["error"]
+    pool.checkin(ocupado)
+    pool.shutdown()
+
+
+def test_los_fallos_del_almacen_de_resultados_van_al_log(monkeypatch, caplog):
+    import sqlite3
+
+    class _AlmacenRoto:
+        def ingest_h2h_rows(self, historial):
+            raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(es, "get_results_warehouse", lambda: _AlmacenRoto())
+    with caplog.at_level("WARNING", logger=es.__name__):
+        es._archivar_historial_of([{"match_id": "1"}])
+    assert [r.levelname for r in caplog.records] == ["WARNING"]
+    assert "database is locked" in caplog.records[0].getMessage()
@@ -0,0 +1,44 @@
+# test_h2h_page.py
+"""Pruebas de modules.h2h_page sobre la captura muestra_sin_fallos/html_extraer/analisis.txt."""
+import os
+import re
+import sys
+
+import pytest
+
+MUESTRA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos")
+sys.path.insert(0, MUESTRA)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from modules.h2h_page import H2HPage, ensure_h2h_page  # noqa: E402
+from modules.utils import get_match_details_from_row_of  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def soup():
+    with open(os.path.join(MUESTRA, "html_extraer", "analisis.txt"), encoding="utf-8", errors="ignore") as f:
+        return BeautifulSoup(f.read(), "lxml")
+
+
+# La captura no trae table_v3 (sin H2H directo)
+@pytest.mark.parametrize("table_no", [1, 2])
+def test_details_igual_que_recorrer_las_filas(soup, table_no):
+    table = soup.find("table", id=f"table_v{table_no}")
+    esperado = []
+    for row in table.find_all("tr", id=re.compile(rf"tr{table_no}_\d+")):
+        if (details := get_match_details_from_row_of(row, score_class_selector=f"fscore_{table_no}")):
+            esperado.append(details)
+    page = H2HPage(soup)
+    assert esperado and page.details(table_no) == esperado
+    assert page.details(f"table_v{table_no}") == esperado
+    assert all(r.table == table_no for r in page.rows(table_no))
+
+
+def test_ensure_h2h_page_construye_el_indice_una_vez(soup):
+    page = ensure_h2h_page(soup)
+    assert ensure_h2h_page(soup) is page
+    assert ensure_h2h_page(page) is page
+    assert ensure_h2h_page(None) is None
+    assert not page.has_table(3) and page.details(3) == []
+    assert not H2HPage(BeautifulSoup("<html></html>", "lxml")).has_table(1)
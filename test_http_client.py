@@ -0,0 +1,72 @@
+# test_http_client.py
+"""Pruebas de modules.http_client contra un servidor local: reintentos y su métrica en los dos caminos."""
+import asyncio
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos"))
+
+from modules import http_client  # noqa: E402
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    peticiones = []
+
+    def do_GET(self):
+        _Manejador.peticiones.append(self.path)
+        status = int(self.path.strip("/"))
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def servidor():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Manejador)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _reintentos():
+    return http_client.UPSTREAM_RETRIES.value(host="127.0.0.1")
+
+
+@pytest.mark.parametrize("status, esperados", [(503, 1), (404, 0)])
+def test_reintentos_sincronos(servidor, monkeypatch, status, esperados):
+    monkeypatch.setattr(http_client, "_session", http_client.build_session(retries=1))
+    _Manejador.peticiones.clear()
+    antes = _reintentos()
+    with pytest.raises(requests.RequestException):
+        http_client.http_get_text(f"{servidor}/{status}", use_cache=False)
+    assert len(_Manejador.peticiones) == 1 + esperados
+    assert _reintentos() - antes == esperados
+
+
+@pytest.mark.parametrize("status, esperados", [(503, 1), (404, 0)])
+def test_reintentos_asincronos(servidor, status, esperados):
+    async def descargar():
+        async with aiohttp.ClientSession() as session:
+            return await http_client.aio_get_text(session, f"{servidor}/{status}", retries=1, use_cache=False)
+
+    _Manejador.peticiones.clear()
+    antes = _reintentos()
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(descargar())
+    assert len(_Manejador.peticiones) == 1 + esperados
+    assert _reintentos() - antes == esperados
+
+
+def test_pagina_correcta(servidor, monkeypatch):
+    monkeypatch.setattr(http_client, "_session", http_client.build_session(retries=1))
+    assert http_client.http_get_text(f"{servidor}/200", use_cache=False) == "ok"
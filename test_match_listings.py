@@ -0,0 +1,185 @@
+# test_match_listings.py
+"""
+Los orígenes de /api/matches y /api/finished_matches (catálogo SQLite, segmentos
+NDJSON e índice en memoria de data.json) deben devolver para cada consulta lo mismo que el recorrido
+completo de antes.
+"""
+import datetime
+import itertools
+import json
+import os
+
+import pytest
+
+from app_utils import normalize_handicap_to_half_bucket_str
+from match_catalog import MatchCatalog
+from match_segments import SegmentStore, write_segments
+from match_snapshot import write_snapshot_atomic
+from match_store import MatchStore, parse_time_obj
+
+HANDICAPS = ["0", "-0.25", "0.5", "0/0.5", "-1", "1.75", "", None, "abc"]
+CONSULTAS = [
+    dict(),
+    dict(limit=10),
+    dict(limit=7, offset=12),
+    dict(offset=5),
+    dict(sort_desc=True),
+    dict(limit=5, offset=3, sort_desc=True),
+    dict(handicap_filter="0.5"),
+    dict(handicap_filter="-0.5", sort_desc=True, limit=4),
+    dict(handicap_filter="0", limit=3, offset=2),
+    dict(handicap_filter="7"),
+    dict(limit=0),
+    dict(limit="x"),
+]
+
+
+def _partidos(prefijo, n, inicio, con_marcador=False):
+    partidos = []
+    for i in range(n):
+        partido = {
+            "id": f"{prefijo}{i:03d}",
+            "home_team": f"Local {i % 7}",
+            "away_team": f"Visitante {i % 5}",
+            "handicap": HANDICAPS[i % len(HANDICAPS)],
+            "goal_line": str(2 + (i % 4) * 0.25),
+        }
+        if i % 11 != 0:
+            # Varios partidos a la misma hora y en días distintos; algunos sin hora
+            partido["time_obj"] = (inicio + datetime.timedelta(hours=7 * (i // 3))).isoformat()
+        if con_marcador:
+            partido["score"] = f"{i % 4} - {i % 3}"
+        partidos.append(partido)
+    return partidos
+
+
+def _consulta_lineal(matches, limit=None, offset=0, handicap_filter=None, sort_desc=False):
+    """Lo que hacía app._filter_and_slice_matches releyendo data.json en cada petición."""
+    def bucket(value):
+        try:
+            return normalize_handicap_to_half_bucket_str(value)
+        except Exception:
+            return None
+
+    prepared = []
+    for original in matches:
+        entry = dict(original)
+        parsed_time = parse_time_obj(entry.get("time_obj"))
+        if not entry.get("time") and parsed_time:
+            entry["time"] = parsed_time.strftime("%d/%m %H:%M")
+        prepared.append((parsed_time or datetime.datetime.min, entry))
+    if handicap_filter and (target := bucket(handicap_filter)) is not None:
+        prepared = [item for item in prepared if bucket(item[1].get("handicap", "")) == target]
+    prepared.sort(key=lambda item: (item[0], item[1].get("id", "")), reverse=sort_desc)
+    entries = [entry for _, entry in prepared][max(int(offset or 0), 0):]
+    try:
+        limit_val = int(limit) if limit is not None else None
+    except (TypeError, ValueError):
+        limit_val = None
+    return entries[:limit_val] if limit_val is not None and limit_val >= 0 else entries
+
+
+def _volcar(data_file, data):
+    write_snapshot_atomic(data_file, data)
+    write_segments(data_file, data)
+    MatchCatalog(data_file.with_name("match_catalog.sqlite3")).record_snapshot(data, source_files=[data_file])
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    data_file = tmp_path / "data.json"
+    _volcar(data_file, {
+        "upcoming_matches": _partidos("u", 40, datetime.datetime(2026, 10, 18, 12)),
+        "finished_matches": _partidos("f", 35, datetime.datetime(2026, 10, 10, 18), con_marcador=True),
+    })
+    return data_file
+
+
+def _ids(entries):
+    return [e["id"] for e in entries]
+
+
+@pytest.mark.parametrize("section, consulta",
+                         list(itertools.product(("upcoming_matches", "finished_matches"), CONSULTAS)))
+def test_los_tres_origenes_igual_que_el_recorrido_completo(data_file, section, consulta):
+    data = json.loads(data_file.read_text(encoding="utf-8"))
+    esperado = _consulta_lineal(data[section], **consulta)
+    assert MatchStore(data_file).query(section, **consulta) == esperado
+    segments = SegmentStore(data_file)
+    assert segments.available()
+    assert segments.query(section, **consulta) == esperado
+    catalog = MatchCatalog(data_file.with_name("match_catalog.sqlite3"))
+    assert catalog.is_current_for(data_file)
+    assert catalog.query(section, **consulta) == esperado
+
+
+def test_match_store_recarga_solo_si_cambia_el_fichero(data_file):
+    store = MatchStore(data_file)
+    primera = store.query("upcoming_matches", limit=5)
+    store.query("finished_matches")
+    assert store.reloads == 1
+    # Las páginas son copias: modificarlas no toca el índice
+    primera[0]["home_team"] = "otro"
+    assert store.query("upcoming_matches", limit=5)[0]["home_team"] != "otro"
+
+    segments = SegmentStore(data_file)
+    assert _ids(segments.query("upcoming_matches", limit=5)) == _ids(primera)
+
+    data = json.loads(data_file.read_text(encoding="utf-8"))
+    data["upcoming_matches"] = data["upcoming_matches"][10:]
+    _volcar(data_file, data)
+    os.utime(data_file, ns=(0, 10 ** 18))
+    esperado = _ids(_consulta_lineal(data["upcoming_matches"]))
+    assert _ids(store.query("upcoming_matches")) == esperado
+    assert _ids(segments.query("upcoming_matches")) == esperado
+    assert store.reloads == 2
+
+
+def test_hora_de_inicio_y_proximos_en_una_ventana(data_file):
+    store = MatchStore(data_file)
+    assert store.kickoff_of("u001") == datetime.datetime(2026, 10, 18, 12)
+    assert store.kickoff_of("f004") == datetime.datetime(2026, 10, 11, 1)
+    assert store.kickoff_of("u000") is None and store.kickoff_of("nada") is None
+    ventana = store.upcoming_within(14, now=datetime.datetime(2026, 10, 18, 12))
+    # u000 no tiene hora y u009 empieza 21 h después, fuera de la ventana
+    assert [match_id for match_id, _ in ventana] == [f"u{i:03d}" for i in range(1, 9)]
+    assert ventana[-1][1] == datetime.datetime(2026, 10, 19, 2)
+
+
+def test_catalogo_busqueda_e_historial_de_cambios(tmp_path):
+    catalog = MatchCatalog(tmp_path / "match_catalog.sqlite3")
+    partidos = _partidos("u", 10, datetime.datetime(2026, 10, 18, 12))
+    catalog.record_snapshot({"upcoming_matches": partidos})
+    movido = dict(partidos[1], handicap="2.5")
+    cambios = {"updated": {"u001": {"handicap": [partidos[1]["handicap"], "2.5"]}}}
+    catalog.record_snapshot({"upcoming_matches": [movido] + partidos[2:]}, changes=cambios)
+
+    assert [c["field"] for c in catalog.history("u001")] == ["handicap"]
+    assert catalog.history("u001")[0]["new"] == "2.5"
+    assert _ids(catalog.search(team="local 1")) == ["u008", "u001"]
+    assert _ids(catalog.search(team="Visitante%", handicap="2.5")) == ["u001"]
+    # u000 salió de la portada: inactivo, pero sigue en el histórico
+    assert "u000" not in _ids(catalog.search(limit=100))
+    assert "u000" in _ids(catalog.search(include_inactive=True, limit=100))
+    assert catalog.stats()["upcoming_active"] == 9 and catalog.stats()["upcoming_inactive"] == 1
+
+
+def test_el_catalogo_sirve_solo_el_ultimo_snapshot(data_file):
+    data = json.loads(data_file.read_text(encoding="utf-8"))
+    # Salen de la portada 10 próximos y 20 finalizados (p.ej. por el tope de data.json)
+    data["upcoming_matches"] = data["upcoming_matches"][10:]
+    data["finished_matches"] = data["finished_matches"][:15]
+    _volcar(data_file, data)
+    catalog = MatchCatalog(data_file.with_name("match_catalog.sqlite3"))
+    for section in ("upcoming_matches", "finished_matches"):
+        esperado = _consulta_lineal(data[section])
+        assert MatchStore(data_file).query(section) == esperado
+        assert SegmentStore(data_file).query(section) == esperado
+        assert catalog.query(section) == esperado
+    # El histórico sigue en el catálogo
+    historico = catalog.search(section="finished_matches", include_inactive=True, limit=1000)
+    assert len(historico) == 35
+    assert len(catalog.search(section="finished_matches", limit=1000)) == 15
+    stats = catalog.stats()
+    assert stats["finished"] == 35 and stats["finished_active"] == 15
+    assert stats["upcoming_active"] == 30 and stats["upcoming_inactive"] == 10
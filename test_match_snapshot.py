@@ -0,0 +1,102 @@
+# test_match_snapshot.py
+"""Pruebas de match_snapshot: diferencia entre snapshots de data.json y registro de cambios."""
+import json
+
+from match_snapshot import (
+    ChangeLogReader,
+    append_change_log,
+    changed_ids,
+    has_changes,
+    load_snapshot,
+    merge_snapshot,
+    write_snapshot_atomic,
+)
+
+
+def _partido(match_id, hora, **campos):
+    return dict({"id": match_id, "home_team": f"Local {match_id}", "away_team": f"Visitante {match_id}",
+                 "time_obj": f"2026-10-18T{hora}:00", "time": f"18/10 {hora}", "handicap": "0.5"}, **campos)
+
+
+def test_diferencia_entre_snapshots():
+    anterior = {
+        "upcoming_matches": [_partido("1", "12:00"), _partido("2", "13:00"), _partido("3", "14:00")],
+        "finished_matches": [_partido("9", "10:00", score="1 - 0")],
+    }
+    proximos = [
+        _partido("2", "13:00", handicap="0.75"),             # cambia la línea
+        _partido("4", "15:00"),                                # nuevo
+        _partido("4", "15:00"),                                # repetido en la portada
+        _partido("5", "16:00", time="otro formato"),           # nuevo
+    ]
+    finalizados = [
+        _partido("3", "14:00", score="2 - 2"),                 # pasa a finalizado
+        _partido("9", "10:00", score="1 - 0", time="x"),       # solo cambia un campo derivado
+        _partido("8", "09:00", score="0 - 0"),                 # finalizado nuevo
+    ]
+    datos, cambios = merge_snapshot(anterior, proximos, finalizados)
+
+    assert cambios == {
+        "added": ["8", "4", "5"],
+        "updated": {"2": {"handicap": ["0.5", "0.75"]}},
+        "finished": ["3"],
+        "removed": ["1"],
+    }
+    assert has_changes(cambios) and changed_ids(cambios) == {"1", "2", "3", "4", "5", "8"}
+    assert [m["id"] for m in datos["upcoming_matches"]] == ["2", "4", "5"]
+    # Finalizados: se acumulan con los anteriores, los más recientes primero
+    assert [m["id"] for m in datos["finished_matches"]] == ["3", "9", "8"]
+
+    datos_otra_vez, sin_cambios = merge_snapshot(datos, proximos, finalizados)
+    assert not has_changes(sin_cambios) and datos_otra_vez == datos
+    assert [m["id"] for m in merge_snapshot(datos, [], finalizados, max_finished=2)[0]["finished_matches"]] == ["3", "9"]
+
+
+def test_escritura_atomica_y_lectura_del_registro(tmp_path):
+    data_file = tmp_path / "data.json"
+    assert load_snapshot(data_file) == {}
+    write_snapshot_atomic(data_file, {"upcoming_matches": [_partido("1", "12:00")]})
+    assert load_snapshot(data_file)["upcoming_matches"][0]["id"] == "1"
+    assert [p.name for p in tmp_path.iterdir()] == ["data.json"]
+
+    log_file = tmp_path / "data_changes.jsonl"
+    append_change_log(log_file, {"added": ["antiguo"]})
+    lector = ChangeLogReader(log_file)
+    assert lector.read_new() == []
+
+    append_change_log(log_file, {"added": ["1"], "updated": {}, "finished": [], "removed": []})
+    with open(log_file, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"added": ["2"]})[:8])   # línea a medio escribir
+    nuevas = lector.read_new()
+    assert [e["added"] for e in nuevas] == [["1"]] and "timestamp" in nuevas[0]
+
+    with open(log_file, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"added": ["2"]})[8:] + "\n")
+    assert [e["added"] for e in lector.read_new()] == [["2"]]
+    assert [e["added"] for e in ChangeLogReader(log_file, from_start=True).read_new()] == [["antiguo"], ["1"], ["2"]]
+
+
+def test_el_modo_completo_tambien_registra_los_cambios(tmp_path, monkeypatch):
+    import asyncio
+
+    import run_scraper
+
+    data_file = tmp_path / "data.json"
+    listas = [([_partido("1", "12:00"), _partido("2", "13:00")], [_partido("9", "10:00", score="1 - 0")])]
+
+    async def descargar():
+        return listas[-1]
+
+    monkeypatch.setattr(run_scraper, "DATA_FILE", str(data_file))
+    monkeypatch.setattr(run_scraper, "_scrape_lists", descargar)
+    asyncio.run(run_scraper.main())
+    listas.append(([_partido("2", "13:00", handicap="0.75")], [_partido("1", "12:00", score="2 - 1")]))
+    cambios = asyncio.run(run_scraper.main())
+
+    assert cambios == {"added": [], "updated": {"2": {"handicap": ["0.5", "0.75"]}}, "finished": ["1"], "removed": ["9"]}
+    # data.json queda exactamente con lo descargado (el modo completo no acumula finalizados)
+    assert [m["id"] for m in load_snapshot(data_file)["finished_matches"]] == ["1"]
+    registro = ChangeLogReader(tmp_path / "data_changes.jsonl", from_start=True).read_new()
+    assert [e["added"] for e in registro] == [["9", "1", "2"], []] and registro[1]["removed"] == ["9"]
+    assert not has_changes(asyncio.run(run_scraper.main()))
+    assert len(ChangeLogReader(tmp_path / "data_changes.jsonl", from_start=True).read_new()) == 2
@@ -0,0 +1,62 @@
+# test_metrics.py
+"""Pruebas de modules.metrics: contadores, histogramas, colectores y el texto de Prometheus."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos"))
+
+from modules import metrics  # noqa: E402
+from modules.metrics import MetricsRegistry  # noqa: E402
+
+
+def test_contador_por_etiquetas():
+    registro = MetricsRegistry()
+    peticiones = registro.counter("prueba_requests_total", "Peticiones", ("route", "status"))
+    peticiones.inc(route="/api/analisis/<id>", status="200")
+    peticiones.inc(2, route="/api/analisis/<id>", status="200")
+    peticiones.inc(route="/", status=500)
+    assert peticiones.value(route="/api/analisis/<id>", status="200") == 3
+    assert registro.counter("prueba_requests_total", "otra ayuda", ("route", "status")) is peticiones
+    with pytest.raises(ValueError):
+        peticiones.inc(route="/")
+
+    texto = registro.render().splitlines()
+    assert texto[:2] == ["# HELP prueba_requests_total Peticiones", "# TYPE prueba_requests_total counter"]
+    assert 'prueba_requests_total{route="/",status="500"} 1' in texto
+    assert 'prueba_requests_total{route="/api/analisis/<id>",status="200"} 3' in texto
+
+
+def test_histograma_acumula_los_buckets():
+    registro = MetricsRegistry()
+    latencia = registro.histogram("prueba_seconds", "Duración", ("route",), buckets=(0.1, 1.0))
+    for valor in (0.05, 0.1, 0.5, 3.0):
+        latencia.observe(valor, route="/")
+    texto = registro.render().splitlines()
+    assert 'prueba_seconds_bucket{route="/",le="0.1"} 2' in texto
+    assert 'prueba_seconds_bucket{route="/",le="1"} 3' in texto
+    assert 'prueba_seconds_bucket{route="/",le="+Inf"} 4' in texto
+    assert 'prueba_seconds_sum{route="/"} 3.65' in texto
+    assert 'prueba_seconds_count{route="/"} 4' in texto
+
+
+def test_colector_de_stats_con_etiquetas_y_desactivado(monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", MetricsRegistry())
+    metrics.register_stats_collector("cache", lambda: {"hits": 5, "entries": 2, "enabled": True, "path": "x"},
+                                     counters=("hits", "enabled"), gauges=("entries", "path"))
+    metrics.register_stats_collector("flight", lambda: [{"name": "a", "leaders": 1}, {"name": "b", "leaders": 4}],
+                                     counters=("leaders",), labels=("name",))
+    metrics.register_stats_collector("apagado", lambda: None, counters=("hits",))
+    metrics.register_stats_collector("roto", lambda: 1 / 0, counters=("hits",))
+    texto = metrics.render_metrics().splitlines()
+    assert "# TYPE cache_hits_total counter" in texto and "cache_hits_total 5" in texto
+    assert "# TYPE cache_entries gauge" in texto and "cache_entries 2" in texto
+    assert 'flight_leaders_total{name="a"} 1' in texto and 'flight_leaders_total{name="b"} 4' in texto
+    assert not any(linea.startswith(("cache_enabled", "cache_path", "apagado", "roto")) for linea in texto)
+
+
+def test_etiquetas_escapadas():
+    registro = MetricsRegistry()
+    registro.counter("prueba_total", "Prueba", ("liga",)).inc(liga='Liga "A"\\B')
+    assert 'prueba_total{liga="Liga \\"A\\"\\\\B"} 1' in registro.render()
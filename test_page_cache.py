@@ -0,0 +1,76 @@
+# test_page_cache.py
+"""Pruebas de modules.page_cache: caducidad por clase de URL, caducidad en lectura y expulsión LRU."""
+import os
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos"))
+
+from modules import page_cache  # noqa: E402
+from modules.page_cache import FOREVER, PageCache, PageCacheTTL  # noqa: E402
+
+BASE = "https://live20.nowgoal25.com"
+
+
+def _pagina(state):
+    return f"<script>var _matchInfo = {{ matchId: 1, state: parseInt('{state}') }};</script>"
+
+
+@pytest.mark.parametrize("url, html, esperado", [
+    (f"{BASE}/match/h2h-2789999", _pagina(-1), FOREVER),   # terminado
+    (f"{BASE}/match/live-2789999", _pagina(-1), FOREVER),
+    (f"{BASE}/match/h2h-2789999", _pagina(0), 600),        # sin empezar
+    (f"{BASE}/match/live-2789999", _pagina(3), 60),        # en juego
+    (f"{BASE}/match/h2h-2789999", _pagina(-14), 600),      # aplazado: puede cambiar
+    (f"{BASE}/match/h2h-2789999", "<html>error</html>", 0),  # sin _matchInfo: no se guarda
+    (f"{BASE}/", "<html></html>", 60),
+    (f"{BASE}/football/results?date=2025-09-06", "<html></html>", 60),
+    (f"{BASE}/team/123", "<html></html>", 300),
+])
+def test_politica_de_caducidad(url, html, esperado):
+    assert PageCacheTTL()(url, html) == esperado
+
+
+def test_get_respeta_la_caducidad(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path))
+    ahora = [1000.0]
+    monkeypatch.setattr(page_cache.time, "time", lambda: ahora[0])
+    assert cache.put(f"{BASE}/match/h2h-1", _pagina(-1))
+    assert cache.put(f"{BASE}/match/h2h-2", _pagina(0))
+    assert not cache.put(f"{BASE}/match/h2h-3", "<html>error</html>")
+    ahora[0] += 601
+    assert cache.get(f"{BASE}/match/h2h-1") == _pagina(-1)
+    assert cache.get(f"{BASE}/match/h2h-2") is None
+    assert cache.get(f"{BASE}/match/h2h-3") is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["entries"] == 1
+
+
+def test_expulsa_las_menos_usadas_y_comparte_blobs(tmp_path, monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(page_cache.time, "time", lambda: ahora[0])
+    paginas = [_pagina(-1) + os.urandom(500).hex() for _ in range(60)]
+    tamano = max(len(zlib.compress(p.encode("utf-8"), 6)) for p in paginas)
+    cache = PageCache(str(tmp_path), max_bytes=tamano * 55)
+    for i in range(55):
+        ahora[0] += 1
+        cache.put(f"{BASE}/match/live-{i}", paginas[i])
+    assert cache.stats()["evicted"] == 0
+    # La 0 se vuelve a leer: deja de ser la menos usada
+    ahora[0] += 1
+    assert cache.get(f"{BASE}/match/live-0") == paginas[0]
+    for i in range(55, 60):
+        ahora[0] += 1
+        cache.put(f"{BASE}/match/live-{i}", paginas[i])
+    # Se expulsa por lotes (de 50) hasta bajar del 90% del máximo
+    assert cache.stats()["evicted"] == 50
+    assert cache.get(f"{BASE}/match/live-0") == paginas[0]
+    assert cache.get(f"{BASE}/match/live-1") is None and cache.get(f"{BASE}/match/live-50") is None
+    assert cache.get(f"{BASE}/match/live-51") == paginas[51]
+    assert cache.stats()["bytes"] <= cache.max_bytes * 0.9
+
+    # Misma página bajo dos URLs: un único fichero
+    cache.put(f"{BASE}/match/h2h-0", paginas[0])
+    blobs = [f for _, _, files in os.walk(tmp_path / "blobs") for f in files]
+    assert len(blobs) == cache.stats()["entries"] - 1
@@ -0,0 +1,67 @@
+# test_prewarm_queue.py
+"""Pruebas de prewarm_queue.PrewarmQueue: orden por hora de inicio, duplicados y cola llena."""
+import datetime
+import threading
+import time
+
+from prewarm_queue import PrewarmQueue
+
+INICIO = datetime.datetime(2026, 10, 18, 12)
+
+
+def _hora(horas):
+    return INICIO + datetime.timedelta(hours=horas)
+
+
+def _esperar(condicion, timeout=5):
+    limite = time.time() + timeout
+    while not condicion():
+        assert time.time() < limite, "tiempo de espera agotado"
+        time.sleep(0.01)
+
+
+def test_ordena_por_hora_descarta_duplicados_y_desplaza_al_mas_tardio():
+    soltar = threading.Event()
+    calculados = []
+
+    def compute(match_id):
+        soltar.wait(5)
+        calculados.append(match_id)
+
+    cola = PrewarmQueue(compute, workers=1, max_size=3, is_fresh=lambda match_id: match_id == "cacheado")
+    assert cola.submit("bloqueo", _hora(0)) == "queued"
+    _esperar(lambda: cola.stats()["running"] == 1)
+
+    assert cola.submit("c", _hora(5)) == "queued"
+    assert cola.submit("a", _hora(1)) == "queued"
+    assert cola.submit("sin_hora") == "queued"
+    assert cola.submit("a", _hora(1)) == "duplicate"
+    assert cola.submit("bloqueo", _hora(0)) == "duplicate"
+    assert cola.submit("cacheado", _hora(0)) == "fresh"
+    # Cola llena: uno que empieza antes desplaza al último; uno más tardío se rechaza
+    assert cola.submit("b", _hora(2)) == "queued"
+    assert cola.submit("d", _hora(9)) == "full"
+    assert cola.pending() == [("a", _hora(1)), ("b", _hora(2)), ("c", _hora(5))]
+
+    soltar.set()
+    _esperar(lambda: cola.stats()["done"] == 4)
+    assert calculados == ["bloqueo", "a", "b", "c"]
+    assert {k: cola.stats()[k] for k in ("duplicates", "fresh", "displaced", "rejected", "queued", "running")} == {
+        "duplicates": 2, "fresh": 1, "displaced": 1, "rejected": 1, "queued": 0, "running": 0}
+
+
+def test_un_error_no_para_los_workers():
+    calculados = []
+
+    def compute(match_id):
+        if match_id == "roto":
+            raise ValueError("sin datos")
+        calculados.append(match_id)
+
+    cola = PrewarmQueue(compute, workers=2)
+    for i, match_id in enumerate(("roto", "1", "2")):
+        cola.submit(match_id, _hora(i))
+    _esperar(lambda: cola.stats()["done"] + cola.stats()["failed"] == 3)
+    assert sorted(calculados) == ["1", "2"] and cola.stats()["failed"] == 1
+    # Ya no está en cola ni en curso: se puede volver a encolar
+    assert cola.submit("roto", _hora(0)) == "queued"
@@ -0,0 +1,122 @@
+# test_results_warehouse.py
+"""Pruebas de modules.results_warehouse: liquidación AH/goles, backtest agrupado e ingesta."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos"))
+
+from modules.results_warehouse import (  # noqa: E402
+    ResultsWarehouse,
+    _settle,
+    backtest_goal_line,
+    backtest_handicap,
+)
+
+
+@pytest.mark.parametrize("margin, line, esperado", [
+    (1, 0.5, 1.0),      # cubre
+    (0, 0.5, -1.0),     # pierde
+    (1, 1.0, 0.0),      # push
+    (1, 0.75, 0.5),     # medio ganado: gana 0.5 y push en 1
+    (0, 0.25, -0.5),    # medio perdido: push en 0 y pierde 0.5
+    (0, -0.25, 0.5),    # recibe un cuarto
+    (-1, -0.75, -0.5),  # recibe 0.75 y pierde por uno
+    (2, 1.5, 1.0),
+    (-3, 0.0, -1.0),
+])
+def test_settle(margin, line, esperado):
+    assert _settle(np.array([margin], dtype=float), np.array([line]))[0] == esperado
+
+
+def test_settle_vectorizado_igual_que_uno_a_uno():
+    margins = np.array([-2, -1, 0, 1, 2, 3], dtype=float)
+    lines = np.array([-1.25, -0.5, 0.25, 0.75, 1.0, 2.5])
+    uno_a_uno = [_settle(np.array([m]), np.array([l]))[0] for m, l in zip(margins, lines)]
+    assert list(_settle(margins, lines)) == uno_a_uno
+
+
+def _resultados():
+    return pd.DataFrame([
+        # league, home, away, goles, ah_line, goal_line
+        ("Liga A", "Rojo", "Azul", 3, 0, 0.5, 2.5),    # local cubre       | over
+        ("Liga A", "Azul", "Rojo", 1, 1, 0.25, 2.0),   # local medio pierde| push
+        ("Liga A", "Rojo", "Verde", 1, 0, 1.0, 2.25),  # push              | under
+        ("Liga B", "Verde", "Azul", 0, 2, -0.5, 2.0),  # visitante da 0.5, cubre | push
+        ("Liga B", "Azul", "Verde", 3, 1, None, 3.0),  # sin línea AH      | over
+    ], columns=["league", "home_team", "away_team", "home_goals", "away_goals", "ah_line", "goal_line"])
+
+
+def test_backtest_handicap_por_linea_y_lado():
+    local = backtest_handicap(_resultados(), by="ah_line", side="home")
+    assert local["matches"].sum() == 4
+    assert local.loc[0.5, "win"] == 1 and local.loc[0.25, "half_loss"] == 1
+    assert local.loc[1.0, "push"] == 1 and local.loc[-0.5, "loss"] == 1
+    visitante = backtest_handicap(_resultados(), by="ah_line", side="away")
+    assert visitante.loc[-0.5, "win"] == 1 and visitante.loc[0.25, "half_win"] == 1
+    assert set(local.columns) == {"matches", "win", "half_win", "push", "half_loss", "loss",
+                                  "cover_rate", "push_rate", "loss_rate", "units_per_match"}
+
+
+def test_backtest_handicap_favorito_liga_y_equipo():
+    favorito = backtest_handicap(_resultados(), by="league", side="favorite")
+    assert favorito.loc["Liga A", "matches"] == 3
+    assert favorito.loc["Liga A", "cover_rate"] == pytest.approx(1 / 3)
+    assert favorito.loc["Liga A", "units_per_match"] == pytest.approx((1 - 0.5 + 0) / 3)
+    # En Liga B el favorito es el visitante (línea negativa) y gana
+    assert favorito.loc["Liga B", "win"] == 1 and favorito.loc["Liga B", "matches"] == 1
+
+    equipos = backtest_handicap(_resultados(), by="team")
+    assert equipos["matches"].sum() == 8   # cada partido cuenta para sus dos equipos
+    assert equipos.loc["Rojo", "matches"] == 3
+    assert equipos.loc["Rojo", "units_per_match"] == pytest.approx((1 + 0.5 + 0) / 3)
+    assert set(backtest_handicap(_resultados(), by="team", min_matches=3).index) == {"Rojo", "Azul"}
+    with pytest.raises(ValueError):
+        backtest_handicap(_resultados(), side="empate")
+
+
+def test_backtest_goal_line_over_under():
+    over = backtest_goal_line(_resultados(), side="over")
+    under = backtest_goal_line(_resultados(), side="under")
+    assert over["matches"].sum() == 5
+    assert over.loc[2.5, "win"] == 1 and under.loc[2.5, "loss"] == 1
+    assert over.loc[2.25, "loss"] == 1 and under.loc[2.25, "win"] == 1
+    assert over.loc[2.0, "push"] == 2 and over.loc[2.0, "matches"] == 2
+    assert over.loc[3.0, "win"] == 1
+    # Over y under son simétricos partido a partido
+    assert (over["units_per_match"] + under.loc[over.index, "units_per_match"]).abs().max() == 0
+
+
+def test_ingesta_conserva_la_liga_y_agrupa_por_liga(tmp_path):
+    warehouse = ResultsWarehouse(tmp_path / "results.sqlite3")
+    filas = [
+        {"matchIndex": "1", "score_raw": "2-0", "date": "06-09-2025", "league_id_hist": "36",
+         "league": "Liga A", "home": "Rojo", "away": "Azul", "ahLine_raw": "0.5"},
+        {"matchIndex": "2", "score_raw": "1:1", "date": "13-09-2025", "league_id_hist": "36",
+         "league": "Liga A", "home": "Azul", "away": "Rojo", "ahLine_raw": "0/0.5"},
+        {"matchIndex": "3", "score_raw": "?", "league": "Liga A"},   # sin marcador: se descarta
+    ]
+    assert warehouse.ingest_h2h_rows(filas) == 2
+    # La portada trae el mismo partido sin liga pero con línea de goles: se completa, no se pisa
+    assert warehouse.ingest_listing([
+        {"id": "1", "score": "2 - 0", "time_obj": "2025-09-06T18:00:00", "home_team": "Rojo",
+         "away_team": "Azul", "handicap": "0.5", "goal_line": "2.5"},
+        {"id": "4", "score": "0 - 2", "time_obj": "2025-09-20T18:00:00", "home_team": "Verde",
+         "away_team": "Azul", "handicap": "-0.5", "goal_line": "2"},
+    ]) == 2
+
+    resultados = warehouse.load_results()
+    assert len(resultados) == 3
+    primero = resultados.set_index("match_id").loc["1"]
+    assert primero["league"] == "Liga A" and primero["goal_line"] == 2.5 and primero["ah_line"] == 0.5
+    assert resultados.set_index("match_id").loc["2", "ah_line"] == 0.25
+    assert len(warehouse.load_results(league="36")) == 2
+    assert len(warehouse.load_results(team="azul")) == 3
+
+    por_liga = backtest_handicap(resultados.dropna(subset=["league"]), by="league")
+    assert list(por_liga.index) == ["Liga A"] and por_liga.loc["Liga A", "matches"] == 2
+    stats = warehouse.stats()
+    assert stats["results"] == 3 and stats["with_goal_line"] == 2 and stats["leagues"] == 1
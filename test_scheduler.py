@@ -0,0 +1,66 @@
+# test_scheduler.py
+"""Pruebas de scheduler.FeedScheduler con feeds falsos (sin red)."""
+import json
+
+from match_snapshot import ChangeLogReader, change_log_path_for, load_snapshot
+from scheduler import Feed, FeedScheduler, read_status_file
+
+
+def _feed(name, section, resultados, intervalo=600):
+    """Feed que devuelve en cada ejecución el siguiente elemento de `resultados` (o lo lanza)."""
+    pendientes = list(resultados)
+
+    async def fetch():
+        resultado = pendientes.pop(0)
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+
+    return Feed(name, section, fetch, intervalo)
+
+
+def test_fusiona_cada_feed_en_data_json_y_publica_el_estado(tmp_path):
+    data_file = tmp_path / "data.json"
+    espejo = tmp_path / "raiz" / "data.json"
+    espejo.parent.mkdir()
+    proximos = [{"id": "1", "time_obj": "2026-10-18T12:00:00"}, {"id": "2", "time_obj": "2026-10-18T13:00:00"}]
+    finalizados = [{"id": "9", "time_obj": "2026-10-17T12:00:00", "score": "1 - 0"}]
+    scheduler = FeedScheduler(data_file, [
+        _feed("upcoming", "upcoming_matches", [proximos, proximos]),
+        _feed("results", "finished_matches", [finalizados, finalizados]),
+    ], jitter=0, mirror_to=[espejo])
+    lector = ChangeLogReader(change_log_path_for(data_file))
+
+    estado = scheduler.run_once()
+    data = load_snapshot(data_file)
+    assert [m["id"] for m in data["upcoming_matches"]] == ["1", "2"]
+    assert [m["id"] for m in data["finished_matches"]] == ["9"]
+    assert json.loads(espejo.read_text(encoding="utf-8")) == data
+    assert [e["added"] for e in lector.read_new()] == [["1", "2"], ["9"]]
+    assert estado["feeds"]["upcoming"]["last_rows"] == 2
+    assert estado["feeds"]["upcoming"]["last_changes"]["added"] == 2
+    assert read_status_file(data_file)["feeds"]["results"]["runs"] == 1
+
+    # Misma descarga: no se reescribe ni se registra nada
+    mtime = data_file.stat().st_mtime_ns
+    scheduler.run_once()
+    assert data_file.stat().st_mtime_ns == mtime and lector.read_new() == []
+
+
+def test_un_fallo_no_pisa_el_snapshot_y_espera_cada_vez_mas(tmp_path):
+    data_file = tmp_path / "data.json"
+    proximos = [{"id": "1", "time_obj": "2026-10-18T12:00:00"}]
+    feed = _feed("upcoming", "upcoming_matches", [proximos, RuntimeError("caída"), [], proximos], intervalo=60)
+    scheduler = FeedScheduler(data_file, [feed], jitter=0, max_backoff_seconds=200)
+
+    assert scheduler._delay(feed) == 60
+    scheduler.run_once()
+    scheduler.run_once()
+    assert "caída" in feed.state["last_error"] and scheduler._delay(feed) == 120
+    scheduler.run_once()   # descarga vacía: también cuenta como fallo
+    assert feed.state["consecutive_failures"] == 2 and scheduler._delay(feed) == 200
+    assert [m["id"] for m in load_snapshot(data_file)["upcoming_matches"]] == ["1"]
+
+    scheduler.run_once()
+    assert feed.state["consecutive_failures"] == 0 and feed.state["failures"] == 2
+    assert feed.state["last_error"] is None and scheduler._delay(feed) == 60
@@ -0,0 +1,24 @@
+# test_scraping_logic.py
+"""Los dos motores de listados de scraping_logic (lxml y bs4) deben devolver los mismos partidos."""
+import pytest
+
+import scraping_logic
+from benchmark_parsers import DEFAULT_FIXTURES_DIR, DEFAULT_NOW, _frozen_clock, _load_fixture
+
+CONSULTAS = [
+    dict(limit=100000),
+    dict(limit=10, offset=3, handicap_filter="0.5"),
+]
+
+
+@pytest.mark.parametrize("consulta", CONSULTAS)
+@pytest.mark.parametrize("funcion, fixture", [
+    (scraping_logic.parse_main_page_matches, "index_web.txt"),
+    (scraping_logic.parse_main_page_finished_matches, "resultados.txt"),
+])
+def test_lxml_igual_que_bs4(funcion, fixture, consulta):
+    html = _load_fixture(DEFAULT_FIXTURES_DIR, fixture)
+    with _frozen_clock(DEFAULT_NOW):
+        lxml = funcion(html, engine="lxml", **consulta)
+        bs4 = funcion(html, engine="bs4", **consulta)
+    assert lxml and lxml == bs4
@@ -0,0 +1,62 @@
+# test_single_flight.py
+"""Pruebas de single_flight.SingleFlight."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def _lanzar(flight, clave, fn, n):
+    """n llamadas simultáneas a flight.do(clave, fn); devuelve los resultados o excepciones."""
+    barrera = threading.Barrier(n)
+
+    def llamada():
+        barrera.wait()
+        try:
+            return flight.do(clave, fn)
+        except Exception as exc:
+            return exc
+
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        return [f.result() for f in [executor.submit(llamada) for _ in range(n)]]
+
+
+def test_llamadas_simultaneas_comparten_un_calculo():
+    llamadas = []
+
+    def calculo():
+        llamadas.append(1)
+        time.sleep(0.2)
+        return {"ok": True}
+
+    flight = SingleFlight("prueba")
+    resultados = _lanzar(flight, "123", calculo, 8)
+    assert len(llamadas) == 1
+    assert all(r is resultados[0] for r in resultados)
+    stats = flight.stats()
+    assert stats["leaders"] == 1 and stats["shared"] == 7 and stats["in_flight"] == 0
+
+
+def test_la_excepcion_del_lider_llega_a_todos():
+    def calculo():
+        time.sleep(0.2)
+        raise RuntimeError("sin datos")
+
+    flight = SingleFlight("prueba")
+    resultados = _lanzar(flight, "123", calculo, 4)
+    assert all(isinstance(r, RuntimeError) and str(r) == "sin datos" for r in resultados)
+    assert flight.stats()["errors"] == 1
+
+
+def test_la_clave_queda_libre_al_terminar_y_las_claves_no_se_mezclan():
+    flight = SingleFlight("prueba")
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("a", lambda: 2) == 2
+    assert flight.do(("light", "a"), lambda: 3) == 3
+    assert flight.in_flight() == []
+    with pytest.raises(ValueError):
+        flight.do("a", int, "x")
+    assert flight.do("a", int, "4") == 4
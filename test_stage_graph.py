@@ -0,0 +1,107 @@
+# test_stage_graph.py
+"""Pruebas de modules.stage_graph: orden de las etapas, fallos y reutilización (initial/partial)."""
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos"))
+
+from modules.stage_graph import StageGraph  # noqa: E402
+
+
+def _grafo(registro, fallo=None):
+    """a -> (b, c) -> d, anotando en `registro` el orden de ejecución."""
+    lock = threading.Lock()
+
+    def etapa(nombre, espera=0.0):
+        def fn(*args):
+            time.sleep(espera)
+            if nombre == fallo:
+                raise RuntimeError(f"fallo en {nombre}")
+            with lock:
+                registro.append(nombre)
+            return f"{nombre}({','.join(args)})"
+        return fn
+
+    grafo = StageGraph("prueba", inputs=("x",))
+    grafo.add("a", etapa("a"), ("x",))
+    grafo.add("b", etapa("b", 0.05), ("a",))
+    grafo.add("c", etapa("c"), ("a",))
+    grafo.add("d", etapa("d"), ("b", "c"))
+    return grafo
+
+
+def test_run_respeta_dependencias_y_pasa_los_resultados_en_orden():
+    registro = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        run = _grafo(registro).run(executor, {"x": "1"})
+    assert registro[0] == "a" and registro[-1] == "d"
+    assert set(registro[1:3]) == {"b", "c"}
+    assert run.results["d"] == "d(b(a(1)),c(a(1)))"
+    assert set(run.timings) == {"a", "b", "c", "d"}
+    assert run.reused == []
+
+
+def test_etapas_independientes_corren_a_la_vez():
+    # c no espera a b: termina antes aunque se añadió después
+    registro = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        _grafo(registro).run(executor, {"x": "1"})
+    assert registro.index("c") < registro.index("b")
+
+
+def test_fallo_llega_al_llamador_y_partial_conserva_lo_terminado():
+    registro, parcial = [], {}
+    with ThreadPoolExecutor(max_workers=4) as executor, pytest.raises(RuntimeError, match="fallo en b"):
+        _grafo(registro, fallo="b").run(executor, {"x": "1"}, partial=parcial)
+    assert "d" not in registro
+    assert parcial["a"] == "a(1)"
+    assert "b" not in parcial and "d" not in parcial
+
+
+def test_initial_salta_las_etapas_ya_calculadas_y_partial_solo_recoge_las_nuevas():
+    registro, parcial = [], {}
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        run = _grafo(registro).run(executor, {"x": "1", "a": "A", "c": "C"}, partial=parcial)
+    assert sorted(registro) == ["b", "d"]
+    assert run.results["d"] == "d(b(A),C)"
+    assert run.reused == ["a", "c"]
+    assert set(parcial) == {"b", "d"}
+
+
+def test_run_async_igual_que_run():
+    orden = []
+
+    def etapa(nombre):
+        async def fn(*args):
+            await asyncio.sleep(0.01)
+            orden.append(nombre)
+            return nombre + "".join(args)
+        return fn
+
+    grafo = StageGraph("prueba_async", inputs=("x",))
+    grafo.add("a", etapa("a"), ("x",))
+    grafo.add("b", etapa("b"), ("a",))
+    grafo.add("c", etapa("c"), ("a", "b"))
+    parcial = {}
+    run = asyncio.run(grafo.run_async({"x": "1", "a": "A"}, partial=parcial))
+    assert orden == ["b", "c"]
+    assert run.results["c"] == "cAbA"
+    assert run.reused == ["a"]
+    assert set(parcial) == {"b", "c"}
+
+
+def test_errores_de_definicion():
+    grafo = StageGraph("prueba", inputs=("x",))
+    grafo.add("a", lambda x: x, ("x",))
+    with pytest.raises(ValueError):
+        grafo.add("a", lambda x: x, ("x",))
+    with pytest.raises(ValueError):
+        grafo.add("b", lambda z: z, ("z",))
+    with ThreadPoolExecutor(max_workers=1) as executor, pytest.raises(ValueError):
+        grafo.run(executor, {})
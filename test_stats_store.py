@@ -0,0 +1,47 @@
+# test_stats_store.py
+"""Pruebas de modules.stats_store y de las estadísticas de progresión en lote de estudio_scraper."""
+import os
+import sys
+
+MUESTRA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos")
+sys.path.insert(0, MUESTRA)
+
+from modules import estudio_scraper as es  # noqa: E402
+from modules.stats_store import StatsStore  # noqa: E402
+
+
+def _captura(nombre):
+    with open(os.path.join(MUESTRA, "html_extraer", nombre), encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def test_guarda_y_recupera_la_misma_tabla(tmp_path):
+    df = es.parse_match_progression_stats_html(_captura("live.txt"))
+    store = StatsStore(str(tmp_path / "stats.sqlite3"))
+    store.put_many({"1": df, "2": None})
+    encontrados = store.get_many(["1", "2", "1", None])
+    assert list(encontrados) == ["1"]
+    assert encontrados["1"].equals(df)
+    assert store.stats() == {"hits": 1, "misses": 1, "stores": 1, "entries": 1}
+
+
+def test_el_lote_solo_descarga_lo_que_falta_y_guarda_los_terminados(tmp_path, monkeypatch):
+    store = StatsStore(str(tmp_path / "stats.sqlite3"))
+    monkeypatch.setattr(es, "get_stats_store", lambda: store)
+    monkeypatch.setenv("RESULTS_WAREHOUSE_ENABLED", "0")
+    terminado = _captura("live.txt")
+    sin_terminar = terminado.replace("state: parseInt('-1')", "state: parseInt('0')")
+    descargas = []
+
+    def http_get_text(url, timeout=None):
+        descargas.append(url.rsplit("-", 1)[-1])
+        return sin_terminar if url.endswith("-3") else terminado
+
+    monkeypatch.setattr(es, "http_get_text", http_get_text)
+    primera = es.get_match_progression_stats_bulk_of(["1", "3", "1", None, "x"])
+    assert sorted(descargas) == ["1", "3"] and set(primera) == {"1", "3"}
+    assert list(store.get_many(["1", "3"])) == ["1"]
+
+    descargas.clear()
+    segunda = es.get_match_progression_stats_bulk_of(["1", "3"])
+    assert descargas == ["3"] and segunda["1"].equals(primera["1"])
@@ -0,0 +1,82 @@
+# test_tracing.py
+"""Pruebas de modules.tracing: trazas por partido, anidamiento y paso entre hilos y procesos."""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "muestra_sin_fallos"))
+
+from modules import tracing  # noqa: E402
+from modules.stage_graph import StageGraph  # noqa: E402
+
+
+def test_fuera_de_una_traza_no_se_registra_nada():
+    antes = len(tracing.recent_spans())
+    with tracing.span("suelto") as s:
+        s.set(bytes=10)
+        tracing.annotate(status=200)
+        assert tracing.current_span() is None
+    assert tracing.current_trace_id() is None and tracing.propagation_context() is None
+    assert len(tracing.recent_spans()) == antes
+
+
+def test_spans_anidados_cuelgan_de_su_padre():
+    with tracing.trace("analisis", match_id="111") as raiz:
+        trace_id = tracing.current_trace_id()
+        with tracing.span("fetch", url="h2h-111") as fetch:
+            fetch.set(status=200)
+            with tracing.trace("parse"):          # dentro de una traza, trace() es un span
+                tracing.annotate(filas=3)
+    assert trace_id.startswith("111-") and raiz.parent_id is None
+
+    spans = {s["name"]: s for s in tracing.recent_spans(trace_id=trace_id)}
+    assert set(spans) == {"analisis", "fetch", "parse"}
+    assert spans["fetch"]["parent_id"] == spans["analisis"]["span_id"]
+    assert spans["parse"]["parent_id"] == spans["fetch"]["span_id"]
+    assert spans["fetch"]["status"] == 200 and spans["parse"]["filas"] == 3
+    assert spans["analisis"]["match_id"] == "111"
+    assert [s["trace_id"] for s in tracing.recent_spans(match_id="111")][-3:] == [trace_id] * 3
+
+    resumen = next(t for t in tracing.recent_traces() if t["trace_id"] == trace_id)
+    assert resumen["name"] == "analisis" and resumen["spans"] == 3 and resumen["match_id"] == "111"
+
+
+def test_el_error_queda_en_el_span():
+    with pytest.raises(KeyError):
+        with tracing.trace("analisis", match_id="222"):
+            with tracing.span("parse"):
+                raise KeyError("x")
+    spans = {s["name"]: s for s in tracing.recent_spans(match_id="222")}
+    assert spans["parse"]["error"] == "KeyError" and spans["analisis"]["error"] == "KeyError"
+
+
+def test_la_traza_cruza_los_hilos_del_grafo():
+    grafo = StageGraph("prueba", inputs=("x",))
+    grafo.add("a", tracing.traced("paso_a")(lambda x: x + "a"), ("x",))
+    grafo.add("b", lambda a: a + "b", ("a",))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with tracing.trace("grafo", match_id="333"):
+            trace_id = tracing.current_trace_id()
+            assert grafo.run(executor, {"x": "1"}).results["b"] == "1ab"
+    spans = {s["name"]: s for s in tracing.recent_spans(trace_id=trace_id)}
+    assert spans["stage:a"]["parent_id"] == spans["grafo"]["span_id"]
+    assert spans["paso_a"]["parent_id"] == spans["stage:a"]["span_id"]
+    assert spans["stage:b"]["parent_id"] == spans["grafo"]["span_id"]
+
+
+def _trabajo(n):
+    with tracing.span("parse", n=n):
+        return n * 2
+
+
+def test_call_collecting_devuelve_los_spans_del_proceso_hijo():
+    with tracing.trace("analisis", match_id="444"):
+        padre = tracing.propagation_context()
+        resultado, registros = tracing.call_collecting(padre, _trabajo, 21)
+        tracing.adopt(registros)
+    assert resultado == 42
+    assert [r["name"] for r in registros] == ["parse", "worker"]
+    assert registros[1]["parent_id"] == padre[1] and registros[0]["parent_id"] == registros[1]["span_id"]
+    assert {s["name"] for s in tracing.recent_spans(trace_id=padre[0])} == {"analisis", "parse", "worker"}